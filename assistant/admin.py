@@ -5,7 +5,7 @@ total count at the top, filters by tenant/status/date, and searches question tex
 """
 from django.contrib import admin
 
-from .models import AssistantQuery
+from .models import AssistantDailyUsage, AssistantQuery
 
 
 @admin.register(AssistantQuery)
@@ -28,3 +28,16 @@ class AssistantQueryAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False  # view-only
+
+
+@admin.register(AssistantDailyUsage)
+class AssistantDailyUsageAdmin(admin.ModelAdmin):
+    list_display = ("day", "schema_name", "status", "count")
+    list_filter = ("status", "schema_name")
+    date_hierarchy = "day"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False  # view-only
@@ -1,11 +1,26 @@
-"""Thin wrapper around the Anthropic Messages API for the help assistant."""
+"""Thin wrapper around the Anthropic Messages API for the help assistant.
+
+Answers are cached by normalised question, scoped by the asker's role line and
+the knowledge-base version (prompts.knowledge_version), so the questions staff
+keep asking are answered once per guide edit:
+
+    assistant:answer:<model>:<guide hash>:<role hash>:<question hash>
+
+ask() returns a whole answer; stream() yields it as it's generated, for the
+server-sent-events endpoint.
+"""
+import hashlib
 import logging
 import os
+import re
+import unicodedata
+from contextlib import contextmanager
 
 import anthropic
 from django.conf import settings
+from django.core.cache import cache
 
-from .prompts import build_system_prompt
+from .prompts import build_system_prompt, knowledge_version, role_scope
 
 logger = logging.getLogger(__name__)
 
@@ -40,17 +55,55 @@ def _get_client():
     return _client
 
 
-def ask(user, question: str) -> str:
-    """Answer `question` for `user`. Raises AssistantUnavailable on failure."""
-    client = _get_client()
+# Harakat, Quranic marks and tatweel; and the letter variants people type
+# interchangeably.
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"})
+
+
+def normalize_question(question: str) -> str:
+    """The cache identity of a question: case, Arabic diacritics / tatweel,
+    alef and yeh variants, whitespace and trailing punctuation don't make a
+    question different."""
+    q = unicodedata.normalize("NFKC", question).casefold()
+    q = _ARABIC_MARKS.sub("", q)
+    q = q.translate(_ARABIC_FOLD)
+    q = re.sub(r"\s+", " ", q).strip()
+    return q.rstrip(" ?？؟!.。،,")
+
+
+def _answer_key(user, question: str) -> str:
+    """Answers depend only on the model, the guide, the role line and the
+    question — never on tenant data — so the cache is shared across tenants."""
+    digest = hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()[:32]
+    return (f"assistant:answer:{settings.ASSISTANT_MODEL}:{knowledge_version()}:"
+            f"{role_scope(user)}:{digest}")
+
+
+def cached_answer(user, question: str) -> str | None:
+    """A stored answer to this question for this role, or None."""
+    if not settings.ASSISTANT_ANSWER_CACHE_SECONDS:
+        return None
+    try:
+        return cache.get(_answer_key(user, question))
+    except Exception:  # noqa: BLE001 — a cache outage just means a live answer
+        return None
+
+
+def _remember(user, question: str, text: str) -> None:
+    if not settings.ASSISTANT_ANSWER_CACHE_SECONDS:
+        return
     try:
-        response = client.messages.create(
-            model=settings.ASSISTANT_MODEL,
-            # Help answers are deliberately short; this caps a runaway response.
-            max_tokens=1024,
-            system=build_system_prompt(user),
-            messages=[{"role": "user", "content": question}],
-        )
+        cache.set(_answer_key(user, question), text, settings.ASSISTANT_ANSWER_CACHE_SECONDS)
+    except Exception:  # noqa: BLE001
+        pass
+
+
+@contextmanager
+def _api_errors():
+    """Turn Anthropic SDK failures into AssistantUnavailable."""
+    try:
+        yield
     except anthropic.RateLimitError:
         logger.warning("assistant: upstream rate limit")
         raise AssistantUnavailable("المساعد مشغول حالياً، يرجى المحاولة بعد قليل.")
@@ -61,12 +114,23 @@ def ask(user, question: str) -> str:
         logger.error("assistant: connection error")
         raise AssistantUnavailable("تعذّر الاتصال بالمساعد، يرجى المحاولة لاحقاً.")
 
+
+def _request(user, question: str) -> dict:
+    return dict(
+        model=settings.ASSISTANT_MODEL,
+        # Help answers are deliberately short; this caps a runaway response.
+        max_tokens=1024,
+        system=build_system_prompt(user),
+        messages=[{"role": "user", "content": question}],
+    )
+
+
+def _finish(user, question: str, response, text: str) -> str:
+    """Validate a complete response, log its usage and cache the answer."""
     if response.stop_reason == "refusal":
         raise AssistantUnavailable("لا يمكن الإجابة على هذا السؤال.")
 
-    text = "\n".join(
-        block.text for block in response.content if block.type == "text"
-    ).strip()
+    text = text.strip()
     if not text:
         raise AssistantUnavailable("لم يصل رد من المساعد، يرجى المحاولة مرة أخرى.")
 
@@ -76,4 +140,33 @@ def ask(user, question: str) -> str:
         response.usage.cache_read_input_tokens,
         response.usage.output_tokens,
     )
+    _remember(user, question, text)
     return text
+
+
+def ask(user, question: str) -> str:
+    """Answer `question` for `user`. Raises AssistantUnavailable on failure.
+
+    Doesn't consult the answer cache (see cached_answer) but fills it."""
+    client = _get_client()
+    with _api_errors():
+        response = client.messages.create(**_request(user, question))
+
+    text = "\n".join(
+        block.text for block in response.content if block.type == "text"
+    )
+    return _finish(user, question, response, text)
+
+
+def stream(user, question: str):
+    """Like ask(), but yields the answer's text as it is generated. Raises
+    AssistantUnavailable — possibly after some text has been yielded."""
+    client = _get_client()
+    parts = []
+    with _api_errors():
+        with client.messages.stream(**_request(user, question)) as events:
+            for text in events.text_stream:
+                parts.append(text)
+                yield text
+            response = events.get_final_message()
+    _finish(user, question, response, "".join(parts))
@@ -6,14 +6,19 @@
     python manage.py assistant_stats --schema ofleet0
     python manage.py assistant_stats --prune 90      # delete rows older than 90 days
 
-Runs against the public-schema table, so it covers every tenant at once. Pass any
+Runs against the public-schema tables, so it covers every tenant at once. Pass any
 DJANGO_SETTINGS_MODULE that points at the shared DB (settings_vps on the server).
+
+Counts come from the AssistantDailyUsage rollup (a few rows per tenant per day);
+only the recent-questions list reads AssistantQuery. Questions still buffered
+(not yet written by flush_assistant_log) are reported separately.
 """
 from django.core.management.base import BaseCommand
-from django.db.models import Count
+from django.db.models import Sum
 from django.utils import timezone
 
-from assistant.models import AssistantQuery
+from assistant import usage
+from assistant.models import AssistantDailyUsage, AssistantQuery
 
 
 class Command(BaseCommand):
@@ -34,34 +39,41 @@ class Command(BaseCommand):
             return
 
         qs = AssistantQuery.objects.all()
+        daily = AssistantDailyUsage.objects.all()
         if opts["days"]:
             qs = qs.filter(created_at__gte=timezone.now() - timezone.timedelta(days=opts["days"]))
+            daily = daily.filter(day__gt=timezone.localdate() - timezone.timedelta(days=opts["days"]))
         if opts["schema"]:
             qs = qs.filter(schema_name=opts["schema"])
+            daily = daily.filter(schema_name=opts["schema"])
 
-        total = qs.count()
+        total = daily.aggregate(n=Sum("count"))["n"] or 0
         window = f"last {opts['days']} days" if opts["days"] else "all time"
         scope = f", schema={opts['schema']}" if opts["schema"] else ""
         self.stdout.write(self.style.MIGRATE_HEADING(f"\nAssistant usage ({window}{scope})"))
         self.stdout.write(f"  Total questions: {total}")
+        waiting = usage.pending()
+        if waiting:
+            self.stdout.write(f"  Buffered, not yet written: {waiting} (run flush_assistant_log)")
         if not total:
             return
 
-        by_status = dict(qs.values_list("status").annotate(n=Count("id")))
+        by_status = dict(daily.values_list("status").annotate(n=Sum("count")).order_by())
         self.stdout.write(
             f"  answered={by_status.get('ok', 0)}  "
+            f"cached={by_status.get('cached', 0)}  "
             f"errors={by_status.get('error', 0)}  "
             f"rate_limited={by_status.get('rate_limited', 0)}"
         )
 
         self.stdout.write("\n  By tenant:")
-        for row in qs.values("schema_name").annotate(n=Count("id")).order_by("-n"):
+        for row in daily.values("schema_name").annotate(n=Sum("count")).order_by("-n"):
             self.stdout.write(f"    {row['schema_name']:24} {row['n']}")
 
         n = opts["recent"]
         self.stdout.write(self.style.MIGRATE_HEADING(f"\n  {n} most recent questions:"))
         for q in qs.order_by("-created_at")[:n]:
             when = q.created_at.strftime("%Y-%m-%d %H:%M")
-            flag = "" if q.status == "ok" else f" [{q.status}]"
+            flag = "" if q.status in ("ok", "cached") else f" [{q.status}]"
             self.stdout.write(f"    {when}  {q.schema_name}/{q.username}{flag}: {q.question[:90]}")
         self.stdout.write("")
@@ -0,0 +1,41 @@
+"""Write the buffered assistant log (Redis list `assistant:log`) to the
+database: AssistantQuery rows in bulk, plus the AssistantDailyUsage rollup.
+
+    python manage.py flush_assistant_log              # drain once
+    python manage.py flush_assistant_log --loop       # long-running worker
+
+A record leaves the list only after its batch is committed, so drains take
+a Redis lease (usage.DRAIN_LOCK_KEY): a run that finds it held writes nothing
+and leaves the list to the drainer already at work.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant import usage
+
+
+class Command(BaseCommand):
+    help = "Drain the buffered assistant usage log into AssistantQuery / AssistantDailyUsage."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Records per transaction.")
+        parser.add_argument("--loop", action="store_true", help="Keep draining until stopped.")
+        parser.add_argument("--interval", type=int, default=30,
+                            help="Seconds between drains with --loop (default 30).")
+
+    def handle(self, *args, **opts):
+        usage.flush(force=True)  # anything this process buffered itself
+        while True:
+            try:
+                n = usage.drain(batch=max(1, opts["batch"]))
+            except Exception as e:
+                if not opts["loop"]:
+                    raise CommandError(f"Redis unavailable: {e}")
+                self.stderr.write(f"drain failed: {e}")
+                n = 0
+            if n or not opts["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Wrote {n} assistant log record(s)."))
+            if not opts["loop"]:
+                return
+            time.sleep(max(1, opts["interval"]))
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assistantquery',
+            name='status',
+            field=models.CharField(choices=[('ok', 'answered'), ('cached', 'answered from cache'), ('error', 'error'), ('rate_limited', 'rate limited')], db_index=True, default='ok', max_length=20),
+        ),
+    ]
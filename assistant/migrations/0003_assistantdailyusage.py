@@ -0,0 +1,50 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Roll the existing log up so assistant_stats keeps its history."""
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+
+    AssistantQuery = apps.get_model('assistant', 'AssistantQuery')
+    AssistantDailyUsage = apps.get_model('assistant', 'AssistantDailyUsage')
+    rows = (AssistantQuery.objects.annotate(day=TruncDate('created_at'))
+            .values('day', 'schema_name', 'status').annotate(n=Count('id')).order_by())
+    AssistantDailyUsage.objects.bulk_create(
+        [AssistantDailyUsage(day=r['day'], schema_name=r['schema_name'], status=r['status'], count=r['n'])
+         for r in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0002_assistantquery_status_cached'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assistantquery',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='AssistantDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('schema_name', models.CharField(max_length=63)),
+                ('status', models.CharField(choices=[('ok', 'answered'), ('cached', 'answered from cache'), ('error', 'error'), ('rate_limited', 'rate limited')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'assistant daily usage',
+                'verbose_name_plural': 'assistant daily usage',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'schema_name', 'status'), name='assistant_daily_usage_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
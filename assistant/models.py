@@ -9,16 +9,22 @@ regardless of which tenant context the view ran in.
 Note on privacy: this stores the free text a staff member typed. It's internal
 "how do I…" help usage, not customer data, but it is retained — prune it if that
 ever matters (see the `assistant_stats --prune` command).
+
+Rows arrive in batches: views buffer them through assistant.usage and the
+`flush_assistant_log` command writes them, adding to AssistantDailyUsage.
 """
 from django.db import models
+from django.utils import timezone
 
 
 class AssistantQuery(models.Model):
     STATUS_OK = "ok"
     STATUS_ERROR = "error"
     STATUS_RATE_LIMITED = "rate_limited"
+    STATUS_CACHED = "cached"
     STATUS_CHOICES = [
         (STATUS_OK, "answered"),
+        (STATUS_CACHED, "answered from cache"),
         (STATUS_ERROR, "error"),
         (STATUS_RATE_LIMITED, "rate limited"),
     ]
@@ -32,7 +38,8 @@ class AssistantQuery(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default=STATUS_OK, db_index=True
     )
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Stamped when asked, not when the buffered row is written (assistant.usage).
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -41,3 +48,26 @@ class AssistantQuery(models.Model):
 
     def __str__(self):
         return f"[{self.schema_name}] {self.question[:60]}"
+
+
+class AssistantDailyUsage(models.Model):
+    """Questions per day, tenant and status — what `assistant_stats` reads
+    instead of counting AssistantQuery. Kept by assistant.usage.save() as the
+    buffered log is written, so it outlives `--prune`."""
+    day = models.DateField()
+    schema_name = models.CharField(max_length=63)
+    status = models.CharField(max_length=20, choices=AssistantQuery.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        verbose_name = "assistant daily usage"
+        verbose_name_plural = "assistant daily usage"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "schema_name", "status"], name="assistant_daily_usage_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.schema_name} {self.status} = {self.count}"
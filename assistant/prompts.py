@@ -5,6 +5,7 @@ so it goes first and carries the cache breakpoint; the per-user role line is
 volatile and goes last. Putting the role first would change the prefix per user
 and defeat prompt caching entirely.
 """
+import hashlib
 from functools import lru_cache
 from pathlib import Path
 
@@ -97,6 +98,21 @@ def knowledge_base() -> str:
     return f"{scope}\n\n---\n\n{body}"
 
 
+@lru_cache(maxsize=1)
+def knowledge_version() -> str:
+    """Short hash of the guide as loaded. Part of the answer cache key, so
+    editing any knowledge/*.md file (and deploying) retires every cached
+    answer written against the old text."""
+    return hashlib.sha256(knowledge_base().encode("utf-8")).hexdigest()[:16]
+
+
+def role_scope(user) -> str:
+    """Hash of everything per-user that goes into the prompt (the role line).
+    Two users with the same role and sections get the same answers."""
+    role, sections = _describe_role(user)
+    return hashlib.sha256(f"{role}\n{sections}".encode("utf-8")).hexdigest()[:16]
+
+
 def _describe_role(user) -> tuple[str, str]:
     granted = allowed_sections(user)
     if is_site_admin(user):
@@ -0,0 +1,110 @@
+import json
+import time
+from unittest import mock
+
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import client, usage
+from .models import AssistantDailyUsage, AssistantQuery
+from .prompts import knowledge_base, knowledge_version
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ASSISTANT_ANSWER_CACHE_SECONDS=60,
+)
+class AnswerCacheTests(SimpleTestCase):
+    """The answer cache: which questions count as the same, and what scopes
+    a cached answer."""
+
+    def test_normalised_questions_match(self):
+        same = ["كيف أضيف سيارة؟", "كيف اضيف سيارة", "  كيـف أُضيف   سيارة ؟ "]
+        self.assertEqual(len({client.normalize_question(q) for q in same}), 1)
+        self.assertEqual(client.normalize_question("How do I add a car?"),
+                         client.normalize_question("how do i add a CAR"))
+        self.assertNotEqual(client.normalize_question("كيف أضيف سيارة"),
+                            client.normalize_question("كيف أحذف سيارة"))
+
+    def test_answers_are_scoped_by_role_and_guide(self):
+        self.assertEqual(knowledge_version(), knowledge_version())
+        self.assertTrue(knowledge_base())
+
+        with mock.patch.object(client, "role_scope", return_value="admin"):
+            client._remember(None, "How do I add a car?", "Open Cars, then Add.")
+            self.assertEqual(client.cached_answer(None, "how do i add a car"), "Open Cars, then Add.")
+        with mock.patch.object(client, "role_scope", return_value="staff"):
+            self.assertIsNone(client.cached_answer(None, "how do i add a car"))
+        with mock.patch.object(client, "role_scope", return_value="admin"), \
+                mock.patch.object(client, "knowledge_version", return_value="edited"):
+            self.assertIsNone(client.cached_answer(None, "how do i add a car"))
+
+
+class UsageTests(TestCase):
+    """assistant.usage: the burst cap's local fallback, and the bulk writer
+    behind the buffered log keeping the daily rollup."""
+
+    def test_burst_cap_falls_back_to_the_process_window(self):
+        with mock.patch.object(usage, "_redis", side_effect=ConnectionError):
+            verdicts = [usage.check("t1", 7, 2, 100) for _ in range(3)]
+        self.assertEqual(verdicts, [usage.OK, usage.OK, usage.BURST])
+
+    def test_refused_questions_use_up_neither_cap(self):
+        try:
+            r = usage._redis()
+            r.ping()
+        except Exception:
+            self.skipTest("needs the state Redis")
+        schema = f"test-{time.time_ns()}"
+        self.addCleanup(lambda: r.delete(*(r.keys(f"{usage.KEY_PREFIX}*{schema}*") or ["-"])))
+        with mock.patch.object(usage, "_redis_down_until", 0.0):
+            # The tenant's daily cap (2) is spent; further questions are
+            # refused on it and never reach the user's burst cap (3).
+            verdicts = [usage.check(schema, 7, 3, 2) for _ in range(5)]
+        self.assertEqual(verdicts, [usage.OK, usage.OK, usage.DAILY, usage.DAILY, usage.DAILY])
+
+    def test_a_quiet_buffer_is_still_pushed(self):
+        r = mock.Mock()
+        with mock.patch.object(usage, "_redis", return_value=r), \
+                mock.patch.object(usage, "_redis_down_until", 0.0), \
+                mock.patch.object(usage, "_last_flush", time.monotonic()), \
+                mock.patch.object(usage, "FLUSH_INTERVAL", 0.2):
+            usage.record(schema_name="t1", question="q")
+            timer = usage._timer
+            r.rpush.assert_not_called()
+            timer.join()
+        r.rpush.assert_called_once()
+        self.assertEqual(r.rpush.call_args.args[0], usage.LOG_KEY)
+
+    def test_drain_skips_while_another_drainer_holds_the_lock(self):
+        r = mock.Mock()
+        r.set.return_value = None
+        with mock.patch.object(usage, "_redis", return_value=r):
+            self.assertEqual(usage.drain(), 0)
+        r.lrange.assert_not_called()
+
+    def test_drain_writes_under_the_lock_and_releases_it(self):
+        rec = dict(schema_name="t1", username="u", is_site_admin=False,
+                   question="q", answer="a", status=AssistantQuery.STATUS_OK)
+        r = mock.Mock()
+        r.set.return_value = True
+        r.lrange.side_effect = [[json.dumps(rec)] * 3, []]
+        with mock.patch.object(usage, "_redis", return_value=r):
+            self.assertEqual(usage.drain(), 3)
+        self.assertEqual(r.set.call_args.kwargs["nx"], True)
+        r.ltrim.assert_called_once_with(usage.LOG_KEY, 3, -1)
+        self.assertEqual(r.eval.call_args.args[2], usage.DRAIN_LOCK_KEY)
+        self.assertEqual(AssistantQuery.objects.count(), 3)
+
+    def test_save_writes_rows_and_adds_to_the_rollup(self):
+        rec = dict(schema_name="t1", username="u", is_site_admin=False,
+                   question="q", answer="a", status=AssistantQuery.STATUS_OK)
+        asked = timezone.now() - timezone.timedelta(minutes=5)
+        self.assertEqual(usage.save([dict(rec, created_at=asked.isoformat())] * 2), 2)
+        usage.save([rec, dict(rec, status=AssistantQuery.STATUS_CACHED)])
+
+        self.assertEqual(AssistantQuery.objects.count(), 4)
+        self.assertEqual(AssistantQuery.objects.filter(created_at=asked).count(), 2)
+        counts = dict(AssistantDailyUsage.objects.values_list("status").annotate(n=Sum("count")).order_by())
+        self.assertEqual(counts, {"ok": 3, "cached": 1})
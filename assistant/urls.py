@@ -4,4 +4,5 @@ from . import views
 
 urlpatterns = [
     path("dashboard/assistant/ask/", views.assistant_ask, name="assistant_ask"),
+    path("dashboard/assistant/stream/", views.assistant_stream, name="assistant_stream"),
 ]
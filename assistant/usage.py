@@ -0,0 +1,227 @@
+"""Usage quotas and the buffered audit log for the help assistant.
+
+Quotas — one atomic Redis round trip per ask. A Lua script checks two fixed
+windows together and counts the question in both only when it is admitted:
+
+    aq:m:<schema>:<user pk>:<epoch minute>   burst cap (per user, 60 s window)
+    aq:d:<schema>:<YYYYmmdd>                 daily cap (per tenant, spend)
+
+A question refused by either cap uses up neither — in particular a tenant at
+its daily cap doesn't keep extending its users' burst lockout. When Redis is
+unreachable (or not configured, e.g. local dev on LocMemCache) the burst cap
+falls back to tenants.ratelimit's per-process window and the daily cap fails
+open — it is a budget guardrail, not a billing guarantee.
+
+Audit log — record() appends to an in-process buffer that is pushed to the
+Redis list `assistant:log` in one RPUSH at most FLUSH_INTERVAL seconds after
+a record arrives (a timer thread covers a quiet process; also at exit), so a
+request never writes to the database. The Procfile's assistant_log worker
+(`flush_assistant_log --loop`) drains that list into AssistantQuery with
+bulk_create and adds the counts to AssistantDailyUsage, which
+`assistant_stats` reads instead of scanning the raw rows. A drain holds the
+`assistant:log:drain` lease (SET NX PX), so the daily cron's catch-all run and
+the worker never write the same batch twice.
+
+The quota keys and the log live on the "state" Redis alias, which a cache
+clear never touches.
+
+    ask ──> check() ──1 round trip──> Lua (INCR/EXPIRE x2)
+        └─> record() ──buffer──> RPUSH assistant:log ──> flush_assistant_log
+                                    ──> AssistantQuery + AssistantDailyUsage
+"""
+import atexit
+import json
+import threading
+import time
+import uuid
+
+from django.utils import timezone
+
+LOG_KEY = "assistant:log"
+DRAIN_LOCK_KEY = "assistant:log:drain"
+KEY_PREFIX = "aq:"
+
+OK, BURST, DAILY = 0, 1, 2
+
+FLUSH_INTERVAL = 5       # seconds between pushes of the buffer, per process
+FLUSH_SIZE = 50          # ...or as soon as this many records are waiting
+REDIS_RETRY_AFTER = 30   # seconds to skip Redis after it failed
+DRAIN_LEASE = 300        # seconds a drainer holds the lock per batch
+
+# KEYS: minute key, day key. ARGV: burst limit, daily limit, minute ttl, day ttl.
+# Returns 0 (allowed and counted), 1 (over the burst cap) or 2 (over the daily
+# cap); a refused question is counted in neither window.
+_QUOTA_LUA = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') >= tonumber(ARGV[1]) then return 1 end
+if tonumber(redis.call('GET', KEYS[2]) or '0') >= tonumber(ARGV[2]) then return 2 end
+if redis.call('INCR', KEYS[1]) == 1 then redis.call('EXPIRE', KEYS[1], ARGV[3]) end
+if redis.call('INCR', KEYS[2]) == 1 then redis.call('EXPIRE', KEYS[2], ARGV[4]) end
+return 0
+"""
+
+# KEYS: lock key. ARGV: holder token. Deletes the lock only if still ours.
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+_script = None
+_redis_down_until = 0.0
+
+_lock = threading.Lock()
+_pending = []            # JSON records not yet pushed
+_last_flush = time.monotonic()
+_timer = None            # pending push of a buffer no later record() will flush
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("state")
+
+
+def check(schema, user_pk, burst_limit, daily_limit):
+    """OK, BURST or DAILY for one more question from `user_pk` on `schema`.
+    Counts it when allowed. Never raises."""
+    global _script, _redis_down_until
+    now = time.time()
+    if time.monotonic() >= _redis_down_until:
+        try:
+            r = _redis()
+            if _script is None:
+                _script = r.register_script(_QUOTA_LUA)
+            day = timezone.localdate().strftime("%Y%m%d")
+            keys = [f"{KEY_PREFIX}m:{schema}:{user_pk}:{int(now // 60)}",
+                    f"{KEY_PREFIX}d:{schema}:{day}"]
+            return int(_script(keys=keys, args=[burst_limit, daily_limit, 90, 60 * 60 * 26], client=r))
+        except Exception:
+            _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+    from tenants.ratelimit import _local_hit
+    return OK if _local_hit(f"assistant:burst:{schema}:{user_pk}", burst_limit, 60) else BURST
+
+
+def record(**fields):
+    """Buffer one AssistantQuery row (model field values; created_at is
+    stamped now). Never raises and never touches the database."""
+    fields.setdefault("created_at", timezone.now().isoformat())
+    with _lock:
+        _pending.append(json.dumps(fields, ensure_ascii=False))
+    flush()
+    _schedule()
+
+
+def _schedule():
+    """Push whatever is still buffered FLUSH_INTERVAL from now, unless a push
+    is already scheduled — so the last records before a quiet spell don't wait
+    for the next question or the process exit."""
+    global _timer
+    with _lock:
+        if not _pending or _timer is not None:
+            return
+        _timer = threading.Timer(FLUSH_INTERVAL, _scheduled_flush)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _scheduled_flush():
+    global _timer
+    with _lock:
+        _timer = None
+    flush(force=True)
+
+
+def flush(force=False):
+    """Push buffered records to Redis if FLUSH_INTERVAL has passed, the buffer
+    is full, or force. Without Redis they are written straight to the database
+    instead (local dev). Best-effort."""
+    global _last_flush, _redis_down_until
+    now = time.monotonic()
+    with _lock:
+        if not _pending or (not force and len(_pending) < FLUSH_SIZE
+                            and now - _last_flush < FLUSH_INTERVAL):
+            return
+        batch = list(_pending)
+        _pending.clear()
+        _last_flush = now
+    if now >= _redis_down_until:
+        try:
+            _redis().rpush(LOG_KEY, *batch)
+            return
+        except Exception:
+            _redis_down_until = now + REDIS_RETRY_AFTER
+    try:
+        save([json.loads(b) for b in batch])
+    except Exception:
+        pass
+
+
+atexit.register(flush, force=True)
+
+
+def save(records):
+    """Write records (dicts from record()) to AssistantQuery in bulk and add
+    them to the daily rollup. Returns the number written."""
+    from collections import Counter
+
+    from django.db import connection, transaction
+    from django.utils.dateparse import parse_datetime
+
+    from .models import AssistantDailyUsage, AssistantQuery
+
+    rows, per_day = [], Counter()
+    for rec in records:
+        rec = dict(rec)
+        rec["created_at"] = parse_datetime(rec.get("created_at") or "") or timezone.now()
+        row = AssistantQuery(**rec)
+        rows.append(row)
+        per_day[(timezone.localdate(row.created_at), row.schema_name, row.status)] += 1
+    if not rows:
+        return 0
+
+    table = AssistantDailyUsage._meta.db_table
+    with transaction.atomic():
+        AssistantQuery.objects.bulk_create(rows, batch_size=500)
+        with connection.cursor() as cur:
+            args = ",".join(cur.mogrify("(%s,%s,%s,%s)", (day, schema, status, n)).decode()
+                            for (day, schema, status), n in per_day.items())
+            cur.execute(
+                f"INSERT INTO {table} (day, schema_name, status, count) VALUES {args} "
+                "ON CONFLICT (day, schema_name, status) "
+                f"DO UPDATE SET count = {table}.count + EXCLUDED.count"
+            )
+    return len(rows)
+
+
+def drain(batch=1000):
+    """Move everything in the Redis log into the database, `batch` records
+    per transaction. Records are trimmed from the list only after they are
+    committed, under the drain lock: while another drainer holds it this
+    returns 0 without reading anything. Returns the number written."""
+    r = _redis()
+    token = uuid.uuid4().hex
+    if not r.set(DRAIN_LOCK_KEY, token, nx=True, px=DRAIN_LEASE * 1000):
+        return 0
+    total = 0
+    try:
+        while True:
+            raw = r.lrange(LOG_KEY, 0, batch - 1)
+            if not raw:
+                return total
+            records = []
+            for b in raw:
+                try:
+                    records.append(json.loads(b))
+                except ValueError:
+                    continue
+            total += save(records)
+            r.ltrim(LOG_KEY, len(raw), -1)
+            r.pexpire(DRAIN_LOCK_KEY, DRAIN_LEASE * 1000)
+    finally:
+        r.eval(_RELEASE_LUA, 1, DRAIN_LOCK_KEY, token)
+
+
+def pending():
+    """Records waiting in Redis (None when Redis is unavailable)."""
+    try:
+        return _redis().llen(LOG_KEY)
+    except Exception:
+        return None
@@ -5,18 +5,19 @@ It never touches tenant data, so there is nothing here that can leak across
 schemas. Keep it that way — if this ever grows data access, every query must be
 scoped to `connection.schema_name`.
 """
-import datetime as dt
+import json
 import logging
 
 from django.conf import settings
-from django.core.cache import cache
 from django.db import connection
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.http import require_POST
 
 from site_cars.permissions import is_site_admin, staff_required
 
-from .client import AssistantUnavailable, ask
+from . import usage
+from .client import AssistantUnavailable, ask, cached_answer, stream
 from .models import AssistantQuery
 
 logger = logging.getLogger(__name__)
@@ -25,10 +26,11 @@ MAX_QUESTION_CHARS = 500
 
 
 def _record(request, question, answer, status):
-    """Log one question. Best-effort — a logging failure must never break the
-    answer the user is waiting for."""
+    """Log one question — buffered (assistant.usage), written in bulk later.
+    Best-effort: a logging failure must never break the answer the user is
+    waiting for."""
     try:
-        AssistantQuery.objects.create(
+        usage.record(
             schema_name=connection.schema_name,
             username=getattr(request.user, "username", "")[:150],
             is_site_admin=is_site_admin(request.user),
@@ -43,51 +45,59 @@ def _record(request, question, answer, status):
 def _over_limit(user) -> str | None:
     """Return an Arabic message if `user` is rate limited, else None.
 
-    Two caps: a per-user burst cap (abuse), and a per-tenant daily cap (spend).
-    These fail open if Redis is down — the cache is configured with
-    IGNORE_EXCEPTIONS, so a cache outage degrades to no limiting rather than a
-    dead assistant. That is the right trade for a help widget, but it means the
-    daily cap is a budget guardrail, not a hard billing guarantee.
+    Two caps: a per-user burst cap (abuse), and a per-tenant daily cap (spend),
+    checked and counted together in one atomic Redis call (assistant.usage).
+    Without Redis the burst cap is per-process and the daily cap fails open —
+    the right trade for a help widget, but it means the daily cap is a budget
+    guardrail, not a hard billing guarantee.
     """
     schema = connection.schema_name
-    today = dt.date.today().isoformat()
-
-    burst_key = f"assistant:burst:{schema}:{user.pk}"
-    burst = cache.get(burst_key) or 0
-    if burst >= settings.ASSISTANT_USER_BURST_PER_MIN:
+    verdict = usage.check(schema, user.pk, settings.ASSISTANT_USER_BURST_PER_MIN,
+                          settings.ASSISTANT_TENANT_DAILY_LIMIT)
+    if verdict == usage.BURST:
         return "أرسلت أسئلة كثيرة بسرعة. انتظر دقيقة ثم حاول مرة أخرى."
-
-    day_key = f"assistant:quota:{schema}:{today}"
-    used = cache.get(day_key) or 0
-    if used >= settings.ASSISTANT_TENANT_DAILY_LIMIT:
+    if verdict == usage.DAILY:
         logger.warning("assistant: daily cap hit for schema=%s", schema)
         return "تم الوصول إلى الحد اليومي لأسئلة المساعد لهذا الموقع."
-
-    cache.set(burst_key, burst + 1, 60)
-    cache.set(day_key, used + 1, 60 * 60 * 26)
     return None
 
 
-@staff_required
-@require_POST
-def assistant_ask(request):
-    """htmx target: renders just the answer bubble."""
+def _check(request):
+    """(question, error message) for the posted question."""
     question = (request.POST.get("question") or "").strip()
 
     if not question:
-        return render(request, "assistant/_answer.html", {"error": "اكتب سؤالك أولاً."})
+        return question, "اكتب سؤالك أولاً."
     if len(question) > MAX_QUESTION_CHARS:
-        return render(
-            request,
-            "assistant/_answer.html",
-            {"error": f"السؤال طويل جداً (الحد {MAX_QUESTION_CHARS} حرف)."},
-        )
+        return question, f"السؤال طويل جداً (الحد {MAX_QUESTION_CHARS} حرف)."
+    return question, None
+
 
+def _limited(request, question):
     limited = _over_limit(request.user)
     if limited:
         # Recorded so demand that hit the cap is still visible in the stats,
         # not silently dropped.
         _record(request, question, limited, AssistantQuery.STATUS_RATE_LIMITED)
+    return limited
+
+
+@staff_required
+@require_POST
+def assistant_ask(request):
+    """htmx target: renders just the answer bubble. Cached answers skip the
+    rate limits — they cost nothing."""
+    question, error = _check(request)
+    if error:
+        return render(request, "assistant/_answer.html", {"error": error})
+
+    answer = cached_answer(request.user, question)
+    if answer is not None:
+        _record(request, question, answer, AssistantQuery.STATUS_CACHED)
+        return render(request, "assistant/_answer.html", {"question": question, "answer": answer})
+
+    limited = _limited(request, question)
+    if limited:
         return render(request, "assistant/_answer.html", {"error": limited})
 
     try:
@@ -102,3 +112,48 @@ def assistant_ask(request):
         "assistant/_answer.html",
         {"question": question, "answer": answer},
     )
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@staff_required
+@require_POST
+def assistant_stream(request):
+    """Server-sent events for the widget: `delta` events carry text as it's
+    generated, then one `done` (or `error`, whose data replaces the answer).
+    A cached answer arrives as a single delta."""
+    question, error = _check(request)
+
+    def events():
+        if error:
+            yield _sse("error", error)
+            return
+        answer = cached_answer(request.user, question)
+        if answer is not None:
+            _record(request, question, answer, AssistantQuery.STATUS_CACHED)
+            yield _sse("delta", answer)
+            yield _sse("done", "")
+            return
+        limited = _limited(request, question)
+        if limited:
+            yield _sse("error", limited)
+            return
+
+        parts = []
+        try:
+            for text in stream(request.user, question):
+                parts.append(text)
+                yield _sse("delta", text)
+        except AssistantUnavailable as exc:
+            _record(request, question, str(exc), AssistantQuery.STATUS_ERROR)
+            yield _sse("error", str(exc))
+            return
+        _record(request, question, "".join(parts), AssistantQuery.STATUS_OK)
+        yield _sse("done", "")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pass each event straight through
+    return response
@@ -98,10 +98,10 @@ class ApiCarAdmin(admin.ModelAdmin):
 
 @admin.register(PdfExport)
 class PdfExportAdmin(admin.ModelAdmin):
-    list_display  = ('auction_name', 'make_name', 'schema_name', 'entry_count', 'status_badge', 'download_link', 'created_at')
-    list_filter   = ('status', 'schema_name', 'created_at')
+    list_display  = ('auction_name', 'make_name', 'schema_name', 'entry_count', 'backend', 'status_badge', 'download_link', 'created_at')
+    list_filter   = ('status', 'backend', 'schema_name', 'created_at')
     search_fields = ('auction_name', 'make_name', 'schema_name')
-    readonly_fields = ('auction_name', 'make_name', 'schema_name', 'entry_count', 'status', 'pdf_file', 'error_detail', 'created_at')
+    readonly_fields = ('auction_name', 'make_name', 'schema_name', 'entry_count', 'backend', 'status', 'pdf_file', 'error_detail', 'created_at')
     ordering = ('-created_at',)
 
     def has_add_permission(self, request):
@@ -110,6 +110,7 @@ class PdfExportAdmin(admin.ModelAdmin):
     def status_badge(self, obj):
         colors = {
             PdfExport.STATUS_PENDING:  ('#f59e0b', '⏳ جاري الإعداد'),
+            PdfExport.STATUS_RENDERING: ('#f59e0b', '⏳ جاري التحويل'),
             PdfExport.STATUS_COMPLETE: ('#16a34a', '✅ جاهز'),
             PdfExport.STATUS_FAILED:   ('#dc2626', '❌ فشل'),
         }
@@ -0,0 +1,160 @@
+"""Price-anomaly detection over the live catalog.
+
+Every live car is scored against its segment — same category (encar /
+auction / market), model, badge and year, or (model, year) when that is too
+small — and the flag, score and expected price are written onto
+cars_apicar, where listings filter on them (`price_flag`) and the dashboard
+report reads them.
+
+    detect() ── per tier, one statement ──> TEMP TABLE price_scores
+                  ln(price) adjusted for mileage: regr_slope(ln price, km)
+                  per segment (never positive), so a high-mileage car isn't
+                  "too cheap" for its year
+                  median / Q1 / Q3 of the adjusted price, MAD around the median
+                  score = (adjusted - median) / (1.4826 * MAD)   (robust z)
+             ── one UPDATE ... FROM ──> cars_apicar.price_flag / price_score /
+                                        price_expected (changed rows only)
+
+A car is flagged when all three agree: |score| >= Z, it lies outside the
+segment's IQR fence, and it is at least MIN_GAP away from the expected price
+(so a tight segment doesn't flag a 5% difference). Cars with no price at all
+(auction lots before bidding, say) are not scored, so "hide suspicious
+prices" never hides them. The statistics never leave Postgres, so a full
+catalog takes a few seconds; run it after each import (cron_import.sh does).
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django_tenants.utils import get_public_schema_name, schema_context
+
+MIN_SEGMENT = 8     # cars a segment needs before it is scored
+Z = 3.5             # robust z cut-off (Iglewicz & Hoaglin)
+FENCE = 1.5         # IQR multiplier
+MIN_GAP = 0.25      # minimum distance from the expected price (25%)
+MIN_SPREAD = 0.02   # floor for 1.4826 * MAD, in log-price units (~2%)
+
+# Segment keys, finest first; a car is scored by the first tier it fits.
+TIERS = [
+    ("cat", "model_id", "badge_id", "year"),
+    ("cat", "model_id", "year"),
+]
+
+Flagged = namedtuple("Flagged", "id title year mileage price expected score flag")
+
+_TMP = "price_scores"
+
+_SCORE = """
+    INSERT INTO {tmp} (id, tier, n, score, expected, flag)
+    WITH base AS (
+        SELECT c.id, COALESCE(c.category_id, 0) AS cat, c.model_id, c.badge_id, c.year,
+               ln(c.price::float8) AS lp, c.mileage / 10000.0 AS km
+        FROM cars_apicar c
+        WHERE c.is_live AND c.price > 0
+          AND NOT EXISTS (SELECT 1 FROM {tmp} t WHERE t.id = c.id)
+    ),
+    seg AS (
+        SELECT {keys}, count(*) AS n, avg(km) AS mkm,
+               LEAST(COALESCE(regr_slope(lp, km), 0), 0) AS slope
+        FROM base GROUP BY {keys}
+        HAVING count(*) >= %(min_segment)s
+    ),
+    adj AS (
+        SELECT {keys}, b.id, s.n, s.slope, b.km - s.mkm AS dkm,
+               b.lp - s.slope * (b.km - s.mkm) AS adj
+        FROM base b JOIN seg s USING ({keys})
+    ),
+    mid AS (
+        SELECT {keys},
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY adj) AS med,
+               percentile_cont(0.25) WITHIN GROUP (ORDER BY adj) AS q1,
+               percentile_cont(0.75) WITHIN GROUP (ORDER BY adj) AS q3
+        FROM adj GROUP BY {keys}
+    ),
+    spread AS (
+        SELECT {keys}, percentile_cont(0.5) WITHIN GROUP (ORDER BY abs(a.adj - m.med)) AS mad
+        FROM adj a JOIN mid m USING ({keys}) GROUP BY {keys}
+    ),
+    scored AS (
+        SELECT a.id, a.n, a.adj - m.med AS dev, m.med + a.slope * a.dkm AS elp,
+               (a.adj - m.med) / GREATEST(1.4826 * s.mad, %(min_spread)s) AS z,
+               a.adj < m.q1 - %(fence)s * (m.q3 - m.q1) AS below,
+               a.adj > m.q3 + %(fence)s * (m.q3 - m.q1) AS above
+        FROM adj a JOIN mid m USING ({keys}) JOIN spread s USING ({keys})
+    )
+    SELECT id, %(tier)s, n, round(z::numeric, 2)::float8, round(exp(elp))::bigint,
+           CASE WHEN z <= -%(z)s AND below AND dev <= ln(1 - %(gap)s) THEN 'low'
+                WHEN z >= %(z)s AND above AND dev >= ln(1 + %(gap)s) THEN 'high'
+                ELSE '' END
+    FROM scored
+"""
+
+# Only rows whose values change are written, so a re-run over an unchanged
+# catalog touches nothing; rows that left the scored set are cleared.
+_WRITE = """
+    UPDATE cars_apicar c
+    SET price_flag = COALESCE(t.flag, ''), price_score = t.score, price_expected = t.expected
+    FROM cars_apicar c0 LEFT JOIN {tmp} t ON t.id = c0.id
+    WHERE c.id = c0.id
+      AND (c0.price_flag, c0.price_score, c0.price_expected)
+          IS DISTINCT FROM (COALESCE(t.flag, ''), t.score, t.expected)
+"""
+
+
+def _score(cur, *, min_segment, z, fence, gap):
+    cur.execute(f"DROP TABLE IF EXISTS {_TMP}")
+    cur.execute(f"""
+        CREATE TEMP TABLE {_TMP} (
+            id bigint PRIMARY KEY, tier smallint, n integer,
+            score float8, expected bigint, flag varchar(4)
+        )
+    """)
+    params = {"min_segment": min_segment, "z": z, "fence": fence, "gap": gap,
+              "min_spread": MIN_SPREAD}
+    for tier, keys in enumerate(TIERS, 1):
+        cur.execute(_SCORE.format(tmp=_TMP, keys=", ".join(keys)), {**params, "tier": tier})
+
+
+def detect(*, min_segment=MIN_SEGMENT, z=Z, fence=FENCE, gap=MIN_GAP, dry_run=False):
+    """Score the live catalog and write the results onto cars_apicar (unless
+    dry_run). Returns {"scored", "low", "high", "updated"}."""
+    with schema_context(get_public_schema_name()), transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = 0")
+            _score(cur, min_segment=min_segment, z=z, fence=fence, gap=gap)
+            cur.execute(f"SELECT count(*), count(*) FILTER (WHERE flag = 'low'), "
+                        f"count(*) FILTER (WHERE flag = 'high') FROM {_TMP}")
+            scored, low, high = cur.fetchone()
+            updated = 0
+            if not dry_run:
+                cur.execute(_WRITE.format(tmp=_TMP))
+                updated = cur.rowcount
+            cur.execute(f"DROP TABLE {_TMP}")
+    return {"scored": scored, "low": low, "high": high, "updated": updated}
+
+
+def flagged(qs=None, flag=None, limit=100):
+    """Flagged cars, furthest from their expected price first, as Flagged
+    tuples (title already carries make / model). `qs` narrows the set (a
+    tenant's visible catalog, say); `flag` is 'low' or 'high'."""
+    from django.db.models.functions import Abs
+
+    from .models import ApiCar
+
+    qs = (qs if qs is not None else ApiCar.objects.all()).filter(is_live=True)
+    qs = qs.filter(price_flag=flag) if flag else qs.exclude(price_flag="")
+    rows = (qs.order_by(Abs("price_score").desc(nulls_last=True), "id")
+            .values_list("id", "title", "year", "mileage", "price", "price_expected",
+                         "price_score", "price_flag")[:limit])
+    return [Flagged(*r) for r in rows]
+
+
+def summary(qs=None):
+    """{"low": n, "high": n} over live cars (optionally within `qs`)."""
+    from django.db.models import Count
+
+    from .models import ApiCar
+
+    qs = (qs if qs is not None else ApiCar.objects.all()).filter(is_live=True)
+    counts = dict(qs.exclude(price_flag="").order_by()
+                  .values_list("price_flag").annotate(n=Count("id")))
+    return {"low": counts.get("low", 0), "high": counts.get("high", 0)}
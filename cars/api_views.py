@@ -9,11 +9,15 @@ Usage:
 Response includes CORS headers so any domain can call it.
 """
 import json
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.core.cache import cache
 
+from tenants.profiling import query_budget
+from tenants.ratelimit import rate_limit
+
 from .models import ApiCar
 
 
@@ -25,6 +29,17 @@ def _cors(response):
     return response
 
 
+def _rate_limited(request):
+    return _cors(JsonResponse({"error": "Rate limited"}, status=429))
+
+
+# Per-IP cap shared by both lookups: a cache miss here is a DB hit on ApiCar,
+# so a scraper walking lot numbers is shed before it reaches the database.
+api_rate_limit = rate_limit(
+    "api_car", lambda: settings.API_CAR_RATE_LIMIT_PER_MIN, 60, on_limited=_rate_limited,
+)
+
+
 def _car_to_dict(car, request=None):
     """Serialize a car to a JSON-safe dict."""
     images = car.images or []
@@ -91,6 +106,8 @@ def _car_to_dict(car, request=None):
 
 @csrf_exempt
 @require_GET
+@api_rate_limit
+@query_budget(3)
 def api_car_by_lot(request, lot_number):
     """GET /api/car/<lot_number>/"""
     cache_key = f"api:car:lot:{lot_number}"
@@ -111,6 +128,8 @@ def api_car_by_lot(request, lot_number):
 
 @csrf_exempt
 @require_GET
+@api_rate_limit
+@query_budget(3)
 def api_car_by_slug(request, slug):
     """GET /api/car/slug/<slug>/"""
     cache_key = f"api:car:slug:{slug}"
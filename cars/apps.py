@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CarsConfig(AppConfig):
     name = "cars"
+
+    def ready(self):
+        import cars.signals  # noqa: F401
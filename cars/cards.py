@@ -0,0 +1,148 @@
+"""Card summaries (CarCard): the narrow projection every listing surface reads.
+
+Listing views still filter, order and paginate on ApiCar — the tenant catalog
+rules and sidebar filters all live there — but only as far as a page of ids.
+The rows they render come from `fetch(ids)`, which reads cars_carcard plus the
+tiny make/model/badge/category tables, so a page of 20 cards never detoasts
+extra_features / options / images.
+
+The table is written set-based in Postgres, one INSERT … SELECT … ON CONFLICT:
+
+    import_encar_fast / import_auction_json ──refresh(ids | since)──┐
+    encar_check.update_prices ────────────────refresh(ids)──────────┤
+    ApiCar save / delete (cars.signals) ──on_commit──refresh / delete┼─> cars_carcard
+    cron_import.sh: refresh_car_cards (names, logos, is_new) ──────┘
+
+A car with no card yet (written by a path none of these cover) is projected
+straight from ApiCar for that read — `fetch` never writes, and never drops a
+car that the ApiCar query selected; the nightly refresh cards it.
+"""
+from django.db import connection, transaction
+from django_tenants.utils import get_public_schema_name, schema_context
+
+COLUMNS = (
+    "id, slug, title, title_ar, title_en, image, manufacturer_id, manufacturer_logo, "
+    "model_id, badge_id, category_id, price, mileage, year, fuel, transmission, "
+    "engine_group, power, seat_count, drive_wheel, points, accident_count, "
+    "replacement_count, inspection_report_url, address, auction_date, auction_name, "
+    "is_new, status, created_at, refreshed_at"
+)
+
+# accident_cnt is the STORED generated column from migration 0035. Replaced
+# panels are counted the way car_dmg_types (migration 0033) tags them: Encar
+# statusTypes code 'X', auction markers status 'replaced'.
+_SELECT = """
+    SELECT c.id, c.slug, c.title,
+           concat_ws(' ', COALESCE(NULLIF(mf.name_ar, ''), mf.name),
+                          COALESCE(NULLIF(md.name_ar, ''), md.name), c.year),
+           concat_ws(' ', mf.name, md.name, c.year),
+           COALESCE(NULLIF(c.image, ''),
+                    CASE WHEN jsonb_typeof(c.images -> 0) = 'string' THEN c.images ->> 0 END),
+           c.manufacturer_id, mf.logo, c.model_id, c.badge_id, c.category_id,
+           c.price, c.mileage, c.year, c.fuel, c.transmission,
+           c.engine_group, c.power, c.seat_count, c.drive_wheel, c.points,
+           CASE WHEN c.accident_cnt ~ '^[0-9]{1,4}$' THEN c.accident_cnt::int END,
+           (SELECT count(*) FROM jsonb_array_elements(
+                CASE WHEN jsonb_typeof(c.extra_features -> 'outers') = 'array'
+                     THEN c.extra_features -> 'outers' ELSE '[]'::jsonb END) p,
+                jsonb_array_elements(
+                CASE WHEN jsonb_typeof(p -> 'statusTypes') = 'array'
+                     THEN p -> 'statusTypes' ELSE '[]'::jsonb END) s
+             WHERE s ->> 'code' = 'X')
+           + (SELECT count(*) FROM jsonb_each(
+                CASE WHEN jsonb_typeof(c.markers) = 'object'
+                     THEN c.markers ELSE '{}'::jsonb END) e
+             WHERE e.value ->> 'status' = 'replaced'),
+           c.inspection_report_url, c.address, c.auction_date, c.auction_name,
+           c.is_new, c.status, c.created_at, now()
+    FROM cars_apicar c
+    JOIN cars_manufacturer mf ON mf.id = c.manufacturer_id
+    JOIN cars_carmodel md ON md.id = c.model_id
+"""
+
+_UPSERT = "ON CONFLICT (id) DO UPDATE SET " + ", ".join(
+    f"{col} = EXCLUDED.{col}" for col in (c.strip() for c in COLUMNS.split(",")) if col != "id"
+)
+
+
+def refresh(ids=None, since=None):
+    """Upsert the cards of the given ApiCar ids, of the cars updated at or
+    after `since`, or (neither given) of every car. Returns rows written."""
+    where, params = "", []
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        where, params = "WHERE c.id = ANY(%s)", [ids]
+    elif since is not None:
+        where, params = "WHERE c.updated_at >= %s", [since]
+    with schema_context(get_public_schema_name()), transaction.atomic():
+        with connection.cursor() as cur:
+            if ids is None:
+                # Bulk runs rewrite most of the table — lift the app's 30s
+                # statement_timeout for this transaction only.
+                cur.execute("SET LOCAL statement_timeout = 0")
+            cur.execute(
+                f"INSERT INTO cars_carcard ({COLUMNS}) {_SELECT} {where} {_UPSERT}",
+                params,
+            )
+            return cur.rowcount
+
+
+def prune():
+    """Drop cards whose car is gone. Returns rows deleted."""
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            cur.execute(
+                "DELETE FROM cars_carcard k "
+                "WHERE NOT EXISTS (SELECT 1 FROM cars_apicar c WHERE c.id = k.id)"
+            )
+            return cur.rowcount
+
+
+def delete(ids):
+    """Drop the cards of cars deleted with raw SQL."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM cars_carcard WHERE id = ANY(%s)", [ids])
+            return cur.rowcount
+
+
+def _load(ids):
+    from cars.models import CarCard
+    return {
+        c.id: c for c in
+        CarCard.objects.filter(id__in=ids).select_related('manufacturer', 'model', 'badge', 'category')
+    }
+
+
+def _project(ids):
+    """Unsaved CarCards built from ApiCar by the refresh SELECT — what the
+    cards would hold, read-only."""
+    from django.db.models import prefetch_related_objects
+
+    from cars.models import CarCard
+
+    names = [c.strip() for c in COLUMNS.split(",")]
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            cur.execute(f"{_SELECT} WHERE c.id = ANY(%s)", [[int(i) for i in ids]])
+            cards = [CarCard(**dict(zip(names, row))) for row in cur.fetchall()]
+    prefetch_related_objects(cards, 'manufacturer', 'model', 'badge', 'category')
+    return {c.id: c for c in cards}
+
+
+def fetch(ids):
+    """CarCards for `ids`, in the same order; ids whose car no longer exists
+    are skipped. Never writes."""
+    ids = list(ids)
+    if not ids:
+        return []
+    rows = _load(ids)
+    missing = [i for i in ids if i not in rows]
+    if missing:
+        rows.update(_project(missing))
+    return [rows[i] for i in ids if i in rows]
@@ -0,0 +1,101 @@
+"""Catalog maintenance a web request triggers but must not wait for.
+
+A bulk write from the dashboard leaves derived tables to bring up to date —
+is_live flags, the model/badge dropdown rollup, every tenant's visible set —
+and each of those is a full-table statement; so does a tenant's new catalog
+rule set. The request only leaves a note; the catalog worker does the work:
+
+    upload_auction_json ──request_rebuild()──> SET catalog:rebuild ────┐
+    Tenant save ──on_commit──request_materialize(schema)──>            ├─> catalog worker
+                                   SADD catalog:materialize           ─┘   (refresh_visible_catalogs --loop)
+
+    run_pending(): rebuild      lifecycle.sweep_cars(), rollup.rebuild(),
+                                visibility.refresh_all()
+                   materialize  visibility.materialize(tenant) per queued
+                                schema (a no-op when its set is built)
+
+Requests made while a job runs are noted again, so they are covered by the
+next pass; any number of requests between two passes cost one. The notes live
+on the "state" Redis alias. Without Redis (local dev) the job runs inline.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+REBUILD_KEY = "catalog:rebuild"
+MATERIALIZE_KEY = "catalog:materialize"
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("state")
+
+
+def rebuild():
+    """Settle is_live, recount the rollup and re-materialise every visible
+    set — what a bulk catalog write needs afterwards."""
+    from cars import lifecycle, rollup, visibility
+    lifecycle.sweep_cars()
+    rollup.rebuild()
+    visibility.refresh_all()
+
+
+def request_rebuild():
+    """Ask the catalog worker for a rebuild. Never raises; returns False when
+    it had to run inline (no Redis)."""
+    try:
+        _redis().set(REBUILD_KEY, 1)
+        return True
+    except Exception:
+        pass
+    try:
+        rebuild()
+    except Exception:
+        logger.exception("inline catalog rebuild failed")
+    return False
+
+
+def materialize(schema_name):
+    """Build the visible set of the tenant's current rule set."""
+    from cars import visibility
+    from tenants.models import Tenant
+    tenant = Tenant.objects.filter(schema_name=schema_name).first()
+    if tenant is not None:
+        visibility.materialize(tenant)
+
+
+def request_materialize(schema_name):
+    """Ask the catalog worker to build the tenant's visible set. Never raises;
+    returns False when it had to run inline (no Redis)."""
+    try:
+        _redis().sadd(MATERIALIZE_KEY, schema_name)
+        return True
+    except Exception:
+        pass
+    try:
+        materialize(schema_name)
+    except Exception:
+        logger.exception("inline materialize of %s failed", schema_name)
+    return False
+
+
+def run_pending():
+    """Do whatever has been requested since the last call. Returns the names
+    of the jobs that ran."""
+    ran = []
+    if _redis().delete(REBUILD_KEY):
+        try:
+            rebuild()
+        except Exception:
+            _redis().set(REBUILD_KEY, 1)   # retried on the next pass
+            raise
+        ran.append("rebuild")
+    for schema in _redis().spop(MATERIALIZE_KEY, 100) or ():
+        schema = schema.decode()
+        try:
+            materialize(schema)
+        except Exception:
+            _redis().sadd(MATERIALIZE_KEY, schema)
+            raise
+        ran.append(f"materialize {schema}")
+    return ran
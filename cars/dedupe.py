@@ -0,0 +1,370 @@
+"""Set-based duplicate detection and merging for the shared catalogue.
+
+One engine behind remove_duplicate_cars, merge_brand_dupes and
+cleanup_car_colors. A Spec names a table, the key that makes two rows
+duplicates and everything that points at it; a merge runs in three steps:
+
+    build_map  ── one window query ──> TEMP TABLE dedupe_<name>(seq, loser, survivor)
+                  first_value(id) OVER (PARTITION BY <keys> ORDER BY <rule>)
+                  (or map_from_pairs, when the caller has already decided)
+    report     ── group / row / reference counts for the dry run
+    apply      ── per batch of `batch` losers, one short transaction:
+                    every Ref:  UPDATE <table> SET col = m.survivor FROM map m ...
+                                (tenant Refs once per tenant schema)
+                    every Drop: DELETE derived rows keyed by a loser
+                    DELETE FROM <table> USING map m WHERE id = m.loser
+
+so locks are held for one batch at a time and the work does not grow with the
+number of groups. Refs with `unique_with` first delete loser rows that would
+collide with a row already pointing at the survivor (a wishlist entry saved
+on both copies of a car, say).
+
+Run cars.rollup.rebuild() after merging lookups or cars; cards and visible
+catalogs of deleted cars are dropped here and the survivors' stay valid.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django_tenants.utils import get_public_schema_name
+
+BATCH = 2000
+
+# A column pointing at the deduped table. `unique_with`: other columns of a
+# unique constraint the column is part of. `tenant`: the table lives in every
+# tenant schema (site_cars) rather than in public.
+Ref = namedtuple("Ref", "table column unique_with tenant", defaults=((), False))
+
+# name: map suffix; keys: SQL over alias t; rule: key of RULES; usage: SQL
+# count for the most_used rule; join: extra FROM clause (e.g. another map);
+# refs / drop: Ref lists; fill: columns copied from a loser when the survivor's
+# is empty.
+Spec = namedtuple("Spec", "name table keys rule usage join where refs drop fill",
+                  defaults=("oldest", "", "", "", (), (), ()))
+
+RULES = {
+    "oldest": "t.id",
+    "newest": "t.id DESC",
+    "most_used": "{usage} DESC, t.id",
+    "updated": "t.updated_at DESC NULLS LAST, t.id DESC",
+}
+
+
+# ── specs ────────────────────────────────────────────────────────────────────
+
+CAR_KEYS = {
+    "lot_number": ["upper(btrim(t.lot_number))"],
+    "vin": ["upper(btrim(t.vin))", "t.category_id"],
+}
+
+
+def car_spec(by="lot_number", rule="oldest"):
+    """ApiCar rows listing the same car: the same lot number up to case and
+    spaces (the unique index only catches exact repeats), or the same VIN in
+    the same category."""
+    from site_cars.models import SiteOrder, SiteQuestion, SiteRating, SiteSoldCar
+
+    from .models import ApiCar, CarCard, CarImage, SimilarCars, VisibleCar, Wishlist
+
+    keys = list(CAR_KEYS[by])
+    return Spec(
+        name="car", table=ApiCar._meta.db_table, keys=keys, rule=rule,
+        where="btrim(t.vin) <> ''" if by == "vin" else "",
+        refs=[
+            Ref(CarImage._meta.db_table, "car_id", ("image_url",)),
+            Ref(Wishlist._meta.db_table, "car_id", ("session_key",)),
+            Ref(SiteOrder._meta.db_table, "car_id", tenant=True),
+            Ref(SiteRating._meta.db_table, "car_id", ("user_id",), tenant=True),
+            Ref(SiteQuestion._meta.db_table, "car_id", tenant=True),
+            Ref(SiteSoldCar._meta.db_table, "car_id", tenant=True),
+        ],
+        drop=[
+            Ref(CarCard._meta.db_table, "id"),
+            Ref(SimilarCars._meta.db_table, "car_id"),
+            Ref(VisibleCar._meta.db_table, "car_id"),
+        ],
+    )
+
+
+def _uses(table, column):
+    return f"(SELECT count(*) FROM {table} u WHERE u.{column} = t.id)"
+
+
+def manufacturer_spec(rule="most_used"):
+    from .models import ApiCar, CarCard, CarModel, Manufacturer
+
+    return Spec(
+        name="manufacturer", table=Manufacturer._meta.db_table,
+        keys=["lower(btrim(t.name))"], rule=rule,
+        usage=_uses(ApiCar._meta.db_table, "manufacturer_id"),
+        refs=[
+            Ref(CarModel._meta.db_table, "manufacturer_id"),
+            Ref(ApiCar._meta.db_table, "manufacturer_id"),
+            Ref(CarCard._meta.db_table, "manufacturer_id"),
+        ],
+        fill=("name_ar", "logo", "country"),
+    )
+
+
+def model_spec(rule="oldest", after_manufacturers=False):
+    """CarModel rows with the same name under the same manufacturer — counted
+    after the pending manufacturer merge when `after_manufacturers`, so the
+    models are merged first and re-pointing manufacturers can't break
+    uniq_carmodel_name_per_manufacturer."""
+    from .models import ApiCar, CarBadge, CarCard, CarModel
+
+    mfr = "t.manufacturer_id"
+    join = ""
+    if after_manufacturers:
+        join = "LEFT JOIN dedupe_manufacturer mm ON mm.loser = t.manufacturer_id"
+        mfr = "coalesce(mm.survivor, t.manufacturer_id)"
+    return Spec(
+        name="model", table=CarModel._meta.db_table,
+        keys=[mfr, "lower(btrim(t.name))"], rule=rule, join=join,
+        usage=_uses(ApiCar._meta.db_table, "model_id"),
+        refs=[
+            Ref(CarBadge._meta.db_table, "model_id"),
+            Ref(ApiCar._meta.db_table, "model_id"),
+            Ref(CarCard._meta.db_table, "model_id"),
+        ],
+        fill=("name_ar",),
+    )
+
+
+def badge_spec(rule="oldest"):
+    from .models import ApiCar, CarBadge, CarCard
+
+    return Spec(
+        name="badge", table=CarBadge._meta.db_table,
+        keys=["t.model_id", "lower(btrim(coalesce(t.name, '')))"], rule=rule,
+        usage=_uses(ApiCar._meta.db_table, "badge_id"),
+        refs=[
+            Ref(ApiCar._meta.db_table, "badge_id"),
+            Ref(CarCard._meta.db_table, "badge_id"),
+        ],
+    )
+
+
+def color_spec(model, field, aliases=None, rule="most_used"):
+    """A colour table keyed by its normalised name, `aliases` folding junk
+    placeholders ({'etc': 'unknown'}) into one bucket."""
+    from .models import ApiCar
+
+    key = "lower(btrim(t.name))"
+    if aliases:
+        whens = " ".join(f"WHEN {_quote(k)} THEN {_quote(v)}" for k, v in aliases.items())
+        key = f"CASE {key} {whens} ELSE {key} END"
+    return Spec(
+        name=field, table=model._meta.db_table, keys=[key], rule=rule,
+        usage=_uses(ApiCar._meta.db_table, f"{field}_id"),
+        refs=[Ref(ApiCar._meta.db_table, f"{field}_id")],
+    )
+
+
+def _quote(s):
+    return "'" + str(s).replace("'", "''") + "'"
+
+
+# ── map ──────────────────────────────────────────────────────────────────────
+
+def _map(spec):
+    return f"dedupe_{spec.name}"
+
+
+def _index_map(cur, m):
+    cur.execute(f"CREATE UNIQUE INDEX ON {m} (loser)")
+    cur.execute(f"CREATE INDEX ON {m} (seq)")
+    cur.execute(f"ANALYZE {m}")
+
+
+def build_map(spec):
+    """(Re)build the spec's loser -> survivor map with one window query.
+    Returns the number of losers."""
+    m = _map(spec)
+    keys = ", ".join(spec.keys)
+    order = RULES[spec.rule].format(usage=spec.usage or "0")
+    where = " AND ".join([f"({k}) IS NOT NULL" for k in spec.keys] + ([spec.where] if spec.where else []))
+    with connection.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {m}")
+        cur.execute(f"""
+            CREATE TEMP TABLE {m} AS
+            SELECT row_number() OVER (ORDER BY loser) AS seq, loser, survivor
+            FROM (
+                SELECT t.id AS loser, first_value(t.id) OVER w AS survivor
+                FROM {spec.table} t {spec.join}
+                WHERE {where}
+                WINDOW w AS (PARTITION BY {keys} ORDER BY {order})
+            ) x
+            WHERE loser <> survivor
+        """)
+        _index_map(cur, m)
+        cur.execute(f"SELECT count(*) FROM {m}")
+        return cur.fetchone()[0]
+
+
+def map_from_pairs(spec, pairs):
+    """Load an explicit {loser: survivor} decision as the spec's map (chains
+    like a -> b -> c are followed to c). Returns the number of losers."""
+    def final(i, seen=()):
+        j = pairs.get(i)
+        return i if j is None or j in seen else final(j, seen + (i,))
+
+    rows = sorted((loser, final(loser)) for loser in pairs)
+    rows = [(loser, survivor) for loser, survivor in rows if loser != survivor]
+    m = _map(spec)
+    with connection.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {m}")
+        cur.execute(f"CREATE TEMP TABLE {m} (seq bigint, loser bigint, survivor bigint)")
+        for i in range(0, len(rows), 5000):
+            chunk = rows[i:i + 5000]
+            args = ",".join(cur.mogrify("(%s,%s,%s)", (i + n + 1, lo, su)).decode()
+                            for n, (lo, su) in enumerate(chunk))
+            cur.execute(f"INSERT INTO {m} (seq, loser, survivor) VALUES {args}")
+        _index_map(cur, m)
+    return len(rows)
+
+
+# ── report ───────────────────────────────────────────────────────────────────
+
+def _tenant_schemas():
+    from tenants.models import Tenant
+
+    return list(Tenant.objects.exclude(schema_name=get_public_schema_name())
+                .order_by("schema_name").values_list("schema_name", flat=True))
+
+
+def _targets(ref, schemas):
+    """Qualified table names a Ref lives in (tenant tables only where the
+    schema has actually been migrated)."""
+    if not ref.tenant:
+        return [ref.table]
+    with connection.cursor() as cur:
+        cur.execute("SELECT table_schema FROM information_schema.tables "
+                    "WHERE table_name = %s AND table_schema = ANY(%s)", [ref.table, schemas])
+        present = {r[0] for r in cur.fetchall()}
+    return [f'"{s}".{ref.table}' for s in schemas if s in present]
+
+
+def report(spec, sample=10):
+    """Counts for a dry run: groups, losers, rows per Ref / Drop that point at
+    a loser, and the largest groups as (survivor id, losers)."""
+    m = _map(spec)
+    schemas = _tenant_schemas() if any(r.tenant for r in spec.refs) else []
+    out = {"refs": {}, "drop": {}}
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT count(DISTINCT survivor), count(*) FROM {m}")
+        out["groups"], out["losers"] = cur.fetchone()
+        cur.execute(f"SELECT survivor, count(*) + 1 FROM {m} GROUP BY survivor "
+                    f"ORDER BY 2 DESC, 1 LIMIT %s", [sample])
+        out["sample"] = cur.fetchall()
+        for kind, refs in (("refs", spec.refs), ("drop", spec.drop)):
+            for ref in refs:
+                n = 0
+                for table in _targets(ref, schemas):
+                    cur.execute(f"SELECT count(*) FROM {table} r JOIN {m} m ON r.{ref.column} = m.loser")
+                    n += cur.fetchone()[0]
+                out[kind][f"{ref.table}.{ref.column}"] = n
+    return out
+
+
+# ── apply ────────────────────────────────────────────────────────────────────
+
+def _repoint(cur, table, ref, m, lo, hi):
+    col = ref.column
+    in_batch = f"m.seq > {int(lo)} AND m.seq <= {int(hi)}"
+    if ref.unique_with:
+        not_null = " AND ".join(f"r.{c} IS NOT NULL" for c in ref.unique_with)
+        same = " AND ".join(f"o.{c} = r.{c}" for c in ref.unique_with)
+        # Already on the survivor (or moved there by an earlier batch).
+        cur.execute(f"""
+            DELETE FROM {table} r USING {m} m
+            WHERE r.{col} = m.loser AND {in_batch} AND {not_null}
+              AND EXISTS (SELECT 1 FROM {table} o WHERE o.{col} = m.survivor AND {same})
+        """)
+        # Two losers of one survivor in this batch: keep the oldest row.
+        part = ", ".join(f"r.{c}" for c in ref.unique_with)
+        cur.execute(f"""
+            DELETE FROM {table} d USING (
+                SELECT r.id, row_number() OVER (PARTITION BY m.survivor, {part} ORDER BY r.id) AS rn
+                FROM {table} r JOIN {m} m ON r.{col} = m.loser
+                WHERE {in_batch} AND {not_null}
+            ) x
+            WHERE d.id = x.id AND x.rn > 1
+        """)
+    cur.execute(f"UPDATE {table} r SET {col} = m.survivor FROM {m} m "
+                f"WHERE r.{col} = m.loser AND {in_batch}")
+    return cur.rowcount
+
+
+def _fill(cur, spec, m, lo, hi):
+    for col in spec.fill:
+        cur.execute(f"""
+            UPDATE {spec.table} s SET {col} = x.v
+            FROM (
+                SELECT DISTINCT ON (m.survivor) m.survivor, l.{col} AS v
+                FROM {m} m JOIN {spec.table} l ON l.id = m.loser
+                WHERE m.seq > %s AND m.seq <= %s AND coalesce(l.{col}, '') <> ''
+                ORDER BY m.survivor, m.loser
+            ) x
+            WHERE s.id = x.survivor AND coalesce(s.{col}, '') = ''
+        """, [lo, hi])
+
+
+def apply(spec, batch=BATCH, progress=None):
+    """Merge every loser in the spec's map into its survivor, `batch` losers
+    per transaction. Returns {"deleted", "repointed"}; `progress(done,
+    total)` is called after each batch."""
+    m = _map(spec)
+    schemas = _tenant_schemas() if any(r.tenant for r in spec.refs) else []
+    refs = [(ref, table) for ref in spec.refs for table in _targets(ref, schemas)]
+    drops = [(ref, table) for ref in spec.drop for table in _targets(ref, schemas)]
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT coalesce(max(seq), 0) FROM {m}")
+        total = cur.fetchone()[0]
+
+    deleted = repointed = 0
+    for lo in range(0, total, batch):
+        hi = lo + batch
+        with transaction.atomic(), connection.cursor() as cur:
+            _fill(cur, spec, m, lo, hi)
+            for ref, table in refs:
+                repointed += _repoint(cur, table, ref, m, lo, hi)
+            for ref, table in drops:
+                cur.execute(f"DELETE FROM {table} r USING {m} m "
+                            f"WHERE r.{ref.column} = m.loser AND m.seq > %s AND m.seq <= %s", [lo, hi])
+            cur.execute(f"DELETE FROM {spec.table} t USING {m} m "
+                        f"WHERE t.id = m.loser AND m.seq > %s AND m.seq <= %s", [lo, hi])
+            deleted += cur.rowcount
+        if progress:
+            progress(min(hi, total), total)
+    return {"deleted": deleted, "repointed": repointed}
+
+
+def purge_unused(spec, batch=BATCH):
+    """Delete rows of the spec's table that no public Ref points at, `batch`
+    per transaction. Returns the number deleted."""
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute(f"""
+                DELETE FROM {spec.table} WHERE id IN (
+                    SELECT t.id FROM {spec.table} t WHERE {_unused(spec)} LIMIT %s
+                )
+            """, [batch])
+            n = cur.rowcount
+        total += n
+        if n < batch:
+            return total
+
+
+def count_unused(spec):
+    """Rows purge_unused would delete."""
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM {spec.table} t WHERE {_unused(spec)}")
+        return cur.fetchone()[0]
+
+
+def _unused(spec):
+    return " AND ".join(
+        f"NOT EXISTS (SELECT 1 FROM {ref.table} r WHERE r.{ref.column} = t.id)"
+        for ref in spec.refs if not ref.tenant
+    ) or "FALSE"
@@ -0,0 +1,358 @@
+"""Encar verification engine: availability, listing price and lease status.
+
+Shared by check_encar_availability, check_lease_cars and the
+car_availability_check view, so all three go through the same client:
+
+- one httpx.AsyncClient per run — a bounded connection pool with HTTP
+  keep-alive instead of a fresh TCP/TLS handshake per car;
+- adaptive concurrency (AIMD): the number of requests in flight grows by one
+  after a window of clean responses and is halved on 429 / 5xx / timeouts;
+- a token bucket caps requests per second regardless of concurrency;
+- results are cached for CACHE_TTL seconds, so the same lot checked again
+  within minutes (a visitor right after the sweep, a re-run) costs nothing.
+  Only definite answers are cached — never a transient error.
+
+Availability is decided by the clean-encar endpoint, as the sweep always has
+been: 404 there means the lot is no longer listed. That endpoint carries no
+price, so a lot it reports listed is then read from the general vehicle
+endpoint (?include=ADVERTISEMENT) for its listing price. The general endpoint
+keeps answering 200 for sold or withdrawn lots, so it never decides a
+deletion; a failed price read leaves the lot listed with no price.
+
+Every call feeds a Stats object (checks/sec, cache hits and an error
+breakdown by kind). Point base_url at a local stub server to run offline.
+
+Callers apply the outcome in bulk per batch: delete_cars() for gone / lease
+lots, update_prices() for changed listing prices.
+"""
+import asyncio
+import time
+from collections import Counter, namedtuple
+
+import httpx
+from django.core.cache import cache
+
+from tenants import telemetry
+
+ENCAR_API = "https://api.encar.com"
+CLEAN_PATH = "/v1/readside/clean-encar/vehicle/{lot}"
+VEHICLE_PATH = "/v1/readside/vehicle/{lot}"
+LEASE_PATH = "/legacy/usedcar/lease/car/succession"
+HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "accept-language": "en-US,en;q=0.9",
+    "origin": "https://fem.encar.com",
+    "referer": "https://fem.encar.com/",
+    "user-agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/146.0.0.0 Safari/537.36"
+    ),
+}
+
+CACHE_TTL = 300             # seconds a definite answer is reused
+LEASE_BATCH = 100           # carIds per lease request (more risks HTTP 414)
+
+OK, GONE, UNKNOWN = "ok", "gone", "unknown"
+
+# status: OK (listed) | GONE (404 from clean-encar) | UNKNOWN (transient
+# error, try later).
+# price: current listing price in won, or None.
+Result = namedtuple("Result", "lot status price")
+
+
+class Stats:
+    """Throughput and error breakdown for one run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.checked = 0        # lots with an answer (network or cache)
+        self.requests = 0       # HTTP requests sent
+        self.cached = 0         # lots answered from cache
+        self.errors = Counter()
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.checked / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        errors = ", ".join(f"{k}={v}" for k, v in self.errors.most_common()) or "none"
+        return (f"checked={self.checked} ({self.rate():.1f}/s) requests={self.requests} "
+                f"cached={self.cached} errors: {errors}")
+
+
+class TokenBucket:
+    """At most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimit:
+    """Concurrency window: +1 after `limit` clean responses, halved on throttling."""
+
+    def __init__(self, start, maximum, minimum=1):
+        self.limit = max(minimum, min(start, maximum))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self._clean = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def success(self):
+        self._clean += 1
+        if self._clean >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._clean = 0
+
+    def backoff(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._clean = 0
+
+
+class EncarChecker:
+    """Async context manager around one pooled client.
+
+        async with EncarChecker(rate=50) as chk:
+            results = await chk.check_vehicles(lots)
+    """
+
+    def __init__(self, *, base_url=ENCAR_API, concurrency=16, max_concurrency=64,
+                 rate=50, timeout=7, use_cache=True, stats=None, transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.use_cache = use_cache
+        self.stats = stats or Stats()
+        self.limit = AdaptiveLimit(concurrency, max_concurrency)
+        self.bucket = TokenBucket(rate)
+        self._max = max_concurrency
+        self._transport = transport
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=HEADERS,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self._max, max_keepalive_connections=self._max),
+            transport=self._transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    def _error(self, kind, kind_label):
+        self.stats.errors[kind] += 1
+        telemetry.inc("encar_checks_total", {"kind": kind_label, "result": kind})
+
+    async def _get(self, path, params=None, kind="vehicle"):
+        """GET with rate limit + adaptive concurrency. None on a transient failure."""
+        await self.bucket.take()
+        async with self.limit:
+            self.stats.requests += 1
+            try:
+                resp = await self.client.get(path, params=params)
+            except httpx.TimeoutException:
+                self.limit.backoff()
+                self._error("timeout", kind)
+                return None
+            except httpx.HTTPError:
+                self.limit.backoff()
+                self._error("connect", kind)
+                return None
+            if resp.status_code == 429 or resp.status_code >= 500:
+                self.limit.backoff()
+                self._error("http_429" if resp.status_code == 429 else "http_5xx", kind)
+                return None
+            self.limit.success()
+            return resp
+
+    # ── availability + price ────────────────────────────────────────────────
+
+    async def _vehicle(self, lot):
+        resp = await self._get(CLEAN_PATH.format(lot=lot))
+        if resp is None:
+            return Result(lot, UNKNOWN, None)
+        if resp.status_code == 404:
+            return Result(lot, GONE, None)
+        if resp.status_code != 200:
+            self._error(f"http_{resp.status_code}", "vehicle")
+            return Result(lot, UNKNOWN, None)
+        return Result(lot, OK, await self._price(lot))
+
+    async def _price(self, lot):
+        """Listing price in won of a listed lot, or None."""
+        resp = await self._get(VEHICLE_PATH.format(lot=lot), {"include": "ADVERTISEMENT"}, kind="price")
+        if resp is None:
+            return None
+        if resp.status_code != 200:
+            self._error(f"http_{resp.status_code}", "price")
+            return None
+        try:
+            raw = (resp.json().get("advertisement") or {}).get("price")
+        except (ValueError, AttributeError):
+            self._error("bad_json", "price")
+            return None
+        # Encar prices are in 만원 (10,000 won).
+        return int(raw) * 10000 if isinstance(raw, (int, float)) and raw > 0 else None
+
+    async def check_vehicles(self, lots):
+        """{lot: Result} for every lot — cached answers first, the rest concurrently."""
+        lots = [str(lot) for lot in lots]
+        out = {}
+        if self.use_cache and lots:
+            for key, val in cache.get_many([f"encar_chk:v:{lot}" for lot in lots]).items():
+                lot = key.rsplit(":", 1)[-1]
+                out[lot] = Result(lot, *val)
+            self.stats.cached += len(out)
+        misses = [lot for lot in lots if lot not in out]
+        fresh = await asyncio.gather(*(self._vehicle(lot) for lot in misses))
+        to_cache = {}
+        for res in fresh:
+            out[res.lot] = res
+            if res.status != UNKNOWN:
+                to_cache[f"encar_chk:v:{res.lot}"] = (res.status, res.price)
+                telemetry.inc("encar_checks_total", {"kind": "vehicle", "result": res.status})
+        if self.use_cache and to_cache:
+            cache.set_many(to_cache, CACHE_TTL)
+        self.stats.checked += sum(1 for r in out.values() if r.status != UNKNOWN)
+        return out
+
+    # ── lease ────────────────────────────────────────────────────────────────
+
+    async def _lease_batch(self, lots):
+        resp = await self._get(LEASE_PATH, {"carIds": ",".join(str(n) for n in lots)}, kind="lease")
+        if resp is None:
+            return None
+        if resp.status_code != 200:
+            self._error(f"http_{resp.status_code}", "lease")
+            return None
+        try:
+            return {int(item["carId"]) for item in resp.json()}
+        except (ValueError, TypeError, KeyError):
+            self._error("bad_json", "lease")
+            return None
+
+    async def check_leases(self, lots, batch=LEASE_BATCH):
+        """{lot: True/False} for lots with a definite answer (the endpoint only
+        returns the lots that ARE leased). Lots in a failed batch are omitted."""
+        lots = [int(lot) for lot in lots]
+        out = {}
+        if self.use_cache and lots:
+            for key, val in cache.get_many([f"encar_chk:l:{lot}" for lot in lots]).items():
+                out[int(key.rsplit(":", 1)[-1])] = val
+            self.stats.cached += len(out)
+        misses = [lot for lot in lots if lot not in out]
+        chunks = [misses[i:i + batch] for i in range(0, len(misses), batch)]
+        answers = await asyncio.gather(*(self._lease_batch(c) for c in chunks))
+        to_cache = {}
+        for chunk, leased in zip(chunks, answers):
+            if leased is None:
+                continue
+            for lot in chunk:
+                out[lot] = lot in leased
+                to_cache[f"encar_chk:l:{lot}"] = out[lot]
+            telemetry.inc("encar_checks_total", {"kind": "lease", "result": "ok"}, len(chunk))
+        if self.use_cache and to_cache:
+            cache.set_many(to_cache, CACHE_TTL)
+        self.stats.checked += len(out)
+        return out
+
+
+def check_vehicle(lot, **opts):
+    """Synchronous single-lot check for request handlers (cached)."""
+    async def run():
+        async with EncarChecker(concurrency=1, max_concurrency=1, rate=0, **opts) as chk:
+            return (await chk.check_vehicles([lot]))[str(lot)]
+    return asyncio.run(run())
+
+
+# ── bulk writes (public schema) ─────────────────────────────────────────────
+
+def delete_cars(ids):
+    """Delete ApiCar rows with raw SQL.
+
+    Django's ORM .delete() triggers a cross-schema cascade lookup for
+    tenant-schema tables (site_cars_siteorder, site_cars_siterating, etc.)
+    which fails with 'relation does not exist' when the DB connection is
+    pointing at the public schema. Raw SQL bypasses ORM cascade entirely.
+    """
+    from django.db import connection
+    from django_tenants.utils import get_public_schema_name, schema_context
+    ids = list(ids)
+    if not ids:
+        return 0
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM cars_wishlist WHERE car_id = ANY(%s)", [ids])
+            cur.execute("DELETE FROM cars_carcard WHERE id = ANY(%s)", [ids])
+            cur.execute("DELETE FROM cars_apicar WHERE id = ANY(%s)", [ids])
+            return cur.rowcount
+
+
+def update_prices(prices):
+    """Bulk-set {car_id: price_won} with one UPDATE … FROM (VALUES …), then
+    re-card the repriced cars and re-decide them in the visible sets (a new
+    price can move a car across a tenant's price whitelist)."""
+    from django.db import connection
+    from django_tenants.utils import get_public_schema_name, schema_context
+    if not prices:
+        return 0
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            args = ",".join(cur.mogrify("(%s,%s)", (pk, price)).decode()
+                            for pk, price in prices.items())
+            cur.execute(f"""
+                UPDATE cars_apicar AS c SET price = v.price
+                FROM (VALUES {args}) AS v(id, price)
+                WHERE c.id = v.id AND c.price IS DISTINCT FROM v.price
+            """)
+            changed = cur.rowcount
+    from cars import cards, visibility
+    cards.refresh(prices)
+    if changed:
+        visibility.refresh_cars(prices)
+    return changed
+
+
+def bust_listing_caches():
+    """Clear car_list / home page caches so deleted cars disappear immediately."""
+    try:
+        from django_redis import get_redis_connection
+        con = get_redis_connection("default")
+        for pattern in ("car_list:*", "home_html:*", "home_ctx:*", "landing_html:*"):
+            keys = con.keys(pattern)
+            if keys:
+                con.delete(*keys)
+        return
+    except Exception:
+        pass
+    cache.clear()
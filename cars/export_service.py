@@ -18,6 +18,7 @@ Public API
   start_export(entries, auction_name, webhook_url)  → (token, job_id)
   process_webhook_payload(data, schema_name, ...)   → None  (saves DB records)
   download_pdf(token, file_id_or_url)               → bytes
+  download_pdf_to(token, file_id_or_url, f)         → bytes written (streamed into f)
 
   run_export_job(...)  — DEPRECATED shim, does nothing (kept so old imports don't break)
 
@@ -159,6 +160,25 @@ def download_pdf(token, file_id_or_url):
     return resp.content
 
 
+def download_pdf_to(token, file_id_or_url, f, chunk_size=256 * 1024):
+    """
+    Stream a PDF from ofleet into the file object `f`, chunk by chunk, so a
+    large catalogue is never held in memory. Returns the bytes written.
+    """
+    if str(file_id_or_url).startswith('http'):
+        url = file_id_or_url
+    else:
+        url = f"{BASE_URL}/api/exports/files/{file_id_or_url}/download/"
+
+    written = 0
+    with requests.get(url, headers=_auth_headers(token), timeout=120, stream=True) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
 def process_webhook_payload(data, schema_name, parent_export_id=None):
     """
     Call this from the webhook view when ofleet POSTs a completion notification.
@@ -180,7 +200,8 @@ def process_webhook_payload(data, schema_name, parent_export_id=None):
     If `parent_export_id` is given, the first record reuses that pending row;
     subsequent makes create new rows.
     """
-    from django.core.files.base import ContentFile
+    import tempfile
+    from django.core.files import File
     from cars.models import PdfExport
 
     job_id    = data.get('job_id') or data.get('id')
@@ -285,12 +306,15 @@ def process_webhook_payload(data, schema_name, parent_export_id=None):
             if not ref:
                 raise ValueError(f"No download_url or id in file payload: {file_info}")
 
-            pdf_bytes    = download_pdf(token, ref)
             auction_safe = (record.auction_name or 'export').replace(' ', '_')
             make_safe    = make_name.replace(' ', '_').replace('/', '-')
             filename     = f"{auction_safe}_{make_safe}_{record.pk}.pdf"
 
-            record.pdf_file.save(filename, ContentFile(pdf_bytes), save=False)
+            # Spooled to disk past 8 MB, then streamed on to storage.
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as tmp:
+                download_pdf_to(token, ref, tmp)
+                tmp.seek(0)
+                record.pdf_file.save(filename, File(tmp), save=False)
             record.status = PdfExport.STATUS_COMPLETE
             record.save(update_fields=['make_name', 'pdf_file', 'status'])
             logger.info("PdfExport %d (%s) saved: %s", record.pk, make_name, filename)
@@ -0,0 +1,296 @@
+"""Inspection / report render model.
+
+The detail page's inspection panel and the standalone car report both used to
+walk the raw Encar inspection JSON (extra_features.outers / inners / images /
+master / record) on every view. build() turns that JSON into a compact render
+model once, and it is stored on ApiCar.render_payload together with the
+RENDER_VERSION it was built with. Views then only format the already-flattened
+rows into HTML and never load the full extra_features blob.
+
+    import_encar_fast upsert ──extra_features changed──> render_version = 0
+        └─> rebuild_stale(since=<import start>)   only the rows it changed
+    ApiCar.save ──────────────────────────────────> built in save()
+    cron_import.sh: rebuild_render_payloads ────> rebuild_stale() catch-all
+
+Bump RENDER_VERSION whenever build() changes shape or content. Rows built by
+an older version are ignored at read time (for_car() rebuilds them on the fly)
+and rewritten in bulk by the nightly `rebuild_render_payloads` — never by the
+release, so a deploy doesn't wait on it.
+"""
+
+RENDER_VERSION = 1
+
+ENCAR_BASE_IMG  = "https://ci.encar.com"
+SEDAN_IMG       = "/static/images/car_sedan.png"
+TRUCK_IMG       = "/static/images/car_truck.png"
+
+PART_NAMES_AR = {
+    "P011": "غطاء المحرك",
+    "P021": "الجناح الأمامي (يسار)",
+    "P022": "الجناح الأمامي (يمين)",
+    "P031": "الباب الأمامي (يسار)",
+    "P032": "الباب الأمامي (يمين)",
+    "P033": "الباب الخلفي (يسار)",
+    "P034": "الباب الخلفي (يمين)",
+    "P041": "الصندوق الخلفي",
+    "P051": "حامل الرادياتير",
+    "P061": "اللوح الخلفي (يسار)",
+    "P062": "اللوح الخلفي (يمين)",
+    "P081": "عتبة الباب (يسار)",
+    "P082": "عتبة الباب (يمين)",
+    "P091": "إطار الزجاج الأمامي",
+    "P111": "العمود A (يسار)",
+    "P112": "العمود A (يمين)",
+    "P121": "العمود B (يسار)",
+    "P122": "العمود B (يمين)",
+    "P123": "العمود C (يسار)",
+    "P124": "العمود C (يمين)",
+    "P131": "عارضة الجانب (يسار أمام)",
+    "P132": "عارضة الجانب (يمين أمام)",
+    "P133": "عارضة الجانب (يسار خلف)",
+    "P134": "عارضة الجانب (يمين خلف)",
+    "P141": "أرضية أمامية",
+    "P142": "أرضية خلفية",
+    "P144": "عارضة العجلة الخلفية (يمين)",
+    "P151": "لوح السقف",
+    "P171": "الأرضية الخلفية",
+    "P181": "أرضية الصندوق",
+}
+
+PART_POSITIONS = {
+    "P011": (50, 14), "P021": (17, 27), "P022": (83, 27),
+    "P031": (17, 41), "P032": (83, 41), "P033": (17, 54),
+    "P034": (83, 54), "P041": (50, 87), "P051": (50, 19),
+    "P061": (17, 67), "P062": (83, 67), "P081": (17, 61),
+    "P082": (83, 61), "P091": (50, 22), "P111": (17, 45),
+    "P112": (83, 45), "P121": (17, 32), "P122": (83, 32),
+    "P123": (17, 65), "P124": (83, 65), "P131": (11, 36),
+    "P132": (89, 36), "P133": (11, 63), "P134": (89, 63),
+    "P141": (17, 36), "P142": (17, 50), "P144": (83, 36),
+    "P151": (50, 30), "P171": (50, 82), "P181": (50, 90),
+}
+STATUS_LABEL = {
+    "X": "Exchange / تغيير", "W": "Sheet Metal / رش",
+    "C": "Corrosion / صدأ",  "A": "Scratches / خدش",
+    "U": "Uneven / انبعاج",  "T": "Impairment / تلف",
+}
+RANK_LABEL = {"RANK_ONE": "Rank 1", "RANK_TWO": "Rank 2"}
+INNER_STATUS = {
+    "1":  ("ok",  "Normal / طبيعي"),    "2":  ("ok",  "Adequate / مناسب"),
+    "3":  ("ok",  "None / لا يوجد"),    "4":  ("bad", "Minor Leak / تسرب طفيف"),
+    "5":  ("bad", "Leak / تسرب"),        "6":  ("bad", "Minor Oil Leak / تسرب زيت طفيف"),
+    "7":  ("bad", "Oil Leak / تسرب زيت"), "8": ("bad", "Low / منخفض"),
+    "9":  ("bad", "Excess / زائد"),      "10": ("bad", "Fault / عطل"),
+    "11": ("bad", "Present / موجود"),
+}
+SECTION_LABEL = {
+    "S00": ("Self-diagnosis", "التشخيص الذاتي"),
+    "S01": ("Engine",         "المحرك"),
+    "S02": ("Transmission",   "ناقل الحركة"),
+    "S03": ("Power Transfer", "نقل القوة"),
+    "S04": ("Steering",       "التوجيه"),
+    "S05": ("Brakes",         "الفرامل"),
+    "S06": ("Electrical",     "الكهرباء"),
+    "S07": ("Fuel System",    "نظام الوقود"),
+}
+
+
+def _fmt_date(s):
+    if s and len(str(s)) == 8 and str(s).isdigit():
+        s = str(s)
+        return f"{s[:4]}-{s[4:6]}-{s[6:]}"
+    return s or "—"
+
+
+def build(extra):
+    """Render model for one car's extra_features. Pure function, no DB access.
+
+    outers:  [code, part name, status code, rank] — one per damage status
+    inners:  [section en, section ar, [[check label, chip class, chip label]]]
+    detail:  the inspection certificate's scalar fields, already formatted
+    record / optionsChoice / vehicleId are copied through for the detail page.
+    """
+    extra = extra if isinstance(extra, dict) else {}
+    outers_data = extra.get("outers") or []
+    inners_data = extra.get("inners") or []
+
+    outers = []
+    for item in outers_data:
+        code = item.get("type", {}).get("code", "")
+        name = PART_NAMES_AR.get(code) or item.get("type", {}).get("title", code)
+        attrs = item.get("attributes", [])
+        rank = attrs[0] if attrs else ""
+        for st in item.get("statusTypes", []):
+            outers.append([code, name, st["code"], rank])
+
+    inners = []
+    for section in inners_data:
+        sec_code = section.get("type", {}).get("code", "")
+        sec_en, sec_ar = SECTION_LABEL.get(sec_code, (section.get("type", {}).get("title", sec_code), ""))
+        rows = []
+
+        def _walk(children):
+            for child in children:
+                st = child.get("statusType")
+                if st and st.get("code"):
+                    cls, lbl = INNER_STATUS.get(str(st["code"]), ("", st.get("title", "")))
+                    rows.append([child.get("type", {}).get("title", ""), cls, lbl])
+                if child.get("children"):
+                    _walk(child["children"])
+
+        _walk(section.get("children", []))
+        if rows:
+            inners.append([sec_en, sec_ar, rows])
+
+    master = extra.get("master") or {}
+    detail = master.get("detail") or {}
+    usage_types = detail.get("usageChangeTypes", [])
+    guarantee_type = detail.get("guarantyType") or {}
+
+    return {
+        "has_inspection": "outers" in extra,
+        "has_outer":      bool(outers_data),
+        "damage_count":   sum(len(i.get("statusTypes", [])) for i in outers_data),
+        "outers":         outers,
+        "inners":         inners,
+        "images": [
+            ENCAR_BASE_IMG + img["path"]
+            for img in extra.get("images") or []
+            if isinstance(img, dict) and img.get("path")
+        ],
+        "detail": {
+            "record_no":     detail.get("recordNo", "—"),
+            "issue_date":    _fmt_date(detail.get("issueDate")),
+            "valid_end":     _fmt_date(detail.get("validityEndDate")),
+            "first_reg":     _fmt_date(detail.get("firstRegistrationDate")),
+            "vin":           detail.get("vin", "—"),
+            "mileage":       detail.get("mileage"),
+            "co":            detail.get("coout", "—"),
+            "hc":            detail.get("hcout", "—"),
+            "engine_ok":     detail.get("engineCheck", "N") == "Y",
+            "trans_ok":      detail.get("trnsCheck", "N") == "Y",
+            "waterlog":      detail.get("waterlog", False),
+            "tuning":        detail.get("tuning", False),
+            "simple_repair": master.get("simpleRepair", False),
+            "accident":      master.get("accdient", False),
+            "usage":         ", ".join(u.get("title", "") for u in usage_types) if usage_types else "None",
+            "guarantee":     guarantee_type.get("title", "—") if isinstance(guarantee_type, dict) else "—",
+        },
+        "record":        extra.get("record"),
+        "optionsChoice": extra.get("optionsChoice"),
+        "vehicleId":     extra.get("vehicleId"),
+    }
+
+
+def for_car(car):
+    """The car's stored render model, or a freshly built one when it is
+    missing or was built by an older RENDER_VERSION (loads extra_features)."""
+    if car.render_version == RENDER_VERSION and car.render_payload is not None:
+        return car.render_payload
+    return build(car.extra_features)
+
+
+def rebuild_stale(since=None, batch=1000, max_seconds=0, everything=False, progress=None):
+    """Build and store the render model of every car whose render_version
+    is not RENDER_VERSION (`everything`: of every car), limited to the cars
+    updated at or after `since`. Stops after `max_seconds` (0 = no limit);
+    the rest are picked up by the next run. Returns the rows written;
+    `progress(done)` is called after each batch."""
+    import time
+
+    from django.db import connection, transaction
+    from django_tenants.utils import get_public_schema_name, schema_context
+    from psycopg2.extras import Json
+
+    from cars.models import ApiCar
+
+    t0 = time.monotonic()
+    done = 0
+    with schema_context(get_public_schema_name()):
+        qs = ApiCar.objects.all()
+        if not everything:
+            qs = qs.exclude(render_version=RENDER_VERSION)
+        if since is not None:
+            qs = qs.filter(updated_at__gte=since)
+        # Keyset pagination on id — OFFSET would rescan, and the stale set
+        # shrinks as we go.
+        last_id = 0
+        while not (max_seconds and time.monotonic() - t0 >= max_seconds):
+            rows = list(qs.filter(id__gt=last_id).order_by("id")
+                        .values_list("id", "extra_features")[:batch])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            with transaction.atomic(), connection.cursor() as cur:
+                args = ",".join(
+                    cur.mogrify("(%s,%s::jsonb)", (pk, Json(build(ef)))).decode()
+                    for pk, ef in rows
+                )
+                cur.execute(f"""
+                    UPDATE cars_apicar AS c
+                    SET render_payload = v.payload, render_version = {int(RENDER_VERSION)}
+                    FROM (VALUES {args}) AS v(id, payload)
+                    WHERE c.id = v.id
+                """)
+            done += len(rows)
+            if progress:
+                progress(done)
+    return done
+
+
+def detail_context(rm):
+    """Pre-rendered HTML strings for the detail page's inspection diagrams."""
+    outer_badge_divs = []
+    structural_badge_divs = []
+    table_rows = []
+    for code, name, sc, rank in rm["outers"]:
+        tip = f"{name} · {STATUS_LABEL.get(sc, sc)}"
+        pos = PART_POSITIONS.get(code)
+        if pos:
+            left, top = pos
+            badge_html = (
+                f'<div class="insp-badge {sc}" style="left:{left}%;top:{top}%" '
+                f'data-tip="{tip}">{sc}</div>'
+            )
+            if code.startswith("P1"):
+                structural_badge_divs.append(badge_html)
+            else:
+                outer_badge_divs.append(badge_html)
+        rank_lbl = RANK_LABEL.get(rank, rank)
+        rank_cls = "insp-rank-1" if rank == "RANK_ONE" else "insp-rank-2"
+        table_rows.append(
+            f'<tr><td>{name}</td>'
+            f'<td><span class="insp-lb {sc}">{sc}</span> {STATUS_LABEL.get(sc, sc)}</td>'
+            f'<td><span class="insp-rank {rank_cls}">{rank_lbl}</span></td></tr>'
+        )
+
+    inner_sections_html = [
+        f'<div class="insp-section">'
+        f'<div class="insp-section-title">{sec_en}'
+        f' <span class="insp-section-ar">/ {sec_ar}</span></div>'
+        f'<div class="insp-checklist">'
+        + "".join(
+            f'<div class="insp-check-row">'
+            f'<span class="insp-check-lbl">{label}</span>'
+            f'<span class="insp-chip {cls}">{lbl}</span>'
+            f'</div>'
+            for label, cls, lbl in rows
+        )
+        + '</div></div>'
+        for sec_en, sec_ar, rows in rm["inners"]
+    ]
+
+    return {
+        "outer_badges_html":      "".join(outer_badge_divs),
+        "structural_badges_html": "".join(structural_badge_divs),
+        "table_rows_html":        "".join(table_rows),
+        "inner_html":             "".join(inner_sections_html),
+        "insp_images":            rm["images"],
+        "damage_count":           rm["damage_count"],
+        "has_outer":              rm["has_outer"],
+        "has_inspection":         rm["has_inspection"],
+        "has_inner":              bool(inner_sections_html),
+        "has_images":             bool(rm["images"]),
+        "sedan_img":              SEDAN_IMG,
+        "truck_img":              TRUCK_IMG,
+    }
@@ -0,0 +1,62 @@
+"""Listing lifecycle: the is_live flag on ApiCar and SiteCar.
+
+An auction car (or a damaged SiteCar) stops being listed once its auction has
+ended. Rather than every query re-deriving that from now() — which defeats
+stable cache keys and partial indexes, and joins cars_category — the state is
+stored in is_live and flipped here, one set-based UPDATE per table:
+
+    live ──auction_date / auction_end passes──> expired
+    expired ──auction re-dated into the future──> live
+
+ORM saves set the flag themselves; the sweep catches rows written in bulk and
+rows whose time simply ran out. It runs off the request path:
+
+    python manage.py sweep_expired_listings --loop — the Procfile's lifecycle
+        worker, every SWEEP_INTERVAL seconds
+    import_auction_json — right after it writes
+    python manage.py sweep_expired_listings — on demand / cron
+"""
+from django.db import connection
+from django_tenants.utils import get_public_schema_name, schema_context
+
+SWEEP_INTERVAL = 60  # seconds
+
+# Rows whose flag disagrees with their dates — only auction rows and already
+# expired rows qualify, which the two partial indexes narrow to.
+_CARS = """
+    UPDATE cars_apicar c SET is_live = NOT c.is_live
+    FROM (SELECT c2.id, COALESCE(c2.auction_date < now()
+                                 AND c2.category_id IN (SELECT id FROM cars_category WHERE name = 'auction'),
+                                 false) AS expired
+          FROM cars_apicar c2
+          WHERE (c2.is_live AND c2.auction_date IS NOT NULL) OR NOT c2.is_live) s
+    WHERE s.id = c.id AND c.is_live = s.expired
+"""
+
+_SITE_CARS = """
+    UPDATE site_cars_sitecar SET is_live = NOT is_live
+    WHERE is_live = COALESCE(external_id LIKE %s AND auction_end < now(), false)
+      AND ((is_live AND auction_end IS NOT NULL) OR NOT is_live)
+"""
+
+
+def sweep_cars():
+    """Flip is_live on the shared ApiCar table. Returns rows changed."""
+    with schema_context(get_public_schema_name()):
+        with connection.cursor() as cur:
+            cur.execute(_CARS)
+            return cur.rowcount
+
+
+def sweep_site_cars(schema_name):
+    """Flip is_live on one tenant's SiteCar table. Returns rows changed."""
+    from site_cars import stats as site_car_stats
+    from site_cars.models import DAMAGED_PREFIX
+    with schema_context(schema_name):
+        with connection.cursor() as cur:
+            cur.execute(_SITE_CARS, [DAMAGED_PREFIX.replace("_", r"\_") + "%"])
+            changed = cur.rowcount
+    if changed:
+        site_car_stats.bump(schema_name)
+    return changed
+
@@ -7,25 +7,23 @@ originPrice is not in the import feed; we read it from Encar's public read API
 already stored in extra_features. Idempotent: cars that already have
 ``originPrice`` are skipped, so it is safe to re-run / resume.
 
+By default the cars are put on the enrichment queue at LOW priority (behind
+detail-page views and new lots) for ``enrich_origin_price`` to work through.
+With --now they are fetched here, concurrently and rate limited, in batches.
+
 Usage:
     DATABASE_URL=<public> python manage.py backfill_origin_price --limit 200
-    python manage.py backfill_origin_price --ids 590624 --force
-    python manage.py backfill_origin_price --only-available --sleep 0.3
+    python manage.py backfill_origin_price --ids 590624 --force --now
+    python manage.py backfill_origin_price --only-available --now --rate 5
 """
 
 from __future__ import annotations
 
-import time
-
-import requests
 from django.core.management.base import BaseCommand
 
+from cars import origin_price
 from cars.models import ApiCar
 
-API = "https://api.encar.com/v1/readside/vehicle/{}"
-UA = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
-      "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
-
 
 class Command(BaseCommand):
     help = "Backfill extra_features['originPrice'] (만원) from the Encar read API."
@@ -37,10 +35,14 @@ class Command(BaseCommand):
                             help="Comma-separated ApiCar pks to backfill (ignores other filters).")
         parser.add_argument("--only-available", action="store_true",
                             help="Only cars with status='available'.")
-        parser.add_argument("--sleep", type=float, default=0.25,
-                            help="Seconds to sleep between API calls (rate limit).")
         parser.add_argument("--force", action="store_true",
-                            help="Re-fetch even if originPrice already present.")
+                            help="Re-fetch even if originPrice already present (implies --now).")
+        parser.add_argument("--now", action="store_true",
+                            help="Fetch here instead of queueing for enrich_origin_price.")
+        parser.add_argument("--workers", type=int, default=8,
+                            help="Concurrent Encar requests (with --now).")
+        parser.add_argument("--rate", type=int, default=4,
+                            help="Max Encar requests per second (with --now).")
 
     def handle(self, *args, **opts):
         qs = ApiCar.objects.exclude(extra_features__isnull=True)
@@ -53,49 +55,29 @@ class Command(BaseCommand):
                 qs = qs.exclude(extra_features__has_key="originPrice")
             if opts["only_available"]:
                 qs = qs.filter(status="available")
-        qs = qs.only("id", "extra_features")
+        ids = qs.order_by("-id").values_list("id", flat=True)
         if opts["limit"]:
-            qs = qs[: opts["limit"]]
-
-        sess = requests.Session()
-        sess.headers.update({"User-Agent": UA, "Referer": "https://fem.encar.com/",
-                             "Accept": "application/json"})
+            ids = ids[: opts["limit"]]
+        ids = list(ids)
 
-        done = updated = missing = errors = 0
-        batch = []
-        for car in qs.iterator(chunk_size=500):
-            ef = car.extra_features or {}
-            vid = ef.get("vehicleId")
-            if not vid:
-                continue
-            done += 1
-            try:
-                r = sess.get(API.format(vid), timeout=20)
-                if r.status_code != 200:
-                    missing += 1
-                else:
-                    op = (r.json().get("category") or {}).get("originPrice")
-                    if op:
-                        ef["originPrice"] = int(op)
-                        car.extra_features = ef
-                        batch.append(car)
-                        updated += 1
-                    else:
-                        missing += 1
-            except (requests.RequestException, ValueError):
-                errors += 1
-            if len(batch) >= 200:
-                ApiCar.objects.bulk_update(batch, ["extra_features"])
-                batch.clear()
-            if done % 200 == 0:
-                self.stdout.write(f"  …{done} checked, {updated} updated, "
-                                  f"{missing} no-data, {errors} errors")
-            if opts["sleep"]:
-                time.sleep(opts["sleep"])
+        if not (opts["now"] or opts["force"]):
+            origin_price.enqueue(ids, origin_price.LOW)
+            self.stdout.write(self.style.SUCCESS(
+                f"Queued {len(ids)} cars (queue={origin_price.queue_depth()}). "
+                f"Run enrich_origin_price to process them."
+            ))
+            return
 
-        if batch:
-            ApiCar.objects.bulk_update(batch, ["extra_features"])
+        stored = retried = 0
+        for i in range(0, len(ids), 200):
+            s, r = origin_price.process_batch(
+                ids[i:i + 200], workers=opts["workers"], rate=opts["rate"], force=opts["force"],
+            )
+            stored += s
+            retried += r
+            self.stdout.write(f"  …{min(i + 200, len(ids))}/{len(ids)} checked, {stored} stored, "
+                              f"{retried} re-queued")
 
         self.stdout.write(self.style.SUCCESS(
-            f"Done. checked={done} updated={updated} no-data={missing} errors={errors}"
+            f"Done. checked={len(ids)} stored={stored} re-queued={retried}"
         ))
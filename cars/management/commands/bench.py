@@ -0,0 +1,283 @@
+"""
+bench
+=====
+Time the hot paths against the synthetic catalog (generate_synthetic_catalog)
+and compare with a stored baseline.
+
+Each scenario runs once to warm up and then --runs times, inside a
+tenants.profiling.RequestProfile, so the numbers are the same ones the
+production request profiler logs: wall time, SQL statements and outbound HTTP
+calls (which must stay 0 — everything here is local). Results go to a JSON
+file as p50 / p95 / queries per scenario:
+
+    car_list[<mix>]@<tenant>     listing pages: filter mixes and deep pages
+    facets[<tab>]@<tenant>       _compute_facet_counts (via _facet_counts_for)
+    car_detail@<tenant>          detail pages of a fixed set of visible cars
+    home@<tenant>, sitemap@<tenant>
+    import_encar_fast, import_auction_json   re-import of the first --import-cars
+
+Pages are requested through the test client with the full middleware stack.
+The default cache is swapped for a private LocMemCache for the whole run and
+cleared before every sample unless --warm is given, so cold runs measure the
+queries rather than the HTML cache (and never touch the real Redis).
+
+A scenario regresses when its p95 grows by more than --tolerance (and by more
+than NOISE_MS), or when it runs more queries than in the baseline.
+
+Usage:
+  python manage.py bench                          # run, compare with bench/baseline.json
+  python manage.py bench --save-baseline          # ... and make this run the baseline
+  python manage.py bench --only car_list --runs 20
+  python manage.py bench --fail-on-regression     # exit non-zero on regressions
+"""
+
+import io
+import json
+import math
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory, override_settings
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, tenant_context
+
+from cars import synthetic
+from cars.models import ApiCar, Manufacturer
+from tenants import profiling
+from tenants.models import Tenant
+
+NOISE_MS = 5.0          # p95 changes smaller than this are never regressions
+DETAIL_SAMPLES = 5      # distinct detail pages cycled through per tenant
+
+# (name, query string) — {make} and {year} are filled in per run.
+LIST_MIXES = [
+    ("all", ""),
+    ("make_year", "car_type=cars&manufacturer={make}&year_from={year}"),
+    ("options_fuel", "car_type=cars&options=010&options=014&options=005&fuel=diesel"),
+    ("auction_markers", "car_type=auction&marker_type=replaced&sort=-price"),
+    ("price_sort", "car_type=cars&sort=price&price_max=3000"),
+    ("deep_page", "car_type=cars&page=200"),
+    ("deep_page_sorted", "car_type=cars&sort=-mileage&page=1000"),
+]
+FACET_TABS = [
+    ("cars", "car_type=cars"),
+    ("auction", "car_type=auction"),
+    ("make", "car_type=cars&manufacturer={make}"),
+]
+
+
+def _percentile(samples, q):
+    s = sorted(samples)
+    return s[max(0, min(len(s) - 1, math.ceil(q * len(s)) - 1))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark listing, facets, detail, home, sitemap and the importers on the synthetic catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=7, help="Timed runs per scenario (default 7).")
+        parser.add_argument("--import-runs", type=int, default=3, help="Timed runs per importer (default 3).")
+        parser.add_argument("--import-cars", type=int, default=2000,
+                            help="Synthetic cars re-imported per importer run (default 2000).")
+        parser.add_argument("--seed", type=int, default=1, help="Seed the catalog was generated with.")
+        parser.add_argument("--only", type=str, default="",
+                            help="Comma-separated substrings; run only the matching scenarios.")
+        parser.add_argument("--warm", action="store_true",
+                            help="Keep the cache between runs (default: cleared before each sample).")
+        parser.add_argument("--output", type=str, default="bench/results.json")
+        parser.add_argument("--baseline", type=str, default="bench/baseline.json")
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="Also write this run's results to --baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.20,
+                            help="Allowed p95 growth over the baseline (default 0.20 = 20%%).")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        synthetic_cars = ApiCar.objects.filter(lot_number__startswith=synthetic.LOT_PREFIX).count()
+        if not synthetic_cars:
+            raise CommandError("No synthetic cars — run `manage.py generate_synthetic_catalog` first.")
+        if ApiCar.objects.exclude(lot_number__startswith=synthetic.LOT_PREFIX).exists():
+            raise CommandError("This database holds non-synthetic cars; the importer scenarios "
+                               "would write to it. Run the bench on a scratch database.")
+
+        self.runs = max(1, options["runs"])
+        self.cold = not options["warm"]
+        self.only = [s for s in options["only"].split(",") if s]
+        self.results = {}
+
+        make = Manufacturer.objects.filter(name="hyundai").values_list("id", flat=True).first() or ""
+        fill = {"make": make, "year": timezone.now().year - 5}
+        tenants = [t for t in (Tenant.objects.filter(schema_name=s).first()
+                               for s, _ in synthetic.BENCH_TENANTS) if t is not None]
+        if not tenants:
+            raise CommandError("No bench tenants — run generate_synthetic_catalog without --no-tenants.")
+
+        with override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                "LOCATION": "bench"}},
+            REQUEST_PROFILE_SAMPLE_RATE=0,
+            QUERY_BUDGET_STRICT=False,
+        ):
+            profiling.install()
+            for tenant in tenants:
+                self._bench_tenant(tenant, fill)
+            self._bench_importers(options)
+
+        self._report(options, synthetic_cars)
+
+    # ── scenarios ────────────────────────────────────────────────────────────
+
+    def _wanted(self, name):
+        return not self.only or any(s in name for s in self.only)
+
+    def _bench_tenant(self, tenant, fill):
+        from cars import views
+
+        domain = tenant.domains.filter(is_primary=True).values_list("domain", flat=True).first()
+        client = Client(HTTP_HOST=domain)
+        at = f"@{tenant.schema_name}"
+
+        def get(path):
+            return lambda: client.get(path).status_code
+
+        for mix, qs in LIST_MIXES:
+            path = "/cars/" + ("?" + qs.format(**fill) if qs else "")
+            self._measure(f"car_list[{mix}]{at}", tenant.schema_name, get(path))
+
+        rf = RequestFactory()
+        for tab, qs in FACET_TABS:
+            request = rf.get("/cars/?" + qs.format(**fill), HTTP_HOST=domain)
+
+            def facets(request=request):
+                with tenant_context(tenant):
+                    return 200 if views._facet_counts_for(request, request.GET.get("car_type")) else 500
+            self._measure(f"facets[{tab}]{at}", tenant.schema_name, facets)
+
+        with tenant_context(tenant):
+            visible = views._apply_tenant_catalog(
+                ApiCar.objects.filter(lot_number__startswith=synthetic.LOT_PREFIX, is_live=True), tenant)
+            slugs = list(visible.order_by("lot_number").values_list("slug", flat=True)[:DETAIL_SAMPLES])
+        if slugs:
+            paths = iter([f"/cars/{slugs[i % len(slugs)]}/" for i in range(self.runs + 1)])
+            self._measure(f"car_detail{at}", tenant.schema_name, lambda: client.get(next(paths)).status_code)
+
+        self._measure(f"home{at}", tenant.schema_name, get("/home/"))
+        self._measure(f"sitemap{at}", tenant.schema_name, get("/sitemap.xml"))
+
+    def _bench_importers(self, options):
+        runs = max(1, options["import_runs"])
+        if not (self._wanted("import_encar_fast") or self._wanted("import_auction_json")):
+            return
+        with tempfile.TemporaryDirectory(prefix="bench_import_") as tmp:
+            csv_path, json_path = os.path.join(tmp, "encar.csv"), os.path.join(tmp, "auction.json")
+            # Same cars as the head of the generated catalog: every run is an
+            # idempotent re-upsert, like a nightly import with few changes.
+            synthetic.write_files(csv_path, json_path, options["seed"], options["import_cars"],
+                                  timezone.now().date())
+            out = io.StringIO()
+            public = get_public_schema_name()
+            self._measure("import_encar_fast", public,
+                          lambda: call_command("import_encar_fast", url=csv_path, stdout=out) or 200, runs)
+            self._measure("import_auction_json", public,
+                          lambda: call_command("import_auction_json", json_path, stdout=out) or 200, runs)
+
+    def _measure(self, name, schema, fn, runs=None):
+        if not self._wanted(name):
+            return
+        runs = runs or self.runs
+        samples, queries, http_calls, status = [], [], 0, None
+        for i in range(runs + 1):
+            if self.cold:
+                cache.clear()
+            prof = profiling.RequestProfile(schema)
+            token = profiling.activate(prof)
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(profiling.sql_wrapper):
+                    status = fn()
+            finally:
+                profiling.deactivate(token)
+            if i == 0:
+                continue  # warm-up: imports, connection, plan cache
+            samples.append((time.perf_counter() - started) * 1000)
+            queries.append(prof.queries)
+            http_calls += prof.http_calls
+        self.results[name] = {
+            "p50_ms": round(_percentile(samples, 0.50), 2),
+            "p95_ms": round(_percentile(samples, 0.95), 2),
+            "min_ms": round(min(samples), 2),
+            "queries": sorted(queries)[len(queries) // 2],
+            "http_calls": http_calls,
+            "status": status,
+        }
+        r = self.results[name]
+        self.stdout.write(f"  {name:<44} p50 {r['p50_ms']:>9.1f}ms  p95 {r['p95_ms']:>9.1f}ms  "
+                          f"{r['queries']:>4}q  [{status}]")
+
+    # ── results ──────────────────────────────────────────────────────────────
+
+    def _path(self, p):
+        return p if os.path.isabs(p) else os.path.join(settings.BASE_DIR, p)
+
+    def _report(self, options, synthetic_cars):
+        doc = {
+            "meta": {
+                "at": timezone.now().isoformat(timespec="seconds"),
+                "synthetic_cars": synthetic_cars,
+                "runs": self.runs,
+                "cache": "cold" if self.cold else "warm",
+            },
+            "scenarios": self.results,
+        }
+        out_path = self._path(options["output"])
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        self.stdout.write(f"Results written to {out_path}")
+
+        problems = [f"{n}: {r['http_calls']} outbound HTTP call(s)"
+                    for n, r in self.results.items() if r["http_calls"]]
+        problems += [f"{n}: status {r['status']}" for n, r in self.results.items()
+                     if r["status"] not in (200, 404)]
+
+        base_path = self._path(options["baseline"])
+        if os.path.exists(base_path):
+            with open(base_path, encoding="utf-8") as f:
+                base = json.load(f).get("scenarios", {})
+            problems += self._compare(base, options["tolerance"])
+        else:
+            self.stdout.write(f"No baseline at {base_path}.")
+
+        if options["save_baseline"]:
+            with open(base_path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline saved to {base_path}")
+
+        for p in problems:
+            self.stdout.write(self.style.WARNING(f"REGRESSION {p}"))
+        if problems and options["fail_on_regression"]:
+            raise CommandError(f"{len(problems)} regression(s).")
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def _compare(self, base, tolerance):
+        problems = []
+        self.stdout.write(f"{'scenario':<44} {'p95 base':>10} {'p95 now':>10} {'Δ':>7}  queries")
+        for name, r in sorted(self.results.items()):
+            b = base.get(name)
+            if not b:
+                continue
+            delta = (r["p95_ms"] - b["p95_ms"]) / b["p95_ms"] if b["p95_ms"] else 0.0
+            self.stdout.write(f"{name:<44} {b['p95_ms']:>9.1f}ms {r['p95_ms']:>9.1f}ms {delta:>+7.0%}  "
+                              f"{b['queries']} → {r['queries']}")
+            if delta > tolerance and r["p95_ms"] - b["p95_ms"] > NOISE_MS:
+                problems.append(f"{name}: p95 {b['p95_ms']:.1f}ms → {r['p95_ms']:.1f}ms ({delta:+.0%})")
+            if r["queries"] > b["queries"]:
+                problems.append(f"{name}: {b['queries']} → {r['queries']} queries")
+        return problems
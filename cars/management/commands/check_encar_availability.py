@@ -1,118 +1,50 @@
 """
 check_encar_availability
 ========================
-Checks every available car (with a lot_number) against the Encar public API
-and DELETES it when Encar returns 404 (car no longer listed).
+Checks every available car (with a lot_number) against the Encar public API,
+DELETES it when Encar returns 404 (car no longer listed) and refreshes our
+stored price when Encar's listing price has changed.
 
 Cars live in the PUBLIC shared schema — we run ONCE, not per tenant.
 
-Speed: uses a thread pool (default 10 workers) so many requests run in
-parallel while staying gentle on Encar and the DB.
+Speed: requests go through cars.encar_check — one pooled keep-alive client,
+adaptive concurrency (up to --workers in flight) and a --rate token bucket.
+Deletions and price updates are applied in bulk once per --batch-size lots.
 
 Usage:
   python manage.py check_encar_availability            # production
   python manage.py check_encar_availability --dry-run  # preview only
   python manage.py check_encar_availability --limit 200 --workers 5
+  python manage.py check_encar_availability --base-url http://127.0.0.1:8765  # stub server
 """
 
-import time
-import urllib.error
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 
-from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from django_tenants.utils import schema_context, get_public_schema_name
 
+from cars import encar_check, rollup
 from cars.models import ApiCar
 
-_ENCAR_URL = "https://api.encar.com/v1/readside/clean-encar/vehicle/{lot}"
-_HEADERS = {
-    "accept": "*/*",
-    "accept-language": "en-US,en;q=0.9",
-    "origin": "https://fem.encar.com",
-    "referer": "https://fem.encar.com/",
-    "user-agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/146.0.0.0 Safari/537.36"
-    ),
-}
-
-
-def _bust_car_list_cache():
-    """Clear car_list / home page caches so deleted cars disappear immediately."""
-    try:
-        from django_redis import get_redis_connection
-        con = get_redis_connection("default")
-        for pattern in ("car_list:*", "home_html:*", "home_ctx:*", "landing_html:*"):
-            keys = con.keys(pattern)
-            if keys:
-                con.delete(*keys)
-        return
-    except Exception:
-        pass
-    cache.clear()
-
-
-def _check_lot(args):
-    """
-    Worker function — runs inside a thread pool.
-    Returns (car_id, 'gone' | 'ok' | 'unknown').
-      gone    → 404 from Encar → car should be deleted
-      ok      → 200 → still listed
-      unknown → network error / 5xx / 429 → skip this run
-    """
-    car_id, lot_number, timeout = args
-    url = _ENCAR_URL.format(lot=lot_number)
-    req = urllib.request.Request(url, headers=_HEADERS)
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return car_id, "ok" if resp.status == 200 else "unknown"
-    except urllib.error.HTTPError as err:
-        return car_id, "gone" if err.code == 404 else "unknown"
-    except Exception:
-        return car_id, "unknown"
-
-
-def _delete_batch(ids, public_schema):
-    """
-    Delete a batch of ApiCar rows safely using raw SQL.
-
-    Django's ORM .delete() triggers a cross-schema cascade lookup for
-    tenant-schema tables (site_cars_siteorder, site_cars_siterating, etc.)
-    which fails with 'relation does not exist' when the DB connection is
-    pointing at the public schema.  Raw SQL bypasses ORM cascade entirely
-    and lets PostgreSQL handle FK cascades at the DB level (or just deletes
-    what exists in the public schema).
-    """
-    from django.db import connection
-    ids_tuple = tuple(ids)
-    with schema_context(public_schema):
-        with connection.cursor() as cur:
-            # 1. Remove wishlist references (public schema table)
-            cur.execute(
-                "DELETE FROM cars_wishlist WHERE car_id = ANY(%s)",
-                [list(ids_tuple)],
-            )
-            # 2. Delete the cars — no ORM cascade, no cross-schema lookup
-            cur.execute(
-                "DELETE FROM cars_apicar WHERE id = ANY(%s)",
-                [list(ids_tuple)],
-            )
-
 
 class Command(BaseCommand):
     help = (
-        "Check Encar availability for all active cars and DELETE those no longer listed."
+        "Check Encar availability for all active cars, DELETE those no longer "
+        "listed and update changed prices."
     )
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--workers",
             type=int,
-            default=20,
-            help="Parallel HTTP workers (default: 20).",
+            default=32,
+            help="Max requests in flight; concurrency adapts up to this (default: 32).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=int,
+            default=40,
+            help="Max requests per second (default: 40, 0 = unlimited).",
         )
         parser.add_argument(
             "--limit",
@@ -129,88 +61,91 @@ class Command(BaseCommand):
         parser.add_argument(
             "--batch-size",
             type=int,
-            default=100,
-            help="Delete batch size (default: 100).",
+            default=500,
+            help="Lots checked before each bulk delete / price update (default: 500).",
+        )
+        parser.add_argument(
+            "--no-prices",
+            action="store_true",
+            help="Only delete gone cars; don't update changed prices.",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Ignore cached answers from the last few minutes.",
+        )
+        parser.add_argument(
+            "--base-url",
+            default=encar_check.ENCAR_API,
+            help="Encar API base URL (point at a stub server for offline runs).",
         )
         parser.add_argument(
             "--dry-run",
             action="store_true",
-            help="Show what would be deleted without touching the DB.",
+            help="Show what would be deleted / repriced without touching the DB.",
         )
 
     def handle(self, *args, **options):
-        workers = options["workers"]
-        limit = options["limit"]
-        timeout = options["timeout"]
-        batch_size = options["batch_size"]
-        dry_run = options["dry_run"]
-
-        public_schema = get_public_schema_name()
-
-        with schema_context(public_schema):
+        self.options = options
+        with schema_context(get_public_schema_name()):
             qs = (
                 ApiCar.objects
                 .filter(status="available")
                 .exclude(lot_number__isnull=True)
                 .exclude(lot_number="")
-                .only("id", "lot_number")
-            )
-            if limit:
-                qs = qs[:limit]
-            tasks = [(car.id, car.lot_number, timeout) for car in qs.iterator(chunk_size=500)]
-
-        total = len(tasks)
-        self.stdout.write(f"Checking {total} cars with {workers} workers (dry_run={dry_run})...")
-
-        checked = 0
-        gone_ids = []
-        total_deleted = 0
-        unknown = 0
-        t0 = time.time()
-
-        with ThreadPoolExecutor(max_workers=workers) as pool:
-            futures = {pool.submit(_check_lot, task): task for task in tasks}
-            for future in as_completed(futures):
-                car_id, result = future.result()
-                checked += 1
-
-                if result == "gone":
-                    gone_ids.append(car_id)
-                    self.stdout.write(f"  gone → id={car_id}")
-                elif result == "unknown":
-                    unknown += 1
-
-                # Flush delete batch
-                if not dry_run and len(gone_ids) >= batch_size:
-                    _delete_batch(gone_ids, public_schema)
-                    total_deleted += len(gone_ids)
-                    _bust_car_list_cache()
-                    self.stdout.write(
-                        self.style.SUCCESS(f"  ✓ Deleted {len(gone_ids)} cars.")
-                    )
-                    gone_ids = []
-
-                # Progress every 100 cars
-                if checked % 100 == 0:
-                    elapsed = time.time() - t0
-                    rate = checked / elapsed if elapsed else 0
-                    self.stdout.write(f"  {checked}/{total} — {rate:.1f} cars/s")
-
-        # Final flush
-        if not dry_run and gone_ids:
-            _delete_batch(gone_ids, public_schema)
-            total_deleted += len(gone_ids)
-            _bust_car_list_cache()
-            self.stdout.write(
-                self.style.SUCCESS(f"  ✓ Deleted {len(gone_ids)} cars (final).")
+                .values_list("id", "lot_number", "price")
             )
+            if options["limit"]:
+                qs = qs[: options["limit"]]
+            cars = list(qs.iterator(chunk_size=2000))
 
-        elapsed = time.time() - t0
         self.stdout.write(
-            self.style.SUCCESS(
-                f"\n=== Done in {elapsed:.0f}s === "
-                f"checked={checked} "
-                f"deleted={total_deleted if not dry_run else f'{len(gone_ids)} (dry-run)'} "
-                f"unknown={unknown}"
-            )
+            f"Checking {len(cars)} cars (workers≤{options['workers']}, "
+            f"rate={options['rate']}/s, dry_run={options['dry_run']})..."
         )
+        self.deleted = self.repriced = 0
+        stats = asyncio.run(self._run(cars))
+
+        if self.deleted and not options["dry_run"]:
+            rollup.rebuild()
+        # Repriced cars were already re-decided in the visible sets by
+        # encar_check.update_prices.
+
+        verb = "would delete" if options["dry_run"] else "deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== Done === {verb}={self.deleted} repriced={self.repriced} {stats.summary()}"
+        ))
+
+    async def _run(self, cars):
+        o = self.options
+        async with encar_check.EncarChecker(
+            base_url=o["base_url"], concurrency=min(8, o["workers"]), max_concurrency=o["workers"],
+            rate=o["rate"], timeout=o["timeout"], use_cache=not o["no_cache"],
+        ) as chk:
+            size = o["batch_size"]
+            for i in range(0, len(cars), size):
+                batch = cars[i:i + size]
+                results = await chk.check_vehicles([lot for _, lot, _ in batch])
+                gone, prices = [], {}
+                for car_id, lot, price in batch:
+                    res = results[str(lot)]
+                    if res.status == encar_check.GONE:
+                        gone.append(car_id)
+                    elif res.price and res.price != price and not o["no_prices"]:
+                        prices[car_id] = res.price
+                # The ORM refuses to run inside the event loop — apply in a thread.
+                await asyncio.to_thread(self._apply, gone, prices)
+                self.stdout.write(
+                    f"  {i + len(batch)}/{len(cars)} — {chk.stats.rate():.1f} checks/s, "
+                    f"concurrency={chk.limit.limit}, gone={len(gone)}, repriced={len(prices)}"
+                )
+            return chk.stats
+
+    def _apply(self, gone, prices):
+        self.deleted += len(gone)
+        self.repriced += len(prices)
+        if self.options["dry_run"] or not (gone or prices):
+            return
+        encar_check.delete_cars(gone)
+        encar_check.update_prices(prices)
+        encar_check.bust_listing_caches()
@@ -1,10 +1,8 @@
-from collections import defaultdict
-
 from django.core.management.base import BaseCommand
-from django.db import connection, transaction
-from django.db.models import Count
+from django.db import connection
 
-from cars.models import ApiCar, CarColor, CarSeatColor
+from cars import dedupe
+from cars.models import CarColor, CarSeatColor
 
 # Junk placeholders the feed uses instead of a real colour — folded into one
 # bucket so the filter shows a single "غير محدد" option instead of three.
@@ -13,11 +11,6 @@ ALIASES = {'etc': 'unknown', 'others': 'unknown'}
 TARGETS = ((CarColor, 'color'), (CarSeatColor, 'seat_color'))
 
 
-def _key(name):
-    k = (name or '').strip().lower()
-    return ALIASES.get(k, k)
-
-
 class Command(BaseCommand):
     help = ("Merge duplicate colour rows (same name stored several times) and "
             "delete colour rows no car references. Shared catalogue data, so "
@@ -27,6 +20,8 @@ class Command(BaseCommand):
         parser.add_argument('--dry-run', action='store_true')
         parser.add_argument('--no-purge', action='store_true',
                             help='merge duplicates but keep unreferenced rows')
+        parser.add_argument('--batch', type=int, default=dedupe.BATCH,
+                            help='rows merged / deleted per transaction')
 
     def handle(self, *args, **opts):
         dry = opts['dry_run']
@@ -38,8 +33,9 @@ class Command(BaseCommand):
         for Model, field in TARGETS:
             self.stdout.write(self.style.MIGRATE_HEADING(
                 f"\n{Model.__name__} (ApiCar.{field})"))
-            merged, moved = self._merge(Model, field, dry)
-            purged = 0 if opts['no_purge'] else self._purge(Model, field, dry)
+            spec = dedupe.color_spec(Model, field, aliases=ALIASES)
+            merged, moved = self._merge(spec, dry, opts['batch'])
+            purged = 0 if opts['no_purge'] else self._purge(spec, dry, opts['batch'])
             verb = "would merge" if dry else "merged"
             self.stdout.write(
                 f"  {verb} {merged} duplicate rows ({moved} cars repointed), "
@@ -47,58 +43,22 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(
             "\nDry run — nothing written." if dry else "\nDone."))
 
-    def _usage(self, field):
-        return dict(ApiCar.objects
-                    .exclude(**{f'{field}__isnull': True})
-                    .values(f'{field}_id')
-                    .annotate(c=Count('id'))
-                    .values_list(f'{field}_id', 'c'))
-
-    def _merge(self, Model, field, dry):
-        usage = self._usage(field)
-        groups = defaultdict(list)
-        for pk, name in Model.objects.values_list('id', 'name'):
-            groups[_key(name)].append(pk)
-
-        merged = moved = 0
-        for key, ids in sorted(groups.items()):
-            if len(ids) < 2:
-                continue
-            # Keep the most-used row; ties go to the lowest id.
-            canonical = max(ids, key=lambda i: (usage.get(i, 0), -i))
-            others = [i for i in ids if i != canonical]
-            n_cars = sum(usage.get(i, 0) for i in others)
-            self.stdout.write(
-                f"    {key!r}: keep #{canonical} ({usage.get(canonical, 0)} cars), "
-                f"merge {others} (+{n_cars} cars)")
-            if not dry:
-                with transaction.atomic(), connection.cursor() as cur:
-                    cur.execute(
-                        f"UPDATE cars_apicar SET {field}_id = %s "
-                        f"WHERE {field}_id = ANY(%s)", [canonical, others])
-                    cur.execute(
-                        f"DELETE FROM {Model._meta.db_table} WHERE id = ANY(%s)",
-                        [others])
-            merged += len(others)
-            moved += n_cars
+    def _merge(self, spec, dry, batch):
+        """Fold every group of same-named rows into its most-used row (ties go
+        to the lowest id) — one window query, then batched bulk UPDATE / DELETE."""
+        merged = dedupe.build_map(spec)
+        info = dedupe.report(spec)
+        moved = sum(info['refs'].values())
+        for survivor, size in info['sample']:
+            self.stdout.write(f"    keep #{survivor}, merge {size - 1} row(s)")
+        if merged and not dry:
+            dedupe.apply(spec, batch=batch)
         return merged, moved
 
-    def _purge(self, Model, field, dry):
-        """Delete rows nothing points at (checked fresh, after the merge)."""
-        used = set(self._usage(field))
-        dead = list(Model.objects.exclude(id__in=used).values_list('id', flat=True))
-        if not dead:
-            return 0
+    def _purge(self, spec, dry, batch):
+        """Delete rows nothing points at (checked fresh, after the merge), in
+        batches. A referenced id would raise a ForeignKeyViolation, so the
+        constraint guards correctness."""
         if dry:
-            return len(dead)
-        # Delete in chunks: one 17k-row statement stalls, and the ORM's cascade
-        # collector would load every related row first. A referenced id would
-        # raise a ForeignKeyViolation, so the constraint guards correctness.
-        done = 0
-        for i in range(0, len(dead), 2000):
-            chunk = dead[i:i + 2000]
-            with transaction.atomic(), connection.cursor() as cur:
-                cur.execute(
-                    f"DELETE FROM {Model._meta.db_table} WHERE id = ANY(%s)", [chunk])
-            done += len(chunk)
-        return done
+            return dedupe.count_unused(spec)
+        return dedupe.purge_unused(spec, batch=batch)
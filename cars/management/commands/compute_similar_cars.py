@@ -0,0 +1,101 @@
+"""
+compute_similar_cars
+====================
+Rebuild the SimilarCars table: for every available car, the ids of the best
+NEIGHBOURS candidates of the same make, ranked exactly like the detail page's
+live query (model+badge+year, model+badge, model, make; newest first within a
+tier).
+
+Done in memory in one pass rather than one query per car: all available cars
+are loaded once (id + the four match columns), sorted newest first, and for
+each match key only the first NEIGHBOURS+1 cars are kept — so every car's list
+is a merge of four short, already-ordered lists. The table is replaced in one
+transaction, so the detail page never sees a half-built table.
+
+More candidates than the page shows are stored because tenants filter the
+catalog at read time; when too few survive, the page falls back to the live
+query.
+
+Usage:
+  python manage.py compute_similar_cars
+  python manage.py compute_similar_cars --neighbours 36
+"""
+
+import json
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django_tenants.utils import schema_context, get_public_schema_name
+
+from cars.models import ApiCar
+
+NEIGHBOURS = 24
+
+
+class Command(BaseCommand):
+    help = "Precompute the similar-cars list of every available car (nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--neighbours",
+            type=int,
+            default=NEIGHBOURS,
+            help=f"Candidates stored per car (default: {NEIGHBOURS}).",
+        )
+
+    def handle(self, *args, **options):
+        n = options["neighbours"]
+        t0 = time.monotonic()
+
+        with schema_context(get_public_schema_name()):
+            cars = list(
+                ApiCar.objects.filter(status="available")
+                .order_by("-year", "-created_at")
+                .values_list("id", "manufacturer_id", "model_id", "badge_id", "year")
+                .iterator(chunk_size=5000)
+            )
+            self.stdout.write(f"Loaded {len(cars):,} available cars in {time.monotonic() - t0:.1f}s.")
+
+            # Newest-first candidates per match key, capped at n+1 (a car may
+            # have to skip itself).
+            tiers = [defaultdict(list) for _ in range(4)]
+
+            def keys(mk, md, bd, yr):
+                return ((mk, md, bd, yr), (mk, md, bd), (mk, md), mk)
+
+            for pk, *cols in cars:
+                for tier, key in zip(tiers, keys(*cols)):
+                    bucket = tier[key]
+                    if len(bucket) <= n:
+                        bucket.append(pk)
+
+            rows = []
+            for pk, *cols in cars:
+                seen = {pk}
+                ids = []
+                for tier, key in zip(tiers, keys(*cols)):
+                    for other in tier[key]:
+                        if other not in seen:
+                            seen.add(other)
+                            ids.append(other)
+                    if len(ids) >= n:
+                        break
+                if ids:
+                    rows.append((pk, json.dumps(ids[:n])))
+
+            with transaction.atomic(), connection.cursor() as cur:
+                cur.execute("DELETE FROM cars_similarcars")
+                for i in range(0, len(rows), 2000):
+                    args = ",".join(
+                        cur.mogrify("(%s,%s::jsonb,now())", row).decode() for row in rows[i:i + 2000]
+                    )
+                    cur.execute(
+                        "INSERT INTO cars_similarcars (car_id, neighbour_ids, computed_at) "
+                        f"VALUES {args}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored similar cars for {len(rows):,} cars in {time.monotonic() - t0:.1f}s."
+        ))
@@ -0,0 +1,57 @@
+"""Worker for the origin-price enrichment queue (cars.origin_price).
+
+Claims the most urgent cars (detail-page views first, then new lots, then
+backfill), fetches Encar's originPrice concurrently under a global rate limit,
+stores each batch with one jsonb_set UPDATE and only then acks it — a batch
+lost to a crash is re-queued when its lease runs out.
+
+Usage:
+    python manage.py enrich_origin_price                    # drain the queue, then exit
+    python manage.py enrich_origin_price --loop             # long-running worker
+    python manage.py enrich_origin_price --max-seconds 600  # bounded run for cron
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import origin_price
+
+
+class Command(BaseCommand):
+    help = "Fill extra_features['originPrice'] for queued cars (concurrent, rate-limited, bulk writes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=200, help="Cars claimed per round.")
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent Encar requests.")
+        parser.add_argument("--rate", type=int, default=10,
+                            help="Max Encar requests per second, shared by all worker processes.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running; sleep while the queue is empty.")
+        parser.add_argument("--max-seconds", type=int, default=0,
+                            help="Stop after this long (0 = no limit).")
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        stored = retried = rounds = 0
+        while True:
+            if opts["max_seconds"] and time.monotonic() - started >= opts["max_seconds"]:
+                break
+            ids = origin_price.claim(opts["batch"])
+            if not ids:
+                if not opts["loop"]:
+                    break
+                time.sleep(2)
+                continue
+            s, r = origin_price.process_batch(ids, workers=opts["workers"], rate=opts["rate"])
+            origin_price.ack(ids)
+            stored += s
+            retried += r
+            rounds += 1
+            if rounds % 10 == 0:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  {stored} stored, {retried} re-queued "
+                                  f"({stored / elapsed:.1f}/s, queue={origin_price.queue_depth()})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. stored={stored} re-queued={retried} queue={origin_price.queue_depth()}"
+        ))
@@ -0,0 +1,130 @@
+"""
+generate_synthetic_catalog
+==========================
+Fill a local database with a deterministic, seeded synthetic catalog
+(cars.synthetic) and the bench tenants, for `manage.py bench`.
+
+The cars are written as Encar CSV / auction JSON files and loaded through the
+real importers (import_encar_fast --url <file>, import_auction_json), so
+slugs, cards, render payloads, generated columns, is_live, the rollup and the
+visible catalog sets all come out as production builds them. Nothing touches
+the network.
+
+Synthetic cars are recognised by their lot number prefix ("syn"). The command
+refuses to run against a database holding other cars unless --force is given.
+
+Usage:
+  python manage.py generate_synthetic_catalog                    # 200k cars, seed 1
+  python manage.py generate_synthetic_catalog --cars 20000 --seed 7
+  python manage.py generate_synthetic_catalog --purge --cars 0   # remove it all
+"""
+
+import os
+import tempfile
+import time
+from datetime import date
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cars import cards, rollup, synthetic, visibility
+from cars.models import ApiCar, Manufacturer
+from tenants.models import Domain, Tenant
+
+
+class Command(BaseCommand):
+    help = "Generate a seeded synthetic catalog and bench tenants (local benchmarking only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cars", type=int, default=200_000,
+                            help="Number of synthetic cars (default 200000).")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed (default 1).")
+        parser.add_argument("--anchor", type=str, default=None,
+                            help="YYYY-MM-DD that model years and auction dates are relative to (default: today).")
+        parser.add_argument("--auction-share", type=float, default=0.15,
+                            help="Fraction of cars that are auction lots (default 0.15).")
+        parser.add_argument("--batch", type=int, default=25_000,
+                            help="Cars per generated CSV file / import run (default 25000).")
+        parser.add_argument("--no-tenants", action="store_true",
+                            help="Don't create or update the bench tenants.")
+        parser.add_argument("--purge", action="store_true",
+                            help="Delete existing synthetic cars and bench tenants first.")
+        parser.add_argument("--force", action="store_true",
+                            help="Run even though the database holds non-synthetic cars.")
+
+    def handle(self, *args, **options):
+        anchor = date.fromisoformat(options["anchor"]) if options["anchor"] else timezone.now().date()
+        count = options["cars"]
+        t0 = time.monotonic()
+
+        if options["purge"]:
+            self._purge()
+        if ApiCar.objects.exclude(lot_number__startswith=synthetic.LOT_PREFIX).exists() and not options["force"]:
+            raise CommandError(
+                "This database holds non-synthetic cars. Point DATABASE_URL at a scratch "
+                "database, or pass --force to add the synthetic catalog alongside them."
+            )
+
+        if count > 0:
+            self._load_cars(count, options["seed"], anchor, options["auction_share"], options["batch"])
+        if not options["no_tenants"]:
+            self._ensure_tenants(anchor)
+
+        self.stdout.write(f"Rebuilt catalog rollup ({rollup.rebuild():,} rows).")
+        self.stdout.write(f"Rebuilt {len(visibility.refresh_all())} visible catalog(s).")
+        with connection.cursor() as cur:
+            cur.execute("ANALYZE cars_apicar")
+        total = ApiCar.objects.filter(lot_number__startswith=synthetic.LOT_PREFIX).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {time.monotonic() - t0:.0f}s — {total:,} synthetic cars."
+        ))
+
+    def _load_cars(self, count, seed, anchor, auction_share, batch):
+        with tempfile.TemporaryDirectory(prefix="synthetic_catalog_") as tmp:
+            json_paths = []
+            for start in range(0, count, batch):
+                n = min(batch, count - start)
+                csv_path = os.path.join(tmp, f"encar_{start}.csv")
+                json_path = os.path.join(tmp, f"auction_{start}.json")
+                n_encar, n_auction = synthetic.write_files(
+                    csv_path, json_path, seed, n, anchor, auction_share, start=start)
+                self.stdout.write(f"Cars {start:,}–{start + n - 1:,}: {n_encar:,} encar, {n_auction:,} auction.")
+                if n_encar:
+                    call_command("import_encar_fast", url=csv_path, stdout=self.stdout)
+                os.remove(csv_path)
+                if n_auction:
+                    json_paths.append(json_path)
+            # One auction run for all batches: it ends with the sweep, the
+            # rollup and the visible-set refresh, which only need doing once.
+            if json_paths:
+                call_command("import_auction_json", ",".join(json_paths), stdout=self.stdout)
+
+    def _ensure_tenants(self, anchor):
+        make_ids = dict(Manufacturer.objects.values_list("name", "id"))
+        for schema_name, domain in synthetic.BENCH_TENANTS:
+            fields = synthetic.bench_tenant_settings(schema_name, anchor, make_ids)
+            tenant = Tenant.objects.filter(schema_name=schema_name).first()
+            created = tenant is None
+            if created:
+                tenant = Tenant(schema_name=schema_name, name=schema_name.replace("_", " ").title())
+            for k, v in fields.items():
+                setattr(tenant, k, v)
+            tenant.save()
+            Domain.objects.get_or_create(domain=domain, defaults={"tenant": tenant, "is_primary": True})
+            self.stdout.write(f"Tenant {schema_name} ({domain}) {'created' if created else 'updated'}.")
+
+    def _purge(self):
+        for schema_name, _ in synthetic.BENCH_TENANTS:
+            tenant = Tenant.objects.filter(schema_name=schema_name).first()
+            if tenant is not None:
+                tenant.delete(force_drop=True)
+                self.stdout.write(f"Dropped tenant {schema_name}.")
+        qs = ApiCar.objects.filter(lot_number__startswith=synthetic.LOT_PREFIX)
+        ids = list(qs.values_list("id", flat=True))
+        for i in range(0, len(ids), 5000):
+            chunk = ids[i:i + 5000]
+            ApiCar.objects.filter(id__in=chunk).delete()
+            cards.delete(chunk)
+        self.stdout.write(f"Deleted {len(ids):,} synthetic cars.")
@@ -9,6 +9,7 @@ from django.core.exceptions import MultipleObjectsReturned
 from django.core.management.base import BaseCommand, CommandError
 from django.db import connection as _conn, transaction
 
+from cars import cards, lifecycle, rollup, visibility
 from cars.models import (
     ApiCar,
     Category,
@@ -514,6 +515,7 @@ class Command(BaseCommand):
                 self.stdout.write(f"  Prepared {i}/{len(data)}…")
 
         # Pass 3: write.
+        cars_to_bulk_update = []
         with transaction.atomic():
             if cars_to_create:
                 ApiCar.objects.bulk_create(
@@ -528,7 +530,6 @@ class Command(BaseCommand):
                         car_id__in=[c["car_id"] for c in cars_to_update]
                     )
                 }
-                cars_to_bulk_update = []
                 for car_data in cars_to_update:
                     cid = car_data.pop("car_id")
                     if cid in existing_cars:
@@ -575,6 +576,20 @@ class Command(BaseCommand):
                     """
                 )
 
+            # Listing cards for every row written above (slugs included).
+            cards.refresh(
+                ApiCar.objects.filter(
+                    car_id__in=[c.car_id for c in cars_to_create]
+                    + [c.car_id for c in cars_to_bulk_update]
+                ).values_list("id", flat=True)
+            )
+
+        # bulk_create / bulk_update skip save(): settle is_live for re-dated
+        # or already-ended lots now rather than at the next sweep.
+        lifecycle.sweep_cars()
+        rollup.rebuild()
+        visibility.refresh_all()
+
         self.stdout.write(self.style.SUCCESS(
             f"Done. Created: {created}, Updated: {updated}, Skipped: {skipped}"
         ))
@@ -15,6 +15,7 @@ from django.core.exceptions import MultipleObjectsReturned
 from django.db import transaction, connection
 from psycopg2.extras import Json, execute_values
 
+from cars import cards, inspection_render, visibility
 from cars.models import (
     ApiCar,
     Manufacturer,
@@ -24,6 +25,7 @@ from cars.models import (
     CarSeatColor,
     BodyType,
 )
+from tenants import telemetry
 
 
 class _LocalFileResponse:
@@ -435,7 +437,7 @@ class Command(BaseCommand):
 
         # Optional new CSV column `originPrice` (만원, grade base) — added once
         # the scraper's parse.py started emitting it. Skips the per-car Encar
-        # API fetch in _ensure_origin_price when present.
+        # API fetch (cars.origin_price / enrich_origin_price) when present.
         raw_origin = norm.get("originPrice")
         if raw_origin not in (None, "", "null", "None"):
             if not isinstance(extra, dict):
@@ -581,11 +583,14 @@ class Command(BaseCommand):
                     raise RuntimeError(f"Could not reconnect to {url} after drop at byte {bytes_read}")
                 current_resp = new_resp
 
+    @telemetry.phase("encar", "active")
     def _process_active_chunked(self, resp: requests.Response, *, url: str = "", username: str = "", password: str = "", chunk_size: int, batch_size: int, progress: bool = False, progress_every: int = 5000, max_rows: int = 0, dry_run: bool = False) -> Tuple[int, int, set]:
         created = 0
         updated = 0
         processed = 0
         seen_lot_numbers: set = set()
+        started = time.monotonic()
+        started_at = datetime.now(timezone.utc)
 
         caches: Dict[str, Dict] = {}
         cache_reset_every = 50000  # rows after which we reset related caches to limit memory
@@ -655,6 +660,8 @@ class Command(BaseCommand):
                     "",                                                         # inspection_report_url
                     now,                                                        # created_at (ignored on conflict)
                     now,                                                        # updated_at
+                    None,                                                       # render_payload (built after the upsert)
+                    0,                                                          # render_version
                 )
 
             values = list(by_lot.values())
@@ -690,7 +697,7 @@ class Command(BaseCommand):
                             fuel, is_leasing, extra_features, options, address,
                             is_special, is_luxury, is_new, status, first_registration,
                             usage_type, features, inspection_notes, inspection_report_url,
-                            created_at, updated_at
+                            created_at, updated_at, render_payload, render_version
                         )
                         VALUES %s
                         ON CONFLICT (lot_number) DO UPDATE SET
@@ -705,7 +712,11 @@ class Command(BaseCommand):
                             price = EXCLUDED.price, mileage = EXCLUDED.mileage, drive_wheel = EXCLUDED.drive_wheel,
                             seat_count = EXCLUDED.seat_count, fuel = EXCLUDED.fuel, is_leasing = EXCLUDED.is_leasing,
                             extra_features = EXCLUDED.extra_features, options = EXCLUDED.options,
-                            address = EXCLUDED.address, updated_at = EXCLUDED.updated_at
+                            address = EXCLUDED.address, updated_at = EXCLUDED.updated_at,
+                            -- The render model only goes stale with the inspection JSON.
+                            render_version = CASE
+                                WHEN cars_apicar.extra_features IS DISTINCT FROM EXCLUDED.extra_features
+                                THEN 0 ELSE cars_apicar.render_version END
                         RETURNING (xmax = 0) AS inserted
                         """,
                         values,
@@ -796,9 +807,20 @@ class Command(BaseCommand):
                         )
                         WHERE slug IS NULL OR slug = ''
                     """)
-
+            # Re-card every row this pass wrote (upsert sets updated_at), now
+            # that new rows have their slugs.
+            carded = cards.refresh(since=started_at)
+            self.stdout.write(f"Refreshed {carded:,} listing cards.")
+            # ...and put new / repriced rows into the tenants' visible sets.
+            visibility.refresh_cars(since=started_at)
+            # Render models of the rows whose inspection JSON is new or changed.
+            rendered = inspection_render.rebuild_stale(since=started_at)
+            self.stdout.write(f"Rebuilt {rendered:,} inspection render payloads.")
+
+        telemetry.import_rows("encar", processed, time.monotonic() - started)
         return created, updated, seen_lot_numbers
 
+    @telemetry.phase("encar", "removed")
     def _process_removed_chunked(self, resp: requests.Response, *, url: str = "", username: str = "", password: str = "", delete_batch_size: int, progress: bool = False, progress_every: int = 5000, max_rows: int = 0, dry_run: bool = False) -> int:
         removed = 0
         processed = 0
@@ -884,6 +906,7 @@ class Command(BaseCommand):
         delete_batch_size = options.get("delete_batch_size", 3000)
         delete_stale = options.get("delete_stale", False)
 
+        @telemetry.phase("encar", "stale_delete")
         def _delete_stale_cars(seen: set, dry_run: bool) -> int:
             """Delete any ApiCar whose lot_number was not in the active CSV.
 
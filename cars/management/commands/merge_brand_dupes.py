@@ -11,20 +11,29 @@ rows also slipped in alongside their English counterparts, causing FK divergence
 Usage:
     python manage.py merge_brand_dupes --tenant=<schema>            # dry-run
     python manage.py merge_brand_dupes --tenant=<schema> --apply    # commit
+    python manage.py merge_brand_dupes --apply --batch 500          # smaller transactions
 
 By default only manufacturers + models are merged. Pass --badges to also dedup
 CarBadge rows (skipped by default because badges can legitimately repeat across
 models, and we group strictly by (name, model_id) which is safe but slower).
+
+Manufacturer clusters are decided here (forced pairs, Arabic name_ar
+matching); models and badges are grouped by cars.dedupe's window query. The
+merge itself is cars.dedupe.apply: one UPDATE per referencing table and a
+bulk DELETE per batch, so no transaction spans the whole run. Models are
+merged before their manufacturers so re-pointing never collides with
+uniq_carmodel_name_per_manufacturer.
 """
 
 from collections import defaultdict
 import re
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db.models import Count
 from django_tenants.utils import schema_context
 
-from cars.models import ApiCar, CarBadge, CarModel, Manufacturer
+from cars import dedupe, rollup
+from cars.models import ApiCar, CarModel, Manufacturer
 
 
 _ARABIC_RE = re.compile(r'[؀-ۿ]')
@@ -45,6 +54,8 @@ class Command(BaseCommand):
         parser.add_argument('--tenant', default='public', help='Tenant schema (cars is a SHARED_APP so public is the right place; default: public).')
         parser.add_argument('--apply', action='store_true', help='Actually write changes. Default is dry-run.')
         parser.add_argument('--badges', action='store_true', help='Also dedup CarBadge rows.')
+        parser.add_argument('--batch', type=int, default=dedupe.BATCH,
+                            help='Duplicate rows merged per transaction.')
         parser.add_argument(
             '--arabic-pair', action='append', default=[],
             metavar='AR=EN',
@@ -81,42 +92,68 @@ class Command(BaseCommand):
         self.stdout.write(f"\n=== merge_brand_dupes — schema={schema} mode={mode} ===\n")
 
         with schema_context(schema):
-            if apply_changes:
-                with transaction.atomic():
-                    self._run(apply_changes, do_badges, forced_pairs)
-            else:
-                self._run(apply_changes, do_badges, forced_pairs)
+            self._run(apply_changes, do_badges, forced_pairs, options['batch'])
 
-    def _run(self, apply_changes, do_badges, forced_pairs):
-        # ---- Phase 1: Manufacturer dedup ----
+    def _run(self, apply_changes, do_badges, forced_pairs, batch):
+        # ---- Phase 1: Manufacturer clusters ----
         self.stdout.write(self.style.MIGRATE_HEADING("\nPhase 1: Manufacturer dedup"))
-        canonical_by_id = self._merge_manufacturers(apply_changes, forced_pairs)
+        mfr_spec = dedupe.manufacturer_spec()
+        dedupe.map_from_pairs(mfr_spec, self._plan_manufacturers(forced_pairs))
+        self._report(mfr_spec, "manufacturers")
 
-        # ---- Phase 2: CarModel dedup ----
+        # ---- Phase 2: CarModel dedup (grouped under the merged manufacturers) ----
         self.stdout.write(self.style.MIGRATE_HEADING("\nPhase 2: CarModel dedup"))
-        self._merge_car_models(apply_changes, canonical_by_id)
+        model_spec = dedupe.model_spec(after_manufacturers=True)
+        dedupe.build_map(model_spec)
+        self._report(model_spec, "models")
+
+        if apply_changes:
+            res = dedupe.apply(model_spec, batch=batch)
+            self.stdout.write(f"  → merged {res['deleted']} models ({res['repointed']} rows re-pointed)")
+            res = dedupe.apply(mfr_spec, batch=batch)
+            self.stdout.write(f"  → merged {res['deleted']} manufacturers ({res['repointed']} rows re-pointed)")
 
         # ---- Phase 3: CarBadge dedup (optional) ----
         if do_badges:
             self.stdout.write(self.style.MIGRATE_HEADING("\nPhase 3: CarBadge dedup"))
-            self._merge_car_badges(apply_changes)
+            badge_spec = dedupe.badge_spec()
+            dedupe.build_map(badge_spec)
+            if not apply_changes:
+                self.stdout.write("  (grouped by the current model ids — models merged above add more)")
+            self._report(badge_spec, "badges")
+            if apply_changes:
+                res = dedupe.apply(badge_spec, batch=batch)
+                self.stdout.write(f"  → merged {res['deleted']} badges ({res['repointed']} rows re-pointed)")
         else:
             self.stdout.write("\n(skip CarBadge dedup — pass --badges to enable)")
 
-        if not apply_changes:
+        if apply_changes:
+            rollup.rebuild()
+        else:
             self.stdout.write(self.style.WARNING("\nDry-run complete. Re-run with --apply to commit."))
 
+    def _report(self, spec, label):
+        info = dedupe.report(spec)
+        self.stdout.write(f"  {info['losers']} duplicate {label} in {info['groups']} clusters")
+        for survivor, size in info['sample']:
+            self.stdout.write(f"      keep id={survivor} ← {size - 1} dupes")
+        for name, n in info['refs'].items():
+            self.stdout.write(f"      {name}: {n} row(s) to re-point")
+
     # ---------------------------------------------------------------
-    # Phase 1 — Manufacturer
+    # Phase 1 — Manufacturer clusters
     # ---------------------------------------------------------------
-    def _merge_manufacturers(self, apply_changes, forced_pairs):
+    def _plan_manufacturers(self, forced_pairs):
         """
-        Returns a mapping {old_manufacturer_id: canonical_manufacturer_id} covering
-        only IDs that changed (canonical IDs map to themselves implicitly).
-        Used by Phase 2 to remap CarModel.manufacturer_id before regrouping models.
+        Returns a mapping {duplicate_manufacturer_id: canonical_manufacturer_id}
+        covering only IDs that change.
         """
         all_mfrs = list(Manufacturer.objects.all().order_by('id'))
         self.stdout.write(f"  total Manufacturer rows: {len(all_mfrs)}")
+        cars_by_mfr = dict(ApiCar.objects.values('manufacturer_id').annotate(c=Count('id'))
+                           .values_list('manufacturer_id', 'c'))
+        models_by_mfr = dict(CarModel.objects.values('manufacturer_id').annotate(c=Count('id'))
+                             .values_list('manufacturer_id', 'c'))
 
         # Partition: forced_pairs gets first crack at rewriting each row's name
         # (handles English↔English brand variants AND Arabic→English). Rows that
@@ -153,14 +190,9 @@ class Command(BaseCommand):
                 f"  ⚠ {len(unmatched_arabic)} Arabic-only Manufacturer rows have no English match; leaving alone:"
             ))
             for m in unmatched_arabic:
-                car_count = ApiCar.objects.filter(manufacturer_id=m.id).count()
-                self.stdout.write(f"      id={m.id} name={m.name!r} cars={car_count}")
+                self.stdout.write(f"      id={m.id} name={m.name!r} cars={cars_by_mfr.get(m.id, 0)}")
 
-        # Process clusters with >1 row.
         remap = {}
-        total_merged = 0
-        cars_repointed = 0
-        models_repointed = 0
         for key, rows in english_clusters.items():
             if len(rows) <= 1:
                 continue
@@ -173,129 +205,7 @@ class Command(BaseCommand):
             dupes = rows[1:]
             self.stdout.write(f"  cluster {key!r}: canonical id={canonical.id} (name={canonical.name!r}) ← {len(dupes)} dupes")
             for d in dupes:
-                car_cnt = ApiCar.objects.filter(manufacturer_id=d.id).count()
-                mod_cnt = CarModel.objects.filter(manufacturer_id=d.id).count()
-                self.stdout.write(f"      drop id={d.id} name={d.name!r} cars={car_cnt} models={mod_cnt}")
+                self.stdout.write(f"      drop id={d.id} name={d.name!r} cars={cars_by_mfr.get(d.id, 0)} "
+                                  f"models={models_by_mfr.get(d.id, 0)}")
                 remap[d.id] = canonical.id
-                cars_repointed += car_cnt
-                models_repointed += mod_cnt
-                total_merged += 1
-
-                if apply_changes:
-                    # Per-row model move so we can handle name collisions: if
-                    # the canonical manufacturer already has a CarModel with
-                    # the same name as one we're trying to move, merge cars +
-                    # badges into the existing row instead of trying to
-                    # repoint the duplicate (which violates the new
-                    # uniq_carmodel_name_per_manufacturer constraint).
-                    for dupe_model in CarModel.objects.filter(manufacturer_id=d.id):
-                        existing = CarModel.objects.filter(
-                            manufacturer_id=canonical.id,
-                            name=dupe_model.name,
-                        ).first()
-                        if existing:
-                            ApiCar.objects.filter(model_id=dupe_model.id).update(model_id=existing.id)
-                            CarBadge.objects.filter(model_id=dupe_model.id).update(model_id=existing.id)
-                            if dupe_model.name_ar and not existing.name_ar:
-                                existing.name_ar = dupe_model.name_ar
-                                existing.save(update_fields=['name_ar'])
-                            CarModel.objects.filter(id=dupe_model.id).delete()
-                        else:
-                            CarModel.objects.filter(id=dupe_model.id).update(manufacturer_id=canonical.id)
-                    ApiCar.objects.filter(manufacturer_id=d.id).update(manufacturer_id=canonical.id)
-                    if d.name_ar and not canonical.name_ar:
-                        canonical.name_ar = d.name_ar
-                        canonical.save(update_fields=['name_ar'])
-                    Manufacturer.objects.filter(id=d.id).delete()
-
-        self.stdout.write(
-            f"  → {total_merged} duplicate manufacturers merged; "
-            f"{cars_repointed} cars + {models_repointed} models repointed"
-        )
         return remap
-
-    # ---------------------------------------------------------------
-    # Phase 2 — CarModel
-    # ---------------------------------------------------------------
-    def _merge_car_models(self, apply_changes, mfr_remap):
-        """
-        Group CarModel by (lower(name), manufacturer_id) after Phase 1 already
-        collapsed the manufacturer side. For each cluster of >1, pick lowest id
-        and repoint ApiCar.model_id + CarBadge.model_id, then delete dupes.
-        """
-        all_models = list(CarModel.objects.all().order_by('id'))
-        self.stdout.write(f"  total CarModel rows: {len(all_models)}")
-
-        clusters = defaultdict(list)
-        for m in all_models:
-            # mfr_remap is only populated when --apply ran Phase 1; in dry-run,
-            # also virtually-repoint so the cluster count reflects post-merge state.
-            mfr_id = mfr_remap.get(m.manufacturer_id, m.manufacturer_id)
-            clusters[(_norm(m.name), mfr_id)].append(m)
-
-        total_merged = 0
-        cars_repointed = 0
-        badges_repointed = 0
-        for (name_key, mfr_id), rows in clusters.items():
-            if len(rows) <= 1:
-                continue
-            rows.sort(key=lambda r: r.id)
-            canonical = rows[0]
-            dupes = rows[1:]
-            self.stdout.write(
-                f"  cluster name={name_key!r} mfr_id={mfr_id}: canonical id={canonical.id} ← {len(dupes)} dupes"
-            )
-            for d in dupes:
-                car_cnt = ApiCar.objects.filter(model_id=d.id).count()
-                bdg_cnt = CarBadge.objects.filter(model_id=d.id).count()
-                self.stdout.write(f"      drop id={d.id} cars={car_cnt} badges={bdg_cnt}")
-                cars_repointed += car_cnt
-                badges_repointed += bdg_cnt
-                total_merged += 1
-
-                if apply_changes:
-                    ApiCar.objects.filter(model_id=d.id).update(model_id=canonical.id)
-                    CarBadge.objects.filter(model_id=d.id).update(model_id=canonical.id)
-                    if d.name_ar and not canonical.name_ar:
-                        canonical.name_ar = d.name_ar
-                        canonical.save(update_fields=['name_ar'])
-                    CarModel.objects.filter(id=d.id).delete()
-
-        self.stdout.write(
-            f"  → {total_merged} duplicate models merged; "
-            f"{cars_repointed} cars + {badges_repointed} badges repointed"
-        )
-
-    # ---------------------------------------------------------------
-    # Phase 3 — CarBadge (optional)
-    # ---------------------------------------------------------------
-    def _merge_car_badges(self, apply_changes):
-        all_badges = list(CarBadge.objects.all().order_by('id'))
-        self.stdout.write(f"  total CarBadge rows: {len(all_badges)}")
-
-        clusters = defaultdict(list)
-        for b in all_badges:
-            clusters[(_norm(b.name), b.model_id)].append(b)
-
-        total_merged = 0
-        cars_repointed = 0
-        for (name_key, model_id), rows in clusters.items():
-            if len(rows) <= 1:
-                continue
-            rows.sort(key=lambda r: r.id)
-            canonical = rows[0]
-            dupes = rows[1:]
-            self.stdout.write(
-                f"  cluster name={name_key!r} model_id={model_id}: canonical id={canonical.id} ← {len(dupes)} dupes"
-            )
-            for d in dupes:
-                car_cnt = ApiCar.objects.filter(badge_id=d.id).count()
-                self.stdout.write(f"      drop id={d.id} cars={car_cnt}")
-                cars_repointed += car_cnt
-                total_merged += 1
-
-                if apply_changes:
-                    ApiCar.objects.filter(badge_id=d.id).update(badge_id=canonical.id)
-                    CarBadge.objects.filter(id=d.id).delete()
-
-        self.stdout.write(f"  → {total_merged} duplicate badges merged; {cars_repointed} cars repointed")
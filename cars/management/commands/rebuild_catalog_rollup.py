@@ -0,0 +1,30 @@
+"""
+rebuild_catalog_rollup
+======================
+Recount the CatalogRollup table (cars.rollup) — car counts per car_type,
+make, model, version, engine group and trim that feed the car-list model/badge
+dropdowns and the cascade APIs.
+
+The importers and cleanup commands rebuild it themselves after they write;
+run this after any manual bulk change to cars_apicar.
+
+Usage:
+  python manage.py rebuild_catalog_rollup
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import rollup
+
+
+class Command(BaseCommand):
+    help = "Recount the model/badge dropdown rollup from cars_apicar."
+
+    def handle(self, *args, **opts):
+        t0 = time.monotonic()
+        rows = rollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt catalog rollup: {rows:,} rows in {time.monotonic() - t0:.1f}s."
+        ))
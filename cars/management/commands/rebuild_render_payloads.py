@@ -0,0 +1,63 @@
+"""
+rebuild_render_payloads
+=======================
+(Re)build ApiCar.render_payload — the precomputed inspection/report render
+model (cars.inspection_render) — for every car whose render_version is not the
+current RENDER_VERSION (missing, built by an older renderer, or reset by the
+importer because the car's inspection JSON changed).
+
+import_encar_fast rebuilds the rows it changed itself; cron_import.sh runs this
+as the catch-all, which is also what brings the table up to a bumped
+RENDER_VERSION. Until a row is rebuilt the views build its model on the fly, so
+the command is never required for correctness — only speed. When nothing is
+stale it is a single count and exits.
+
+Usage:
+  python manage.py rebuild_render_payloads
+  python manage.py rebuild_render_payloads --all          # force every car
+  python manage.py rebuild_render_payloads --batch 500
+  python manage.py rebuild_render_payloads --max-seconds 900   # bounded (cron)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context, get_public_schema_name
+
+from cars import inspection_render
+from cars.models import ApiCar
+
+
+class Command(BaseCommand):
+    help = "Rebuild stale inspection/report render payloads in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000,
+                            help="Cars per read/UPDATE round (default: 1000).")
+        parser.add_argument("--all", action="store_true",
+                            help="Rebuild every car, not just stale ones.")
+        parser.add_argument("--max-seconds", type=int, default=0,
+                            help="Stop after this long; the rest is picked up next run (0 = no limit).")
+
+    def handle(self, *args, **opts):
+        version = inspection_render.RENDER_VERSION
+        t0 = time.monotonic()
+        with schema_context(get_public_schema_name()):
+            qs = ApiCar.objects.all()
+            if not opts["all"]:
+                qs = qs.exclude(render_version=version)
+            total = qs.count()
+        if not total:
+            self.stdout.write(f"All render payloads are at version {version}.")
+            return
+        self.stdout.write(f"Rebuilding {total:,} render payloads (version {version})...")
+
+        def progress(done):
+            self.stdout.write(f"  {done:,}/{total:,} — {done / (time.monotonic() - t0):.0f} cars/s")
+
+        done = inspection_render.rebuild_stale(
+            batch=opts["batch"], max_seconds=opts["max_seconds"], everything=opts["all"],
+            progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {done:,} render payloads in {time.monotonic() - t0:.0f}s."
+        ))
@@ -0,0 +1,42 @@
+"""
+refresh_car_cards
+=================
+Rebuild the CarCard table (cars.cards) — the narrow per-car summary every
+listing page renders — from cars_apicar in one set-based upsert, then drop
+the cards of cars that no longer exist.
+
+The importers keep cards current for the rows they write; this full pass picks
+up everything they don't touch: Arabic make/model names (set_car_arabic_names),
+manufacturer logos, the is_new flags run_encar_import sets after the upsert,
+and cars deleted by the cleanup commands. cron_import.sh runs it last.
+
+Usage:
+  python manage.py refresh_car_cards
+  python manage.py refresh_car_cards --ids 101 102 103
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import cards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the listing card summaries from cars_apicar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", nargs="+", type=int,
+                            help="Only refresh these ApiCar ids (no prune).")
+
+    def handle(self, *args, **opts):
+        t0 = time.monotonic()
+        if opts["ids"]:
+            written = cards.refresh(opts["ids"])
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {written:,} cards."))
+            return
+        written = cards.refresh()
+        pruned = cards.prune()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {written:,} cards, pruned {pruned:,} in {time.monotonic() - t0:.1f}s."
+        ))
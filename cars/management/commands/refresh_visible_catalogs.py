@@ -0,0 +1,69 @@
+"""
+refresh_visible_catalogs
+========================
+Re-materialise the visible car set of every distinct tenant catalog signature
+(cars.visibility) and drop the sets no tenant uses any more.
+
+The importers already do this after they write; run it by hand after bulk
+edits to the catalog, or with --missing to build only signatures that have no
+set yet (cron_import.sh, after the exchange rate update).
+
+With --loop it is the catalog worker (Procfile): it runs the rebuilds web
+requests have asked for (cars.catalog_jobs) as they come in.
+
+Usage:
+  python manage.py refresh_visible_catalogs
+  python manage.py refresh_visible_catalogs --missing
+  python manage.py refresh_visible_catalogs --loop     # long-running worker
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name
+
+from cars import catalog_jobs, visibility
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-signature visible catalog sets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--missing", action="store_true",
+                            help="Only build signatures that have no set yet.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running the rebuilds requested by web requests.")
+        parser.add_argument("--interval", type=int, default=5,
+                            help="Seconds between checks with --loop (default 5).")
+
+    def handle(self, *args, **options):
+        if options["loop"]:
+            return self._loop(max(1, options["interval"]))
+        t0 = time.monotonic()
+        if options["missing"]:
+            sigs = {
+                visibility.materialize(t)
+                for t in Tenant.objects.exclude(schema_name=get_public_schema_name())
+            } - {None}
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(sigs)} signature(s) in use, all built, in {time.monotonic() - t0:.1f}s."
+            ))
+            return
+        for sig, n in sorted(visibility.refresh_all().items()):
+            self.stdout.write(f"  {sig}: {n:,} cars")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt visible catalogs in {time.monotonic() - t0:.1f}s."
+        ))
+
+    def _loop(self, interval):
+        while True:
+            t0 = time.monotonic()
+            try:
+                ran = catalog_jobs.run_pending()
+            except Exception as e:
+                self.stderr.write(f"catalog job failed: {e}")
+                ran = []
+            if ran:
+                self.stdout.write(f"Ran {', '.join(ran)} in {time.monotonic() - t0:.1f}s.")
+            time.sleep(interval)
@@ -1,37 +1,56 @@
+"""Merge ApiCar rows that list the same car (cars.dedupe).
+
+Duplicate groups come from one window query; each loser's images, wishlist
+entries and tenant orders / ratings / questions / sold records are re-pointed
+to the survivor with one UPDATE per table, then the losers are deleted — in
+batches, so each transaction stays short.
+
+Usage:
+    python manage.py remove_duplicate_cars --dry-run             # report only
+    python manage.py remove_duplicate_cars                       # by lot number, keep the oldest
+    python manage.py remove_duplicate_cars --by vin --keep updated --batch 500
+"""
 from django.core.management.base import BaseCommand
+
+from cars import dedupe, rollup
 from cars.models import ApiCar
-from django.db.models import Count
 
 
 class Command(BaseCommand):
-    help = 'Remove duplicate cars based on lot_number, keeping only the first occurrence'
-    
+    help = 'Merge duplicate cars (same lot number, or same VIN) into one survivor per group'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by', choices=sorted(dedupe.CAR_KEYS), default='lot_number',
+                            help='What makes two cars duplicates (default: lot_number, ignoring case and spaces).')
+        parser.add_argument('--keep', choices=['oldest', 'newest', 'updated'], default='oldest',
+                            help='Which car of a group survives (default: oldest = lowest id).')
+        parser.add_argument('--batch', type=int, default=dedupe.BATCH,
+                            help='Duplicates merged per transaction.')
+        parser.add_argument('--dry-run', action='store_true')
+
     def handle(self, *args, **options):
-        # Find all lot_numbers that have duplicates
-        duplicates = (
-            ApiCar.objects.values('lot_number')
-            .annotate(count=Count('id'))
-            .filter(count__gt=1)
-        )
-        
-        total_duplicates = duplicates.count()
-        self.stdout.write(f'Found {total_duplicates} lot_numbers with duplicates')
-        
-        deleted_count = 0
-        for dup in duplicates:
-            lot_number = dup['lot_number']
-            # Get all cars with this lot_number, ordered by id (keep first, delete rest)
-            cars = ApiCar.objects.filter(lot_number=lot_number).order_by('id')
-            # Keep the first one, delete the rest by getting their IDs
-            first_id = cars.first().id
-            count = ApiCar.objects.filter(lot_number=lot_number).exclude(id=first_id).delete()[0]
-            deleted_count += count
-            if count > 0:
-                self.stdout.write(f'Deleted {count} duplicate(s) for lot_number {lot_number}')
-        
-        self.stdout.write(self.style.SUCCESS(
-            f'Cleanup complete: removed {deleted_count} duplicate cars'
-        ))
+        spec = dedupe.car_spec(by=options['by'], rule=options['keep'])
+        losers = dedupe.build_map(spec)
+        info = dedupe.report(spec)
+        self.stdout.write(f"Found {info['groups']} groups by {options['by']} ({losers} duplicate cars)")
+        for survivor, size in info['sample']:
+            self.stdout.write(f"    keep #{survivor} ← {size - 1} duplicate(s)")
+        for name, n in info['refs'].items():
+            if n:
+                self.stdout.write(f"    {name}: {n} row(s) to re-point")
+
+        if options['dry_run'] or not losers:
+            self.stdout.write(self.style.SUCCESS(
+                "Dry run — nothing written." if options['dry_run'] else "Nothing to merge."))
+            return
+
+        res = dedupe.apply(spec, batch=options['batch'], progress=self._progress)
+        rollup.rebuild()
         self.stdout.write(self.style.SUCCESS(
-            f'Total unique cars now: {ApiCar.objects.count()}'
+            f"Cleanup complete: removed {res['deleted']} duplicate cars, "
+            f"re-pointed {res['repointed']} references"
         ))
+        self.stdout.write(self.style.SUCCESS(f'Total unique cars now: {ApiCar.objects.count()}'))
+
+    def _progress(self, done, total):
+        self.stdout.write(f"  {done}/{total}")
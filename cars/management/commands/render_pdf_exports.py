@@ -0,0 +1,58 @@
+"""Worker for the local PDF backend (cars.pdf_local).
+
+Renders pending PdfExport rows with backend="local": each is claimed
+(pdf_local.claim_next), pages missing from the page cache are rendered on a
+process pool, then each make's file is streamed to storage. Several renderers
+may run at once; an export is only ever built by the one that claimed it.
+
+Usage:
+    python manage.py render_pdf_exports                    # render what is pending, then exit
+    python manage.py render_pdf_exports --loop             # long-running worker
+    python manage.py render_pdf_exports --max-seconds 900  # bounded run for cron
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cars import pdf_local
+from cars.models import PdfExport
+
+
+class Command(BaseCommand):
+    help = "Render pending local PDF exports (cached pages, process pool, streamed to storage)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.PDF_RENDER_WORKERS,
+                            help="Page render processes.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running; sleep while nothing is pending.")
+        parser.add_argument("--interval", type=int, default=5,
+                            help="Seconds to sleep between polls with --loop.")
+        parser.add_argument("--max-seconds", type=int, default=0,
+                            help="Stop after this long (0 = no limit).")
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        cache = pdf_local.PageCache()
+        done = failed = 0
+        while True:
+            if opts["max_seconds"] and time.monotonic() - started >= opts["max_seconds"]:
+                break
+            export = pdf_local.claim_next()
+            if export is None:
+                if not opts["loop"]:
+                    break
+                time.sleep(opts["interval"])
+                continue
+            t0 = time.monotonic()
+            pdf_local.render_export(export, workers=opts["workers"], cache=cache)
+            export.refresh_from_db(fields=["status"])
+            if export.status == PdfExport.STATUS_COMPLETE:
+                done += 1
+            else:
+                failed += 1
+            self.stdout.write(f"  #{export.pk} {export.auction_name}: {export.status} "
+                              f"({time.monotonic() - t0:.1f}s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. rendered={done} failed={failed}"))
@@ -29,6 +29,7 @@ from django.core.management import call_command
 from django.utils import timezone
 
 from cars.models import ApiCar
+from tenants import telemetry
 
 
 class Command(BaseCommand):
@@ -65,12 +66,13 @@ class Command(BaseCommand):
 
             # ── Step 1: Download CSV to local disk (resumable, drop-resistant) ──
             self.stdout.write(f"Downloading CSV from R2 to {local_csv}...")
-            s3.download_file(
-                Bucket="encar-csv",
-                Key="encar/encar_cars.csv",
-                Filename=str(local_csv),
-                Config=transfer_cfg,
-            )
+            with telemetry.phase("encar", "download"):
+                s3.download_file(
+                    Bucket="encar-csv",
+                    Key="encar/encar_cars.csv",
+                    Filename=str(local_csv),
+                    Config=transfer_cfg,
+                )
             size_mb = local_csv.stat().st_size / 1024 / 1024
             self.stdout.write(self.style.SUCCESS(f"Downloaded {size_mb:,.1f} MB"))
 
@@ -98,3 +100,22 @@ class Command(BaseCommand):
             # ── Step 4: Mark freshly imported cars as new ─────────────────────
             marked = ApiCar.objects.filter(created_at__gte=import_started_at).update(is_new=True)
             self.stdout.write(self.style.SUCCESS(f"Marked {marked:,} newly imported cars as new."))
+
+            # New lots without a grade base price from the CSV go on the
+            # origin-price queue (behind cars visitors are viewing right now).
+            from cars import origin_price
+            queued = origin_price.enqueue(
+                ApiCar.objects.filter(is_new=True, extra_features__has_key="vehicleId")
+                .exclude(extra_features__has_key="originPrice")
+                .values_list("id", flat=True).iterator(),
+                origin_price.NORMAL,
+            )
+            self.stdout.write(f"Queued {queued:,} new cars for origin-price enrichment.")
+
+            # Recount the dropdown rollup for the upserted + deleted cars.
+            from cars import rollup
+            self.stdout.write(f"Rebuilt catalog rollup ({rollup.rebuild():,} rows).")
+
+            # Re-materialise every tenant catalog against the new rows.
+            from cars import visibility
+            self.stdout.write(f"Rebuilt {len(visibility.refresh_all())} visible catalog(s).")
@@ -0,0 +1,56 @@
+"""
+sweep_expired_listings
+======================
+Flip the is_live flag (cars.lifecycle) on every car whose auction ended — the
+shared ApiCar table, then each tenant's damaged SiteCars — and back on for any
+auction re-dated into the future. One UPDATE per table.
+
+The Procfile's lifecycle worker runs it with --loop, once a minute, so no web
+request ever pays for a sweep; cron_import.sh also runs it right after the
+import.
+
+Usage:
+  python manage.py sweep_expired_listings
+  python manage.py sweep_expired_listings --loop       # long-running worker
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name
+
+from cars import lifecycle
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Mark ended auctions (ApiCar + damaged SiteCars) as no longer live."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping until stopped.")
+        parser.add_argument("--interval", type=int, default=lifecycle.SWEEP_INTERVAL,
+                            help=f"Seconds between sweeps with --loop (default {lifecycle.SWEEP_INTERVAL}).")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                self._sweep(quiet=options["loop"])
+            except Exception as e:
+                if not options["loop"]:
+                    raise
+                self.stderr.write(f"sweep failed: {e}")
+            if not options["loop"]:
+                return
+            time.sleep(max(1, options["interval"]))
+
+    def _sweep(self, quiet):
+        changed = lifecycle.sweep_cars()
+        schemas = (Tenant.objects.exclude(schema_name=get_public_schema_name())
+                   .values_list("schema_name", flat=True))
+        site_changed = 0
+        for schema in schemas:
+            site_changed += lifecycle.sweep_site_cars(schema)
+        if quiet and not (changed or site_changed):
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Cars: {changed}. Site cars: {site_changed} across {len(schemas)} tenant(s)."
+        ))
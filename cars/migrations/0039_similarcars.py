@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0038_seed_japan_market'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarCars',
+            fields=[
+                ('car_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('neighbour_ids', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'سيارات مشابهة',
+                'verbose_name_plural': 'سيارات مشابهة',
+            },
+        ),
+    ]
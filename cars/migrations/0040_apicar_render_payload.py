@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0039_similarcars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apicar',
+            name='render_payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apicar',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0040_apicar_render_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('slug', models.CharField(blank=True, max_length=200, null=True)),
+                ('title', models.CharField(max_length=100)),
+                ('title_ar', models.CharField(blank=True, default='', max_length=255, verbose_name='العنوان بالعربي')),
+                ('title_en', models.CharField(blank=True, default='', max_length=255, verbose_name='العنوان بالإنجليزي')),
+                ('image', models.CharField(blank=True, max_length=500, null=True, verbose_name='الصورة المصغرة')),
+                ('manufacturer', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cars.manufacturer')),
+                ('manufacturer_logo', models.CharField(blank=True, max_length=255, null=True)),
+                ('model', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cars.carmodel')),
+                ('badge', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cars.carbadge')),
+                ('category', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cars.category')),
+                ('price', models.BigIntegerField()),
+                ('mileage', models.BigIntegerField()),
+                ('year', models.IntegerField()),
+                ('fuel', models.CharField(blank=True, max_length=100, null=True)),
+                ('transmission', models.CharField(blank=True, max_length=100, null=True)),
+                ('engine_group', models.CharField(blank=True, max_length=60, null=True)),
+                ('power', models.IntegerField(blank=True, null=True)),
+                ('seat_count', models.CharField(blank=True, max_length=100, null=True)),
+                ('drive_wheel', models.CharField(blank=True, max_length=100, null=True)),
+                ('points', models.CharField(blank=True, max_length=50, null=True)),
+                ('accident_count', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='عدد الحوادث')),
+                ('replacement_count', models.PositiveSmallIntegerField(default=0, verbose_name='عدد القطع المستبدلة')),
+                ('inspection_report_url', models.CharField(blank=True, default='', max_length=500)),
+                ('address', models.CharField(blank=True, max_length=255, null=True)),
+                ('auction_date', models.DateTimeField(blank=True, null=True)),
+                ('auction_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_new', models.BooleanField(default=False)),
+                ('status', models.CharField(default='available', max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'بطاقة سيارة',
+                'verbose_name_plural': 'بطاقات السيارات',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0041_carcard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_type', models.CharField(max_length=100)),
+                ('auction_date', models.DateTimeField(blank=True, null=True)),
+                ('manufacturer_id', models.BigIntegerField()),
+                ('model_id', models.BigIntegerField()),
+                ('model_version', models.CharField(blank=True, default='', max_length=120)),
+                ('engine_group', models.CharField(blank=True, default='', max_length=60)),
+                ('badge_id', models.BigIntegerField()),
+                ('car_count', models.PositiveIntegerField(default=0)),
+                ('max_year', models.IntegerField(blank=True, null=True)),
+                ('year_range', models.CharField(blank=True, default='', max_length=20)),
+            ],
+            options={
+                'verbose_name': 'ملخص الكتالوج',
+                'verbose_name_plural': 'ملخص الكتالوج',
+                'indexes': [
+                    models.Index(fields=['car_type', 'manufacturer_id'], name='cars_rollup_type_mfr_idx'),
+                    models.Index(fields=['car_type', 'model_id'], name='cars_rollup_type_model_idx'),
+                ],
+            },
+        ),
+    ]
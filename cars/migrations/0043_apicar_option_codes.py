@@ -0,0 +1,56 @@
+# Equipment filters were one `options @> '{"standard": ["010"]}'` per selected
+# code against the full options JSONB — no index, so every option-filtered
+# listing detoasted `options` for the whole catalog. The standard codes
+# (zero-padded numeric strings, '001'..'097') are now normalised into a
+# compact smallint[] column, and a GIN index on it answers the whole
+# selection with one `option_codes @> ARRAY[...]` predicate.
+#
+# This step only adds the column — nullable with no default, so a catalog
+# change, not a table rewrite — and the trigger that fills it on every
+# insert and every write to `options`, so the fast importer's bulk upsert and
+# ORM saves need no changes. Existing rows are filled in batches, and the
+# index built, by 0048_backfill_option_codes.
+from django.db import migrations
+
+
+FUNC = r"""
+CREATE OR REPLACE FUNCTION car_option_codes(o jsonb)
+RETURNS smallint[] LANGUAGE sql IMMUTABLE AS $func$
+  SELECT ARRAY(SELECT DISTINCT x::smallint FROM jsonb_array_elements_text(
+      CASE WHEN jsonb_typeof(o -> 'standard') = 'array' THEN o -> 'standard' ELSE '[]'::jsonb END) x
+    WHERE x ~ '^[0-9]{1,4}$' ORDER BY 1);
+$func$;
+
+CREATE OR REPLACE FUNCTION cars_apicar_set_option_codes()
+RETURNS trigger LANGUAGE plpgsql AS $func$
+BEGIN
+  NEW.option_codes := car_option_codes(NEW.options);
+  RETURN NEW;
+END;
+$func$;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [('cars', '0042_catalogrollup')]
+    operations = [
+        migrations.RunSQL(
+            FUNC,
+            reverse_sql=[
+                "DROP FUNCTION IF EXISTS cars_apicar_set_option_codes();",
+                "DROP FUNCTION IF EXISTS car_option_codes(jsonb);",
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                "ALTER TABLE cars_apicar ADD COLUMN IF NOT EXISTS option_codes smallint[];",
+                "CREATE TRIGGER cars_apicar_option_codes "
+                "BEFORE INSERT OR UPDATE OF options ON cars_apicar "
+                "FOR EACH ROW EXECUTE FUNCTION cars_apicar_set_option_codes();",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS cars_apicar_option_codes ON cars_apicar;",
+                "ALTER TABLE cars_apicar DROP COLUMN IF EXISTS option_codes;",
+            ],
+        ),
+    ]
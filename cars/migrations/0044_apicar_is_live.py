@@ -0,0 +1,49 @@
+# is_live replaces the per-query "auction_date >= now()" exclusion: a constant
+# column default adds the column without a table rewrite, expired auctions are
+# flipped once here, and cars.lifecycle.sweep_cars() keeps it current. The
+# partial indexes cover only live rows (plus a small one over the expired
+# rows the sweeper and the purge visit).
+from django.db import migrations, models
+
+
+BACKFILL = """
+    UPDATE cars_apicar c SET is_live = false
+    FROM cars_category cat
+    WHERE cat.id = c.category_id AND cat.name = 'auction' AND c.auction_date < now();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0043_apicar_option_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apicar',
+            name='is_live',
+            field=models.BooleanField(default=True, db_default=True),
+        ),
+        migrations.RunSQL(BACKFILL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('is_live', True)), fields=['-created_at'], name='cars_apicar_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('is_live', True)), fields=['category', '-created_at'], name='cars_apicar_live_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('is_live', True)), fields=['price'], name='cars_apicar_live_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('auction_date__isnull', False), ('is_live', True)), fields=['category', 'auction_date'], name='cars_apicar_live_auction_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('is_live', False)), fields=['id'], name='cars_apicar_expired_idx'),
+        ),
+    ]
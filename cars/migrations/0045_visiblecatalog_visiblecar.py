@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0044_apicar_is_live'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisibleCatalog',
+            fields=[
+                ('sig', models.CharField(max_length=16, primary_key=True, serialize=False)),
+                ('car_count', models.PositiveIntegerField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'كتالوج مرئي',
+                'verbose_name_plural': 'كتالوجات مرئية',
+            },
+        ),
+        migrations.CreateModel(
+            name='VisibleCar',
+            fields=[
+                ('pk', models.CompositePrimaryKey('sig', 'car_id', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('sig', models.CharField(max_length=16)),
+                ('car_id', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'سيارة مرئية',
+                'verbose_name_plural': 'سيارات مرئية',
+            },
+        ),
+    ]
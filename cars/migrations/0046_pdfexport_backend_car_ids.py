@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0045_visiblecatalog_visiblecar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfexport',
+            name='backend',
+            field=models.CharField(choices=[('ofleet', 'ofleet'), ('local', 'محلي')], default='ofleet', max_length=10, verbose_name='المحرك'),
+        ),
+        migrations.AddField(
+            model_name='pdfexport',
+            name='car_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
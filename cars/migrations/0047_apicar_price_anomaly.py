@@ -0,0 +1,33 @@
+# Price-anomaly columns filled by cars.anomaly.detect(). Constant defaults add
+# the columns without a table rewrite; the partial index covers only the
+# flagged rows the "suspicious price" filter and the report read.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0046_pdfexport_backend_car_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apicar',
+            name='price_flag',
+            field=models.CharField(blank=True, choices=[('low', 'أقل من المتوقع'), ('high', 'أعلى من المتوقع')], db_default='', default='', max_length=4, verbose_name='سعر مريب'),
+        ),
+        migrations.AddField(
+            model_name='apicar',
+            name='price_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apicar',
+            name='price_expected',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='apicar',
+            index=models.Index(condition=models.Q(('price_flag', ''), _negated=True), fields=['price_flag'], name='cars_apicar_price_flag_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Fill option_codes (0043) for the rows that predate its trigger, then index
+# it. Each batch is its own short transaction, so the backfill never holds
+# row locks on more than BATCH cars at once or leaves one huge transaction
+# for the importers to wait on, and a failed run resumes where it stopped
+# (only rows still NULL are touched). The GIN index is built afterwards, once,
+# and CONCURRENTLY so listings keep reading the table meanwhile.
+from django.db import migrations
+
+BATCH = 5000
+
+
+def backfill(apps, schema_editor):
+    with schema_editor.connection.cursor() as cur:
+        cur.execute("SELECT min(id), max(id) FROM cars_apicar WHERE option_codes IS NULL")
+        lo, hi = cur.fetchone()
+        if lo is None:
+            return
+        for start in range(lo, hi + 1, BATCH):
+            cur.execute(
+                "UPDATE cars_apicar SET option_codes = car_option_codes(options) "
+                "WHERE id >= %s AND id < %s AND option_codes IS NULL",
+                [start, start + BATCH],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0047_apicar_price_anomaly'),
+    ]
+
+    # Per-batch commits and CONCURRENTLY both need autocommit.
+    atomic = False
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=[
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS cars_apicar_option_codes_gin "
+                "ON cars_apicar USING gin (option_codes);",
+                "ANALYZE cars_apicar;",
+            ],
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS cars_apicar_option_codes_gin;",
+        ),
+    ]
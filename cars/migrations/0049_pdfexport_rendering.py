@@ -0,0 +1,24 @@
+# Local PDF renderers claim an export (status "rendering", started_at) before
+# working on it, so two of them never build the same one. The new column is
+# nullable, so adding it doesn't rewrite the table.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0048_backfill_option_codes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pdfexport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'جاري الإعداد'), ('rendering', 'جاري التحويل'), ('complete', 'جاهز للتحميل'), ('failed', 'فشل')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pdfexport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -133,6 +133,10 @@ class Wishlist(models.Model):
         return f"{self.session_key} - {self.car.title}"
 
 class ApiCar(models.Model):
+    PRICE_FLAG_CHOICES = [
+        ('low', 'أقل من المتوقع'),
+        ('high', 'أعلى من المتوقع'),
+    ]
     STATUS_CHOICES = [
         ('available', 'متاح'),
         ('sold', 'تم البيع'),
@@ -201,6 +205,21 @@ class ApiCar(models.Model):
     slug = models.SlugField(max_length=200, unique=True, blank=True, null=True, db_index=True)
     entry = models.CharField(max_length=100, blank=True, null=True, db_index=True)  # New field for entry number or date
     markers = models.JSONField(blank=True, null=True)  # inspection markers {panel: {status, code}}
+    # Precomputed inspection/report render model (cars.inspection_render) and
+    # the RENDER_VERSION it was built with; stale versions are rebuilt.
+    render_payload = models.JSONField(blank=True, null=True)
+    render_version = models.PositiveSmallIntegerField(default=0)
+    # False once an auction car's auction_date has passed. Flipped in bulk by
+    # cars.lifecycle.sweep_cars() rather than re-deriving "expired" from now()
+    # on every query; listings filter on it through the partial indexes below.
+    is_live = models.BooleanField(default=True, db_default=True)
+    # Written by cars.anomaly.detect() after each import: robust z-score of the
+    # mileage-adjusted price within the car's segment, the segment's expected
+    # price at this mileage, and 'low' / 'high' when the price is implausible.
+    price_flag = models.CharField(max_length=4, blank=True, default='', db_default='',
+                                  choices=PRICE_FLAG_CHOICES, verbose_name="سعر مريب")
+    price_score = models.FloatField(null=True, blank=True)
+    price_expected = models.BigIntegerField(null=True, blank=True)
 
     class Meta:
         indexes = [
@@ -216,6 +235,19 @@ class ApiCar(models.Model):
             models.Index(fields=['category', 'color'],        name='cars_apicar_cat_color_idx'),
             models.Index(fields=['category', 'seat_color'],   name='cars_apicar_cat_seat_clr_idx'),
             models.Index(fields=['category', '-year'],        name='cars_apicar_cat_year_idx'),
+            # Live rows only (migration 0044)
+            models.Index(fields=['-created_at'], name='cars_apicar_live_created_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['category', '-created_at'], name='cars_apicar_live_cat_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['price'], name='cars_apicar_live_price_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['category', 'auction_date'], name='cars_apicar_live_auction_idx',
+                         condition=models.Q(is_live=True, auction_date__isnull=False)),
+            models.Index(fields=['id'], name='cars_apicar_expired_idx',
+                         condition=models.Q(is_live=False)),
+            models.Index(fields=['price_flag'], name='cars_apicar_price_flag_idx',
+                         condition=~models.Q(price_flag='')),
         ]
     
     def __str__(self):
@@ -254,6 +286,22 @@ class ApiCar(models.Model):
     def save(self, *args, **kwargs):
         self.fuel = normalize_fuel(self.fuel)
         self.transmission = normalize_transmission(self.transmission)
+        # ORM writes set is_live themselves instead of waiting for the next
+        # sweep (the category lookup only happens for past auction dates).
+        if kwargs.get('update_fields') is None:
+            from django.utils import timezone
+            self.is_live = not (self.auction_date and self.auction_date < timezone.now()
+                                and self.category_id and self.category.name == 'auction')
+        # Keep the render model in step with extra_features on ORM writes (the
+        # fast importer sets both columns itself in its bulk upsert).
+        update_fields = kwargs.get('update_fields')
+        if 'extra_features' not in self.get_deferred_fields() and (
+                update_fields is None or 'extra_features' in update_fields):
+            from cars import inspection_render
+            self.render_payload = inspection_render.build(self.extra_features)
+            self.render_version = inspection_render.RENDER_VERSION
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'render_payload', 'render_version'}
         # Generate slug after first save so we have a PK
         if not self.pk:
             super().save(*args, **kwargs)
@@ -448,13 +496,21 @@ class PostComment(models.Model):
 
 class PdfExport(models.Model):
     STATUS_PENDING   = 'pending'
+    STATUS_RENDERING = 'rendering'
     STATUS_COMPLETE  = 'complete'
     STATUS_FAILED    = 'failed'
     STATUS_CHOICES = [
         (STATUS_PENDING,  'جاري الإعداد'),
+        (STATUS_RENDERING, 'جاري التحويل'),
         (STATUS_COMPLETE, 'جاهز للتحميل'),
         (STATUS_FAILED,   'فشل'),
     ]
+    BACKEND_OFLEET = 'ofleet'
+    BACKEND_LOCAL  = 'local'
+    BACKEND_CHOICES = [
+        (BACKEND_OFLEET, 'ofleet'),
+        (BACKEND_LOCAL,  'محلي'),
+    ]
 
     auction_name = models.CharField(max_length=200, verbose_name="اسم المزاد")
     make_name    = models.CharField(max_length=200, blank=True, verbose_name="الماركة")
@@ -463,6 +519,14 @@ class PdfExport(models.Model):
     pdf_file     = models.FileField(upload_to='auction_pdfs/', null=True, blank=True, verbose_name="ملف PDF")
     error_detail = models.TextField(blank=True, verbose_name="سبب الخطأ")
     entry_count  = models.IntegerField(default=0, verbose_name="عدد السيارات")
+    # Which engine builds the file: the ofleet service (webhook) or the local
+    # renderer (cars.pdf_local, run by `render_pdf_exports`), which needs the
+    # selected car ids.
+    backend      = models.CharField(max_length=10, choices=BACKEND_CHOICES, default=BACKEND_OFLEET, verbose_name="المحرك")
+    car_ids      = models.JSONField(default=list, blank=True, editable=False)
+    # When a local renderer claimed the row (status rendering); a claim older
+    # than pdf_local.LEASE is taken to be from a renderer that died.
+    started_at   = models.DateTimeField(null=True, blank=True, editable=False)
     created_at   = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
@@ -474,3 +538,144 @@ class PdfExport(models.Model):
         make = f" — {self.make_name}" if self.make_name else ""
         return f"{self.auction_name}{make} — {self.get_status_display()} ({self.created_at:%Y-%m-%d %H:%M})"
 
+
+
+class SimilarCars(models.Model):
+    """Precomputed "similar cars" for one car: candidate ids, best first
+    (same model+badge+year, then model+badge, model, make; newest first within
+    each). Rebuilt nightly by `compute_similar_cars`; the detail page filters it
+    by tenant visibility at read time and falls back to the live ranked query
+    when too few survive.
+
+    Plain ids rather than foreign keys: the importers delete cars with raw
+    SQL, and stale ids are dropped by the read-time filter anyway."""
+    car_id = models.BigIntegerField(primary_key=True)
+    neighbour_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "سيارات مشابهة"
+        verbose_name_plural = "سيارات مشابهة"
+
+    def __str__(self):
+        return f"{self.car_id} → {len(self.neighbour_ids)} similar"
+
+
+class CarCard(models.Model):
+    """Narrow card summary of one ApiCar — everything a listing card renders
+    and nothing else, so list pages never detoast the wide extra_features /
+    options / images JSONB. Kept in step by the importers (cars.cards.refresh);
+    listing views pick ids from ApiCar and then load cards by id.
+
+    `id` is the ApiCar id and the field names match ApiCar's, so the card
+    partials render a CarCard exactly like the car itself. `image` is the
+    thumbnail: ApiCar.image, else the first gallery image.
+
+    The car is referenced by id only (the importers delete cars with raw SQL);
+    the lookup FKs are unconstrained for the same reason and only serve
+    select_related into the small dimension tables."""
+    id = models.BigIntegerField(primary_key=True)
+    slug = models.CharField(max_length=200, blank=True, null=True)
+    title = models.CharField(max_length=100)
+    title_ar = models.CharField(max_length=255, blank=True, default="", verbose_name="العنوان بالعربي")
+    title_en = models.CharField(max_length=255, blank=True, default="", verbose_name="العنوان بالإنجليزي")
+    image = models.CharField(max_length=500, blank=True, null=True, verbose_name="الصورة المصغرة")
+    manufacturer = models.ForeignKey(Manufacturer, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    manufacturer_logo = models.CharField(max_length=255, blank=True, null=True)
+    model = models.ForeignKey(CarModel, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    badge = models.ForeignKey(CarBadge, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+                                 blank=True, null=True)
+    price = models.BigIntegerField()
+    mileage = models.BigIntegerField()
+    year = models.IntegerField()
+    fuel = models.CharField(max_length=100, blank=True, null=True)
+    transmission = models.CharField(max_length=100, blank=True, null=True)
+    engine_group = models.CharField(max_length=60, blank=True, null=True)
+    power = models.IntegerField(null=True, blank=True)
+    seat_count = models.CharField(max_length=100, blank=True, null=True)
+    drive_wheel = models.CharField(max_length=100, blank=True, null=True)
+    points = models.CharField(max_length=50, null=True, blank=True)
+    accident_count = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="عدد الحوادث")
+    replacement_count = models.PositiveSmallIntegerField(default=0, verbose_name="عدد القطع المستبدلة")
+    inspection_report_url = models.CharField(max_length=500, blank=True, default="")
+    address = models.CharField(max_length=255, blank=True, null=True)
+    auction_date = models.DateTimeField(null=True, blank=True)
+    auction_name = models.CharField(max_length=100, null=True, blank=True)
+    is_new = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, default='available')
+    created_at = models.DateTimeField()
+    refreshed_at = models.DateTimeField()
+
+    site_auction_end = ApiCar.site_auction_end
+
+    class Meta:
+        verbose_name = "بطاقة سيارة"
+        verbose_name_plural = "بطاقات السيارات"
+
+    def __str__(self):
+        return self.title
+
+
+class CatalogRollup(models.Model):
+    """Car counts per (car_type, make, model, version, engine group, trim),
+    rebuilt from cars_apicar by the importers (cars.rollup.rebuild). The
+    car-list model/badge dropdowns and the cascade APIs read their options and
+    counts from here instead of aggregating the catalog per request.
+
+    car_type is the tab a car belongs to: its category name ('auction',
+    'kbchachacha', a market), or 'cars' / 'truck' for uncategorised encar cars.
+    Auction rows are split by auction_date so ended auctions drop out at read
+    time without a rebuild."""
+    car_type = models.CharField(max_length=100)
+    auction_date = models.DateTimeField(null=True, blank=True)
+    manufacturer_id = models.BigIntegerField()
+    model_id = models.BigIntegerField()
+    model_version = models.CharField(max_length=120, blank=True, default="")
+    engine_group = models.CharField(max_length=60, blank=True, default="")
+    badge_id = models.BigIntegerField()
+    car_count = models.PositiveIntegerField(default=0)
+    max_year = models.IntegerField(null=True, blank=True)
+    year_range = models.CharField(max_length=20, blank=True, default="")
+
+    class Meta:
+        verbose_name = "ملخص الكتالوج"
+        verbose_name_plural = "ملخص الكتالوج"
+        indexes = [
+            models.Index(fields=['car_type', 'manufacturer_id'], name='cars_rollup_type_mfr_idx'),
+            models.Index(fields=['car_type', 'model_id'], name='cars_rollup_type_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.car_type}/{self.model_id}/{self.badge_id}: {self.car_count}"
+
+
+class VisibleCatalog(models.Model):
+    """One materialised tenant catalog: the cars a catalog signature
+    (cars.visibility.signature — toggles + catalog_filter + price factor)
+    lets through, stored as VisibleCar rows. Tenants with identical rules share
+    one signature and so one set. Rebuilt after every import and whenever a
+    tenant's catalog settings change; a signature with no row here is not
+    built yet and is evaluated live."""
+    sig = models.CharField(max_length=16, primary_key=True)
+    car_count = models.PositiveIntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "كتالوج مرئي"
+        verbose_name_plural = "كتالوجات مرئية"
+
+    def __str__(self):
+        return f"{self.sig}: {self.car_count}"
+
+
+class VisibleCar(models.Model):
+    """(signature, car) membership of a VisibleCatalog. Plain ids, like
+    SimilarCars: stale ids of deleted cars fall out of every join."""
+    pk = models.CompositePrimaryKey('sig', 'car_id')
+    sig = models.CharField(max_length=16)
+    car_id = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "سيارة مرئية"
+        verbose_name_plural = "سيارات مرئية"
@@ -0,0 +1,203 @@
+"""Origin-price enrichment: a prioritised queue plus a concurrent, rate-limited
+worker that fills ApiCar.extra_features['originPrice'] (Encar grade base price,
+만원) for the new-car price comparison.
+
+The request path only ever enqueues (one ZADD). Fetching happens in
+`manage.py enrich_origin_price`:
+
+    car_detail / car_price_comparison ──enqueue(HIGH)──┐
+    run_encar_import (new lots) ──────enqueue(NORMAL)──┼─> Redis ZSET ──> worker
+    backfill_origin_price ────────────enqueue(LOW)─────┘     (score = priority, then age)
+
+The queue lives on the "state" Redis alias, which a cache clear never touches.
+The Procfile's origin_price worker runs `--loop` with small batches, so a HIGH
+car is fetched within a few seconds — well inside the detail page's 202 poll.
+
+The worker claims a batch — one Lua call moves it from the queue into the
+`origin_price:processing` ZSET, scored by when its LEASE runs out — fetches it
+on a thread pool under a global rate limit (tenants.ratelimit, shared by every
+worker process) and writes the whole batch with ONE
+`UPDATE … SET extra_features = jsonb_set(…) FROM (VALUES …)` — no full-row
+rewrite, no per-car save(). Only then does ack() drop the batch from the
+processing set. A worker that dies mid-batch leaves it there, and the next
+claim after the lease runs out puts it back in the queue (at NORMAL).
+
+Stored values: the price, or 0 when Encar has no data / the listing is gone
+(404), so it isn't fetched again. Transient errors are re-queued at LOW.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.db import connection
+
+from tenants import telemetry
+
+logger = logging.getLogger(__name__)
+
+API = "https://api.encar.com/v1/readside/vehicle/{}"
+HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"),
+    "Referer": "https://fem.encar.com/",
+    "Accept": "application/json",
+}
+
+QUEUE_KEY = "origin_price:queue"
+PROCESSING_KEY = "origin_price:processing"
+LEASE = 300   # seconds a claimed batch has to be written before it is re-queued
+
+# Lower score is served first. Within a priority, oldest first.
+HIGH = 0      # a visitor is looking at the car right now
+NORMAL = 1    # new lot from today's import
+LOW = 2       # backfill / retry after a transient error
+_PRIORITY_SPAN = 10 ** 10   # > any unix timestamp we'll see
+
+# KEYS: queue, processing. ARGV: now, lease deadline, n, re-queue score.
+# Re-queues expired claims, then moves the n most urgent ids to processing.
+_CLAIM_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, m in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], m)
+    redis.call('ZADD', KEYS[1], 'LT', ARGV[4], m)
+end
+local ids = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[3]) - 1)
+for _, m in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], m)
+    redis.call('ZADD', KEYS[2], ARGV[2], m)
+end
+return ids
+"""
+_claim_script = None
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("state")
+
+
+def enqueue(car_ids, priority=NORMAL):
+    """Queue cars for enrichment. A car already queued keeps the more urgent
+    of its two priorities (ZADD LT). Best-effort: never raises."""
+    ids = [int(i) for i in car_ids]
+    if not ids:
+        return 0
+    score = priority * _PRIORITY_SPAN + int(time.time())
+    try:
+        r = _redis()
+        n = 0
+        for i in range(0, len(ids), 5000):
+            n += r.zadd(QUEUE_KEY, {str(pk): score for pk in ids[i:i + 5000]}, lt=True)
+        return n
+    except Exception:
+        return 0
+
+
+def queue_depth():
+    try:
+        return _redis().zcard(QUEUE_KEY)
+    except Exception:
+        return None
+
+
+def claim(n):
+    """Claim up to n car ids, most urgent first, for LEASE seconds. ack()
+    them once they are written."""
+    global _claim_script
+    r = _redis()
+    if _claim_script is None:
+        _claim_script = r.register_script(_CLAIM_LUA)
+    now = int(time.time())
+    ids = _claim_script(keys=[QUEUE_KEY, PROCESSING_KEY],
+                        args=[now, now + LEASE, n, NORMAL * _PRIORITY_SPAN + now], client=r)
+    return [int(m) for m in ids]
+
+
+def ack(car_ids):
+    """Release claimed ids whose batch has been written (or re-queued)."""
+    ids = [str(int(i)) for i in car_ids]
+    if ids:
+        _redis().zrem(PROCESSING_KEY, *ids)
+
+
+def fetch(session, vehicle_id, timeout=10):
+    """originPrice for one vehicle: int (0 = no data / gone) or None (transient
+    failure — try again later)."""
+    try:
+        r = session.get(API.format(vehicle_id), timeout=timeout)
+    except requests.RequestException:
+        return None
+    if r.status_code == 404:
+        return 0
+    if r.status_code != 200:
+        return None
+    try:
+        val = (r.json().get("category") or {}).get("originPrice")
+        return int(val) if val else 0
+    except (ValueError, TypeError, AttributeError):
+        return 0
+
+
+def write(prices):
+    """Bulk-store {car_id: originPrice} with a single jsonb_set UPDATE."""
+    if not prices:
+        return 0
+    with connection.cursor() as cur:
+        args = ",".join(cur.mogrify("(%s,%s)", (pk, val)).decode() for pk, val in prices.items())
+        cur.execute(f"""
+            UPDATE cars_apicar AS c
+            SET extra_features = jsonb_set(COALESCE(c.extra_features, '{{}}'::jsonb),
+                                           '{{originPrice}}', to_jsonb(v.price))
+            FROM (VALUES {args}) AS v(id, price)
+            WHERE c.id = v.id
+        """)
+        return cur.rowcount
+
+
+def _rate_wait(rate):
+    """Block until the shared per-second budget admits one more call."""
+    from tenants.ratelimit import hit
+    while not hit("encar:origin_price", rate, 1):
+        time.sleep(0.05)
+
+
+def process_batch(car_ids, *, workers=8, rate=10, force=False, session=None):
+    """Fetch and store originPrice for car_ids (skipping cars that already
+    have one unless force). Returns (stored, retried)."""
+    from cars.models import ApiCar
+
+    todo = {}
+    for pk, ef in ApiCar.objects.filter(pk__in=car_ids).values_list("id", "extra_features"):
+        ef = ef or {}
+        if (force or "originPrice" not in ef) and ef.get("vehicleId"):
+            todo[pk] = ef["vehicleId"]
+    if not todo:
+        return 0, 0
+
+    sess = session or requests.Session()
+    sess.headers.update(HEADERS)
+
+    def one(item):
+        pk, vid = item
+        _rate_wait(rate)
+        return pk, fetch(sess, vid)
+
+    prices, retry = {}, []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for pk, val in pool.map(one, todo.items()):
+            if val is None:
+                retry.append(pk)
+            else:
+                prices[pk] = val
+    write(prices)
+    if retry:
+        enqueue(retry, LOW)
+    return len(prices), len(retry)
+
+
+@telemetry.collector
+def _queue_metric():
+    depth = queue_depth()
+    if depth is not None:
+        yield ("job_queue_depth", {"queue": "origin_price"}, depth)
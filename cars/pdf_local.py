@@ -0,0 +1,364 @@
+"""
+Local PDF backend for auction catalogues (settings.PDF_EXPORT_BACKEND = "local").
+
+The ofleet backend (cars.export_service) sends entries to an outside service
+and downloads the finished files from its webhook. This one renders the
+catalogue from our own ApiCar rows, off the request path:
+
+    export_auction_pdf / pdf_export_panel
+        └─> PdfExport(backend=local, car_ids=[...], status=pending)
+
+    render_pdf_exports (Procfile pdf worker, --loop)
+        ──> claim_next(): pending ──> rendering (SELECT … FOR UPDATE SKIP LOCKED)
+        ──> render_export(export)
+        cars ──page_hash──> page cache (PDF_PAGE_CACHE_DIR/<hash>.page)
+                  └─ misses ──> process pool: fetch photo, downscale, lay out
+        per make: PdfWriter ──> spooled temp file ──> default_storage
+
+Any number of renderers can run: each export is claimed by one, and the
+per-make rows it adds are created already claimed. A claim older than LEASE
+is from a renderer that died, and the export is picked up again.
+
+A page is keyed by the hash of exactly what it shows (plus PAGE_VERSION), so
+re-exporting an auction only renders the cars that changed. The photo is part
+of the page by URL only, so a page whose photo could not be fetched is never
+cached (the next export tries again), and cached pages are re-rendered after
+PAGE_MAX_AGE — a photo replaced under the same URL shows up by then. Pages are written
+into the PDF one at a time and the file is spooled to disk past a few MB, so
+memory stays flat however large the auction is.
+
+The PDF is written by hand (PdfWriter): one JPEG photo and a text block per
+page, in the standard Helvetica fonts — no PDF library needed. Those fonts are
+Latin-only, so pages use the English make/model names.
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+PAGE_VERSION = 1          # bump when the layout changes to retire cached pages
+PAGE_MAX_AGE = 7 * 86400  # seconds a cached page is reused
+LEASE = 60 * 60           # seconds before a rendering export counts as abandoned
+PAGE_W, PAGE_H = 595, 842  # A4, points
+MARGIN = 40
+PHOTO_BOX = (PAGE_W - 2 * MARGIN, 390)
+PHOTO_PX = (1000, 750)
+SPOOL_BYTES = 8 * 1024 * 1024
+
+_PAGE_MAGIC = b"PG1"
+
+
+# ── page content ─────────────────────────────────────────────────────────────
+
+def car_page_data(car):
+    """Everything one catalogue page shows, as plain values (picklable, and
+    hashed for the page cache). `car` needs manufacturer / model / badge /
+    color loaded."""
+    from cars.templatetags.custom_filters import img_full
+
+    photo = car.image or ((car.images or [None])[0] if isinstance(car.images, list) else None)
+    make = getattr(car.manufacturer, "name", "") or ""
+    title = " ".join(x for x in (make, getattr(car.model, "name", ""),
+                                 getattr(car.badge, "name", ""), str(car.year or "")) if x)
+    rows = [
+        ("Entry", car.entry or ""),
+        ("Lot", car.lot_number or ""),
+        ("Year", str(car.year or "")),
+        ("Mileage", f"{car.mileage:,} km" if car.mileage is not None else ""),
+        ("Fuel", car.fuel or ""),
+        ("Transmission", car.transmission or ""),
+        ("Engine", car.engine or ""),
+        ("Color", getattr(car.color, "name", "") or ""),
+        ("VIN", car.vin or ""),
+        ("Price", f"{car.price:,}" if car.price else ""),
+        ("Auction date", car.auction_date.strftime("%Y-%m-%d") if car.auction_date else ""),
+    ]
+    return {
+        "make": make,
+        "title": title,
+        "rows": [(k, v) for k, v in rows if v],
+        "photo": img_full(photo) if photo else "",
+    }
+
+
+def page_hash(data):
+    blob = json.dumps([PAGE_VERSION, data], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _pdf_text(s):
+    s = str(s).encode("latin-1", "replace").decode("latin-1")
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _fetch_photo(url):
+    """(jpeg bytes, width, height) of the downscaled photo, or None."""
+    import requests
+    from PIL import Image
+
+    try:
+        r = requests.get(url, timeout=20, headers={"User-Agent": "Mozilla/5.0"})
+        r.raise_for_status()
+        img = Image.open(BytesIO(r.content)).convert("RGB")
+        img.thumbnail(PHOTO_PX, Image.Resampling.LANCZOS)
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=80, optimize=True)
+        return out.getvalue(), img.width, img.height
+    except Exception:
+        return None
+
+
+def render_page(data):
+    """Render one page: its content stream plus the photo. Runs in a pool
+    process — network and CPU only, no Django database or storage."""
+    ops = []
+    top = PAGE_H - MARGIN
+    jpeg, w, h = (_fetch_photo(data["photo"]) if data.get("photo") else None) or (b"", 0, 0)
+    if jpeg:
+        scale = min(PHOTO_BOX[0] / w, PHOTO_BOX[1] / h)
+        dw, dh = w * scale, h * scale
+        x = MARGIN + (PHOTO_BOX[0] - dw) / 2
+        ops.append(f"q {dw:.2f} 0 0 {dh:.2f} {x:.2f} {top - 30 - dh:.2f} cm /Im0 Do Q")
+    ops.append(f"BT /F1 18 Tf {MARGIN} {top - 14} Td ({_pdf_text(data['title'])}) Tj ET")
+    y = top - 30 - PHOTO_BOX[1] - 30
+    for label, value in data["rows"]:
+        ops.append(f"BT /F1 11 Tf {MARGIN} {y} Td ({_pdf_text(label)}) Tj ET")
+        ops.append(f"BT /F2 11 Tf {MARGIN + 120} {y} Td ({_pdf_text(value)}) Tj ET")
+        y -= 20
+    content = zlib.compress("\n".join(ops).encode("latin-1"))
+    return _PAGE_MAGIC + struct.pack(">III", len(content), w, h) + content + jpeg
+
+
+def _unpack(blob):
+    n, w, h = struct.unpack(">III", blob[3:15])
+    return blob[15:15 + n], blob[15 + n:], w, h
+
+
+# ── page cache ───────────────────────────────────────────────────────────────
+
+class PageCache:
+    """Rendered pages on local disk, one file per page hash. A plain cache:
+    losing it (a new container) only means pages get rendered again."""
+
+    def __init__(self, root=None):
+        from django.conf import settings
+        self.root = root or settings.PDF_PAGE_CACHE_DIR
+
+    def _path(self, h):
+        return os.path.join(self.root, h[:2], f"{h}.page")
+
+    def has(self, h):
+        try:
+            return time.time() - os.path.getmtime(self._path(h)) < PAGE_MAX_AGE
+        except OSError:
+            return False
+
+    def get(self, h):
+        with open(self._path(h), "rb") as f:
+            return f.read()
+
+    def put(self, h, blob):
+        path = self._path(h)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+
+
+# ── streaming PDF writer ─────────────────────────────────────────────────────
+
+class PdfWriter:
+    """Writes a PDF to `f` page by page; only the object offsets stay in
+    memory. Call add_page() per rendered page, then close()."""
+
+    _CATALOG, _PAGES, _FONT_BOLD, _FONT = 1, 2, 3, 4
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.kids = []
+        self._next = 5
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, num, body, stream=None):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode())
+        self.f.write(body)
+        if stream is not None:
+            self.f.write(b"\nstream\n")
+            self.f.write(stream)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def _alloc(self):
+        self._next += 1
+        return self._next - 1
+
+    def add_page(self, blob):
+        content, jpeg, w, h = _unpack(blob)
+        xobjects = b""
+        if jpeg:
+            img = self._alloc()
+            self._write(img, (f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} "
+                              f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode "
+                              f"/Length {len(jpeg)} >>").encode(), jpeg)
+            xobjects = f" /XObject << /Im0 {img} 0 R >>".encode()
+        cs = self._alloc()
+        self._write(cs, f"<< /Filter /FlateDecode /Length {len(content)} >>".encode(), content)
+        page = self._alloc()
+        self._write(page, (
+            f"<< /Type /Page /Parent {self._PAGES} 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+            f"/Resources << /Font << /F1 {self._FONT_BOLD} 0 R /F2 {self._FONT} 0 R >>"
+        ).encode() + xobjects + f" >> /Contents {cs} 0 R >>".encode())
+        self.kids.append(page)
+
+    def close(self):
+        for num, name in ((self._FONT_BOLD, "Helvetica-Bold"), (self._FONT, "Helvetica")):
+            self._write(num, f"<< /Type /Font /Subtype /Type1 /BaseFont /{name} "
+                             f"/Encoding /WinAnsiEncoding >>".encode())
+        kids = " ".join(f"{k} 0 R" for k in self.kids)
+        self._write(self._PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.kids)} >>".encode())
+        self._write(self._CATALOG, f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>".encode())
+        xref = self.f.tell()
+        size = self._next
+        self.f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for num in range(1, size):
+            self.f.write(f"{self.offsets.get(num, 0):010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {size} /Root {self._CATALOG} 0 R >>\n"
+                     f"startxref\n{xref}\n%%EOF\n".encode())
+
+
+# ── export job ───────────────────────────────────────────────────────────────
+
+def queue_export(auction_name, car_ids, schema_name):
+    """Create the pending PdfExport that `render_pdf_exports` will build."""
+    from cars.models import PdfExport
+
+    return PdfExport.objects.create(
+        auction_name=auction_name, schema_name=schema_name,
+        backend=PdfExport.BACKEND_LOCAL, car_ids=[int(i) for i in car_ids],
+        entry_count=len(car_ids), status=PdfExport.STATUS_PENDING,
+    )
+
+
+def claim_next():
+    """Claim the oldest local export waiting to be rendered — pending, or
+    left rendering longer than LEASE — and return it (None when there is
+    none). Per-make rows of a renderer that died are failed on the way."""
+    from datetime import timedelta
+
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from cars.models import PdfExport
+
+    now = timezone.now()
+    stale = Q(status=PdfExport.STATUS_RENDERING, started_at__lt=now - timedelta(seconds=LEASE))
+    local = PdfExport.objects.filter(backend=PdfExport.BACKEND_LOCAL)
+    with transaction.atomic():
+        local.filter(stale, car_ids=[]).update(
+            status=PdfExport.STATUS_FAILED, error_detail="The renderer stopped before this file was written.")
+        export = (local.select_for_update(skip_locked=True)
+                  .filter(Q(status=PdfExport.STATUS_PENDING) | stale)
+                  .order_by("created_at").first())
+        if export is not None:
+            export.status, export.started_at = PdfExport.STATUS_RENDERING, now
+            export.save(update_fields=["status", "started_at"])
+    return export
+
+
+def _render_missing(cache, pages, workers):
+    """Render the pages not in the cache on a process pool. Returns how many
+    were rendered, and {hash: page} of those kept out of the cache because
+    their photo could not be fetched."""
+    from django.db import connections
+
+    todo = {}
+    for h, data in pages:
+        if h not in todo and not cache.has(h):
+            todo[h] = data
+    if not todo:
+        return 0, {}
+    held = {}
+    # Forked workers must not inherit (and later close) our DB sockets.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for (h, data), blob in zip(todo.items(), pool.map(render_page, todo.values(), chunksize=8)):
+            if data.get("photo") and not _unpack(blob)[1]:
+                held[h] = blob
+            else:
+                cache.put(h, blob)
+    return len(todo), held
+
+
+def render_export(export, workers=None, cache=None):
+    """Render a claimed local PdfExport: one file per make when the tenant
+    splits by make (extra makes get their own PdfExport rows, like the ofleet
+    webhook does), else one file. On error, marks the export and any per-make
+    row not yet written failed."""
+    from django.conf import settings
+    from django.core.files import File
+    from tenants.models import Tenant
+
+    from cars.models import ApiCar, PdfExport
+
+    cache = cache or PageCache()
+    workers = workers or settings.PDF_RENDER_WORKERS
+    unfinished = [export.pk]
+    try:
+        tenant = Tenant.objects.filter(schema_name=export.schema_name).first()
+        split = getattr(tenant, "ofleet_split_by_make", True)
+        cars = (ApiCar.objects.filter(pk__in=export.car_ids or [])
+                .select_related("manufacturer", "model", "badge", "color")
+                .order_by("manufacturer__name", "model__name", "year", "pk"))
+        groups = {}
+        pages = []
+        for car in cars.iterator(chunk_size=500):
+            data = car_page_data(car)
+            h = page_hash(data)
+            pages.append((h, data))
+            groups.setdefault(data["make"] if split else "", []).append(h)
+        if not pages:
+            raise ValueError("None of the selected cars exist any more.")
+
+        rendered, held = _render_missing(cache, pages, workers)
+        del pages
+        logger.info("PdfExport %d: %d page(s) rendered, %d from cache",
+                    export.pk, rendered, sum(map(len, groups.values())) - rendered)
+
+        for idx, (make, hashes) in enumerate(groups.items()):
+            record = export if idx == 0 else PdfExport.objects.create(
+                auction_name=export.auction_name, schema_name=export.schema_name,
+                backend=export.backend, entry_count=len(hashes),
+                status=PdfExport.STATUS_RENDERING, started_at=export.started_at,
+            )
+            if record.pk not in unfinished:
+                unfinished.append(record.pk)
+            record.make_name = make
+            record.entry_count = len(hashes)
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as tmp:
+                writer = PdfWriter(tmp)
+                for h in hashes:
+                    writer.add_page(held.get(h) or cache.get(h))
+                writer.close()
+                tmp.seek(0)
+                auction_safe = (record.auction_name or "export").replace(" ", "_")
+                make_safe = (make or "all").replace(" ", "_").replace("/", "-")
+                record.pdf_file.save(f"{auction_safe}_{make_safe}_{record.pk}.pdf", File(tmp), save=False)
+            record.status = PdfExport.STATUS_COMPLETE
+            record.save(update_fields=["make_name", "entry_count", "pdf_file", "status"])
+            unfinished.remove(record.pk)
+    except Exception as exc:
+        logger.exception("PdfExport %d: local render failed", export.pk)
+        PdfExport.objects.filter(pk__in=unfinished).update(
+            status=PdfExport.STATUS_FAILED, error_detail=str(exc)[:2000])
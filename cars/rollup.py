@@ -0,0 +1,151 @@
+"""Catalog rollup (CatalogRollup): car counts per
+(car_type, make, model, version, engine group, trim), the source of every
+make → model → version → engine → trim dropdown.
+
+`rebuild()` replaces the table with one GROUP BY over cars_apicar (narrow
+columns only) inside a transaction, so readers switch from the old counts to
+the new ones atomically. The importers and the cleanup commands call it after
+they write; a few thousand rows cover the whole catalog.
+
+Readers get plain tuples — never ORM instances — so nothing has to be pickled
+into the cache, and each lookup is an index scan over a few hundred rows:
+
+    models(types, manufacturer_ids)            → [ModelOption]
+    badges(types, model_ids, version, engine)  → [BadgeOption]
+    versions(types, model_id)                  → [(value, car_count, year_range)]
+    engine_groups(types, model_id, version)    → [(value, car_count)]
+
+`types` is the list of car_type values a tab covers (see `types_for`). Auction
+rows whose auction_date has passed are skipped at read time.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django_tenants.utils import get_public_schema_name, schema_context
+
+ModelOption = namedtuple("ModelOption", "id name name_ar manufacturer_id car_count")
+BadgeOption = namedtuple("BadgeOption", "id name car_count")
+
+ENCAR_TYPES = ("cars", "truck")
+
+_REBUILD = """
+    INSERT INTO cars_catalogrollup (
+        car_type, auction_date, manufacturer_id, model_id, model_version,
+        engine_group, badge_id, car_count, max_year, year_range
+    )
+    SELECT CASE WHEN c.category_id IS NOT NULL THEN COALESCE(cat.name, '')
+                WHEN bt.name = 'truck' THEN 'truck' ELSE 'cars' END,
+           CASE WHEN cat.name = 'auction' THEN c.auction_date END,
+           c.manufacturer_id, c.model_id, COALESCE(c.model_version, ''),
+           COALESCE(c.engine_group, ''), c.badge_id,
+           count(*), max(c.year), COALESCE(max(c.model_year_range), '')
+    FROM cars_apicar c
+    LEFT JOIN cars_category cat ON cat.id = c.category_id
+    LEFT JOIN cars_bodytype bt ON bt.id = c.body_id
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+_LIVE = "r.car_type = ANY(%s) AND (r.auction_date IS NULL OR r.auction_date >= now())"
+
+
+def rebuild():
+    """Recount the whole catalog. Returns the number of rollup rows."""
+    with schema_context(get_public_schema_name()), transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = 0")
+            cur.execute("DELETE FROM cars_catalogrollup")
+            cur.execute(_REBUILD)
+            return cur.rowcount
+
+
+def types_for(car_type, market_names=(), *, show_auctions=True, show_encar=True):
+    """car_type values a car-list tab covers — the rollup counterpart of
+    views._car_type_scope, plus the tenant's auction/encar toggles."""
+    if car_type in ("auction", "kbchachacha", "cars", "truck"):
+        types = [car_type]
+    elif car_type and car_type in market_names:
+        types = [car_type]
+    else:
+        types = [*ENCAR_TYPES, "auction"]
+    if not show_auctions:
+        types = [t for t in types if t != "auction"]
+    if not show_encar:
+        types = [t for t in types if t == "auction"]
+    return types
+
+
+def _ids(values):
+    """Query-string ids as ints; anything non-numeric is dropped."""
+    return [int(v) for v in values if str(v).strip().isdigit()]
+
+
+def _rows(sql, params):
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def models(types, manufacturer_ids):
+    """Models of the given makes with cars in `types`, most cars first."""
+    manufacturer_ids = _ids(manufacturer_ids)
+    if not types or not manufacturer_ids:
+        return []
+    rows = _rows(f"""
+        SELECT m.id, m.name, m.name_ar, m.manufacturer_id, SUM(r.car_count)
+        FROM cars_catalogrollup r JOIN cars_carmodel m ON m.id = r.model_id
+        WHERE {_LIVE} AND r.manufacturer_id = ANY(%s)
+        GROUP BY m.id
+        ORDER BY 5 DESC, m.id
+    """, [list(types), manufacturer_ids])
+    return [ModelOption(*row) for row in rows]
+
+
+def badges(types, model_ids, model_version="", engine_group="", newest_first=True):
+    """Trims of the given models (optionally one version / engine group).
+    Newest generation first (latest model year), count as tiebreaker — or by
+    count alone with newest_first=False."""
+    model_ids = _ids(model_ids)
+    if not types or not model_ids:
+        return []
+    where, params = [_LIVE, "r.model_id = ANY(%s)"], [list(types), model_ids]
+    if model_version:
+        where.append("r.model_version = %s")
+        params.append(model_version)
+    if engine_group:
+        where.append("r.engine_group = %s")
+        params.append(engine_group)
+    order = "MAX(r.max_year) DESC NULLS LAST, 3 DESC" if newest_first else "3 DESC"
+    rows = _rows(f"""
+        SELECT b.id, b.name, SUM(r.car_count)
+        FROM cars_catalogrollup r JOIN cars_carbadge b ON b.id = r.badge_id
+        WHERE {' AND '.join(where)}
+        GROUP BY b.id
+        ORDER BY {order}, b.id
+    """, params)
+    return [BadgeOption(*row) for row in rows]
+
+
+def versions(types, model_id):
+    """(model_version, car_count, year_range) under one model, most cars first."""
+    if not types or not _ids([model_id]):
+        return []
+    return _rows(f"""
+        SELECT r.model_version, SUM(r.car_count), MAX(r.year_range)
+        FROM cars_catalogrollup r
+        WHERE {_LIVE} AND r.model_id = %s AND r.model_version <> ''
+        GROUP BY r.model_version
+        ORDER BY 2 DESC
+    """, [list(types), int(model_id)])
+
+
+def engine_groups(types, model_id, model_version):
+    """(engine_group, car_count) under one model version, most cars first."""
+    if not types or not _ids([model_id]):
+        return []
+    return _rows(f"""
+        SELECT r.engine_group, SUM(r.car_count)
+        FROM cars_catalogrollup r
+        WHERE {_LIVE} AND r.model_id = %s AND r.model_version = %s AND r.engine_group <> ''
+        GROUP BY r.engine_group
+        ORDER BY 2 DESC
+    """, [list(types), int(model_id), model_version])
@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender='cars.ApiCar')
+def api_car_saved(sender, instance, **kwargs):
+    """Re-card a car saved through the ORM (admin, dashboard edits, order
+    status) once the write commits (cars.cards)."""
+    from . import cards
+
+    pk = instance.pk
+    transaction.on_commit(lambda: cards.refresh([pk]))
+
+
+@receiver(post_delete, sender='cars.ApiCar')
+def api_car_deleted(sender, instance, **kwargs):
+    """Drop the card of a car deleted through the ORM."""
+    from . import cards
+
+    pk = instance.pk
+    transaction.on_commit(lambda: cards.delete([pk]))
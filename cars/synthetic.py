@@ -0,0 +1,368 @@
+"""Seeded synthetic catalog: Encar CSV rows and auction feed items.
+
+Car i is a pure function of (seed, i, anchor) — it gets its own
+random.Random(f"{seed}:{i}") — so any slice of the catalog can be regenerated
+on its own and two runs with the same arguments produce identical files. The
+rows are shaped like the real feeds and go through the real importers
+(import_encar_fast --url <csv>, import_auction_json <json>), so every derived
+column (slugs, cards, render payloads, option_codes, car_dmg_types, is_live)
+is built the way production builds it.
+
+Distributions are rough fits to the live catalog: a long-tailed make mix led
+by Hyundai/Kia, mostly recent years, mileage and price that track age, 5–40
+standard option codes, inspection JSON from ~3 KB to ~20 KB, and auction dates
+from ten days ago to two weeks ahead (so ~40% of auctions have ended).
+
+Every synthetic car's lot number (and auction car_identifire) starts with
+LOT_PREFIX, which is how the generator tells them apart from real data.
+"""
+import csv
+import json
+import random
+from datetime import datetime, timedelta
+
+LOT_PREFIX = "syn"
+
+# (make, weight, body, base price in 만원, [(model, cc, [badges])])
+MAKES = [
+    ("Hyundai", 26, "sedan", 2600, [
+        ("Avante", 1600, ["Smart", "Modern", "Inspiration"]),
+        ("Sonata", 2000, ["Premium", "Exclusive", "Inspiration"]),
+        ("Grandeur", 2500, ["Premium", "Exclusive", "Calligraphy"]),
+        ("Tucson", 1600, ["Modern", "Premium", "Inspiration"]),
+        ("Santa Fe", 2200, ["Exclusive", "Prestige", "Calligraphy"]),
+        ("Porter", 2500, ["Super Cab", "Double Cab"]),
+    ]),
+    ("Kia", 21, "sedan", 2500, [
+        ("K3", 1600, ["Trendy", "Prestige"]),
+        ("K5", 2000, ["Prestige", "Noblesse", "Signature"]),
+        ("K8", 2500, ["Noblesse", "Signature"]),
+        ("Sportage", 1600, ["Trendy", "Prestige", "Signature"]),
+        ("Sorento", 2200, ["Prestige", "Noblesse", "Signature"]),
+        ("Carnival", 2200, ["Prestige", "Noblesse", "Signature"]),
+        ("Bongo", 2500, ["Standard Cab", "King Cab"]),
+    ]),
+    ("Genesis", 8, "sedan", 5200, [
+        ("G70", 2000, ["Standard", "Sport"]),
+        ("G80", 2500, ["Standard", "Sport"]),
+        ("GV70", 2500, ["Standard", "Sport"]),
+        ("GV80", 3000, ["Standard", "Signature"]),
+    ]),
+    ("Mercedes-Benz", 8, "sedan", 6500, [
+        ("C-Class", 2000, ["C200", "C300 AMG Line"]),
+        ("E-Class", 2000, ["E250", "E300 4MATIC", "E350 AMG Line"]),
+        ("S-Class", 3000, ["S450 4MATIC", "S580 4MATIC"]),
+        ("GLC", 2000, ["GLC300 4MATIC"]),
+    ]),
+    ("BMW", 8, "sedan", 6000, [
+        ("3 Series", 2000, ["320i", "320d", "M340i"]),
+        ("5 Series", 2000, ["520i", "520d", "530i xDrive"]),
+        ("X3", 2000, ["xDrive20i", "xDrive30e"]),
+        ("X5", 3000, ["xDrive30d", "xDrive40i"]),
+    ]),
+    ("Audi", 4, "sedan", 5500, [
+        ("A4", 2000, ["40 TFSI", "45 TFSI quattro"]),
+        ("A6", 2000, ["45 TFSI", "45 TDI quattro"]),
+        ("Q5", 2000, ["40 TDI quattro", "45 TFSI quattro"]),
+    ]),
+    ("Chevrolet", 4, "suv", 2200, [
+        ("Spark", 1000, ["LS", "LT"]),
+        ("Malibu", 1400, ["LT", "Premier"]),
+        ("Trax", 1400, ["LS", "LT"]),
+    ]),
+    ("Renault Korea", 3, "suv", 2300, [
+        ("SM6", 1800, ["SE", "LE", "RE"]),
+        ("QM6", 2000, ["SE", "LE", "RE"]),
+        ("XM3", 1300, ["SE", "RE"]),
+    ]),
+    ("KG Mobility", 3, "suv", 2500, [
+        ("Tivoli", 1500, ["V3", "V5"]),
+        ("Rexton", 2200, ["Prestige", "Summit"]),
+        ("Rexton Sports", 2200, ["Wild", "Prestige"]),
+    ]),
+    ("Volkswagen", 3, "sedan", 3800, [
+        ("Golf", 2000, ["TDI", "GTI"]),
+        ("Tiguan", 2000, ["2.0 TDI", "2.0 TDI 4MOTION"]),
+    ]),
+    ("Toyota", 2, "sedan", 3900, [
+        ("Camry", 2500, ["XLE", "Hybrid XLE"]),
+        ("RAV4", 2500, ["Hybrid AWD"]),
+    ]),
+    ("Lexus", 2, "sedan", 5800, [
+        ("ES", 2500, ["ES300h", "ES300h Luxury+"]),
+        ("NX", 2500, ["NX350h"]),
+    ]),
+    ("Volvo", 2, "suv", 5300, [
+        ("XC60", 2000, ["B5 Momentum", "B6 Inscription"]),
+        ("S90", 2000, ["B5 Inscription"]),
+    ]),
+    ("Porsche", 1, "suv", 11000, [
+        ("Cayenne", 3000, ["Base", "Coupe"]),
+        ("911", 3000, ["Carrera", "Carrera S"]),
+    ]),
+    ("Land Rover", 1, "suv", 9000, [
+        ("Range Rover Sport", 3000, ["D300 HSE", "P400 HSE"]),
+        ("Discovery", 3000, ["D300 HSE"]),
+    ]),
+]
+_MAKE_WEIGHTS = [m[1] for m in MAKES]
+
+COLORS = [("white", 30), ("black", 22), ("gray", 14), ("silver", 10), ("pearl", 9),
+          ("blue", 6), ("red", 4), ("brown", 3), ("green", 2)]
+SEAT_COLORS = [("black", 60), ("beige", 20), ("brown", 12), ("gray", 8)]
+FUELS = [("Gasoline", 52), ("Diesel", 27), ("Hybrid", 12), ("LPG", 6), ("Electric", 3)]
+REGIONS = ["Seoul", "Gyeonggi", "Incheon", "Busan", "Daegu", "Daejeon", "Gwangju", "Ulsan"]
+AUCTION_NAMES = ["Lotte", "Glovis", "Autohub", "K Car"]
+# Panels with the share of auction cars that have them replaced/painted.
+_MARKER_PANELS = [
+    ("left_front_fender", 0.14), ("right_front_fender", 0.13), ("hood_front", 0.12),
+    ("trunk_lid", 0.10), ("right_rear_door", 0.07), ("right_front_door", 0.07),
+    ("left_front_door", 0.07), ("left_rear_door", 0.06), ("rear_member", 0.03),
+    ("right_rear_quarter", 0.03), ("center_floor", 0.01), ("roof", 0.01),
+]
+_OUTER_PANELS = ["P011", "P021", "P022", "P031", "P032", "P033", "P034", "P041",
+                 "P051", "P061", "P062", "P081", "P082", "P151"]
+_INNER_SECTIONS = ["S00", "S01", "S02", "S03", "S04", "S05", "S06", "S07"]
+
+ENCAR_COLUMNS = [
+    "mark", "model", "configuration", "inner_id", "year", "km_age", "price",
+    "displacement", "transmission_type", "body_type", "engine_type", "color",
+    "seatColor", "prep_drive_type", "seatCount", "address", "images", "options",
+    "extra", "record", "optionsChoice", "originPrice", "model_version",
+    "model_year_range", "engine_group", "trim_detail",
+]
+
+
+def lot_number(i):
+    return f"{LOT_PREFIX}{i:08d}"
+
+
+def _pick(rng, weighted):
+    return rng.choices([v for v, _ in weighted], weights=[w for _, w in weighted])[0]
+
+
+def _option_codes():
+    from cars.utils import OPTION_DATA
+    return sorted({o["code"] for o in OPTION_DATA if str(o.get("code", "")).isdigit()})
+
+
+_CODES = None
+
+
+def _standard_options(rng, age):
+    global _CODES
+    if _CODES is None:
+        _CODES = _option_codes()
+    # Newer cars carry more equipment; low codes (ABS, airbags, ...) are the
+    # most common, so sample from a head-weighted slice.
+    k = max(5, min(len(_CODES), int(rng.gauss(30 - 1.5 * age, 6))))
+    head = _CODES[:max(k, int(len(_CODES) * 0.8))]
+    return sorted(rng.sample(head, k))
+
+
+def _inspection(rng, i, year, mileage):
+    """Encar inspection JSON (extra_features): outers, inners, master, images."""
+    damaged = rng.random() < 0.35
+    outers = []
+    if damaged:
+        for code in rng.sample(_OUTER_PANELS, rng.choice([1, 1, 1, 2, 2, 3, 4])):
+            status = rng.choice(["X", "W", "W", "A", "U"])
+            outers.append({
+                "type": {"code": code, "title": code},
+                "statusTypes": [{"code": status, "title": status}],
+                "attributes": [rng.choice(["RANK_ONE", "RANK_TWO"])],
+            })
+    # Checklist length is what makes the real blobs long-tailed in size.
+    depth = rng.choice([3, 4, 6, 8, 12, 20])
+    inners = []
+    for sec in _INNER_SECTIONS:
+        children = []
+        for j in range(depth):
+            code = "4" if rng.random() < 0.03 else rng.choice(["1", "1", "1", "2", "3"])
+            children.append({
+                "type": {"code": f"{sec}{j:02d}", "title": f"Check item {sec}-{j:02d}"},
+                "statusType": {"code": code, "title": code},
+                "children": [],
+            })
+        inners.append({"type": {"code": sec, "title": sec}, "children": children})
+    reg = f"{year}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+    return {
+        "vehicleId": 30_000_000 + i,
+        "outers": outers,
+        "inners": inners,
+        "master": {
+            "accdient": damaged and rng.random() < 0.5,
+            "simpleRepair": damaged,
+            "detail": {
+                "recordNo": f"SYN-{i:08d}",
+                "issueDate": reg, "validityEndDate": reg, "firstRegistrationDate": reg,
+                "vin": f"KMHSYN{i:011d}",
+                "mileage": mileage,
+                "engineCheck": "Y", "trnsCheck": "Y",
+                "waterlog": False, "tuning": rng.random() < 0.02,
+                "usageChangeTypes": [],
+                "guarantyType": {"title": "Self"},
+            },
+        },
+        "images": [{"path": f"/carinspection/syn/{i}_{n}.jpg"} for n in range(rng.randint(0, 3))],
+    }
+
+
+def _record(rng, age):
+    accidents = [
+        {"date": f"20{rng.randint(10, 25)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+         "type": rng.choice(["1", "2", "3"]),
+         "insuranceBenefit": rng.randint(20, 900) * 10000,
+         "partCost": rng.randint(10, 400) * 10000}
+        for _ in range(rng.choice([0, 0, 0, 0, 1, 1, 2, 3, 5]) if age else 0)
+    ]
+    return {
+        "accidentCnt": len(accidents),
+        "myAccidentCnt": sum(1 for a in accidents if a["type"] == "2"),
+        "ownerChangeCnt": rng.randint(0, min(age, 5)),
+        "floodTotalLossCnt": 0,
+        "accidents": accidents,
+    }
+
+
+def _base(rng, anchor):
+    make, _, body, base_price, models = rng.choices(MAKES, weights=_MAKE_WEIGHTS)[0]
+    model, cc, badges = rng.choice(models)
+    age = min(15, int(rng.expovariate(1 / 3.5)))
+    mileage = max(300, int(age * rng.gauss(14_000, 5_000) + rng.randint(0, 9_000)))
+    price = max(150, int(base_price * (0.86 ** age) * rng.lognormvariate(0, 0.18)))  # 만원
+    if model in ("Porter", "Bongo"):
+        body = "truck"
+    elif model.startswith(("X", "Q", "GV", "GL", "Tivoli", "Rexton", "Sportage", "Sorento",
+                           "Santa", "Tucson", "Carnival", "Trax", "Tiguan", "RAV4", "NX",
+                           "Cayenne", "Range", "Discovery")):
+        body = "suv"
+    return {
+        "make": make, "model": model, "badge": rng.choice(badges), "cc": cc, "body": body,
+        "year": anchor.year - age, "age": age, "mileage": mileage, "price": price,
+        "fuel": "Diesel" if body == "truck" else _pick(rng, FUELS),
+        "color": _pick(rng, COLORS),
+        "transmission": "Manual" if rng.random() < 0.04 else "Automatic",
+    }
+
+
+def encar_row(rng, i, b):
+    """One active_offer.csv row, as import_encar_fast reads it."""
+    lot = lot_number(i)
+    images = [{"code": f"{n:03d}", "path": f"/carpicture/syn/{lot}_{n:03d}.jpg",
+               "type": "OUTER" if n <= 12 else "INNER"} for n in range(1, rng.randint(8, 24) + 1)]
+    options = {"standard": _standard_options(rng, b["age"]), "etc": [], "tuning": [], "choice": []}
+    return {
+        "mark": b["make"], "model": b["model"], "configuration": b["badge"],
+        "inner_id": lot, "year": b["year"], "km_age": b["mileage"], "price": b["price"],
+        "displacement": b["cc"], "transmission_type": b["transmission"],
+        "body_type": b["body"], "engine_type": b["fuel"], "color": b["color"],
+        "seatColor": _pick(rng, SEAT_COLORS),
+        "prep_drive_type": "4WD" if rng.random() < 0.2 else "2WD",
+        "seatCount": 3 if b["body"] == "truck" else rng.choice([5, 5, 5, 7]),
+        "address": rng.choice(REGIONS),
+        "images": json.dumps(images),
+        "options": json.dumps(options),
+        "extra": json.dumps(_inspection(rng, i, b["year"], b["mileage"]), ensure_ascii=False),
+        "record": json.dumps(_record(rng, b["age"])),
+        "optionsChoice": "",
+        "originPrice": int(b["price"] / (0.86 ** b["age"])) if rng.random() < 0.7 else "",
+        "model_version": f"{b['model']} ({b['year'] - b['year'] % 5})",
+        "model_year_range": f"{b['year'] - b['year'] % 5}~{b['year'] - b['year'] % 5 + 4}",
+        "engine_group": "",
+        "trim_detail": f"{b['cc'] / 1000:.1f} {b['badge']}",
+    }
+
+
+def auction_item(rng, i, b, anchor):
+    """One auction feed item, as import_auction_json reads it."""
+    when = (datetime(anchor.year, anchor.month, anchor.day, 10)
+            + timedelta(days=rng.randint(-10, 14), minutes=30 * rng.randint(0, 14)))
+    markers = {}
+    for panel, share in _MARKER_PANELS:
+        if rng.random() < share:
+            replaced = rng.random() < 0.45
+            markers[panel] = {"status": "replaced" if replaced else "painted",
+                              "code": "X" if replaced else "W"}
+    lot = lot_number(i)
+    return {
+        "car_identifire": lot,
+        "title": f"{b['make']} {b['model']} {b['badge']}",
+        "make_en": b["make"], "models_en": b["model"], "badge_en": b["badge"],
+        "color_en": b["color"], "year": b["year"],
+        "mileage": f"{b['mileage']:,} km",
+        "price": b["price"] * 10000,
+        "auction_date": when.strftime("%Y-%m-%d %H:%M:%S"),
+        "auction_name": rng.choice(AUCTION_NAMES),
+        "image": f"/media/synthetic/{lot}/1.jpg",
+        "images": [f"/media/synthetic/{lot}/{n}.jpg" for n in range(1, rng.randint(6, 18) + 1)],
+        "markers": markers or None,
+        "fuel_en": b["fuel"], "mission_en": b["transmission"],
+        "points": rng.choice(["A4", "A3", "B4", "B3", "C3", "4.5", "4.0", "3.5"]),
+        "power": f"{b['cc']:,}cc",
+        "seats": 5, "wheel": "2WD",
+        "region": rng.choice(REGIONS),
+        "use": "personal",
+        "entry": "", "notes": "",
+    }
+
+
+def car(seed, i, anchor, auction_share=0.15):
+    """('encar', csv_row) or ('auction', feed_item) for synthetic car i."""
+    rng = random.Random(f"{seed}:{i}")
+    is_auction = rng.random() < auction_share
+    b = _base(rng, anchor)
+    if is_auction:
+        return "auction", auction_item(rng, i, b, anchor)
+    return "encar", encar_row(rng, i, b)
+
+
+def cars(seed, count, anchor, auction_share=0.15, start=0):
+    for i in range(start, start + count):
+        yield car(seed, i, anchor, auction_share)
+
+
+def write_files(csv_path, json_path, seed, count, anchor, auction_share=0.15, start=0):
+    """Write cars start..start+count to an Encar CSV and an auction JSON file.
+    Returns (encar rows, auction items) written."""
+    items = []
+    n_encar = 0
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=ENCAR_COLUMNS)
+        writer.writeheader()
+        for kind, row in cars(seed, count, anchor, auction_share, start):
+            if kind == "encar":
+                writer.writerow(row)
+                n_encar += 1
+            else:
+                items.append(row)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+    return n_encar, len(items)
+
+
+# Bench tenants: one per kind of catalog rule set the views branch on.
+#   bench_open   — no catalog_filter (toggles only, no visible set)
+#   bench_recent — encar year floor + damage exclusion, auction panel exclusion
+#   bench_strict — auctions hidden, price ceiling + make whitelist
+BENCH_TENANTS = [
+    ("bench_open", "bench-open.localhost"),
+    ("bench_recent", "bench-recent.localhost"),
+    ("bench_strict", "bench-strict.localhost"),
+]
+
+
+def bench_tenant_settings(schema_name, anchor, make_ids):
+    """Tenant field values for a BENCH_TENANTS entry. `make_ids` maps the
+    normalised make name to its Manufacturer id."""
+    if schema_name == "bench_recent":
+        return {"show_auctions": True, "show_encar": True, "catalog_filter": {
+            "encar": {"year_min": anchor.year - 6, "exclude_types": ["replaced"]},
+            "auction": {"exclude_panels": ["hood_front", "roof"]},
+        }}
+    if schema_name == "bench_strict":
+        makes = [make_ids[m] for m in ("hyundai", "kia", "genesis") if m in make_ids]
+        return {"show_auctions": False, "show_encar": True, "catalog_filter": {
+            "encar": {"price_max": 60000, "makes": makes},
+        }}
+    return {"show_auctions": True, "show_encar": True, "catalog_filter": {}}
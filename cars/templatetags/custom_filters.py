@@ -780,23 +780,8 @@ def panel_label(value):
 def sar_price(krw):
     """KRW price -> whole-number SAR, for server-rendered meta/OG/schema tags
     (there's no JS there to convert). Matches the on-site rate × tenant markup."""
-    try:
-        krw = float(krw or 0)
-    except (TypeError, ValueError):
-        return 0
-    if krw <= 0:
-        return 0
-    try:
-        from tenants.models import GlobalExchangeRates
-        rate = float(GlobalExchangeRates.get_solo().rate_sar or 0.0025)
-    except Exception:
-        rate = 0.0025
-    try:
-        from django.db import connection
-        markup = float(getattr(getattr(connection, 'tenant', None), 'price_markup_factor', 1.01))
-    except Exception:
-        markup = 1.01
-    return int(round(krw * rate * markup))
+    from tenants import pricing
+    return pricing.convert(krw, "SAR")
 
 
 # ── Filter-option icons (importer theme) ───────────────────────────────
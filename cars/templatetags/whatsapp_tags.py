@@ -5,12 +5,6 @@ from urllib.parse import quote
 register = template.Library()
 
 
-# Markup applied when converting AWAY from the source KRW price. KRW displays
-# the original feed value; every other currency shows the price + 1%.
-# Mirrors `PRICE_MARKUP` in templates/partials/lang_currency_script.html.
-PRICE_MARKUP = 1.01
-
-
 @register.filter
 def krw_to_sar(value, rate):
     """Convert a price stored in KRW to SAR using the provided rate and
@@ -24,14 +18,11 @@ def krw_to_sar(value, rate):
     try:
         if value is None:
             return ""
-        v = float(value)
-        r = float(rate) if rate is not None else 0.00250
-        try:
-            from django.db import connection
-            markup = float(getattr(getattr(connection, 'tenant', None), 'price_markup_factor', PRICE_MARKUP))
-        except Exception:
-            markup = PRICE_MARKUP
-        sar = v * r * markup
+        from tenants import pricing
+        if rate is None:
+            sar = pricing.convert(value, "SAR")
+        else:
+            sar = float(value) * float(rate) * pricing.markup()
         # Format with comma as thousands separator, no decimal places
         return "{:,.0f}".format(sar)
     except Exception:
@@ -1,3 +1,440 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+
+from cars import (catalog_jobs, encar_check, inspection_render, origin_price, pdf_local, rollup,
+                  synthetic, visibility)
+from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+from cars.utils import describe_options
+from cars.views import _apply_option_filters, _similar_order
+
+
+class _StubEncar(BaseHTTPRequestHandler):
+    """Minimal stand-in for the two Encar endpoints.
+
+    Clean-encar: lots ending in 404 are gone, in 410 sold / withdrawn (gone
+    here, but still a 200 from the general endpoint), in 429 throttled; the
+    rest are listed. Vehicle: every lot at 1,234만원, unless it ends in 503.
+    Lease: every even carId is leased.
+    """
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        url = urlparse(self.path)
+        lot = url.path.rsplit("/", 1)[-1]
+        if url.path.startswith("/v1/readside/clean-encar/vehicle/"):
+            if lot.endswith(("404", "410")):
+                return self._send(404, {})
+            if lot.endswith("429"):
+                return self._send(429, {})
+            return self._send(200, {})
+        if url.path.startswith("/v1/readside/vehicle/"):
+            if lot.endswith("503"):
+                return self._send(503, {})
+            status = "SOLD" if lot.endswith("410") else "ADVERTISE"
+            return self._send(200, {"advertisement": {"price": 1234, "status": status}})
+        if url.path == encar_check.LEASE_PATH:
+            ids = [int(x) for x in parse_qs(url.query)["carIds"][0].split(",")]
+            return self._send(200, [{"carId": n} for n in ids if n % 2 == 0])
+        self._send(404, {})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class EncarCheckTests(SimpleTestCase):
+    """cars.encar_check against a local stub server — no network needed."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubEncar)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        _StubEncar.hits = 0
+
+    def _run(self, method, *args, **opts):
+        async def go():
+            async with encar_check.EncarChecker(base_url=self.base_url, rate=0, **opts) as chk:
+                return await getattr(chk, method)(*args), chk.stats
+        return asyncio.run(go())
+
+    def test_vehicle_statuses_and_price(self):
+        out, stats = self._run("check_vehicles", ["1001", "2404", "3429"])
+        self.assertEqual(out["1001"], encar_check.Result("1001", encar_check.OK, 12_340_000))
+        self.assertEqual(out["2404"].status, encar_check.GONE)
+        self.assertEqual(out["3429"].status, encar_check.UNKNOWN)
+        self.assertEqual(stats.checked, 2)
+        self.assertEqual(stats.errors["http_429"], 1)
+
+    def test_clean_encar_decides_availability(self):
+        out, stats = self._run("check_vehicles", ["4410", "5404", "6503"])
+        self.assertEqual(out["4410"], encar_check.Result("4410", encar_check.GONE, None))
+        self.assertEqual(out["5404"].status, encar_check.GONE)
+        # Listed, but the price read failed: kept, with no price to apply.
+        self.assertEqual(out["6503"], encar_check.Result("6503", encar_check.OK, None))
+        self.assertEqual(stats.requests, 4)     # a price read only for the listed lot
+
+    def test_definite_answers_are_cached(self):
+        self._run("check_vehicles", ["1001", "2404", "3429"])
+        out, stats = self._run("check_vehicles", ["1001", "2404", "3429"])
+        self.assertEqual(stats.cached, 2)
+        self.assertEqual(stats.requests, 1)     # only the throttled lot is retried
+        self.assertEqual(out["2404"].status, encar_check.GONE)
+
+    def test_throttling_halves_concurrency(self):
+        _, stats = self._run("check_vehicles", ["1429", "2429"], concurrency=8, max_concurrency=8)
+        self.assertEqual(stats.errors["http_429"], 2)
+
+        limit = encar_check.AdaptiveLimit(8, 8)
+        limit.backoff()
+        self.assertEqual(limit.limit, 4)
+        for _ in range(4):
+            limit.success()
+        self.assertEqual(limit.limit, 5)
+
+    def test_lease_batches(self):
+        out, stats = self._run("check_leases", list(range(1, 251)), batch=100, use_cache=False)
+        self.assertEqual(stats.requests, 3)
+        self.assertEqual(len(out), 250)
+        self.assertTrue(out[2])
+        self.assertFalse(out[3])
+
+    def test_unreachable_server_is_unknown(self):
+        async def go():
+            async with encar_check.EncarChecker(base_url="http://127.0.0.1:9", rate=0,
+                                                timeout=1, use_cache=False) as chk:
+                return await chk.check_vehicles(["1"]), chk.stats
+        out, stats = asyncio.run(go())
+        self.assertEqual(out["1"].status, encar_check.UNKNOWN)
+        self.assertEqual(stats.errors["connect"], 1)
+
+
+class SimilarOrderTests(SimpleTestCase):
+    """Precomputed candidates are re-ranked in Python exactly like the SQL
+    fallback: tier first, then year and created_at descending."""
+
+    def _car(self, pk, model, badge, year, day):
+        return SimpleNamespace(pk=pk, model_id=model, badge_id=badge, year=year,
+                               created_at=datetime.datetime(2026, 1, day))
+
+    def test_tier_then_newest(self):
+        car = self._car(0, 1, 1, 2020, 1)
+        candidates = [
+            self._car(1, 2, 9, 2024, 1),    # make only
+            self._car(2, 1, 9, 2023, 1),    # model
+            self._car(3, 1, 1, 2019, 1),    # model + badge
+            self._car(4, 1, 1, 2020, 1),    # exact, older listing
+            self._car(5, 1, 1, 2020, 5),    # exact, newer listing
+            self._car(6, 1, 1, 2022, 1),    # model + badge, newer year
+        ]
+        self.assertEqual([c.pk for c in _similar_order(car, candidates)], [5, 4, 6, 3, 2, 1])
+
+
+class InspectionRenderTests(SimpleTestCase):
+    """The precomputed render model carries everything the detail panel and
+    the report need from the raw inspection JSON."""
+
+    EXTRA = {
+        "vehicleId": 123,
+        "outers": [
+            {"type": {"code": "P021", "title": "Front fender"},
+             "statusTypes": [{"code": "X"}, {"code": "W"}], "attributes": ["RANK_ONE"]},
+            {"type": {"code": "P131", "title": "Side member"},
+             "statusTypes": [{"code": "W"}], "attributes": ["RANK_TWO"]},
+        ],
+        "inners": [
+            {"type": {"code": "S01"}, "children": [
+                {"type": {"title": "Oil leak"}, "statusType": {"code": "7"}},
+                {"type": {"title": "Group"}, "children": [
+                    {"type": {"title": "Idle"}, "statusType": {"code": "1"}},
+                ]},
+            ]},
+        ],
+        "images": [{"path": "/carpicture/a.jpg"}, {"nopath": True}],
+        "master": {"accdient": True, "detail": {"issueDate": "20250102", "engineCheck": "Y"}},
+        "record": {"accidentCount": 2},
+    }
+
+    def test_build(self):
+        rm = inspection_render.build(self.EXTRA)
+        self.assertEqual(rm["damage_count"], 3)
+        self.assertEqual(rm["outers"][0], ["P021", "الجناح الأمامي (يسار)", "X", "RANK_ONE"])
+        self.assertEqual(rm["inners"], [["Engine", "المحرك", [
+            ["Oil leak", "bad", "Oil Leak / تسرب زيت"], ["Idle", "ok", "Normal / طبيعي"],
+        ]]])
+        self.assertEqual(rm["images"], ["https://ci.encar.com/carpicture/a.jpg"])
+        self.assertEqual(rm["detail"]["issue_date"], "2025-01-02")
+        self.assertTrue(rm["detail"]["engine_ok"])
+        self.assertTrue(rm["detail"]["accident"])
+        self.assertEqual(rm["record"], {"accidentCount": 2})
+        self.assertEqual(rm["vehicleId"], 123)
+        json.dumps(rm)  # stored as jsonb
+
+    def test_detail_context(self):
+        ctx = inspection_render.detail_context(inspection_render.build(self.EXTRA))
+        self.assertEqual(ctx["outer_badges_html"].count("insp-badge"), 2)
+        self.assertEqual(ctx["structural_badges_html"].count("insp-badge"), 1)
+        self.assertIn("Oil Leak", ctx["inner_html"])
+        self.assertTrue(ctx["has_inspection"] and ctx["has_inner"] and ctx["has_images"])
+
+    def test_empty_extra(self):
+        ctx = inspection_render.detail_context(inspection_render.build(None))
+        self.assertFalse(ctx["has_inspection"] or ctx["has_outer"] or ctx["has_inner"])
+
+
+class RollupTypesTests(SimpleTestCase):
+    """Tabs map onto rollup car_types the way _car_type_scope maps them onto
+    categories, with the tenant's auction/encar toggles applied on top."""
+
+    def test_tabs(self):
+        self.assertEqual(rollup.types_for("cars"), ["cars"])
+        self.assertEqual(rollup.types_for("truck"), ["truck"])
+        self.assertEqual(rollup.types_for("auction"), ["auction"])
+        self.assertEqual(rollup.types_for("japan_market", {"japan_market"}), ["japan_market"])
+        self.assertEqual(rollup.types_for("japan_market"), ["cars", "truck", "auction"])
+        self.assertEqual(rollup.types_for(None), ["cars", "truck", "auction"])
+
+    def test_toggles(self):
+        self.assertEqual(rollup.types_for(None, show_auctions=False), ["cars", "truck"])
+        self.assertEqual(rollup.types_for(None, show_encar=False), ["auction"])
+        self.assertEqual(rollup.types_for("kbchachacha", show_encar=False), [])
+
+    def test_bad_ids_skip_the_query(self):
+        self.assertEqual(rollup.models(["cars"], ["x", ""]), [])
+        self.assertEqual(rollup.badges(["cars"], []), [])
+        self.assertEqual(rollup.versions(["cars"], "abc"), [])
+
+
+class OptionLabelTests(SimpleTestCase):
+    """Option codes resolve from the in-memory table, known or not."""
+
+    def test_describe_options(self):
+        known, unknown = describe_options(["001", "zzz"])
+        self.assertEqual(known["en"]["name"], "Brake Lock (ABS)")
+        self.assertEqual(known["section_name"], "Safety")
+        self.assertEqual(unknown["code"], "zzz")
+        self.assertEqual(unknown["en"]["name"], "Option zzz")
+        self.assertNotIn("image", unknown)
+
+
+class OptionCodesTests(TestCase):
+    """option_codes (migrations 0043/0048) follows options->standard on insert
+    and on update, and the equipment filter matches on it."""
+
+    def setUp(self):
+        make = Manufacturer.objects.create(name="Kia")
+        model = CarModel.objects.create(name="Sorento", manufacturer=make)
+        self.car = ApiCar.objects.create(
+            car_id="oc1", lot_number="oc1", title="Kia Sorento", manufacturer=make,
+            model=model, badge=CarBadge.objects.create(name="2.2", model=model),
+            color=CarColor.objects.create(name="black"), year=2021, mileage=1, price=1,
+            options={"standard": ["014", "010", "014", "x1"], "etc": ["999"]})
+
+    def _codes(self):
+        with connection.cursor() as cur:
+            cur.execute("SELECT option_codes FROM cars_apicar WHERE id = %s", [self.car.pk])
+            return cur.fetchone()[0]
+
+    def test_written_on_insert_and_update(self):
+        self.assertEqual(self._codes(), [10, 14])
+        ApiCar.objects.filter(pk=self.car.pk).update(options={"standard": ["005"]})
+        self.assertEqual(self._codes(), [5])
+        ApiCar.objects.filter(pk=self.car.pk).update(options=None)
+        self.assertEqual(self._codes(), [])
+
+    def test_equipment_filter(self):
+        def ids(query):
+            return list(_apply_option_filters(ApiCar.objects.all(), QueryDict(query))
+                        .values_list("pk", flat=True))
+
+        self.assertEqual(ids("options=014&options=010"), [self.car.pk])
+        self.assertEqual(ids("options=014&options=005"), [])
+
+
+class VisibilitySignatureTests(SimpleTestCase):
+    """Tenants with the same catalog rules share one visible set; anything
+    that changes which cars pass changes the signature."""
+
+    def _tenant(self, cf, **kw):
+        return SimpleNamespace(catalog_filter=cf, show_auctions=kw.get("auctions", True),
+                               show_encar=True, price_markup_factor=kw.get("markup", 1.01))
+
+    def test_no_rules_no_set(self):
+        self.assertIsNone(visibility.signature(None))
+        self.assertIsNone(visibility.signature(self._tenant({})))
+
+    def test_shared_and_distinct(self):
+        rules = {"encar": {"year_min": 2018}}
+        sig = visibility.signature(self._tenant(rules))
+        self.assertEqual(sig, visibility.signature(self._tenant({"encar": {"year_min": 2018}})))
+        self.assertNotEqual(sig, visibility.signature(self._tenant(rules, auctions=False)))
+        # The markup only matters once the rules filter on price.
+        self.assertEqual(sig, visibility.signature(self._tenant(rules, markup=1.2)))
+        priced = {"encar": {"price_max": 50000}}
+        self.assertNotEqual(visibility.signature(self._tenant(priced)),
+                            visibility.signature(self._tenant(priced, markup=1.2)))
+
+
+class SyntheticCatalogTests(SimpleTestCase):
+    """Car i depends only on (seed, i, anchor), so the bench can regenerate
+    any slice of the catalog."""
+
+    anchor = datetime.date(2026, 3, 1)
+
+    def test_deterministic_per_car(self):
+        head = list(synthetic.cars(3, 50, self.anchor))
+        self.assertEqual(head, list(synthetic.cars(3, 50, self.anchor)))
+        self.assertEqual(head[40:], list(synthetic.cars(3, 10, self.anchor, start=40)))
+        self.assertNotEqual(head, list(synthetic.cars(4, 50, self.anchor)))
+
+    def test_rows_match_the_feeds(self):
+        kinds = {}
+        for kind, row in synthetic.cars(1, 300, self.anchor):
+            kinds.setdefault(kind, row)
+        encar, auction = kinds["encar"], kinds["auction"]
+        self.assertEqual(set(encar), set(synthetic.ENCAR_COLUMNS))
+        self.assertTrue(encar["inner_id"].startswith(synthetic.LOT_PREFIX))
+        self.assertTrue(json.loads(encar["options"])["standard"])
+        self.assertIn("outers", json.loads(encar["extra"]))
+        self.assertTrue(auction["car_identifire"].startswith(synthetic.LOT_PREFIX))
+        datetime.datetime.strptime(auction["auction_date"], "%Y-%m-%d %H:%M:%S")
+
+
+class LocalPdfTests(SimpleTestCase):
+    """cars.pdf_local without photos: pages are content-hashed, cached on
+    disk and streamed into a well-formed PDF."""
+
+    def _data(self, lot):
+        return {"make": "Hyundai", "title": f"Hyundai Sonata (lot {lot})",
+                "rows": [("Lot", lot), ("Mileage", "12,000 km")], "photo": ""}
+
+    def test_page_hash_follows_content(self):
+        self.assertEqual(pdf_local.page_hash(self._data("1")), pdf_local.page_hash(self._data("1")))
+        self.assertNotEqual(pdf_local.page_hash(self._data("1")), pdf_local.page_hash(self._data("2")))
+
+    def test_writer_streams_cached_pages(self):
+        import io
+        import tempfile
+
+        cache = pdf_local.PageCache(tempfile.mkdtemp())
+        hashes = []
+        for lot in ("1", "2", "3"):
+            data = self._data(lot)
+            h = pdf_local.page_hash(data)
+            cache.put(h, pdf_local.render_page(data))
+            hashes.append(h)
+        self.assertTrue(all(cache.has(h) for h in hashes))
+
+        out = io.BytesIO()
+        writer = pdf_local.PdfWriter(out)
+        for h in hashes:
+            writer.add_page(cache.get(h))
+        writer.close()
+        pdf = out.getvalue()
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        self.assertIn(b"/Count 3", pdf)
+        # startxref points at the cross-reference table.
+        xref = int(pdf.rsplit(b"startxref", 1)[1].split()[0])
+        self.assertTrue(pdf[xref:].startswith(b"xref"))
+
+    def test_cached_pages_expire(self):
+        import os
+        import tempfile
+        import time
+
+        cache = pdf_local.PageCache(tempfile.mkdtemp())
+        h = pdf_local.page_hash(self._data("1"))
+        cache.put(h, pdf_local.render_page(self._data("1")))
+        self.assertTrue(cache.has(h))
+        old = time.time() - pdf_local.PAGE_MAX_AGE - 1
+        os.utime(cache._path(h), (old, old))
+        self.assertFalse(cache.has(h))
+
+
+class OriginPriceQueueTests(SimpleTestCase):
+    """enrich_origin_price acks a claimed batch only once it is written."""
+
+    def _run(self, process_batch):
+        from django.core.management import call_command
+
+        with mock.patch.object(origin_price, "claim", side_effect=[[1, 2], []]), \
+                mock.patch.object(origin_price, "process_batch", side_effect=process_batch), \
+                mock.patch.object(origin_price, "ack") as ack, \
+                mock.patch.object(origin_price, "queue_depth", return_value=0):
+            try:
+                call_command("enrich_origin_price", stdout=io.StringIO())
+            except OSError:
+                pass
+        return ack
+
+    def test_written_batch_is_acked(self):
+        self._run(lambda ids, **kw: (len(ids), 0)).assert_called_once_with([1, 2])
+
+    def test_failed_batch_stays_claimed(self):
+        def boom(ids, **kw):
+            raise OSError("database went away")
+        self._run(boom).assert_not_called()
+
+
+class CatalogJobTests(SimpleTestCase):
+    """Requested jobs wait for the worker; without Redis they run inline."""
+
+    def test_rebuild_is_left_to_the_worker(self):
+        r = mock.Mock()
+        with mock.patch.object(catalog_jobs, "_redis", return_value=r), \
+                mock.patch.object(catalog_jobs, "rebuild") as rebuild:
+            self.assertTrue(catalog_jobs.request_rebuild())
+            rebuild.assert_not_called()
+            r.delete.return_value = 1
+            self.assertEqual(catalog_jobs.run_pending(), ["rebuild"])
+            r.delete.return_value = 0
+            self.assertEqual(catalog_jobs.run_pending(), [])
+        rebuild.assert_called_once()
+
+    def test_materialize_runs_per_queued_schema(self):
+        r = mock.Mock()
+        r.delete.return_value = 0
+        r.spop.return_value = [b"t1", b"t2"]
+        with mock.patch.object(catalog_jobs, "_redis", return_value=r), \
+                mock.patch.object(catalog_jobs, "materialize") as materialize:
+            self.assertTrue(catalog_jobs.request_materialize("t1"))
+            self.assertEqual(catalog_jobs.run_pending(), ["materialize t1", "materialize t2"])
+        r.sadd.assert_called_once_with(catalog_jobs.MATERIALIZE_KEY, "t1")
+        self.assertEqual([c.args for c in materialize.call_args_list], [("t1",), ("t2",)])
+
+    def test_inline_without_redis(self):
+        with mock.patch.object(catalog_jobs, "_redis", side_effect=ConnectionError), \
+                mock.patch.object(catalog_jobs, "rebuild") as rebuild:
+            self.assertFalse(catalog_jobs.request_rebuild())
+        rebuild.assert_called_once()
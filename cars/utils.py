@@ -1428,6 +1428,9 @@ address_en = {
 # Default to English for backward compatibility
 STANDARD_OPTIONS = OPTION_TRANSLATIONS['en']
 
+# OPTION_DATA keyed by code, built once at import.
+OPTIONS_BY_CODE = {option['code']: option for option in OPTION_DATA}
+
 def get_option_data(option_code):
     """
     Get the option data for a given option code
@@ -1438,10 +1441,7 @@ def get_option_data(option_code):
     Returns:
         dict: The option data dictionary or None if not found
     """
-    for option in OPTION_DATA:
-        if option['code'] == option_code:
-            return option
-    return None
+    return OPTIONS_BY_CODE.get(option_code)
 
 def get_option_description(option_code, language='en'):
     """
@@ -1515,9 +1515,47 @@ def format_options_list(options_list, language='en'):
     else:
         return [OPTION_TRANSLATIONS['en'].get(code, f"Option {code}") for code in options_list]
 
+def _describe_option(code):
+    option_data = get_option_data(code)
+    entry = {
+        'en': get_option_description(code, 'en'),
+        'ar': get_option_description(code, 'ar'),
+    }
+    if option_data:
+        entry['image'] = option_data.get('image', '')
+        entry['section'] = option_data.get('section', '')
+        entry['section_name'] = option_data.get('section_name', '')
+    return entry
+
+
+# Every known code resolved once at import; unknown codes fall back per call.
+OPTION_LABELS = {
+    code: _describe_option(code)
+    for code in {*OPTIONS_BY_CODE, *OPTION_TRANSLATIONS['en']}
+}
+
+
+def describe_options(codes):
+    """
+    Resolve a list of option codes in one pass against OPTION_LABELS
+    
+    Args:
+        codes (list): List of option codes
+        
+    Returns:
+        list: One dict per code with 'code', 'en' and 'ar' descriptions, plus
+        'image', 'section' and 'section_name' when the code is in OPTION_DATA
+    """
+    return [
+        {'code': code, **(OPTION_LABELS.get(code) or _describe_option(code))}
+        for code in codes
+    ]
+
+
 def enrich_car_details_from_db(car_data, language='en'):
     """
-    Enrich car data with additional information like option descriptions from the database
+    Enrich car data with option descriptions. Kept for existing callers: the
+    labels come from the in-memory OPTION_LABELS table, not one query per code.
     
     Args:
         car_data (dict): The car data to enrich
@@ -1526,132 +1564,7 @@ def enrich_car_details_from_db(car_data, language='en'):
     Returns:
         dict: The enriched car data
     """
-    # Import here to avoid circular imports
-    from cars.models import Option
-    
-    if not car_data or not isinstance(car_data, dict):
-        return car_data
-    
-    # Check if car has lots and details with options
-    if 'lots' in car_data and car_data['lots'] and len(car_data['lots']) > 0:
-        lot = car_data['lots'][0]
-        
-        if 'details' in lot and 'options' in lot['details']:
-            options = lot['details']['options']
-            
-            # Enrich standard options with descriptions from database
-            if 'standard' in options and isinstance(options['standard'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                standard_options = []
-                for code in options['standard']:
-                    # Get the option data from the database
-                    try:
-                        option_obj = Option.objects.get(code=code)
-                        standard_options.append({
-                            'code': code,
-                            'image': option_obj.image,
-                            'section': option_obj.section,
-                            'section_name': option_obj.section_name,
-                            'en': {
-                                'name': option_obj.name,
-                                'description': option_obj.description,
-                                'location': option_obj.location
-                            },
-                            'ar': {
-                                'name': option_obj.name_ar,
-                                'description': option_obj.description_ar,
-                                'location': option_obj.location_ar
-                            }
-                        })
-                    except Option.DoesNotExist:
-                        # Fallback to the old method if option not in database
-                        standard_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['standard_options'] = standard_options
-            
-            # Enrich additional options with descriptions from database
-            if 'etc' in options and isinstance(options['etc'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                etc_options = []
-                for code in options['etc']:
-                    # Get the option data from the database
-                    try:
-                        option_obj = Option.objects.get(code=code)
-                        etc_options.append({
-                            'code': code,
-                            'image': option_obj.image,
-                            'section': option_obj.section,
-                            'section_name': option_obj.section_name,
-                            'en': {
-                                'name': option_obj.name,
-                                'description': option_obj.description,
-                                'location': option_obj.location
-                            },
-                            'ar': {
-                                'name': option_obj.name_ar,
-                                'description': option_obj.description_ar,
-                                'location': option_obj.location_ar
-                            }
-                        })
-                    except Option.DoesNotExist:
-                        # Fallback to the old method if option not in database
-                        etc_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['etc_options'] = etc_options
-            
-            # Enrich tuning options with descriptions from database
-            if 'tuning' in options and isinstance(options['tuning'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                tuning_options = []
-                for code in options['tuning']:
-                    # Get the option data from the database
-                    try:
-                        option_obj = Option.objects.get(code=code)
-                        tuning_options.append({
-                            'code': code,
-                            'image': option_obj.image,
-                            'section': option_obj.section,
-                            'section_name': option_obj.section_name,
-                            'en': {
-                                'name': option_obj.name,
-                                'description': option_obj.description,
-                                'location': option_obj.location
-                            },
-                            'ar': {
-                                'name': option_obj.name_ar,
-                                'description': option_obj.description_ar,
-                                'location': option_obj.location_ar
-                            }
-                        })
-                    except Option.DoesNotExist:
-                        # Fallback to the old method if option not in database
-                        tuning_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['tuning_options'] = tuning_options
-                
-            # Keep the old format for backward compatibility
-            if 'standard' in options and isinstance(options['standard'], list):
-                options['standard_descriptions'] = format_options_list(options['standard'], language)
-                options['standard_descriptions_ar'] = format_options_list(options['standard'], 'ar')
-            
-            if 'etc' in options and isinstance(options['etc'], list):
-                options['etc_descriptions'] = format_options_list(options['etc'], language)
-                options['etc_descriptions_ar'] = format_options_list(options['etc'], 'ar')
-            
-            if 'tuning' in options and isinstance(options['tuning'], list):
-                options['tuning_descriptions'] = format_options_list(options['tuning'], language)
-                options['tuning_descriptions_ar'] = format_options_list(options['tuning'], 'ar')
-    
-    return car_data
+    return enrich_car_details(car_data, language)
 
 
 def enrich_car_details(car_data, language='en'):
@@ -1675,77 +1588,10 @@ def enrich_car_details(car_data, language='en'):
         if 'details' in lot and 'options' in lot['details']:
             options = lot['details']['options']
             
-            # Enrich standard options with descriptions in English and Arabic
-            if 'standard' in options and isinstance(options['standard'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                standard_options = []
-                for code in options['standard']:
-                    # Get the option data directly from OPTION_DATA
-                    option_data = get_option_data(code)
-                    if option_data:
-                        standard_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar'),
-                            'image': option_data.get('image', ''),
-                            'section': option_data.get('section', ''),
-                            'section_name': option_data.get('section_name', '')
-                        })
-                    else:
-                        standard_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['standard_options'] = standard_options
-            
-            # Enrich additional options with descriptions in English and Arabic
-            if 'etc' in options and isinstance(options['etc'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                etc_options = []
-                for code in options['etc']:
-                    # Get the option data directly from OPTION_DATA
-                    option_data = get_option_data(code)
-                    if option_data:
-                        etc_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar'),
-                            'image': option_data.get('image', ''),
-                            'section': option_data.get('section', ''),
-                            'section_name': option_data.get('section_name', '')
-                        })
-                    else:
-                        etc_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['etc_options'] = etc_options
-            
-            # Enrich tuning options with descriptions in English and Arabic
-            if 'tuning' in options and isinstance(options['tuning'], list):
-                # Create a list of dictionaries with both English and Arabic translations
-                tuning_options = []
-                for code in options['tuning']:
-                    # Get the option data directly from OPTION_DATA
-                    option_data = get_option_data(code)
-                    if option_data:
-                        tuning_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar'),
-                            'image': option_data.get('image', ''),
-                            'section': option_data.get('section', ''),
-                            'section_name': option_data.get('section_name', '')
-                        })
-                    else:
-                        tuning_options.append({
-                            'code': code,
-                            'en': get_option_description(code, 'en'),
-                            'ar': get_option_description(code, 'ar')
-                        })
-                options['tuning_options'] = tuning_options
+            # Standard / additional / tuning options with English and Arabic descriptions
+            for group in ('standard', 'etc', 'tuning'):
+                if group in options and isinstance(options[group], list):
+                    options[f'{group}_options'] = describe_options(options[group])
                 
             # Keep the old format for backward compatibility
             if 'standard' in options and isinstance(options['standard'], list):
@@ -2,19 +2,20 @@ from datetime import datetime, date, timedelta
 import hashlib
 import json
 import logging
+import math
 from urllib.parse import urlencode
-import urllib.request
-import requests
 
 logger = logging.getLogger(__name__)
 
+from django.conf import settings
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.db.models import Q, Max, F
+from django.db.models import Q, Max, Case, When, Value, IntegerField
 from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KT
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.cache import never_cache
@@ -42,6 +43,8 @@ from django.db import connection, ProgrammingError, OperationalError
 from .models import ApiCar, Manufacturer, CarModel, CarRequest, Contact, CarColor, BodyType, Category, CarBadge, Wishlist, CarSeatColor, Post, PostLike, PostComment, PostImage
 from .utils import car_models_dict
 from .export_service import start_export, process_webhook_payload
+from . import cards, encar_check, inspection_render, origin_price, rollup, visibility
+from tenants.profiling import query_budget
 
 
 # ── Manufacturer "appeal" tiers ─────────────────────────────────────────────
@@ -135,9 +138,9 @@ def _get_current_tenant():
 
 
 def _exclude_expired_auctions(qs, tenant=None):
-    """Exclude auction cars whose auction_date has passed."""
-    now = timezone.now()
-    return qs.exclude(category__name='auction', auction_date__lt=now)
+    """Exclude auction cars whose auction_date has passed — the is_live flag
+    cars.lifecycle keeps current, so no per-query now() or category join."""
+    return qs.filter(is_live=True)
 
 
 _CATALOG_DMG_TYPES = ('replaced', 'painted')
@@ -219,15 +222,11 @@ def _tenant_catalog_sig(tenant):
     return hashlib.md5(raw.encode('utf-8')).hexdigest()[:10]
 
 
-def _catalog_rate_factor():
-    """SAR per 1 KRW — matches the on-site display (global rate × tenant markup)."""
-    try:
-        from tenants.models import GlobalExchangeRates
-        rate = float(GlobalExchangeRates.get_solo().rate_sar or 0.0025)
-    except Exception:
-        rate = 0.0025
-    markup = float(getattr(getattr(connection, 'tenant', None), 'price_markup_factor', 1.01))
-    return rate * markup
+def _catalog_rate_factor(tenant=None):
+    """SAR per 1 KRW — matches the on-site display (global rate × tenant markup).
+    `tenant` defaults to the current one."""
+    from tenants import pricing
+    return pricing.factors(tenant)['SAR']
 
 
 def _catalog_whitelist_q(rules, factor):
@@ -272,11 +271,32 @@ def _catalog_damage_subqueries(rules):
 
 
 def _apply_tenant_catalog(qs, tenant):
-    """Toggles + per-category catalog filter. Auction cars obey the 'auction'
+    """Toggles + per-category catalog filter. Call this everywhere the shared
+    catalog is shown (list, home, facets, APIs, sitemap, detail).
+
+    A tenant with a catalog_filter reads its materialised visible set
+    (cars.visibility) — one semi-join on (sig, car_id) — once that signature
+    has been built; until then, and for toggle-only tenants, the rules are
+    applied live by _tenant_catalog_rules."""
+    sig = visibility.signature(tenant)
+    if sig and visibility.is_ready(sig):
+        return visibility.restrict(qs, sig)
+    return _tenant_catalog_rules(qs, tenant)
+
+
+def _catalog_allows(car_pk, tenant):
+    """Whether the tenant's catalog shows this car — a primary-key probe of
+    the visible set when it is built."""
+    sig = visibility.signature(tenant)
+    if sig and visibility.is_ready(sig):
+        return visibility.contains(sig, car_pk)
+    return _tenant_catalog_rules(ApiCar.objects.filter(pk=car_pk), tenant).exists()
+
+
+def _tenant_catalog_rules(qs, tenant):
+    """The catalog rules as WHERE clauses. Auction cars obey the 'auction'
     rule set and everything else (encar) obeys the 'encar' rule set — configured
-    independently. Whitelist for year/price/make/model; exclude-list for damage.
-    Call this everywhere the shared catalog is shown (list, home, facets, APIs,
-    sitemap, detail)."""
+    independently. Whitelist for year/price/make/model; exclude-list for damage."""
     if tenant is None:
         return qs
     if not getattr(tenant, 'show_auctions', True):
@@ -295,7 +315,7 @@ def _apply_tenant_catalog(qs, tenant):
         a_rules, e_rules = cf.get('auction') or {}, cf.get('encar') or {}
     else:
         a_rules = e_rules = cf
-    factor = _catalog_rate_factor()
+    factor = _catalog_rate_factor(tenant)
     a_is = Q(category__name='auction')
     # Keep a car if it's an auction passing the auction whitelist, or a
     # non-auction (encar) passing the encar whitelist.
@@ -375,9 +395,7 @@ def landing(request):
     }
     for _i, _m in enumerate(_enabled_markets):
         _agg_kwargs['market_%d' % _i] = Count('id', filter=Q(category__name=_m['name']))
-    agg = _apply_tenant_catalog(ApiCar.objects.exclude(
-        category__name='auction', auction_date__lt=now
-    ), _lt).aggregate(**_agg_kwargs)
+    agg = _apply_tenant_catalog(ApiCar.objects.filter(is_live=True), _lt).aggregate(**_agg_kwargs)
     market_stats = [
         {'name': _m['name'], 'label_ar': _m['label_ar'], 'label_en': _m['label_en'],
          'count': agg.get('market_%d' % _i, 0)}
@@ -453,6 +471,7 @@ def landing(request):
 
 
 @cache_control(public=True, max_age=180)
+@query_budget(40)
 def home(request):
     # Site-builder override: if a tenant has published a Page(kind='home'), render that.
     from site_builder.views import render_home_if_configured
@@ -460,7 +479,6 @@ def home(request):
     if sb_response is not None:
         return sb_response
 
-    now = timezone.now()
     schema = getattr(connection, 'schema_name', 'public')
 
     # Cache the full rendered HTML — anonymous visitors only. The rendered HTML
@@ -480,60 +498,35 @@ def home(request):
 
     if context is None:
         # ── Single base queryset with direct filter (no subquery) ──
-        _base_qs = ApiCar.objects.select_related(
-            'manufacturer', 'model', 'badge', 'category'
-        ).exclude(category__name='auction', auction_date__lt=now)
+        _base_qs = ApiCar.objects.filter(is_live=True)
         # Respect the tenant's visibility toggles + catalog filter.
         _base_qs = _apply_tenant_catalog(_base_qs, getattr(connection, 'tenant', None))
 
         # Latest cars (non-auction) – limited early. Ordered by manufacturer
         # appeal (premium → luxury → mainstream → other), then newest first.
-        latest_cars = list(
+        # Each strip picks 12 ids here and renders their CarCards.
+        latest_cars = cards.fetch(
             _order_by_appeal(
                 _base_qs.filter(category__isnull=True),
                 '-created_at',
-            )
-            .only(
-                'id', 'title', 'slug', 'image', 'images', 'price', 'year',
-                'mileage', 'status', 'transmission', 'address', 'created_at',
-                'manufacturer__id', 'manufacturer__name', 'manufacturer__name_ar',
-                'model__id', 'model__name', 'model__name_ar',
-                'badge__id', 'badge__name',
-                'category__id', 'category__name',
-            )[:12]
+            ).values_list('id', flat=True)[:12]
         )
 
         # Latest auctions – limited early. Same appeal-tier ordering.
-        latest_auctions = list(
+        latest_auctions = cards.fetch(
             _order_by_appeal(
                 _base_qs.filter(category__name='auction'),
                 '-created_at',
-            )
-            .only(
-                'id', 'title', 'slug', 'image', 'images', 'price', 'year',
-                'mileage', 'status', 'transmission', 'auction_date',
-                'auction_name', 'address', 'created_at',
-                'manufacturer__id', 'manufacturer__name', 'manufacturer__name_ar',
-                'model__id', 'model__name', 'model__name_ar',
-                'badge__id', 'badge__name',
-                'category__id', 'category__name',
-            )[:12]
+            ).values_list('id', flat=True)[:12]
         )
 
         # Latest cars per enabled market (japan_market, …) — one row each, newest
         # first. Dynamic: adding/enabling a market adds a row with no code change.
         latest_markets = []
         for _lm in _tenant_enabled_markets(getattr(connection, 'tenant', None)):
-            _lm_cars = list(
+            _lm_cars = cards.fetch(
                 _base_qs.filter(category__name=_lm['name']).order_by('-created_at')
-                .only(
-                    'id', 'title', 'slug', 'image', 'images', 'price', 'year',
-                    'mileage', 'status', 'transmission', 'address', 'created_at',
-                    'manufacturer__id', 'manufacturer__name', 'manufacturer__name_ar',
-                    'model__id', 'model__name', 'model__name_ar',
-                    'badge__id', 'badge__name',
-                    'category__id', 'category__name',
-                )[:12]
+                .values_list('id', flat=True)[:12]
             )
             if _lm_cars:
                 latest_markets.append({
@@ -543,9 +536,7 @@ def home(request):
 
         # ── Fast aggregation: use DB-side COUNT/DISTINCT instead of full table scan ──
         from django.db.models import Count as _Count
-        _base_filter = _apply_tenant_catalog(ApiCar.objects.exclude(
-            category__name='auction', auction_date__lt=now
-        ), getattr(connection, 'tenant', None))
+        _base_filter = _apply_tenant_catalog(ApiCar.objects.filter(is_live=True), getattr(connection, 'tenant', None))
 
         _home_markets = _tenant_enabled_markets(getattr(connection, 'tenant', None))
         _agg_kw = dict(
@@ -594,7 +585,7 @@ def home(request):
             .annotate(
                 car_count=Count('apicar'),
                 cars_count=Count('apicar', filter=Q(apicar__category__isnull=True)),
-                auction_count=Count('apicar', filter=Q(apicar__category__name='auction') & ~Q(apicar__auction_date__lt=now)),
+                auction_count=Count('apicar', filter=Q(apicar__category__name='auction', apicar__is_live=True)),
             )
             .order_by('-car_count')[:20]
         )
@@ -761,6 +752,24 @@ def export_auction_pdf(request):
         messages.error(request, "يرجى تحديد اسم المزاد.")
         return redirect(request.META.get('HTTP_REFERER', '/cars/'))
 
+    from .models import PdfExport
+    schema = getattr(connection, 'schema_name', '')
+
+    if settings.PDF_EXPORT_BACKEND == PdfExport.BACKEND_LOCAL:
+        # Rendered from our own data by `render_pdf_exports` — no entries needed.
+        car_ids = list(ApiCar.objects.filter(auction_name=auction_name).values_list('pk', flat=True))
+        if not car_ids:
+            messages.error(request, f"لا توجد سيارات في المزاد «{auction_name}».")
+            return redirect(request.META.get('HTTP_REFERER', '/cars/'))
+        from .pdf_local import queue_export
+        queue_export(auction_name, car_ids, schema)
+        messages.success(
+            request,
+            f"تم إرسال طلب تصدير PDF للمزاد «{auction_name}». "
+            f"ستجد الملف جاهزاً في لوحة التحكم تحت «تصديرات PDF» خلال لحظات."
+        )
+        return redirect(request.META.get('HTTP_REFERER', '/cars/?car_type=auction'))
+
     entries = list(
         ApiCar.objects.filter(auction_name=auction_name)
         .exclude(entry__isnull=True).exclude(entry='')
@@ -770,9 +779,6 @@ def export_auction_pdf(request):
         messages.error(request, f"لا توجد سيارات بقيم entry في المزاد «{auction_name}».")
         return redirect(request.META.get('HTTP_REFERER', '/cars/'))
 
-    from .models import PdfExport
-    schema = getattr(connection, 'schema_name', '')
-
     # Build the absolute webhook URL so ofleet can call us back
     webhook_url = _build_webhook_url(request)
 
@@ -828,6 +834,23 @@ def pdf_export_panel(request):
             messages.error(request, "لم تحدد أي سيارة.")
             return redirect(f"{request.path}?auction={auction_name}")
 
+        if settings.PDF_EXPORT_BACKEND == PdfExport.BACKEND_LOCAL:
+            car_ids = list(
+                ApiCar.objects.filter(pk__in=selected_ids, auction_name=auction_name)
+                .values_list('pk', flat=True)
+            )
+            if not car_ids:
+                messages.error(request, "السيارات المحددة غير موجودة في هذا المزاد.")
+                return redirect(f"{request.path}?auction={auction_name}")
+            from .pdf_local import queue_export
+            queue_export(auction_name, car_ids, schema)
+            messages.success(
+                request,
+                f"✅ تم إرسال طلب التصدير للمزاد «{auction_name}» ({len(car_ids)} سيارة). "
+                f"الملف سيظهر جاهزاً خلال لحظات."
+            )
+            return redirect('pdf_export_panel')
+
         # Fetch entries only for the checked cars
         entries = list(
             ApiCar.objects.filter(pk__in=selected_ids, auction_name=auction_name)
@@ -952,7 +975,7 @@ def pdf_export_panel(request):
         page_number = request.GET.get('page', 1)
         page_obj    = paginator.get_page(page_number)
         exports     = PdfExport.objects.all().order_by('-created_at')
-        has_pending = exports.filter(status=PdfExport.STATUS_PENDING).exists()
+        has_pending = exports.filter(status__in=[PdfExport.STATUS_PENDING, PdfExport.STATUS_RENDERING]).exists()
 
         # Build a query-string fragment that preserves all filters (for pagination links)
         active_filters = {k: v for k, v in {
@@ -986,6 +1009,7 @@ def pdf_export_panel(request):
             'exports': exports,
             'has_pending': has_pending,
             'STATUS_PENDING':  PdfExport.STATUS_PENDING,
+            'STATUS_RENDERING': PdfExport.STATUS_RENDERING,
             'STATUS_COMPLETE': PdfExport.STATUS_COMPLETE,
             'STATUS_FAILED':   PdfExport.STATUS_FAILED,
         })
@@ -1000,7 +1024,7 @@ def pdf_export_panel(request):
     )
 
     exports = PdfExport.objects.all().order_by('-created_at')
-    has_pending = exports.filter(status=PdfExport.STATUS_PENDING).exists()
+    has_pending = exports.filter(status__in=[PdfExport.STATUS_PENDING, PdfExport.STATUS_RENDERING]).exists()
 
     return render(request, 'cars/pdf_export_panel.html', {
         'step': 'choose',
@@ -1008,6 +1032,7 @@ def pdf_export_panel(request):
         'exports': exports,
         'has_pending': has_pending,
         'STATUS_PENDING':  PdfExport.STATUS_PENDING,
+        'STATUS_RENDERING': PdfExport.STATUS_RENDERING,
         'STATUS_COMPLETE': PdfExport.STATUS_COMPLETE,
         'STATUS_FAILED':   PdfExport.STATUS_FAILED,
     })
@@ -1070,7 +1095,8 @@ def ofleet_webhook(request):
     # Find the most recent pending record for this schema to link files to it
     parent = (
         PdfExport.objects
-        .filter(schema_name=schema, status=PdfExport.STATUS_PENDING)
+        .filter(schema_name=schema, status=PdfExport.STATUS_PENDING,
+                backend=PdfExport.BACKEND_OFLEET)
         .order_by('-created_at')
         .first()
     )
@@ -1171,6 +1197,36 @@ _NO_ACCIDENT_WHERE = ("((accident_cnt IS NULL OR accident_cnt = '0') "
                       "AND NOT COALESCE(dmg_replaced, false))")
 
 
+def _price_bounds(GET):
+    """price_min / price_max as a KRW (min, max). They are KRW unless
+    `price_cur` names the currency they were typed in (SAR, USD, ...); then
+    they become the KRW range that displays inside them, so the filter is
+    still a range scan on the price index."""
+    def _num(key):
+        try:
+            v = float(GET.get(key)) if GET.get(key) else None
+        except ValueError:
+            return None
+        return v if v is None or math.isfinite(v) else None
+    lo, hi = _num('price_min'), _num('price_max')
+    if lo is None and hi is None:
+        return None, None
+    from tenants import pricing
+    return pricing.krw_range(lo, hi, GET.get('price_cur') or 'KRW')
+
+
+def _price_flag_filter(qs, value):
+    """`price_flag` filter over the flags cars.anomaly writes: 'low' / 'high'
+    show those cars, 'any' every suspicious price, 'ok' hides them."""
+    if value in ('low', 'high'):
+        return qs.filter(price_flag=value)
+    if value == 'any':
+        return qs.exclude(price_flag='')
+    if value == 'ok':
+        return qs.filter(price_flag='')
+    return qs
+
+
 def _damaged_main_parts_subq():
     """RawSQL subquery: ids of auction cars with a SERIOUS damage marker on any
     MAIN body part (lamps/mirrors/glass don't count). 'repaired' (paint/small
@@ -1201,10 +1257,15 @@ _MAX_OPTION_FILTERS = 6
 
 
 def _apply_option_filters(qs, GET):
-    """AND-match the selected equipment codes against options->standard."""
+    """AND-match the selected equipment codes against options->standard.
+
+    One `@>` on the option_codes smallint[] column (options->standard,
+    kept by a trigger — migrations 0043/0048), so the GIN index answers the
+    whole selection instead of one JSONB containment per code."""
     codes = [c for c in GET.getlist('options') if c in _FILTER_OPTION_SET]
-    for code in codes[:_MAX_OPTION_FILTERS]:
-        qs = qs.filter(options__standard__contains=[code])
+    if codes:
+        qs = qs.extra(where=["option_codes @> %s::smallint[]"],
+                      params=[[int(c) for c in codes[:_MAX_OPTION_FILTERS]]])
     return qs
 
 
@@ -1302,15 +1363,12 @@ def _apply_sidebar_filters(qs, GET, exclude=None):
     if exclude != 'status':
         v = GET.getlist('status')
         if v: qs = qs.filter(status__in=v)
+    if exclude != 'price_flag':
+        qs = _price_flag_filter(qs, GET.get('price_flag'))
     if exclude != 'price':
-        pmn = GET.get('price_min')
-        if pmn:
-            try: qs = qs.filter(price__gte=int(pmn))
-            except ValueError: pass
-        pmx = GET.get('price_max')
-        if pmx:
-            try: qs = qs.filter(price__lte=int(pmx))
-            except ValueError: pass
+        pmn, pmx = _price_bounds(GET)
+        if pmn is not None: qs = qs.filter(price__gte=pmn)
+        if pmx is not None: qs = qs.filter(price__lte=pmx)
     if exclude != 'mileage':
         mmn = GET.get('mileage_min')
         if mmn:
@@ -1446,6 +1504,7 @@ def car_facets(request):
 
 @ensure_csrf_cookie
 @cache_control(public=True, max_age=120)
+@query_budget(40)
 def car_list(request):
     # Hard-bounce disabled car_type tabs to a still-enabled one (or home if
     # nothing is enabled). Direct URL access to a disabled tab would otherwise
@@ -1495,23 +1554,8 @@ def car_list(request):
         if cached_html:
             return HttpResponse(cached_html)
 
-    qs = _exclude_expired_auctions(
-        ApiCar.objects.select_related(
-            'manufacturer', 'model', 'badge', 'color', 'body', 'category'
-        ).only(
-            'id', 'title', 'slug', 'image', 'images', 'price', 'year', 'mileage',
-            'status', 'lot_number', 'vin', 'fuel', 'transmission', 'address',
-            'auction_date', 'auction_name', 'condition', 'created_at', 'is_new',
-            'engine_group',
-            'manufacturer__id', 'manufacturer__name', 'manufacturer__name_ar',
-            'manufacturer__logo',
-            'model__id', 'model__name', 'model__name_ar',
-            'badge__id', 'badge__name',
-            'color__id', 'color__name',
-            'body__id', 'body__name',
-            'category__id', 'category__name',
-        )
-    )
+    # Filtered/ordered down to page ids only; the cards come from CarCard.
+    qs = _exclude_expired_auctions(ApiCar.objects.all())
 
     q = request.GET.get('q', '').strip()
     if q:
@@ -1627,19 +1671,16 @@ def car_list(request):
     if sel_statuses:
         qs = qs.filter(status__in=sel_statuses)
 
-    price_min = request.GET.get('price_min')
-    if price_min:
-        try:
-            qs = qs.filter(price__gte=int(price_min))
-        except ValueError:
-            pass
+    sel_price_flag = request.GET.get('price_flag', '')
+    qs = _price_flag_filter(qs, sel_price_flag)
 
+    price_min = request.GET.get('price_min')
     price_max = request.GET.get('price_max')
-    if price_max:
-        try:
-            qs = qs.filter(price__lte=int(price_max))
-        except ValueError:
-            pass
+    _krw_min, _krw_max = _price_bounds(request.GET)
+    if _krw_min is not None:
+        qs = qs.filter(price__gte=_krw_min)
+    if _krw_max is not None:
+        qs = qs.filter(price__lte=_krw_max)
 
     mileage_min = request.GET.get('mileage_min')
     if mileage_min:
@@ -1735,19 +1776,10 @@ def car_list(request):
 
     # Two-step page fetch: the appeal-tier + shuffle ordering has to sort the
     # whole filtered set, so paginate over bare ids (narrow sort tuples), then
-    # fetch only the 20 page rows — with card FKs joined and the huge
-    # JSONB/text fields deferred (cards never read them).
+    # render the 20 page rows from their CarCards — never the wide ApiCar row.
     paginator = _CachedCountPaginator(qs.values_list('id', flat=True), 20)
     page_obj = paginator.get_page(request.GET.get('page'))
-    _page_ids = list(page_obj.object_list)
-    _page_rows = {
-        c.id: c for c in
-        ApiCar.objects.filter(id__in=_page_ids)
-        .select_related('manufacturer', 'model', 'badge', 'category', 'body')
-        .defer('extra_features', 'markers', 'options', 'description',
-               'inspection_notes', 'inspection_image')
-    }
-    page_obj.object_list = [_page_rows[i] for i in _page_ids if i in _page_rows]
+    page_obj.object_list = cards.fetch(page_obj.object_list)
 
     # ── "Between auctions" note ── When the auction tab is empty because the
     # last auction ended (and the visitor set no filters), show a friendly
@@ -1785,7 +1817,7 @@ def car_list(request):
 
         # If ANY of the three auction caches is cold, rebuild all from one scan
         if manufacturers is None or static_filters is None or popular_manufacturers is None:
-            _auction_qs = ApiCar.objects.filter(category__name='auction').exclude(auction_date__lt=now)
+            _auction_qs = ApiCar.objects.filter(category__name='auction', is_live=True)
 
             # --- manufacturers sidebar list ---
             _mfr_ids = set(_auction_qs.values_list('manufacturer_id', flat=True).distinct())
@@ -1793,7 +1825,7 @@ def car_list(request):
                 Manufacturer.objects.filter(id__in=_mfr_ids)
                 .annotate(car_count=Count(
                     'apicar',
-                    filter=Q(apicar__category__name='auction') & ~Q(apicar__auction_date__lt=now),
+                    filter=Q(apicar__category__name='auction', apicar__is_live=True),
                 ))
                 .order_by('-car_count')
             )
@@ -1856,158 +1888,19 @@ def car_list(request):
             )
             cache.set(_mfr_cache_key, manufacturers, 60 * 15)
 
-    # Only load models/badges when manufacturer/model is selected, scoped to car_type
+    # Only load models/badges when manufacturer/model is selected, scoped to
+    # car_type — read straight from the catalog rollup as plain tuples.
+    _rollup_tab = rollup.types_for(car_type, enabled_market_names)
     if sel_manufacturers:
-        _mfr_key_part = sel_manufacturers[0] if len(sel_manufacturers) == 1 else '-'.join(sorted(sel_manufacturers))
-        if car_type == 'auction':
-            _models_cache_key = f"car_list_v2:models_auction_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _auction_model_ids = list(
-                    ApiCar.objects.filter(
-                        category__name='auction', manufacturer_id__in=sel_manufacturers
-                    ).exclude(auction_date__lt=now)
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_auction_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=Q(apicar__category__name='auction') & ~Q(apicar__auction_date__lt=now) & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
-        elif car_type == 'kbchachacha':
-            _models_cache_key = f"car_list_v2:models_kbchachacha_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _kb_model_ids = list(
-                    ApiCar.objects.filter(
-                        category__name='kbchachacha', manufacturer_id__in=sel_manufacturers
-                    )
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_kb_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=Q(apicar__category__name='kbchachacha') & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
-        elif car_type in enabled_market_names:
-            _models_cache_key = f"car_list_v2:models_{car_type}_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _mkt_model_ids = list(
-                    ApiCar.objects.filter(
-                        category__name=car_type, manufacturer_id__in=sel_manufacturers
-                    )
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_mkt_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=Q(apicar__category__name=car_type) & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
-        elif car_type == 'cars':
-            _models_cache_key = f"car_list_v2:models_cars_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _cars_model_ids = list(
-                    ApiCar.objects.filter(manufacturer_id__in=sel_manufacturers, category__isnull=True)
-                    .exclude(body__name='truck')
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_cars_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=Q(apicar__category__isnull=True) & ~Q(apicar__body__name='truck') & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
-        elif car_type == 'truck':
-            _models_cache_key = f"car_list_v2:models_truck_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _truck_model_ids = list(
-                    ApiCar.objects.filter(manufacturer_id__in=sel_manufacturers, body__name='truck', category__isnull=True)
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_truck_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=Q(apicar__category__isnull=True) & Q(apicar__body__name='truck') & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
-        else:
-            _models_cache_key = f"car_list_v2:models_cnt:{_mfr_key_part}"
-            models_qs = cache.get(_models_cache_key)
-            if models_qs is None:
-                _model_ids = list(
-                    ApiCar.objects.filter(manufacturer_id__in=sel_manufacturers)
-                    .filter(Q(category__isnull=True) | Q(category__name='auction'))
-                    .exclude(category__name='auction', auction_date__lt=now)
-                    .values_list('model_id', flat=True).distinct()
-                )
-                models_qs = list(
-                    CarModel.objects.filter(id__in=_model_ids)
-                    .annotate(car_count=Count(
-                        'apicar',
-                        filter=(Q(apicar__category__isnull=True) | Q(apicar__category__name='auction')) & ~Q(apicar__category__name='auction', apicar__auction_date__lt=now) & Q(apicar__manufacturer_id__in=sel_manufacturers),
-                    ))
-                    .order_by('-car_count')
-                )
-                for m in models_qs:
-                    setattr(m, 'name_ar', car_models_dict.get(m.name.lower()))
-                cache.set(_models_cache_key, models_qs, 60 * 15)
+        models_qs = [
+            m._replace(name_ar=car_models_dict.get(m.name.lower()))
+            for m in rollup.models(_rollup_tab, sel_manufacturers)
+        ]
     else:
         models_qs = []
 
     if sel_models:
-        _mdl_key_part = sel_models[0] if len(sel_models) == 1 else '-'.join(sorted(sel_models))
-        _badges_cache_key = f"car_list_v3:badges_cnt:{_mdl_key_part}:{car_type or 'all'}"
-        badges = cache.get(_badges_cache_key)
-        if badges is None:
-            _badge_filter = (
-                _car_type_scope(car_type, enabled_market_names, prefix='apicar__')
-                & ~Q(apicar__category__name='auction', apicar__auction_date__lt=now)
-                & Q(apicar__model_id__in=sel_models)
-            )
-            if car_type == 'cars':
-                _badge_filter &= ~Q(apicar__body__name='truck')
-            badges = list(
-                CarBadge.objects.filter(model_id__in=sel_models)
-                .annotate(
-                    car_count=Count('apicar', filter=_badge_filter),
-                    max_year=Max('apicar__year', filter=_badge_filter),
-                )
-                .filter(car_count__gt=0)
-                # Newest generation first (by latest model year), count as tiebreaker.
-                .distinct().order_by(F('max_year').desc(nulls_last=True), '-car_count')
-            )
-            cache.set(_badges_cache_key, badges, 60 * 15)
+        badges = rollup.badges(_rollup_tab, sel_models)
     else:
         badges = []
 
@@ -2030,7 +1923,7 @@ def car_list(request):
             _base_qs = ApiCar.objects.filter(category__isnull=True, body__name='truck')
         else:
             _static_cache_key = f"car_list_v4:static_filters_all:{schema}"
-            _base_qs = ApiCar.objects.filter(Q(category__isnull=True) | Q(category__name='auction')).exclude(category__name='auction', auction_date__lt=now)
+            _base_qs = ApiCar.objects.filter(Q(category__isnull=True) | Q(category__name='auction'), is_live=True)
 
         static_filters = cache.get(_static_cache_key)
         if static_filters is None:
@@ -2087,7 +1980,7 @@ def car_list(request):
     _tab_count_key = f"car_list_v2:tab_counts_v4:{schema}"
     tab_counts = cache.get(_tab_count_key)
     if tab_counts is None:
-        _tab_base = ApiCar.objects.exclude(category__name='auction', auction_date__lt=now)
+        _tab_base = ApiCar.objects.filter(is_live=True)
         tab_counts = _tab_base.aggregate(
             count_all=Count('id', filter=Q(category__isnull=True) | Q(category__name='auction')),
             count_auction=Count('id', filter=Q(category__name='auction')),
@@ -2143,7 +2036,7 @@ def car_list(request):
             _pop_mfr_filter = Q(apicar__category__name=car_type)
         else:
             _pop_mfr_key = f"car_list_v3:popular_manufacturers:{schema}"
-            _pop_mfr_filter = (Q(apicar__category__isnull=True) | Q(apicar__category__name='auction')) & ~Q(apicar__category__name='auction', apicar__auction_date__lt=now)
+            _pop_mfr_filter = (Q(apicar__category__isnull=True) | Q(apicar__category__name='auction')) & Q(apicar__is_live=True)
         popular_manufacturers = cache.get(_pop_mfr_key)
         if popular_manufacturers is None:
             popular_manufacturers = list(
@@ -2325,6 +2218,7 @@ def car_list(request):
         'auction_break':         auction_break,
         'last_auction_end':      last_auction_end,
         'sel_no_accident':       sel_no_accident,
+        'sel_price_flag':        sel_price_flag,
     }
     # HTMX partial request — return only the car grid fragment
     if request.htmx:
@@ -2346,10 +2240,9 @@ def car_list(request):
 
 
 def expired_auctions(request):
-    now = timezone.now()
     qs = ApiCar.objects.select_related(
         'manufacturer', 'model', 'badge', 'color', 'body'
-    ).filter(category__name='auction', auction_date__lt=now).only(
+    ).filter(category__name='auction', is_live=False).only(
         'id', 'title', 'slug', 'image', 'price', 'year', 'mileage',
         'status', 'lot_number', 'auction_date', 'auction_name', 'created_at',
         'manufacturer__id', 'manufacturer__name', 'manufacturer__name_ar',
@@ -2393,10 +2286,16 @@ def api_models_by_manufacturer(request):
     car_type = request.GET.get('car_type')
     lang = request.GET.get('lang') or getattr(request, 'LANGUAGE_CODE', '') or ''
     schema = getattr(connection, 'schema_name', 'public')
-    _cache_key = f"api_models_v4:{schema}:{_tenant_catalog_sig(getattr(connection, 'tenant', None))}:{manufacturer_id}:ct:{car_type or 'all'}:lang:{lang or 'en'}"
-    cached = cache.get(_cache_key)
-    if cached is not None:
-        return JsonResponse(cached, safe=False)
+    _ttn = getattr(connection, 'tenant', None)
+    # Options + counts come from the catalog rollup (one index scan). Only a
+    # tenant catalog filter needs a live query, so only that result is cached.
+    _types = _rollup_types(car_type, _ttn)
+    _restricted = _ttn is not None and bool(getattr(_ttn, 'catalog_filter', None))
+    _cache_key = f"api_models_v5:{schema}:{_tenant_catalog_sig(_ttn)}:{manufacturer_id}:ct:{car_type or 'all'}:lang:{lang or 'en'}"
+    if _restricted:
+        cached = cache.get(_cache_key)
+        if cached is not None:
+            return JsonResponse(cached, safe=False)
 
     # Get manufacturer info for logo
     manufacturer_logo = None
@@ -2429,77 +2328,22 @@ def api_models_by_manufacturer(request):
         pass
     
     try:
-        # Optionally scope models to car_type (auction or cars) and localize names
-        now = timezone.now()
-
-        # Restrict to models the tenant's catalog filter allows (whitelist).
-        _ttn = getattr(connection, 'tenant', None)
-        _allowed_models = None
-        if _ttn is not None and (getattr(_ttn, 'catalog_filter', None)
-                or not getattr(_ttn, 'show_auctions', True) or not getattr(_ttn, 'show_encar', True)):
-            _allowed_models = set(_apply_tenant_catalog(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id), _ttn
-            ).values_list('model_id', flat=True))
-
-        _mnames = _tenant_market_names(_ttn)
-        if car_type == 'auction':
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id, category__name='auction')
-                .exclude(auction_date__lt=now)
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count('apicar', filter=Q(apicar__category__name='auction') & ~Q(apicar__auction_date__lt=now)))
-        elif car_type == 'kbchachacha':
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id, category__name='kbchachacha')
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count('apicar', filter=Q(apicar__category__name='kbchachacha')))
-        elif car_type in _mnames:
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id, category__name=car_type)
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count('apicar', filter=Q(apicar__category__name=car_type)))
-        elif car_type == 'cars':
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id, category__isnull=True)
-                .exclude(body__name='truck')
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count('apicar', filter=Q(apicar__category__isnull=True) & ~Q(apicar__body__name='truck')))
-        elif car_type == 'truck':
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id, body__name='truck', category__isnull=True)
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count('apicar', filter=Q(apicar__category__isnull=True) & Q(apicar__body__name='truck')))
+        if _types is not None:
+            options = rollup.models(_types, [manufacturer_id])
         else:
-            model_ids = list(
-                ApiCar.objects.filter(manufacturer_id=manufacturer_id)
-                .filter(Q(category__isnull=True) | Q(category__name='auction'))
-                .exclude(category__name='auction', auction_date__lt=now)
-                .values_list('model_id', flat=True).distinct()
-            )
-            qs = CarModel.objects.filter(id__in=model_ids)
-            qs = qs.annotate(car_count=Count(
-                'apicar',
-                filter=(Q(apicar__category__isnull=True) | Q(apicar__category__name='auction')) & ~Q(apicar__category__name='auction', apicar__auction_date__lt=now) & Q(apicar__manufacturer_id=manufacturer_id),
-            ))
-
-        if _allowed_models is not None:
-            qs = qs.filter(id__in=_allowed_models)
-        qs = qs.order_by('-car_count')
+            # The tenant's catalog filter: count the cars it shows, live.
+            counts = dict(
+                _car_type_base(car_type, timezone.now(), manufacturer_id=manufacturer_id)
+                .order_by().values_list('model_id').annotate(n=Count('id')))
+            options = sorted(
+                (rollup.ModelOption(m.id, m.name, m.name_ar, m.manufacturer_id, counts[m.id])
+                 for m in CarModel.objects.filter(id__in=counts)),
+                key=lambda m: (-m.car_count, m.id))
 
         from cars.templatetags.custom_filters import pretty_en
         models = []
-        for m in qs:
-            name_ar = getattr(m, 'name_ar', None) or car_models_dict.get(m.name.lower()) or m.name
+        for m in options:
+            name_ar = m.name_ar or car_models_dict.get(m.name.lower()) or m.name
             name_en = pretty_en(m.name)
             if lang and lang.startswith('ar'):
                 display_name = name_ar
@@ -2510,11 +2354,12 @@ def api_models_by_manufacturer(request):
                 'name': display_name,
                 'name_ar': name_ar,
                 'name_en': name_en,
-                'car_count': getattr(m, 'car_count', 0),
+                'car_count': m.car_count,
                 'manufacturer_logo': manufacturer_logo,
             })
 
-        cache.set(_cache_key, models, 60 * 30)  # 30 minutes
+        if _restricted:
+            cache.set(_cache_key, models, 60 * 30)  # 30 minutes
         return JsonResponse(models, safe=False)
     except Exception:
         return JsonResponse([], safe=False)
@@ -2524,62 +2369,11 @@ def api_badges_by_model(request):
     if not model_id:
         return JsonResponse([], safe=False)
 
-    schema = getattr(connection, 'schema_name', 'public')
-    car_type_key = request.GET.get('car_type') or 'all'
-    _cache_key = f"api_badges_v3:{schema}:{model_id}:ct:{car_type_key}"
-    cached = cache.get(_cache_key)
-    if cached is not None:
-        return JsonResponse(cached, safe=False)
-
-    # Scope badges to car_type via ApiCar membership so only badges that have
-    # at least one matching car are returned.
-    car_type = request.GET.get('car_type')
-    now = timezone.now()
-    _mnames = _tenant_market_names(getattr(connection, 'tenant', None))
-    if car_type == 'auction':
-        badge_ids = ApiCar.objects.filter(
-            model_id=model_id, category__name='auction'
-        ).exclude(auction_date__lt=now).values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = Q(apicar__category__name='auction') & ~Q(apicar__auction_date__lt=now) & Q(apicar__model_id=model_id)
-    elif car_type == 'kbchachacha':
-        badge_ids = ApiCar.objects.filter(
-            model_id=model_id, category__name='kbchachacha'
-        ).values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = Q(apicar__category__name='kbchachacha') & Q(apicar__model_id=model_id)
-    elif car_type in _mnames:
-        badge_ids = ApiCar.objects.filter(
-            model_id=model_id, category__name=car_type
-        ).values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = Q(apicar__category__name=car_type) & Q(apicar__model_id=model_id)
-    elif car_type == 'cars':
-        badge_ids = ApiCar.objects.filter(
-            model_id=model_id, category__isnull=True
-        ).exclude(body__name='truck').values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = Q(apicar__category__isnull=True) & ~Q(apicar__body__name='truck') & Q(apicar__model_id=model_id)
-    elif car_type == 'truck':
-        badge_ids = ApiCar.objects.filter(
-            model_id=model_id, body__name='truck', category__isnull=True
-        ).values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = Q(apicar__category__isnull=True) & Q(apicar__body__name='truck') & Q(apicar__model_id=model_id)
-    else:
-        badge_ids = ApiCar.objects.filter(model_id=model_id).filter(
-            Q(category__isnull=True) | Q(category__name='auction')
-        ).exclude(
-            category__name='auction', auction_date__lt=now
-        ).values_list('badge_id', flat=True).distinct()
-        _badge_count_filter = (Q(apicar__category__isnull=True) | Q(apicar__category__name='auction')) & ~Q(apicar__category__name='auction', apicar__auction_date__lt=now) & Q(apicar__model_id=model_id)
-
-    badges = list(
-        CarBadge.objects.filter(id__in=badge_ids)
-        .annotate(
-            car_count=Count('apicar', filter=_badge_count_filter),
-            max_year=Max('apicar__year', filter=_badge_count_filter),
-        )
-        # Newest generation first (by latest model year), count as tiebreaker.
-        .order_by(F('max_year').desc(nulls_last=True), '-car_count')
-        .values('id', 'name', 'car_count')
-    )
-    cache.set(_cache_key, badges, 60 * 30)  # 30 minutes
+    # Scope badges to car_type: only badges with at least one matching car,
+    # newest generation first (by latest model year), count as tiebreaker.
+    types = rollup.types_for(
+        request.GET.get('car_type'), _tenant_market_names(getattr(connection, 'tenant', None)))
+    badges = [b._asdict() for b in rollup.badges(types, [model_id])]
     return JsonResponse(badges, safe=False)
 
 
@@ -2590,7 +2384,7 @@ def _car_type_base(car_type, now, **filters):
     _tn = getattr(connection, 'tenant', None)
     qs = _apply_tenant_catalog(ApiCar.objects.filter(**filters), _tn)
     if car_type == 'auction':
-        return qs.filter(category__name='auction').exclude(auction_date__lt=now)
+        return qs.filter(category__name='auction', is_live=True)
     if car_type == 'kbchachacha':
         return qs.filter(category__name='kbchachacha')
     if car_type and car_type in _tenant_market_names(_tn):
@@ -2599,7 +2393,20 @@ def _car_type_base(car_type, now, **filters):
         return qs.filter(category__isnull=True).exclude(body__name='truck')
     if car_type == 'truck':
         return qs.filter(category__isnull=True, body__name='truck')
-    return qs.filter(Q(category__isnull=True) | Q(category__name='auction')).exclude(category__name='auction', auction_date__lt=now)
+    return qs.filter(Q(category__isnull=True) | Q(category__name='auction'), is_live=True)
+
+
+def _rollup_types(car_type, tenant):
+    """Catalog-rollup car_types for a tab under the tenant's auction/encar
+    toggles — or None when the tenant's catalog filter (price/damage/make
+    rules) means the counts must come from a live _car_type_base query."""
+    if tenant is not None and getattr(tenant, 'catalog_filter', None):
+        return None
+    return rollup.types_for(
+        car_type, _tenant_market_names(tenant),
+        show_auctions=getattr(tenant, 'show_auctions', True),
+        show_encar=getattr(tenant, 'show_encar', True),
+    )
 
 
 def api_model_versions_by_model(request):
@@ -2608,6 +2415,12 @@ def api_model_versions_by_model(request):
     if not model_id:
         return JsonResponse([], safe=False)
     car_type = request.GET.get('car_type')
+    types = _rollup_types(car_type, getattr(connection, 'tenant', None))
+    if types is not None:
+        return JsonResponse([
+            {'value': v, 'car_count': n, 'year_range': yr}
+            for v, n, yr in rollup.versions(types, model_id)
+        ], safe=False)
     schema = getattr(connection, 'schema_name', 'public')
     ck = f"api_modelversions_v1:{schema}:{model_id}:ct:{car_type or 'all'}"
     cached = cache.get(ck)
@@ -2634,6 +2447,12 @@ def api_engine_groups_by_version(request):
     if not model_id or not model_version:
         return JsonResponse([], safe=False)
     car_type = request.GET.get('car_type')
+    types = _rollup_types(car_type, getattr(connection, 'tenant', None))
+    if types is not None:
+        return JsonResponse([
+            {'value': v, 'car_count': n}
+            for v, n in rollup.engine_groups(types, model_id, model_version)
+        ], safe=False)
     schema = getattr(connection, 'schema_name', 'public')
     import hashlib
     mvk = hashlib.md5(model_version.encode('utf-8')).hexdigest()[:10]
@@ -2658,6 +2477,12 @@ def api_badges_by_engine(request):
     model_version = request.GET.get('model_version') or ''
     engine_group = request.GET.get('engine_group') or ''
     car_type = request.GET.get('car_type')
+    types = _rollup_types(car_type, getattr(connection, 'tenant', None))
+    if types is not None:
+        return JsonResponse([
+            b._asdict() for b in
+            rollup.badges(types, [model_id], model_version, engine_group, newest_first=False)
+        ], safe=False)
     schema = getattr(connection, 'schema_name', 'public')
     import hashlib
     sk = hashlib.md5(f"{model_version}|{engine_group}".encode('utf-8')).hexdigest()[:10]
@@ -2681,54 +2506,64 @@ def api_badges_by_engine(request):
     return JsonResponse(badges, safe=False)
 
 
+def _similar_tier(car, other):
+    """Match tier of `other` for `car`'s similar-cars list (lower is closer):
+    0 model+badge+year, 1 model+badge, 2 model, 3 make only."""
+    if other.model_id != car.model_id:
+        return 3
+    if other.badge_id != car.badge_id:
+        return 2
+    return 0 if other.year == car.year else 1
+
+
+def _similar_order(car, cars):
+    """Sort candidates the way the ranked query does: tier, then newest."""
+    cars = sorted(cars, key=lambda c: c.created_at, reverse=True)
+    cars.sort(key=lambda c: c.year, reverse=True)
+    cars.sort(key=lambda c: _similar_tier(car, c))
+    return cars
+
+
 def _get_similar_cars(car, count=6):
     """
-    Return up to `count` similar cars matching make + model + badge + year.
-    Falls back gracefully if not enough exact matches:
-      1. make + model + badge + year        (exact)
-      2. make + model + badge               (any year)
-      3. make + model                       (any badge/year)
-      4. make only                          (fill remaining slots)
+    Return up to `count` similar cars of the same make, ranked by match tier:
+      0. make + model + badge + year        (exact)
+      1. make + model + badge               (any year)
+      2. make + model                       (any badge/year)
+      3. make only                          (fill remaining slots)
+    newest first within a tier.
+
+    Reads the nightly SimilarCars list (compute_similar_cars) when there is
+    one: a single pk lookup, filtered by tenant visibility. When there isn't,
+    or too few of its cars are visible on this site, one ranked query scores
+    every candidate by tier in SQL and returns the top `count`. Either way
+    the cars are rendered from their CarCards.
     """
     base_qs = (
         _apply_tenant_catalog(ApiCar.objects, getattr(connection, 'tenant', None))
-        .filter(manufacturer=car.manufacturer, status='available')
+        .filter(manufacturer_id=car.manufacturer_id, status='available')
         .exclude(pk=car.pk)
-        .select_related('manufacturer', 'model', 'badge')
-        .order_by('-year', '-created_at')
     )
 
-    results = []
-    seen_ids = set()
-
-    def _add(qs, limit):
-        for c in qs[:limit]:
-            if c.pk not in seen_ids:
-                seen_ids.add(c.pk)
-                results.append(c)
-
-    remaining = count
-
-    # 1 — exact: same model + badge + year
-    if car.model_id and car.badge_id and car.year:
-        _add(base_qs.filter(model=car.model, badge=car.badge, year=car.year), remaining)
-        remaining = count - len(results)
-
-    # 2 — same model + badge, any year
-    if remaining and car.model_id and car.badge_id:
-        _add(base_qs.filter(model=car.model, badge=car.badge).exclude(pk__in=seen_ids), remaining)
-        remaining = count - len(results)
-
-    # 3 — same model, any badge/year
-    if remaining and car.model_id:
-        _add(base_qs.filter(model=car.model).exclude(pk__in=seen_ids), remaining)
-        remaining = count - len(results)
-
-    # 4 — same make only (fill remaining slots)
-    if remaining:
-        _add(base_qs.exclude(pk__in=seen_ids), remaining)
-
-    return results
+    precomputed = base_qs.filter(pk__in=RawSQL(
+        "SELECT (jsonb_array_elements_text(neighbour_ids))::bigint "
+        "FROM cars_similarcars WHERE car_id = %s", [car.pk],
+    )).values_list('pk', flat=True)
+    results = _similar_order(car, cards.fetch(precomputed))[:count]
+    if len(results) == count:
+        return results
+
+    tier = Case(
+        When(model_id=car.model_id, badge_id=car.badge_id, year=car.year, then=Value(0)),
+        When(model_id=car.model_id, badge_id=car.badge_id, then=Value(1)),
+        When(model_id=car.model_id, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )
+    return cards.fetch(
+        base_qs.annotate(similar_tier=tier).order_by('similar_tier', '-year', '-created_at')
+        .values_list('pk', flat=True)[:count]
+    )
 
 
 def car_detail_by_pk(request, pk):
@@ -2739,69 +2574,25 @@ def car_detail_by_pk(request, pk):
     return redirect('car_detail', slug=str(pk), permanent=True)
 
 
-_ENCAR_VEHICLE_API = "https://api.encar.com/v1/readside/vehicle/{}"
-
-
-def _ensure_origin_price(car):
-    """Lazily fetch the Encar grade base price (category.originPrice, 만원) the
-    first time a car's detail page is viewed, and store it on extra_features so
-    later views (and the price comparison) reuse it.
-
-    Stores 0 when Encar has no data / the listing is gone (404) so we don't
-    re-fetch on every view; transient network errors are left unstored so a
-    later view can retry. Best-effort: never raises into the request.
-    """
-    ef = car.extra_features or {}
-    if 'originPrice' in ef:
-        return
-    vid = ef.get('vehicleId')
-    if not vid:
-        return
-    try:
-        r = requests.get(
-            _ENCAR_VEHICLE_API.format(vid),
-            timeout=2.5,
-            headers={'User-Agent': 'Mozilla/5.0', 'Referer': 'https://fem.encar.com/',
-                     'Accept': 'application/json'},
-        )
-    except requests.RequestException:
-        return  # transient — allow a retry on a later view
-    val = None
-    if r.status_code == 200:
-        try:
-            val = (r.json().get('category') or {}).get('originPrice')
-        except ValueError:
-            val = None
-    elif r.status_code != 404:
-        return  # unexpected error — retry later, don't poison with 0
-    try:
-        ef['originPrice'] = int(val) if val else 0
-    except (TypeError, ValueError):
-        ef['originPrice'] = 0
-    car.extra_features = ef
-    try:
-        car.save(update_fields=['extra_features'])
-    except Exception:
-        pass
-
-
 def _is_auction(car):
     cat = getattr(car, 'category', None)
     return bool(cat and (cat.name or '').lower() == 'auction')
 
 
-def _build_price_comparison(car):
+def _build_price_comparison(car, ef=None):
     """Encar 신차대비 (vs new-car) price comparison for the detail page.
 
     New-car price = grade base (extra_features.originPrice, 만원) + the actually
     fitted choice options (optionsChoice entries whose optionCd is in
     options.choice). Returns KRW values (for the data-price-krw converter) plus
     the saving and the current/new percentage, or None when data is missing or
-    the current price isn't below the new-car price.
+    the current price isn't below the new-car price. `ef` overrides
+    car.extra_features (the detail page passes the few keys it loaded).
     """
     if _is_auction(car):
         return None  # comparison is meaningless for auctions (price is a starting bid)
-    ef = car.extra_features or {}
+    if ef is None:
+        ef = car.extra_features or {}
     try:
         origin = int(ef.get('originPrice'))
     except (TypeError, ValueError):
@@ -2836,13 +2627,17 @@ def _build_price_comparison(car):
     }
 
 
+@query_budget(30)
 def car_detail(request, slug):
     # Accept either a slug or a numeric string that was previously used as pk
     # Use select_related to fetch all related objects in one query
+    # The raw extra_features blob (inspection JSON, often tens of KB) is never
+    # loaded: the inspection panel comes from the precomputed render model and
+    # originPrice (written later by the enrichment worker) is read on its own.
     car = get_object_or_404(
         ApiCar.objects.select_related(
             'manufacturer', 'model', 'badge', 'color', 'seat_color', 'body', 'category'
-        ),
+        ).defer('extra_features').annotate(ef_origin_price=KT('extra_features__originPrice')),
         slug=slug,
     )
 
@@ -2858,7 +2653,7 @@ def car_detail(request, slug):
     # reachable by direct URL either (staff bypass so they can still manage it).
     _ctf_tenant = getattr(connection, 'tenant', None)
     if (_ctf_tenant is not None and not request.user.is_staff
-            and not _apply_tenant_catalog(ApiCar.objects.filter(pk=car.pk), _ctf_tenant).exists()):
+            and not _catalog_allows(car.pk, _ctf_tenant)):
         raise Http404("not in catalog")
 
     # Market cars (japan_market, …) are only reachable on tenants that enabled
@@ -2898,13 +2693,21 @@ def car_detail(request, slug):
         if request.user.is_authenticated:
             user_rating = SiteRating.objects.filter(car=car, user=request.user).first()
 
-    insp = _build_inspection_context(car.extra_features or {})
+    rm = inspection_render.for_car(car)
+    insp = inspection_render.detail_context(rm)
+
+    # The slice of extra_features the page and price comparison use.
+    _ef = {'record': rm['record'], 'optionsChoice': rm['optionsChoice'],
+           'vehicleId': rm['vehicleId']}
+    if car.ef_origin_price is not None:
+        _ef['originPrice'] = car.ef_origin_price
 
     # Non-blocking: render whatever we already know. If originPrice hasn't been
     # fetched yet, the template loads the comparison via AJAX (car_price_comparison).
-    _ef = car.extra_features or {}
     pc_pending = (bool(_ef.get('vehicleId')) and 'originPrice' not in _ef
                   and not _is_auction(car))
+    if pc_pending:
+        origin_price.enqueue([car.pk], origin_price.HIGH)
 
     # Shipping cost varies by car size — resolve the tier from the body type.
     # The tier name is also passed so the (multi-country) calculator JS can pick
@@ -2931,7 +2734,8 @@ def car_detail(request, slug):
         'car': car,
         'import_calc_shipping_value': import_calc_shipping_value,
         'import_calc_size_tier': import_calc_size_tier,
-        'price_comparison': _build_price_comparison(car),
+        'car_ef': _ef,
+        'price_comparison': _build_price_comparison(car, _ef),
         'pc_pending': pc_pending,
         'ratings': ratings,
         'avg_rating': avg_rating,
@@ -2966,16 +2770,22 @@ def car_detail(request, slug):
     return render(request, 'cars/car_detail.html', context)
 
 
+@query_budget(8)
 def car_price_comparison(request, slug):
-    """AJAX endpoint: lazily fetch originPrice from Encar and return the rendered
-    new-car comparison panel (theme-aware). Empty body when there's nothing to
-    show, so the page's placeholder simply removes itself."""
+    """AJAX endpoint: return the rendered new-car comparison panel (theme-aware).
+    Empty body when there's nothing to show, so the page's placeholder simply
+    removes itself. Never calls Encar: if originPrice hasn't been fetched yet the
+    car is queued at HIGH priority for enrich_origin_price and we answer 202,
+    which the page polls again shortly."""
     car = get_object_or_404(
         ApiCar.objects.select_related('manufacturer', 'model', 'category'), slug=slug
     )
     if _is_auction(car):
         return HttpResponse('')
-    _ensure_origin_price(car)
+    ef = car.extra_features or {}
+    if ef.get('vehicleId') and 'originPrice' not in ef:
+        origin_price.enqueue([car.pk], origin_price.HIGH)
+        return HttpResponse('', status=202)
     pc = _build_price_comparison(car)
     if not pc:
         return HttpResponse('')
@@ -3510,197 +3320,28 @@ def manufacturer_logo(request, manufacturer_id):
         return HttpResponse('', status=404)
 
 
-_ENCAR_BASE_IMG  = "https://ci.encar.com"
-_SEDAN_IMG       = "/static/images/car_sedan.png"
-_TRUCK_IMG       = "/static/images/car_truck.png"
-
-_PART_NAMES_AR = {
-    "P011": "غطاء المحرك",
-    "P021": "الجناح الأمامي (يسار)",
-    "P022": "الجناح الأمامي (يمين)",
-    "P031": "الباب الأمامي (يسار)",
-    "P032": "الباب الأمامي (يمين)",
-    "P033": "الباب الخلفي (يسار)",
-    "P034": "الباب الخلفي (يمين)",
-    "P041": "الصندوق الخلفي",
-    "P051": "حامل الرادياتير",
-    "P061": "اللوح الخلفي (يسار)",
-    "P062": "اللوح الخلفي (يمين)",
-    "P081": "عتبة الباب (يسار)",
-    "P082": "عتبة الباب (يمين)",
-    "P091": "إطار الزجاج الأمامي",
-    "P111": "العمود A (يسار)",
-    "P112": "العمود A (يمين)",
-    "P121": "العمود B (يسار)",
-    "P122": "العمود B (يمين)",
-    "P123": "العمود C (يسار)",
-    "P124": "العمود C (يمين)",
-    "P131": "عارضة الجانب (يسار أمام)",
-    "P132": "عارضة الجانب (يمين أمام)",
-    "P133": "عارضة الجانب (يسار خلف)",
-    "P134": "عارضة الجانب (يمين خلف)",
-    "P141": "أرضية أمامية",
-    "P142": "أرضية خلفية",
-    "P144": "عارضة العجلة الخلفية (يمين)",
-    "P151": "لوح السقف",
-    "P171": "الأرضية الخلفية",
-    "P181": "أرضية الصندوق",
-}
-
-_PART_POSITIONS = {
-    "P011": (50, 14), "P021": (17, 27), "P022": (83, 27),
-    "P031": (17, 41), "P032": (83, 41), "P033": (17, 54),
-    "P034": (83, 54), "P041": (50, 87), "P051": (50, 19),
-    "P061": (17, 67), "P062": (83, 67), "P081": (17, 61),
-    "P082": (83, 61), "P091": (50, 22), "P111": (17, 45),
-    "P112": (83, 45), "P121": (17, 32), "P122": (83, 32),
-    "P123": (17, 65), "P124": (83, 65), "P131": (11, 36),
-    "P132": (89, 36), "P133": (11, 63), "P134": (89, 63),
-    "P141": (17, 36), "P142": (17, 50), "P144": (83, 36),
-    "P151": (50, 30), "P171": (50, 82), "P181": (50, 90),
-}
-_STATUS_LABEL = {
-    "X": "Exchange / تغيير", "W": "Sheet Metal / رش",
-    "C": "Corrosion / صدأ",  "A": "Scratches / خدش",
-    "U": "Uneven / انبعاج",  "T": "Impairment / تلف",
-}
-_RANK_LABEL = {"RANK_ONE": "Rank 1", "RANK_TWO": "Rank 2"}
-_INNER_STATUS = {
-    "1":  ("ok",  "Normal / طبيعي"),    "2":  ("ok",  "Adequate / مناسب"),
-    "3":  ("ok",  "None / لا يوجد"),    "4":  ("bad", "Minor Leak / تسرب طفيف"),
-    "5":  ("bad", "Leak / تسرب"),        "6":  ("bad", "Minor Oil Leak / تسرب زيت طفيف"),
-    "7":  ("bad", "Oil Leak / تسرب زيت"), "8": ("bad", "Low / منخفض"),
-    "9":  ("bad", "Excess / زائد"),      "10": ("bad", "Fault / عطل"),
-    "11": ("bad", "Present / موجود"),
-}
-_SECTION_LABEL = {
-    "S00": ("Self-diagnosis", "التشخيص الذاتي"),
-    "S01": ("Engine",         "المحرك"),
-    "S02": ("Transmission",   "ناقل الحركة"),
-    "S03": ("Power Transfer", "نقل القوة"),
-    "S04": ("Steering",       "التوجيه"),
-    "S05": ("Brakes",         "الفرامل"),
-    "S06": ("Electrical",     "الكهرباء"),
-    "S07": ("Fuel System",    "نظام الوقود"),
-}
-
-
-def _build_inspection_context(extra):
-    """Return a dict of pre-rendered HTML strings for the inspection diagrams.
-    Safe to call from any view — pure function, no DB access."""
-    outers_data = extra.get("outers", [])
-    inners_data = extra.get("inners", [])
-    images_data = extra.get("images", [])
-
-    # ── outer panel badges & table ────────────────────────────────────────────
-    outer_badge_divs = []
-    structural_badge_divs = []
-    table_rows = []
-    for item in outers_data:
-        code     = item.get("type", {}).get("code", "")
-        name     = _PART_NAMES_AR.get(code) or item.get("type", {}).get("title", code)
-        statuses = item.get("statusTypes", [])
-        attrs    = item.get("attributes", [])
-        rank     = attrs[0] if attrs else ""
-        is_structural = code.startswith("P1")
-        for st in statuses:
-            sc  = st["code"]
-            tip = f"{name} · {_STATUS_LABEL.get(sc, sc)}"
-            pos = _PART_POSITIONS.get(code)
-            if pos:
-                left, top = pos
-                badge_html = (
-                    f'<div class="insp-badge {sc}" style="left:{left}%;top:{top}%" '
-                    f'data-tip="{tip}">{sc}</div>'
-                )
-                if is_structural:
-                    structural_badge_divs.append(badge_html)
-                else:
-                    outer_badge_divs.append(badge_html)
-            rank_lbl = _RANK_LABEL.get(rank, rank)
-            rank_cls = "insp-rank-1" if rank == "RANK_ONE" else "insp-rank-2"
-            table_rows.append(
-                f'<tr><td>{name}</td>'
-                f'<td><span class="insp-lb {sc}">{sc}</span> {_STATUS_LABEL.get(sc, sc)}</td>'
-                f'<td><span class="insp-rank {rank_cls}">{rank_lbl}</span></td></tr>'
-            )
-
-    # ── inner mechanical sections ─────────────────────────────────────────────
-    inner_sections_html = []
-    for section in inners_data:
-        sec_code = section.get("type", {}).get("code", "")
-        sec_en, sec_ar = _SECTION_LABEL.get(sec_code, (section.get("type", {}).get("title", sec_code), ""))
-        rows = []
-
-        def _walk(children):
-            for child in children:
-                st = child.get("statusType")
-                if st and st.get("code"):
-                    cls, lbl = _INNER_STATUS.get(str(st["code"]), ("", st.get("title", "")))
-                    rows.append(
-                        f'<div class="insp-check-row">'
-                        f'<span class="insp-check-lbl">{child.get("type", {}).get("title", "")}</span>'
-                        f'<span class="insp-chip {cls}">{lbl}</span>'
-                        f'</div>'
-                    )
-                if child.get("children"):
-                    _walk(child["children"])
-
-        _walk(section.get("children", []))
-        if rows:
-            inner_sections_html.append(
-                f'<div class="insp-section">'
-                f'<div class="insp-section-title">{sec_en}'
-                f' <span class="insp-section-ar">/ {sec_ar}</span></div>'
-                f'<div class="insp-checklist">{"".join(rows)}</div>'
-                f'</div>'
-            )
-
-    # ── inspection report images (scanned pages) ──────────────────────────────
-    insp_images = [
-        _ENCAR_BASE_IMG + img["path"]
-        for img in images_data
-        if isinstance(img, dict) and img.get("path")
-    ]
-
-    damage_count = sum(len(i.get("statusTypes", [])) for i in outers_data)
-
-    return {
-        "outer_badges_html":      "".join(outer_badge_divs),
-        "structural_badges_html": "".join(structural_badge_divs),
-        "table_rows_html":        "".join(table_rows),
-        "inner_html":             "".join(inner_sections_html),
-        "insp_images":            insp_images,
-        "damage_count":           damage_count,
-        "has_outer":              bool(outers_data),
-        "has_inspection":         "outers" in extra,
-        "has_inner":              bool(inner_sections_html),
-        "has_images":             bool(insp_images),
-        "sedan_img":              _SEDAN_IMG,
-        "truck_img":              _TRUCK_IMG,
-    }
-
-
 def car_report(request, lot_number):
     """
     Generate a dynamic inspection report for a car from the database.
     Mirrors the logic of report_from_csv.py but reads from ApiCar instead of CSV.
     """
     # ── lookup car ────────────────────────────────────────────────────────────
-    car = get_object_or_404(ApiCar, lot_number=lot_number)
+    car = get_object_or_404(
+        ApiCar.objects.select_related('manufacturer', 'model', 'badge', 'color', 'body')
+        .defer('extra_features'),
+        lot_number=lot_number,
+    )
     vid = lot_number
 
     # ── static / CDN blueprint image URLs ─────────────────────────────────────
-    BASE_IMG  = _ENCAR_BASE_IMG
-    SEDAN_IMG = _SEDAN_IMG
-    TRUCK_IMG = _TRUCK_IMG
+    BASE_IMG  = inspection_render.ENCAR_BASE_IMG
+    SEDAN_IMG = inspection_render.SEDAN_IMG
+    TRUCK_IMG = inspection_render.TRUCK_IMG
 
     # ── part positions for damage badges ──────────────────────────────────────
-    PART_POSITIONS = _PART_POSITIONS
-    STATUS_LABEL   = {k: v.split(" / ")[0] + " (" + v.split(" / ")[-1] + ")" if " / " in v else v for k, v in _STATUS_LABEL.items()}
-    RANK_LABEL     = _RANK_LABEL
-    INNER_STATUS   = _INNER_STATUS
-    SECTION_LABEL  = _SECTION_LABEL
+    PART_POSITIONS = inspection_render.PART_POSITIONS
+    STATUS_LABEL   = {k: v.split(" / ")[0] + " (" + v.split(" / ")[-1] + ")" if " / " in v else v for k, v in inspection_render.STATUS_LABEL.items()}
+    RANK_LABEL     = inspection_render.RANK_LABEL
     OPTION_NAMES = {
         "001": ("ABS", "نظام منع انغلاق المكابح"),
         "003": ("Airbag (Driver)", "وسادة هوائية (السائق)"),
@@ -3773,64 +3414,31 @@ def car_report(request, lot_number):
     }
 
     # ── helpers ────────────────────────────────────────────────────────────────
-    def fmt_date(s):
-        if s and len(str(s)) == 8 and str(s).isdigit():
-            s = str(s)
-            return f"{s[:4]}-{s[4:6]}-{s[6:]}"
-        return s or "—"
-
     def check_chip(val, true_class="ok", false_class="bad", true_label="Normal", false_label="Yes"):
         if val:
             return f'<span class="chip {true_class}">{true_label}</span>'
         return f'<span class="chip {false_class}">{false_label}</span>'
 
-    def extract_inners(inners):
-        sections = []
-        for section in inners:
-            sec_code = section.get("type", {}).get("code", "")
-            sec_en, sec_ar = SECTION_LABEL.get(sec_code, (section.get("type", {}).get("title", sec_code), ""))
-            rows = []
-            def walk(children):
-                for child in children:
-                    st = child.get("statusType")
-                    if st and st.get("code"):
-                        cls, lbl = INNER_STATUS.get(str(st["code"]), ("", st.get("title", "")))
-                        rows.append((child.get("type", {}).get("title", ""), cls, lbl))
-                    if child.get("children"):
-                        walk(child["children"])
-            walk(section.get("children", []))
-            if rows:
-                sections.append((sec_en, sec_ar, rows))
-        return sections
-
     def build_outer_badges_and_table(outers):
         outer_badge_divs = []
         structural_badge_divs = []
         table_rows = []
-        for item in outers:
-            code = item.get("type", {}).get("code", "")
-            name = _PART_NAMES_AR.get(code) or item.get("type", {}).get("title", code)
-            statuses = item.get("statusTypes", [])
-            attrs = item.get("attributes", [])
-            rank = attrs[0] if attrs else ""
-            is_structural = code.startswith("P1")
-            for st in statuses:
-                sc = st["code"]
-                tip = f"{name} · {STATUS_LABEL.get(sc, sc)}"
-                pos = PART_POSITIONS.get(code)
-                if pos:
-                    left, top = pos
-                    badge_html = (
-                        f'<div class="badge {sc}" style="left:{left}%;top:{top}%" '
-                        f'data-tip="{tip}">{sc}</div>'
-                    )
-                    if is_structural:
-                        structural_badge_divs.append(badge_html)
-                    else:
-                        outer_badge_divs.append(badge_html)
-                rank_lbl = RANK_LABEL.get(rank, rank)
-                rank_cls = "rank-1" if rank == "RANK_ONE" else "rank-2"
-                table_rows.append(f"""
+        for code, name, sc, rank in outers:
+            tip = f"{name} · {STATUS_LABEL.get(sc, sc)}"
+            pos = PART_POSITIONS.get(code)
+            if pos:
+                left, top = pos
+                badge_html = (
+                    f'<div class="badge {sc}" style="left:{left}%;top:{top}%" '
+                    f'data-tip="{tip}">{sc}</div>'
+                )
+                if code.startswith("P1"):
+                    structural_badge_divs.append(badge_html)
+                else:
+                    outer_badge_divs.append(badge_html)
+            rank_lbl = RANK_LABEL.get(rank, rank)
+            rank_cls = "rank-1" if rank == "RANK_ONE" else "rank-2"
+            table_rows.append(f"""
         <tr>
           <td>{name}</td>
           <td><span class="lb {sc}" style="display:inline-flex">{sc}</span>&nbsp; {STATUS_LABEL.get(sc, sc)}</td>
@@ -3856,8 +3464,10 @@ def car_report(request, lot_number):
     except (ValueError, AttributeError):
         displacement = 0
 
-    extra        = car.extra_features or {}
-    record_data  = extra.get("record") or {}
+    # Inspection data comes from the precomputed render model, not the raw
+    # extra_features blob (see cars/inspection_render.py).
+    rm           = inspection_render.for_car(car)
+    record_data  = rm["record"] or {}
     options_raw  = car.options or {}
     images_raw   = car.images or []
 
@@ -3896,48 +3506,38 @@ def car_report(request, lot_number):
         options_html = '<span style="color:#bbb;font-size:12px">No options data available</span>'
 
     # ── inspection data ────────────────────────────────────────────────────────
-    master      = extra.get("master", {})
-    detail      = (master.get("detail") or {})
-    outers_data = extra.get("outers", [])
-    inners_data = extra.get("inners", [])
-    insp_images = [
-        BASE_IMG + img["path"]
-        for img in extra.get("images", [])
-        if isinstance(img, dict) and img.get("path")
-    ]
-
-    record_no  = detail.get("recordNo", "—")
-    issue_date = fmt_date(detail.get("issueDate"))
-    valid_end  = fmt_date(detail.get("validityEndDate"))
-    first_reg  = fmt_date(detail.get("firstRegistrationDate"))
-    vin        = car.vin or detail.get("vin", "—")
-    insp_km    = detail.get("mileage") or mileage
-    co         = detail.get("coout", "—")
-    hc         = detail.get("hcout", "—")
-    engine_ok  = detail.get("engineCheck", "N") == "Y"
-    trans_ok   = detail.get("trnsCheck",   "N") == "Y"
-    waterlog   = detail.get("waterlog", False)
-    tuning     = detail.get("tuning", False)
-    simple_rep = master.get("simpleRepair", False)
-    accident   = master.get("accdient", False)
-    usage_types = detail.get("usageChangeTypes", [])
-    usage_str  = ", ".join(u.get("title", "") for u in usage_types) if usage_types else "None"
-    guarantee_type = detail.get("guarantyType") or {}
-    guarantee  = guarantee_type.get("title", "—") if isinstance(guarantee_type, dict) else "—"
+    d           = rm["detail"]
+    insp_images = rm["images"]
+
+    record_no  = d["record_no"]
+    issue_date = d["issue_date"]
+    valid_end  = d["valid_end"]
+    first_reg  = d["first_reg"]
+    vin        = car.vin or d["vin"]
+    insp_km    = d["mileage"] or mileage
+    co         = d["co"]
+    hc         = d["hc"]
+    engine_ok  = d["engine_ok"]
+    trans_ok   = d["trans_ok"]
+    waterlog   = d["waterlog"]
+    tuning     = d["tuning"]
+    simple_rep = d["simple_repair"]
+    accident   = d["accident"]
+    usage_str  = d["usage"]
+    guarantee  = d["guarantee"]
 
     # ── outer panel badges & table ─────────────────────────────────────────────
-    outer_badge_divs, structural_badge_divs, table_rows = build_outer_badges_and_table(outers_data)
+    outer_badge_divs, structural_badge_divs, table_rows = build_outer_badges_and_table(rm["outers"])
     outer_badges_html      = "\n          ".join(outer_badge_divs)
     structural_badges_html = "\n          ".join(structural_badge_divs)
-    damage_count = sum(len(i.get("statusTypes", [])) for i in outers_data)
+    damage_count = rm["damage_count"]
     table_rows_html = "".join(table_rows) if table_rows else (
         '<tr><td colspan="4" style="color:#aaa;text-align:center">No outer panel damage recorded</td></tr>'
     )
 
     # ── inner mechanical checklist ─────────────────────────────────────────────
-    inner_sections = extract_inners(inners_data)
     inner_html_parts = []
-    for sec_en, sec_ar, rows in inner_sections:
+    for sec_en, sec_ar, rows in rm["inners"]:
         rows_html = "".join(
             f'<div class="check-row"><span class="lbl">{name}</span>'
             f'<span class="chip {cls}">{lbl}</span></div>'
@@ -4329,8 +3929,10 @@ def car_report(request, lot_number):
 
 def car_availability_check(request, lot_number):
     """
-    Proxy Encar API to check whether a car lot is still available, and
-    refresh our stored price when Encar's listing price has changed.
+    Check whether a car lot is still listed on Encar, and refresh our stored
+    price when Encar's listing price has changed. Goes through
+    cars.encar_check, so a lot checked within the last few minutes (by another
+    visitor or the availability sweep) is answered from cache.
 
     Returns JSON: { available, price, price_changed }
       available     true|false|null  (200 / 404 / error)
@@ -4338,47 +3940,23 @@ def car_availability_check(request, lot_number):
       price_changed true if we updated our DB price this call
     """
     try:
-        url = (
-            f"https://api.encar.com/v1/readside/vehicle/{lot_number}"
-            "?include=ADVERTISEMENT"
-        )
-        req = urllib.request.Request(url, headers={
-            'accept': '*/*',
-            'origin': 'https://fem.encar.com',
-            'referer': 'https://fem.encar.com/',
-            'user-agent': (
-                'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/124.0.0.0 Safari/537.36'
-            ),
-        })
-        payload = None
-        try:
-            with urllib.request.urlopen(req, timeout=6) as resp:
-                available = resp.status == 200
-                if available:
-                    payload = json.loads(resp.read().decode('utf-8'))
-        except urllib.error.HTTPError as http_err:
-            available = False if http_err.code == 404 else None
-
-        new_price = None
+        res = encar_check.check_vehicle(lot_number, timeout=6)
+        available = {encar_check.OK: True, encar_check.GONE: False}.get(res.status)
+
+        new_price = res.price if available else None
         old_price = None
         price_changed = False
-        if available and isinstance(payload, dict):
-            adv = payload.get('advertisement') or {}
-            raw_price = adv.get('price')
-            if isinstance(raw_price, (int, float)) and raw_price > 0:
-                new_price = int(raw_price) * 10000
-                from django_tenants.utils import schema_context, get_public_schema_name
-                with schema_context(get_public_schema_name()):
-                    try:
-                        car = ApiCar.objects.only('id', 'price').get(lot_number=lot_number)
-                        if car.price != new_price:
-                            old_price = car.price
-                            ApiCar.objects.filter(pk=car.pk).update(price=new_price)
-                            price_changed = True
-                    except ApiCar.DoesNotExist:
-                        pass
+        if new_price:
+            from django_tenants.utils import schema_context, get_public_schema_name
+            with schema_context(get_public_schema_name()):
+                try:
+                    car = ApiCar.objects.only('id', 'price').get(lot_number=lot_number)
+                    if car.price != new_price:
+                        old_price = car.price
+                        # Through update_prices so the listing card follows.
+                        price_changed = bool(encar_check.update_prices({car.pk: new_price}))
+                except ApiCar.DoesNotExist:
+                    pass
 
         return JsonResponse({
             'available': available,
@@ -0,0 +1,177 @@
+"""Materialised tenant catalogs (VisibleCatalog / VisibleCar).
+
+A tenant's catalog_filter (year / price / make / model whitelists, damage
+exclusions) used to be re-applied as extra WHERE clauses — damage subqueries
+included — on every listing, facet, home, sitemap and detail query. Instead,
+the ids it lets through are written once per distinct rule set:
+
+    signature(tenant) = md5(show_auctions, show_encar, catalog_filter,
+                            SAR price factor when the rules filter on price)
+
+Tenants with the same rules share a signature and so one set. Catalog
+queries then semi-join (sig, car_id) — `restrict(qs, sig)` — and the detail
+page's visibility check is a primary-key probe, `contains(sig, car_id)`.
+
+    run_encar_import / import_auction_json · catalog_jobs worker ─┐
+    update_exchange_rates (cron) ─────────────────────────────────┼─> refresh_all()
+    tenant settings save (tenants.signals → catalog_jobs) ────────┼─> materialize(tenant)
+    encar_check.update_prices · import_encar_fast ────────────────┘─> refresh_cars(ids / since)
+
+Tenants without a catalog_filter get None: their toggles are two category
+filters, cheaper than any join. A signature that has not been built yet (a
+new rule set, a changed exchange rate) is answered by the live rules, so the
+set is only ever an accelerator. Repriced and newly inserted cars are
+re-decided in every built set by refresh_cars(), without a rebuild.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django_tenants.utils import get_public_schema_name, schema_context
+
+READY_TTL = 300  # seconds a built/not-built answer is cached per signature
+
+
+def _rule_sets(cf):
+    if 'auction' in cf or 'encar' in cf:
+        return [cf.get('auction') or {}, cf.get('encar') or {}]
+    return [cf]
+
+
+def signature(tenant):
+    """Signature of the tenant's catalog rules, or None when it has none."""
+    cf = getattr(tenant, 'catalog_filter', None) or {}
+    if tenant is None or not cf:
+        return None
+    factor = None
+    if any(r.get('price_min') or r.get('price_max') for r in _rule_sets(cf)):
+        from cars.views import _catalog_rate_factor
+        factor = round(_catalog_rate_factor(tenant), 12)
+    raw = json.dumps([
+        int(getattr(tenant, 'show_auctions', True)),
+        int(getattr(tenant, 'show_encar', True)),
+        cf,
+        factor,
+    ], sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _ready_key(sig):
+    return f"visible_catalog:{sig}"
+
+
+def is_ready(sig):
+    """Whether the set for `sig` has been built."""
+    ready = cache.get(_ready_key(sig))
+    if ready is None:
+        from cars.models import VisibleCatalog
+        with schema_context(get_public_schema_name()):
+            ready = VisibleCatalog.objects.filter(sig=sig).exists()
+        cache.set(_ready_key(sig), ready, READY_TTL)
+    return ready
+
+
+def restrict(qs, sig):
+    """Narrow an ApiCar queryset to the visible set of `sig`."""
+    from cars.models import VisibleCar
+    return qs.filter(id__in=VisibleCar.objects.filter(sig=sig).values('car_id'))
+
+
+def contains(sig, car_id):
+    from cars.models import VisibleCar
+    with schema_context(get_public_schema_name()):
+        return VisibleCar.objects.filter(sig=sig, car_id=car_id).exists()
+
+
+def materialize(tenant, force=False):
+    """Build the tenant's visible set unless its signature is already built
+    (or always, with force=True). Returns the signature, or None."""
+    from cars.models import ApiCar, VisibleCatalog
+    from cars.views import _tenant_catalog_rules
+
+    sig = signature(tenant)
+    if sig is None:
+        return None
+    with schema_context(get_public_schema_name()):
+        if not force and VisibleCatalog.objects.filter(sig=sig).exists():
+            return sig
+        sql, params = _tenant_catalog_rules(ApiCar.objects.all(), tenant).values('id').query.sql_with_params()
+        # Readers keep the previous set until the transaction commits.
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute("SET LOCAL statement_timeout = 0")
+            cur.execute("DELETE FROM cars_visiblecar WHERE sig = %s", [sig])
+            cur.execute(f"INSERT INTO cars_visiblecar (sig, car_id) SELECT %s, v.id FROM ({sql}) v",
+                        [sig, *params])
+            VisibleCatalog.objects.update_or_create(sig=sig, defaults={'car_count': cur.rowcount})
+    cache.set(_ready_key(sig), True, READY_TTL)
+    return sig
+
+
+def refresh_all():
+    """Rebuild one set per distinct signature across all tenants and drop the
+    sets no tenant uses any more. Returns {sig: car_count}."""
+    from cars.models import VisibleCatalog
+    from tenants.models import Tenant
+
+    public = get_public_schema_name()
+    by_sig = {}
+    for tenant in Tenant.objects.exclude(schema_name=public):
+        sig = signature(tenant)
+        if sig:
+            by_sig.setdefault(sig, tenant)
+    for tenant in by_sig.values():
+        materialize(tenant, force=True)
+    with schema_context(public):
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute("DELETE FROM cars_visiblecar WHERE NOT (sig = ANY(%s))", [list(by_sig)])
+            stale = list(VisibleCatalog.objects.exclude(sig__in=by_sig).values_list('sig', flat=True))
+            VisibleCatalog.objects.filter(sig__in=stale).delete()
+        cache.delete_many([_ready_key(s) for s in stale])
+        return dict(VisibleCatalog.objects.values_list('sig', 'car_count'))
+
+
+def refresh_cars(ids=None, since=None):
+    """Re-decide the given cars — by id, or every car updated at or after
+    `since` — in each built set, after they were repriced or inserted.
+    Returns the membership rows written."""
+    from django.db.models import F
+
+    from cars.models import ApiCar, VisibleCatalog
+    from cars.views import _tenant_catalog_rules
+    from tenants.models import Tenant
+
+    if ids is not None:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        cars = ApiCar.objects.filter(id__in=ids)
+    elif since is not None:
+        cars = ApiCar.objects.filter(updated_at__gte=since)
+    else:
+        raise ValueError("refresh_cars() needs ids or since")
+
+    public = get_public_schema_name()
+    with schema_context(public):
+        built = set(VisibleCatalog.objects.values_list('sig', flat=True))
+    by_sig = {}
+    for tenant in Tenant.objects.exclude(schema_name=public) if built else ():
+        sig = signature(tenant)
+        if sig in built:
+            by_sig.setdefault(sig, tenant)
+
+    written = 0
+    with schema_context(public):
+        ids_sql, ids_params = cars.values('id').query.sql_with_params()
+        for sig, tenant in by_sig.items():
+            sql, params = _tenant_catalog_rules(cars, tenant).values('id').query.sql_with_params()
+            with transaction.atomic(), connection.cursor() as cur:
+                cur.execute(f"DELETE FROM cars_visiblecar WHERE sig = %s AND car_id IN ({ids_sql})",
+                            [sig, *ids_params])
+                removed = cur.rowcount
+                cur.execute(f"INSERT INTO cars_visiblecar (sig, car_id) SELECT %s, v.id FROM ({sql}) v "
+                            "ON CONFLICT DO NOTHING", [sig, *params])
+                written += cur.rowcount
+                VisibleCatalog.objects.filter(sig=sig).update(
+                    car_count=F('car_count') + cur.rowcount - removed)
+    return written
@@ -13,7 +13,7 @@ import time
 
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db import connection
-from django.http import HttpResponseNotFound
+from django.http import HttpResponse, HttpResponseNotFound
 from django.shortcuts import render
 
 
@@ -150,14 +150,19 @@ def vps_health(request):
     # ── Traffic (from TrafficCounterMiddleware's Redis counters) ──
     try:
         from django_redis import get_redis_connection
-        r = get_redis_connection("default")
+        r = get_redis_connection("state")
         gm = time.gmtime()
         hour = time.strftime("%Y%m%d%H", gm)
         day = time.strftime("%Y%m%d", gm)
         prev_min = time.strftime("%Y%m%d%H%M", time.gmtime(time.time() - 60))
-        rate = int(r.get(f"traf:min:{prev_min}") or 0)
-        hour_h = {k.decode(): int(v) for k, v in (r.hgetall(f"traf:hour:{hour}") or {}).items()}
-        day_h = {k.decode(): int(v) for k, v in (r.hgetall(f"traf:day:{day}") or {}).items()}
+        pipe = r.pipeline(transaction=False)
+        pipe.get(f"traf:min:{prev_min}")
+        pipe.hgetall(f"traf:hour:{hour}")
+        pipe.hgetall(f"traf:day:{day}")
+        rate_raw, hour_raw, day_raw = pipe.execute()
+        rate = int(rate_raw or 0)
+        hour_h = {k.decode(): int(v) for k, v in (hour_raw or {}).items()}
+        day_h = {k.decode(): int(v) for k, v in (day_raw or {}).items()}
         name_by_schema = {}
         try:
             from tenants.models import Tenant
@@ -179,10 +184,36 @@ def vps_health(request):
 
     # ── Fleet rollups (owner overview) ──
     try:
-        from tenants.metrics import fleet_gsc, fleet_sales
+        from tenants.metrics import fleet_gsc, fleet_sales, fleet_traffic
         ctx["fleet_gsc"] = fleet_gsc()
         ctx["fleet_sales"] = fleet_sales()
+        per = fleet_traffic()
+        if per:
+            from tenants.models import Tenant
+            names = dict(Tenant.objects.values_list("schema_name", "name"))
+            ctx["fleet_traffic"] = [{"label": names.get(s) or s, **t}
+                                    for s, t in list(per.items())[:12]]
     except Exception:
         pass
 
     return render(request, "vps_health.html", ctx)
+
+
+def metrics(request):
+    """Prometheus scrape target (text exposition format), see tenants.telemetry.
+
+    Owner (public) schema only. Authorised by `Authorization: Bearer
+    $METRICS_TOKEN` (for the scraper) or a superuser session; anything else
+    gets a 404 so the endpoint isn't advertised.
+    """
+    if getattr(connection, "schema_name", "public") != "public":
+        return HttpResponseNotFound("Not found.")
+    import hmac
+    token = os.environ.get("METRICS_TOKEN", "")
+    auth = request.headers.get("Authorization", "")
+    ok = bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+    if not ok and not getattr(request.user, "is_superuser", False):
+        return HttpResponseNotFound("Not found.")
+
+    from tenants import telemetry
+    return HttpResponse(telemetry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -114,6 +114,7 @@ MIDDLEWARE = [
     "tenants.middleware.QueryStringGuardMiddleware",
     "django_tenants.middleware.main.TenantMainMiddleware",
     "tenants.middleware.TrafficCounterMiddleware",
+    "tenants.middleware.RequestProfileMiddleware",
     "tenants.middleware.BlockTenantAdminMiddleware",
     "tenants.middleware.TenantPublicSchemaMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -133,7 +134,7 @@ MIDDLEWARE = [
 
 if DEBUG:
     # Insert after GZipMiddleware (index 7 = after gzip at index 6)
-    MIDDLEWARE.insert(7, "debug_toolbar.middleware.DebugToolbarMiddleware")
+    MIDDLEWARE.insert(8, "debug_toolbar.middleware.DebugToolbarMiddleware")
     INTERNAL_IPS = ["127.0.0.1", "localhost"]
 
 ROOT_URLCONF = "cars_multi_site.urls"
@@ -219,7 +220,25 @@ if _REDIS_URL:
                 "IGNORE_EXCEPTIONS": True,  # Degrade gracefully if Redis is down
             },
             "KEY_PREFIX": "cars",
-        }
+        },
+        # Working state that must outlive a cache clear: queues, counters,
+        # buffered logs, quotas. Read through get_redis_connection("state").
+        # REDIS_STATE_URL puts it in its own database; by default it shares
+        # the cache's, which is safe because clearing the cache only deletes
+        # the "cars:" keys (cron_import.sh), never FLUSHDB.
+        "state": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": os.environ.get("REDIS_STATE_URL") or _REDIS_URL,
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                "CONNECTION_POOL_KWARGS": {
+                    "max_connections": 5,
+                },
+                "SOCKET_CONNECT_TIMEOUT": 5,
+                "SOCKET_TIMEOUT": 5,
+            },
+            "KEY_PREFIX": "state",
+        },
     }
 else:
     CACHES = {
@@ -241,6 +260,19 @@ ASSISTANT_MODEL = os.environ.get("ASSISTANT_MODEL", "claude-haiku-4-5")
 # tenant near $18/month; normal use is a tiny fraction of that.
 ASSISTANT_TENANT_DAILY_LIMIT = int(os.environ.get("ASSISTANT_TENANT_DAILY_LIMIT", "300"))
 ASSISTANT_USER_BURST_PER_MIN = int(os.environ.get("ASSISTANT_USER_BURST_PER_MIN", "8"))
+# Answers are cached per (normalised question, role, guide version); 0 disables.
+ASSISTANT_ANSWER_CACHE_SECONDS = int(os.environ.get("ASSISTANT_ANSWER_CACHE_SECONDS", str(60 * 60 * 24 * 7)))
+
+# Request profiling (tenants.profiling). Fraction of requests that get the full
+# SQL / HTTP / cache / template breakdown; every request is timed against
+# SLOW_REQUEST_MS. QUERY_BUDGET_STRICT turns @query_budget overruns into errors
+# (meant for the test suite).
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get("REQUEST_PROFILE_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "2000"))
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", "") == "1"
+
+# Public JSON API (/api/car/...): requests per minute per client IP.
+API_CAR_RATE_LIMIT_PER_MIN = int(os.environ.get("API_CAR_RATE_LIMIT_PER_MIN", "60"))
 
 
 # Password validation
@@ -366,6 +398,7 @@ OAUTH_RELAY_DOMAIN = os.environ.get("OAUTH_RELAY_DOMAIN", "").strip()
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "").strip()
 TELEGRAM_BOT_USERNAME = os.environ.get("TELEGRAM_BOT_USERNAME", "").strip().lstrip("@")
 TELEGRAM_WEBHOOK_SECRET = os.environ.get("TELEGRAM_WEBHOOK_SECRET", "").strip()
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
 _APPLE_CLIENT_ID = os.environ.get("APPLE_CLIENT_ID", "")        # Services ID, e.g. com.brand.signin
 _APPLE_KEY_ID = os.environ.get("APPLE_KEY_ID", "")
 _APPLE_TEAM_ID = os.environ.get("APPLE_TEAM_ID", "")
@@ -389,6 +422,9 @@ if _APPLE_CLIENT_ID and _APPLE_KEY_ID and _APPLE_TEAM_ID and _APPLE_PRIVATE_KEY:
     }
 
 EMAIL_BACKEND = "site_cars.email_backend.TenantEmailBackend"
+# Backend for queued broadcasts (tenants.notify): given each tenant's SMTP
+# settings and reused for a whole batch. Tests use the locmem backend.
+NOTIFY_EMAIL_BACKEND = os.environ.get("NOTIFY_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
 
 
 
@@ -447,6 +483,13 @@ OFLEET_API_BASE  = os.environ.get("OFLEET_API_BASE",  "https://ofleet0.com")
 OFLEET_USERNAME  = os.environ.get("OFLEET_USERNAME",  "")
 OFLEET_PASSWORD  = os.environ.get("OFLEET_PASSWORD",  "")
 
+# "ofleet" sends exports to the service above; "local" renders them here
+# (cars.pdf_local, via the render_pdf_exports command).
+PDF_EXPORT_BACKEND = os.environ.get("PDF_EXPORT_BACKEND", "ofleet")
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_PAGE_CACHE_DIR = os.environ.get(
+    "PDF_PAGE_CACHE_DIR", os.path.join(os.environ.get("TMPDIR", "/tmp"), "pdf_pages"))
+
 
 
 R2_ACCOUNT_ID=os.environ.get("R2_ACCOUNT_ID", "")
@@ -480,5 +523,6 @@ LOGGING = {
     },
     "loggers": {
         "django.request": {"handlers": ["console"], "level": "ERROR", "propagate": False},
+        "slow_requests": {"handlers": ["console"], "level": "WARNING", "propagate": False},
     },
 }
@@ -27,7 +27,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from tenants.views import site_settings, set_dashboard_password
 from tenants.sso_views import launch as sso_launch, enter as sso_enter
-from cars.vps_health import vps_health
+from cars.vps_health import metrics, vps_health
 from tenants import oauth_relay
 from tenants.telegram_views import telegram_webhook
 from billing.views import stripe_webhook
@@ -177,8 +177,7 @@ def sitemap_xml(request):
         tenant = getattr(_conn, "tenant", None)
         api_qs = ApiCar.objects.exclude(slug__isnull=True).exclude(slug="")
         # Expired auctions now 404 on their detail page — keep them out of the sitemap.
-        from django.utils import timezone as _tz
-        api_qs = api_qs.exclude(category__name="auction", auction_date__lt=_tz.now())
+        api_qs = api_qs.filter(is_live=True)
         # Only list reachable cars: encar (NULL category) + auctions + any market
         # this tenant has enabled. Non-enabled market cars 404, so keep them out.
         from django.db.models import Q as _Q
@@ -218,6 +217,7 @@ urlpatterns = [
     path("sitemap.xml", sitemap_xml),
     re_path(r"^(?P<fname>google[\w-]+\.html)$", gsc_verify_file),
     path("vps-health/", vps_health, name="vps_health"),
+    path("metrics", metrics, name="metrics"),
     path("admin/", admin.site.urls),
     path("settings/", site_settings, name="site_settings"),
     path("settings/password/", set_dashboard_password, name="set_dashboard_password"),
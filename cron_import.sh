@@ -11,14 +11,55 @@ python manage.py run_encar_import
 
 echo "==> [$(date -u)] Import complete"
 
+echo "==> Sweeping ended auctions..."
+python manage.py sweep_expired_listings || echo "==> Listing sweep failed (non-fatal)"
+
+# Re-score prices against their segments now that the catalog is current
+# (feeds the "suspicious price" filter and the dashboard report).
+echo "==> Detecting price anomalies..."
+python manage.py detect_price_anomalies --limit 0 || echo "==> Price anomaly detection failed (non-fatal)"
+
 # Fill Arabic names on anything the import just created. Only touches rows whose
 # name_ar is empty, so existing translations are never disturbed.
 echo "==> Setting Arabic names for new makes/models..."
 python manage.py set_car_arabic_names || echo "==> Arabic name fill failed (non-fatal)"
 
+# Inspection render payloads still stale: rows written outside the fast
+# importer, or every row after a RENDER_VERSION bump. Bounded; the site builds
+# the rest on the fly and the next run finishes them.
+echo "==> Rebuilding render payloads..."
+python manage.py rebuild_render_payloads --max-seconds 900 || echo "==> Render payload rebuild failed (non-fatal)"
+
+echo "==> Precomputing similar cars..."
+python manage.py compute_similar_cars || echo "==> Similar cars precompute failed (non-fatal)"
+
+# Fetch new-car prices for the lots queued by the import (bounded run; the
+# rest is picked up by the Procfile's origin_price worker or the next run).
+echo "==> Enriching origin prices..."
+python manage.py enrich_origin_price --max-seconds 900 || echo "==> Origin price enrichment failed (non-fatal)"
+
+# Anything left in the notification queue (a `send_notifications --loop`
+# worker normally sends it as it arrives).
+echo "==> Sending queued notifications..."
+python manage.py send_notifications --max-seconds 600 || echo "==> Notification send failed (non-fatal)"
+
+echo "==> Rolling up traffic counters..."
+python manage.py rollup_traffic || echo "==> Traffic rollup failed (non-fatal)"
+
+# Catch-all for the assistant's buffered usage log; the Procfile's
+# assistant_log worker (`flush_assistant_log --loop`) normally keeps it drained,
+# and the drain lease makes this a no-op while the worker is mid-drain.
+echo "==> Writing assistant usage log..."
+python manage.py flush_assistant_log || echo "==> Assistant log flush failed (non-fatal)"
+
 echo "==> Updating exchange rates..."
 python manage.py update_exchange_rates || echo "==> Exchange rate update failed (non-fatal)"
 
+# A new SAR rate changes the signature of every price-filtered catalog —
+# build those now (signatures already built by the import are skipped).
+echo "==> Building visible catalogs..."
+python manage.py refresh_visible_catalogs --missing || echo "==> Visible catalog build failed (non-fatal)"
+
 # Fill in Arabic names / logos only for manufacturers that are still missing them
 python manage.py shell -c "
 from cars.models import Manufacturer
@@ -37,10 +78,17 @@ if grep -q "missing logo: [^0]" /tmp/mfr_check.txt; then
     python manage.py set_manufacturer_logos
 fi
 
-# Clear stale cache so all tenants see fresh data immediately
+# Re-card every car now that Arabic names, logos and is_new flags are final
+# (and drop the cards of cars deleted since the last run).
+echo "==> Refreshing listing cards..."
+python manage.py refresh_car_cards || echo "==> Card refresh failed (non-fatal)"
+
+# Clear stale cache so all tenants see fresh data immediately. Only the page
+# cache's own "cars:" keys go; cache.clear() would FLUSHDB and take the
+# origin-price queue, traffic counters and assistant log with it.
 if [ -n "$REDIS_URL" ]; then
     echo "==> Clearing cache..."
-    python manage.py shell -c "from django.core.cache import cache; cache.clear(); print('Cache cleared.')"
+    python manage.py shell -c "from django.core.cache import cache; print(f'Cache cleared ({cache.delete_pattern(\"*\")} keys).')"
 fi
 
 # Warm the Google Search Console cache for tenant dashboards (after the clear)
@@ -44,3 +44,8 @@ done
 
 echo "==> setup_public_tenant"
 python manage.py setup_public_tenant
+
+# Recount the model/badge dropdown rollup — a single GROUP BY, so it is cheap to
+# run on every deploy and covers a freshly migrated (empty) table.
+echo "==> rebuild_catalog_rollup"
+python manage.py rebuild_catalog_rollup || echo "==> Catalog rollup rebuild failed (non-fatal)"
@@ -15,7 +15,11 @@ def get_tenant_email_config():
         tenant = Tenant.objects.get(schema_name=schema)
     except Tenant.DoesNotExist:
         return None
+    return email_config(tenant)
 
+
+def email_config(tenant):
+    """SMTP config for `tenant`, or None when it has none."""
     if not tenant.email_username or not tenant.email_host:
         return None
 
@@ -209,10 +213,13 @@ def send_order_status_email(order):
 
 
 def send_broadcast_email(subject, body_html, sender_user=None):
-    """Send an email to all users with email addresses."""
-    users = User.objects.exclude(email='').exclude(email__isnull=True)
-    count = 0
-    for user in users:
-        if send_tenant_email(user.email, subject, body_html, 'broadcast', user):
-            count += 1
-    return count
+    """Queue an email to all users with email addresses. Sent in the
+    background by `send_notifications` (tenants.notify); returns the
+    Notification, whose counters track progress."""
+    from tenants import notify
+
+    recipients = (
+        User.objects.exclude(email='').exclude(email__isnull=True)
+        .order_by('pk').values_list('email', 'pk')
+    )
+    return notify.queue_email(recipients, subject, body_html, kind='broadcast')
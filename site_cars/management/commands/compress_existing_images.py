@@ -1,27 +1,44 @@
 """
 Management command to retroactively compress existing uploaded images.
 
-Works with S3/CloudFront storage (reads image, compresses in-memory, writes back).
+Works with S3/CloudFront storage (reads image, compresses in-memory, writes back)
+and with the local FileSystemStorage used in DEBUG / tests.
+
+Storage I/O and Pillow work run on a thread pool (--workers); the main thread
+keeps all DB access (schema switching, filename updates, manifest rows).
+
+Every file that is compressed — or found to be already optimal — is recorded
+in tenants.ImageCompressionRecord (schema, key, before/after bytes, sha256).
+Re-runs skip keys already in the manifest, so an interrupted run resumes where
+it stopped instead of starting over.
 
 Usage on Heroku:
-    # Dry run for a tenant (safe, no changes):
+    # Dry run for a tenant (safe, no changes) — estimates the byte savings:
     heroku run "python manage.py compress_existing_images --schema=<tenant_schema>"
 
+    # Quick estimate: compress 1 in 10 pending files and extrapolate:
+    heroku run "python manage.py compress_existing_images --all-tenants --sample=10"
+
     # Apply for a specific tenant:
     heroku run "python manage.py compress_existing_images --schema=<tenant_schema> --apply"
 
-    # Run for ALL tenants at once:
-    heroku run "python manage.py compress_existing_images --all-tenants --apply"
+    # Run for ALL tenants at once, 16 parallel workers:
+    heroku run "python manage.py compress_existing_images --all-tenants --apply --workers=16"
 
 Schema routing (automatic):
     - Tenant / TenantHeroImage  -> always saved in public schema
     - SiteCar / SiteCarImage / PostImage -> saved in the given tenant schema
 """
-from django.core.management.base import BaseCommand
+import hashlib
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
 from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
 from django.db import connection
 from PIL import Image
-from io import BytesIO
 
 
 # Tenant-schema models (SiteCar, SiteCarImage, PostImage)
@@ -42,26 +59,24 @@ PUBLIC_TARGETS = [
     ('TenantHeroImage', 'tenants', 'TenantHeroImage', [('image', 1920, 1080, 82)]),
 ]
 
+# Manifest rows are buffered and written in one INSERT per batch.
+MANIFEST_BATCH = 200
 
-def _compress(field_file, max_width, max_height, quality):
-    """
-    Read field_file from storage, compress with Pillow.
-    Returns (ContentFile, old_kb, new_kb, skip_reason).
-    skip_reason is None when the file should be rewritten.
-    """
-    try:
-        field_file.open('rb')
-        raw = field_file.read()
-        field_file.close()
-    except Exception as e:
-        return None, 0, 0, f"read error: {e}"
+# One unit of work handed to a pool thread. Carries no model instance, so the
+# worker never touches the DB connection (which is per-thread and schema-bound).
+Job = namedtuple('Job', 'model_label field_name pk key storage max_w max_h quality')
 
-    old_kb = len(raw) / 1024
 
+def _compress_bytes(raw, max_width, max_height, quality):
+    """
+    Compress raw image bytes with Pillow.
+    Returns (jpeg_bytes, skip_reason); skip_reason is None when the result
+    should replace the original.
+    """
     try:
         img = Image.open(BytesIO(raw))
     except Exception as e:
-        return None, old_kb, 0, f"PIL open error: {e}"
+        return None, f"PIL open error: {e}"
 
     # Convert palette / transparency modes to RGB
     if img.mode in ('RGBA', 'LA', 'P'):
@@ -73,21 +88,65 @@ def _compress(field_file, max_width, max_height, quality):
     elif img.mode != 'RGB':
         img = img.convert('RGB')
 
-    needs_resize = img.width > max_width or img.height > max_height
-    if needs_resize:
+    if img.width > max_width or img.height > max_height:
         img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
 
     out = BytesIO()
     img.save(out, format='JPEG', quality=quality, optimize=True)
-    new_kb = out.tell() / 1024
+    data = out.getvalue()
 
     # Skip if result is not at least 5% smaller (avoids bloating already-optimal files)
-    if new_kb >= old_kb * 0.95:
-        return None, old_kb, new_kb, "already optimal"
+    if len(data) >= len(raw) * 0.95:
+        return data, "already optimal"
+    return data, None
 
-    out.seek(0)
-    name = field_file.name.rsplit('.', 1)[0] + '.jpg'
-    return ContentFile(out.read(), name=name), old_kb, new_kb, None
+
+def _process_job(job, apply):
+    """
+    Worker body: read job.key from storage, compress, and (with apply) store
+    the result under a new .jpg key. Pure storage + CPU — no DB access.
+
+    Returns a dict: status ('compressed' | 'optimal' | 'error'), old_bytes,
+    new_bytes, content_hash, saved_key (only when written) and error.
+    """
+    res = {'job': job, 'status': 'error', 'old_bytes': 0, 'new_bytes': 0,
+           'content_hash': '', 'saved_key': None, 'error': ''}
+    try:
+        with job.storage.open(job.key, 'rb') as fh:
+            raw = fh.read()
+    except Exception as e:
+        res['error'] = f"read error: {e}"
+        return res
+
+    res['old_bytes'] = len(raw)
+    data, skip_reason = _compress_bytes(raw, job.max_w, job.max_h, job.quality)
+    if data is None:
+        res['error'] = skip_reason
+        return res
+
+    res['new_bytes'] = len(data)
+    if skip_reason:
+        res['status'] = 'optimal'
+        res['content_hash'] = hashlib.sha256(raw).hexdigest()
+        return res
+
+    res['status'] = 'compressed'
+    res['content_hash'] = hashlib.sha256(data).hexdigest()
+    if apply:
+        try:
+            # Write first, delete later: the old file is only removed once the
+            # DB points at the new one (done by the caller on the main thread).
+            new_name = job.key.rsplit('.', 1)[0] + '.jpg'
+            res['saved_key'] = job.storage.save(new_name, ContentFile(data))
+        except Exception as e:
+            res['status'] = 'error'
+            res['error'] = f"write error: {e}"
+    return res
+
+
+def _new_totals():
+    return {'processed': 0, 'skipped': 0, 'resumed': 0, 'errors': 0,
+            'old_bytes': 0, 'new_bytes': 0, 'sampled': 0, 'pending': 0}
 
 
 class Command(BaseCommand):
@@ -118,15 +177,39 @@ class Command(BaseCommand):
             default=None,
             help='Only process one model: sitecar | sitecarimage | postimage | tenant | tenantheroimage',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Parallel download/compress/upload threads (default 8).',
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=1,
+            help='Dry run only: compress 1 in N pending files and extrapolate the savings (default 1 = all).',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            default=False,
+            help='Only print per-model and per-schema summaries, not one line per file.',
+        )
 
     def handle(self, *args, **options):
         apply       = options['apply']
         schema      = options['schema']
         all_tenants = options['all_tenants']
         only        = options['model'].lower() if options['model'] else None
+        self.workers = max(1, options['workers'])
+        self.sample = 1 if apply else max(1, options['sample'])
+        self.verbose_files = not options['quiet']
 
         mode_label = 'APPLY' if apply else 'DRY RUN'
-        self.stdout.write(self.style.WARNING(f'\n{mode_label} -- compress_existing_images\n'))
+        self.stdout.write(self.style.WARNING(
+            f'\n{mode_label} -- compress_existing_images (workers={self.workers}'
+            f'{f", sample=1/{self.sample}" if self.sample > 1 else ""})\n'
+        ))
 
         if all_tenants:
             from django.apps import apps
@@ -139,89 +222,210 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR('Provide --schema=<name> or --all-tenants'))
             return
 
-        totals = {'processed': 0, 'skipped': 0, 'errors': 0, 'saved_kb': 0}
+        summaries = {}
+        t0 = time.time()
 
-        # ── 1. Public-schema models (Tenant, TenantHeroImage) ──────────────────
-        connection.set_schema_to_public()
-        self.stdout.write(self.style.WARNING('[ public schema ]'))
-        self._process_targets(PUBLIC_TARGETS, only, apply, totals)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.pool = pool
+
+            # ── 1. Public-schema models (Tenant, TenantHeroImage) ──────────────
+            connection.set_schema_to_public()
+            self.stdout.write(self.style.WARNING('[ public schema ]'))
+            summaries['public'] = self._process_targets('public', PUBLIC_TARGETS, only, apply)
 
-        # ── 2. Per-tenant models (SiteCar, SiteCarImage, PostImage) ────────────
-        for s in schemas:
-            self.stdout.write(self.style.WARNING(f'\n[ tenant schema: {s} ]'))
-            connection.set_schema(s)
-            self._process_targets(TENANT_TARGETS, only, apply, totals)
+            # ── 2. Per-tenant models (SiteCar, SiteCarImage, PostImage) ────────
+            for s in schemas:
+                self.stdout.write(self.style.WARNING(f'\n[ tenant schema: {s} ]'))
+                connection.set_schema(s)
+                summaries[s] = self._process_targets(s, TENANT_TARGETS, only, apply)
 
         # Reset to public when done
         connection.set_schema_to_public()
 
-        self.stdout.write('')
-        self.stdout.write(self.style.SUCCESS(
-            f'Done.  processed={totals["processed"]}  skipped={totals["skipped"]}  '
-            f'errors={totals["errors"]}  '
-            f'{"saved" if apply else "would save"}={totals["saved_kb"]:.0f} KB '
-            f'({totals["saved_kb"] / 1024:.1f} MB)'
-        ))
+        self._write_summary(summaries, apply, time.time() - t0)
         if not apply:
             self.stdout.write(self.style.WARNING(
                 'Dry run complete. Re-run with --apply to rewrite the images.'
             ))
 
-    def _process_targets(self, targets, only, apply, totals):
+    # ── per-schema work ──────────────────────────────────────────────────────
+
+    def _process_targets(self, schema, targets, only, apply):
         from django.apps import apps
+        from tenants.models import ImageCompressionRecord
+
+        totals = _new_totals()
+        done_keys = set(
+            ImageCompressionRecord.objects.filter(schema_name=schema)
+            .values_list('result_key', flat=True)
+        )
 
+        jobs = []
         for model_label, app_label, model_name, fields in targets:
             if only and model_label.lower() != only:
                 continue
 
-            self.stdout.write(self.style.HTTP_INFO(f'  >> {model_label}'))
-
             try:
                 Model = apps.get_model(app_label, model_name)
-                count = Model.objects.count()
-                self.stdout.write(f'     {count} records found')
+                rows = list(Model.objects.values_list('pk', *[f[0] for f in fields]))
             except Exception as e:
-                self.stdout.write(self.style.ERROR(f'     Skipping -- cannot query: {e}'))
+                self.stdout.write(self.style.ERROR(f'  >> {model_label}: skipping -- cannot query: {e}'))
                 continue
 
-            for obj in Model.objects.iterator():
-                for field_name, max_w, max_h, quality in fields:
-                    field_file = getattr(obj, field_name)
-                    if not field_file:
+            queued = 0
+            for row in rows:
+                pk = row[0]
+                for (field_name, max_w, max_h, quality), key in zip(fields, row[1:]):
+                    if not key:
                         continue
+                    if key in done_keys:
+                        totals['resumed'] += 1
+                        continue
+                    totals['pending'] += 1
+                    # Dry-run sampling: only every Nth pending file is fetched.
+                    if self.sample > 1 and totals['pending'] % self.sample:
+                        continue
+                    storage = Model._meta.get_field(field_name).storage
+                    jobs.append(Job(model_label, field_name, pk, key, storage, max_w, max_h, quality))
+                    queued += 1
+            self.stdout.write(self.style.HTTP_INFO(
+                f'  >> {model_label}: {len(rows)} records, {queued} files queued'
+            ))
 
-                    cf, old_kb, new_kb, skip_reason = _compress(field_file, max_w, max_h, quality)
+        if not jobs:
+            self._write_schema_line(schema, totals, apply)
+            return totals
+
+        pending_records = []
+        futures = [self.pool.submit(_process_job, job, apply) for job in jobs]
+        for n, future in enumerate(as_completed(futures), 1):
+            self._handle_result(schema, future.result(), apply, totals, pending_records)
+            if apply and len(pending_records) >= MANIFEST_BATCH:
+                self._flush_manifest(pending_records)
+            if n % 200 == 0:
+                self.stdout.write(f'     {n}/{len(jobs)} files')
+        if apply:
+            self._flush_manifest(pending_records)
+
+        self._write_schema_line(schema, totals, apply)
+        return totals
+
+    def _handle_result(self, schema, res, apply, totals, pending_records):
+        """Main-thread half of a job: DB pointer update, old-file delete, manifest row."""
+        from django.apps import apps
+        from tenants.models import ImageCompressionRecord
 
-                    if skip_reason:
-                        totals['skipped'] += 1
-                        self.stdout.write(
-                            f'     SKIP   {field_file.name} -- {skip_reason} ({old_kb:.0f} KB)'
-                        )
-                        continue
+        job = res['job']
+        if res['status'] == 'error':
+            totals['errors'] += 1
+            self.stdout.write(self.style.ERROR(f'     ERROR  {job.key} -- {res["error"]}'))
+            return
+
+        totals['sampled'] += 1
+        result_key = job.key
+        if res['status'] == 'optimal':
+            totals['skipped'] += 1
+            if self.verbose_files:
+                self.stdout.write(
+                    f'     SKIP   {job.key} -- already optimal ({res["old_bytes"] / 1024:.0f} KB)'
+                )
+        else:
+            totals['processed'] += 1
+            totals['old_bytes'] += res['old_bytes']
+            totals['new_bytes'] += res['new_bytes']
+            if self.verbose_files:
+                saved = res['old_bytes'] - res['new_bytes']
+                self.stdout.write(
+                    f'     {"WRITE " if apply else "WOULD "} {job.key} '
+                    f'{res["old_bytes"] / 1024:.0f} KB -> {res["new_bytes"] / 1024:.0f} KB  '
+                    f'(save {saved / 1024:.0f} KB, {saved / res["old_bytes"] * 100:.0f}%)'
+                )
+            if apply:
+                result_key = res['saved_key']
+                app_label, model_name = next(
+                    (a, m) for lbl, a, m, _ in TENANT_TARGETS + PUBLIC_TARGETS if lbl == job.model_label
+                )
+                Model = apps.get_model(app_label, model_name)
+                try:
+                    # Update DB with the new filename — bypass save() overrides
+                    Model.objects.filter(pk=job.pk).update(**{job.field_name: result_key})
+                except Exception as e:
+                    totals['errors'] += 1
+                    self.stdout.write(self.style.ERROR(f'     ERROR saving {job.key}: {e}'))
+                    try:
+                        job.storage.delete(result_key)
+                    except Exception:
+                        pass
+                    return
+                if result_key != job.key:
+                    try:
+                        job.storage.delete(job.key)
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'     WARN   could not delete {job.key}: {e}'))
+
+        if apply:
+            pending_records.append(ImageCompressionRecord(
+                schema_name=schema,
+                model_label=job.model_label,
+                field_name=job.field_name,
+                object_id=job.pk,
+                source_key=job.key,
+                result_key=result_key,
+                old_bytes=res['old_bytes'],
+                new_bytes=res['new_bytes'] if res['status'] == 'compressed' else res['old_bytes'],
+                content_hash=res['content_hash'],
+                status=res['status'],
+            ))
 
-                    saved_kb = old_kb - new_kb
-                    totals['saved_kb'] += saved_kb
-                    totals['processed'] += 1
-
-                    self.stdout.write(
-                        f'     {"WRITE " if apply else "WOULD "} {field_file.name} '
-                        f'{old_kb:.0f} KB -> {new_kb:.0f} KB  '
-                        f'(save {saved_kb:.0f} KB, {saved_kb / old_kb * 100:.0f}%)'
-                    )
-
-                    if apply:
-                        try:
-                            # 1. Delete old file from S3
-                            field_file.delete(save=False)
-                            # 2. Save new file to S3 via the field's storage backend
-                            #    and get back the actual stored filename
-                            field_obj = getattr(obj, field_name)
-                            new_name = field_obj.field.generate_filename(obj, cf.name)
-                            saved_name = field_obj.storage.save(new_name, cf)
-                            # 3. Update DB with the new filename — bypass save() overrides
-                            Model.objects.filter(pk=obj.pk).update(**{field_name: saved_name})
-                            self.stdout.write(f'     -> saved as: {saved_name}')
-                        except Exception as e:
-                            totals['errors'] += 1
-                            self.stdout.write(self.style.ERROR(f'     ERROR saving: {e}'))
+    @staticmethod
+    def _flush_manifest(pending_records):
+        from tenants.models import ImageCompressionRecord
+
+        if pending_records:
+            ImageCompressionRecord.objects.bulk_create(pending_records, ignore_conflicts=True)
+            pending_records.clear()
+
+    # ── reporting ────────────────────────────────────────────────────────────
+
+    def _estimated_saving(self, totals):
+        """Bytes saved (apply) or expected to be saved (dry run), scaled up
+        from the sample when --sample is in use."""
+        saved = totals['old_bytes'] - totals['new_bytes']
+        if self.sample > 1 and totals['sampled']:
+            saved = saved * totals['pending'] / totals['sampled']
+        return saved
+
+    def _write_schema_line(self, schema, totals, apply):
+        saved_mb = self._estimated_saving(totals) / (1024 * 1024)
+        self.stdout.write(
+            f'  = {schema}: processed={totals["processed"]} skipped={totals["skipped"]} '
+            f'resumed={totals["resumed"]} errors={totals["errors"]} '
+            f'{"saved" if apply else "would save"}~{saved_mb:.1f} MB'
+        )
+
+    def _write_summary(self, summaries, apply, elapsed):
+        self.stdout.write('')
+        self.stdout.write(self.style.WARNING('Per-schema summary:'))
+        self.stdout.write(
+            f'  {"schema":<30} {"processed":>9} {"skipped":>8} {"resumed":>8} {"errors":>7} {"MB":>9}'
+        )
+        grand = _new_totals()
+        grand_saved = 0
+        for schema, t in summaries.items():
+            saved = self._estimated_saving(t)
+            grand_saved += saved
+            for k in grand:
+                grand[k] += t[k]
+            self.stdout.write(
+                f'  {schema:<30} {t["processed"]:>9} {t["skipped"]:>8} {t["resumed"]:>8} '
+                f'{t["errors"]:>7} {saved / (1024 * 1024):>9.1f}'
+            )
 
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {elapsed:.0f}s.  processed={grand["processed"]}  skipped={grand["skipped"]}  '
+            f'resumed={grand["resumed"]}  errors={grand["errors"]}  '
+            f'{"saved" if apply else "would save"}={grand_saved / 1024:.0f} KB '
+            f'({grand_saved / (1024 * 1024):.1f} MB)'
+            f'{" (extrapolated from sample)" if self.sample > 1 else ""}'
+        ))
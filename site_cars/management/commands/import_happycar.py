@@ -25,6 +25,7 @@ from django.db import transaction
 from django.utils import timezone
 from django_tenants.utils import schema_context
 
+from site_cars import stats as site_car_stats
 from site_cars.models import SiteCar, SiteCarImage
 from site_cars.happycar import scraper as _scraper
 from site_cars.happycar import classifier as _classify
@@ -303,6 +304,10 @@ class Command(BaseCommand):
                 stats["deleted"] = qs.count()
                 qs.delete()
 
+        if not dry_run:
+            # New listing counters / dropdowns (site_cars.stats) for the run.
+            site_car_stats.bump(schema)
+
         self.stdout.write(self.style.SUCCESS(
             "Done. " + ", ".join(f"{k}={v}" for k, v in stats.items())))
 
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_cars', '0027_sitebillitem_vin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitecar',
+            name='is_live',
+            field=models.BooleanField(db_default=True, default=True, verbose_name='معروضة'),
+        ),
+        migrations.RunSQL(
+            "UPDATE site_cars_sitecar SET is_live = false "
+            "WHERE external_id LIKE 'hc\\_%' AND auction_end < now();",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='sitecar',
+            index=models.Index(condition=models.Q(('is_live', True)), fields=['-created_at'], name='site_cars_live_created_idx'),
+        ),
+    ]
@@ -29,20 +29,23 @@ def exclude_expired_damaged(qs):
 
     The mirror of ``cars.views._exclude_expired_auctions`` for SiteCar. Damaged
     cars with no auction_end are kept, matching how auction cars with no
-    auction_date are kept.
+    auction_date are kept. Reads the is_live flag that save() and
+    ``cars.lifecycle.sweep_site_cars`` maintain.
     """
-    return qs.exclude(
-        external_id__startswith=DAMAGED_PREFIX, auction_end__lt=timezone.now()
+    return qs.filter(is_live=True)
+
+
+def _damaged_expired(external_id, auction_end):
+    return bool(
+        (external_id or '').startswith(DAMAGED_PREFIX)
+        and auction_end
+        and auction_end < timezone.now()
     )
 
 
 def damaged_auction_ended(car):
     """True if this damaged car's auction is over (used to 404 its detail page)."""
-    return bool(
-        (car.external_id or '').startswith(DAMAGED_PREFIX)
-        and car.auction_end
-        and car.auction_end < timezone.now()
-    )
+    return _damaged_expired(car.external_id, car.auction_end)
 
 
 class SiteCar(models.Model):
@@ -130,6 +133,9 @@ class SiteCar(models.Model):
         verbose_name="رابط الصورة الخارجي",
         help_text="يستخدم بدل رفع الصورة عند استيراد السيارة من مصدر خارجي",
     )
+    # False once a damaged car's auction_end has passed — set on save and
+    # flipped in bulk by cars.lifecycle.sweep_site_cars().
+    is_live = models.BooleanField(default=True, db_default=True, verbose_name="معروضة")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -137,6 +143,10 @@ class SiteCar(models.Model):
         ordering = ['-created_at']
         verbose_name = "سيارة الموقع"
         verbose_name_plural = "سيارات الموقع"
+        indexes = [
+            models.Index(fields=['-created_at'], name='site_cars_live_created_idx',
+                         condition=models.Q(is_live=True)),
+        ]
 
     def __str__(self):
         return f"{self.manufacturer} {self.model} {self.year}"
@@ -152,6 +162,7 @@ class SiteCar(models.Model):
         self.transmission = normalize_transmission(self.transmission) if self.transmission else self.transmission
         self.body_type = normalize_name(self.body_type) if self.body_type else self.body_type
         self.color = normalize_name(self.color) if self.color else self.color
+        self.is_live = not _damaged_expired(self.external_id, self.auction_end)
         if self.image and getattr(self.image, '_file', None) is not None:
             self.image = optimize_image(self.image, max_width=1200, max_height=900, quality=85)
         if self.inspection_image and getattr(self.inspection_image, '_file', None) is not None:
@@ -1,4 +1,4 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -32,3 +32,13 @@ def order_completed_handler(sender, instance, **kwargs):
                 'original_price': car.price,
             },
         )
+
+
+@receiver(post_save, sender='site_cars.SiteCar')
+@receiver(post_delete, sender='site_cars.SiteCar')
+def site_car_changed(sender, instance, **kwargs):
+    """Invalidate the listing stats (site_cars.stats)."""
+    from tenants import generations
+
+    from .stats import GENERATION
+    generations.bump_on_write(GENERATION)
@@ -0,0 +1,83 @@
+"""Cached per-schema stats for the own-cars listing (site_car_list).
+
+The listing's tab counters (sold / active per source, both source totals) and
+its make / fuel / transmission dropdowns only change when SiteCar rows do, yet
+were recomputed with four count() and three distinct() queries per request.
+They are now computed together — the counters in one FILTER aggregate, the
+dropdown values in one grouped query — and cached per schema under a
+generation number (tenants.generations):
+
+    site_car_stats:<schema>:<generation>
+
+Anything that changes SiteCar rows bumps the generation:
+
+    site_cars.signals — post_save / post_delete of a SiteCar
+    import_happycar — once at the end of a run
+    cars.lifecycle.sweep_site_cars — when damaged auctions expire
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, Count, Q, Value, When
+
+from tenants import generations
+
+STATS_TTL = 60 * 60 * 6  # seconds; a backstop — bumps make entries stale first
+
+SOURCES = ('mine', 'auctions')
+
+GENERATION = "site_car_stats"
+
+
+def bump(schema=None):
+    """Invalidate the schema's stats. Best-effort: never raises."""
+    generations.bump(GENERATION, schema)
+
+
+def _compute():
+    from .models import DAMAGED_PREFIX, SiteCar
+
+    damaged = Q(external_id__startswith=DAMAGED_PREFIX)
+    scopes = {'mine': ~damaged, 'auctions': damaged & Q(is_live=True)}
+    sold = Q(status='sold')
+    agg = SiteCar.objects.aggregate(**{
+        f'{src}_{k}': Count('pk', filter=scope & cond)
+        for src, scope in scopes.items()
+        for k, cond in (('sold', sold), ('active', ~sold))
+    })
+
+    # Dropdowns: one row per distinct (source, make, fuel, transmission);
+    # expired damaged cars are in neither source.
+    values = {src: {'makes': set(), 'fuels': set(), 'transmissions': set()} for src in SOURCES}
+    rows = (SiteCar.objects.filter(scopes['mine'] | scopes['auctions'])
+            .annotate(src=Case(When(damaged, then=Value('auctions')), default=Value('mine')))
+            .values_list('src', 'manufacturer', 'fuel', 'transmission')
+            .order_by().distinct())
+    for src, make, fuel, trans in rows:
+        v = values[src]
+        if make:
+            v['makes'].add(make)
+        if fuel:
+            v['fuels'].add(fuel)
+        if trans:
+            v['transmissions'].add(trans)
+
+    out = {}
+    for src in SOURCES:
+        s, a = agg[f'{src}_sold'], agg[f'{src}_active']
+        out[src] = {
+            'sold': s, 'active': a, 'all': s + a,
+            **{k: sorted(vs) for k, vs in values[src].items()},
+        }
+    return out
+
+
+def get(schema=None):
+    """{'mine': {...}, 'auctions': {...}}, each with sold / active / all counts
+    and sorted makes / fuels / transmissions."""
+    schema = schema or connection.schema_name
+    key = f"site_car_stats:{schema}:{generations.generation(GENERATION, schema)}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute()
+        cache.set(key, stats, STATS_TTL)
+    return stats
@@ -1,11 +1,23 @@
+import json
 import re
+import shutil
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
 from types import SimpleNamespace
 
 from django.contrib.auth.models import AnonymousUser, User
 from django.core.exceptions import PermissionDenied
+from django.core.files.base import ContentFile
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
 from django.template.loader import render_to_string
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
 from django.utils import timezone
 from django_tenants.test.cases import TenantTestCase
 from django_tenants.test.client import TenantClient
@@ -397,11 +409,35 @@ class DamagedCarAuctionTests(TenantTestCase):
         self.assertIn(self.own.pk, kept)
         self.assertNotIn(self.expired.pk, kept)
 
+    def test_sweep_flips_cars_whose_time_ran_out(self):
+        """Rows written without save() are settled by the lifecycle sweep."""
+        from cars import lifecycle
+        past = timezone.now() - timedelta(minutes=1)
+        SiteCar.objects.filter(pk=self.live.pk).update(auction_end=past)
+        SiteCar.objects.filter(pk=self.expired.pk).update(auction_end=past + timedelta(days=1))
+        self.assertEqual(lifecycle.sweep_site_cars(connection.schema_name), 2)
+        kept = set(exclude_expired_damaged(SiteCar.objects.all()).values_list("pk", flat=True))
+        self.assertNotIn(self.live.pk, kept)
+        self.assertIn(self.expired.pk, kept)
+        self.assertEqual(lifecycle.sweep_site_cars(connection.schema_name), 0)
+
     def test_damaged_tab_count_matches_the_list(self):
         """The tab counter must not advertise cars the list hides."""
         response = self._damaged_tab()
         self.assertEqual(response.context["auctions_total"], 2)  # live + undated
 
+    def test_listing_stats_are_cached_until_a_car_changes(self):
+        from . import stats
+        first = stats.get()
+        self.assertEqual((first["auctions"]["all"], first["mine"]["all"]), (2, 1))
+        self.assertEqual(first["mine"]["makes"], ["Hyundai"])
+        with self.assertNumQueries(0):
+            stats.get()
+        self.live.status = "sold"
+        self.live.save()
+        after = stats.get()
+        self.assertEqual((after["auctions"]["sold"], after["auctions"]["active"]), (1, 1))
+
     # ---- detail page ----
 
     def test_expired_damaged_detail_404s_for_a_visitor(self):
@@ -448,3 +484,603 @@ class DamagedCarAuctionTests(TenantTestCase):
         response = self.client.get(f"/our-cars/{self.live.pk}/")
         self.assertContains(response, "auction-countdown")
         self.assertIn(self.live.auction_end, self._rendered_countdowns(response))
+
+
+class CompressExistingImagesTests(TenantTestCase):
+    """compress_existing_images against the local FileSystemStorage: dry runs
+    change nothing, --apply rewrites and records a manifest row, and a re-run
+    skips what the manifest already covers."""
+
+    def setUp(self):
+        from PIL import Image
+
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        self.settings_override.enable()
+
+        # A noisy oversize PNG — compresses far below the 95% threshold.
+        buf = BytesIO()
+        Image.effect_noise((1600, 1200), 64).convert("RGB").save(buf, format="PNG")
+        key = default_storage.save("site_cars/raw.png", ContentFile(buf.getvalue()))
+        self.car = SiteCar.objects.create(
+            title="car", manufacturer="Hyundai", model="Tucson", year=2015, price=1,
+        )
+        # Point at the stored file directly so save() doesn't pre-optimize it.
+        SiteCar.objects.filter(pk=self.car.pk).update(image=key)
+        self.key = key
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def _run(self, **opts):
+        out = StringIO()
+        call_command(
+            "compress_existing_images", schema=self.tenant.schema_name,
+            model="sitecar", workers=2, stdout=out, **opts,
+        )
+        # The command leaves the connection on public; come back to the tenant.
+        connection.set_tenant(self.tenant)
+        return out.getvalue()
+
+    def test_dry_run_changes_nothing(self):
+        from tenants.models import ImageCompressionRecord
+
+        out = self._run()
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.image.name, self.key)
+        self.assertTrue(default_storage.exists(self.key))
+        self.assertFalse(ImageCompressionRecord.objects.exists())
+        self.assertIn("would save", out)
+
+    def test_apply_rewrites_and_records_the_manifest(self):
+        from tenants.models import ImageCompressionRecord
+
+        self._run(apply=True)
+        self.car.refresh_from_db()
+        self.assertTrue(self.car.image.name.endswith(".jpg"))
+        self.assertTrue(default_storage.exists(self.car.image.name))
+        self.assertFalse(default_storage.exists(self.key))
+
+        record = ImageCompressionRecord.objects.get(schema_name=self.tenant.schema_name)
+        self.assertEqual(record.source_key, self.key)
+        self.assertEqual(record.result_key, self.car.image.name)
+        self.assertLess(record.new_bytes, record.old_bytes)
+        self.assertEqual(record.new_bytes, default_storage.size(record.result_key))
+
+    def test_rerun_skips_keys_already_in_the_manifest(self):
+        from tenants.models import ImageCompressionRecord
+
+        self._run(apply=True)
+        self.car.refresh_from_db()
+        first = self.car.image.name
+
+        self._run(apply=True)
+        self.car.refresh_from_db()
+        self.assertEqual(self.car.image.name, first)
+        self.assertEqual(ImageCompressionRecord.objects.count(), 1)
+
+
+class _StubTelegram(BaseHTTPRequestHandler):
+    """Bot API stand-in: chat 403 has blocked the bot, chat 500 hits a
+    server error, a photo named "bad" can't be fetched; the rest succeed."""
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        method = self.path.rsplit("/", 1)[-1]
+        type(self).calls.append((method, body))
+        chat = str(body.get("chat_id"))
+        if chat == "403":
+            return self._send(403, {"ok": False, "description": "Forbidden: bot was blocked"})
+        if chat == "500":
+            return self._send(500, {"ok": False, "description": "Internal Server Error"})
+        if body.get("photo") == "bad":
+            return self._send(400, {"ok": False, "description": "Bad Request: wrong file"})
+        self._send(200, {"ok": True, "result": {}})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(NOTIFY_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NotificationDispatchTests(TenantTestCase):
+    """tenants.notify: broadcasts are queued, sent in batches over one mail
+    connection with bulk-written logs, and Telegram calls are retried, fall
+    back to text, or fail as the Bot API answers."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubTelegram)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        from unittest import mock
+
+        from tenants import notify
+
+        _StubTelegram.calls = []
+        type(self.tenant).objects.filter(pk=self.tenant.pk).update(
+            email_host="smtp.example.com", email_username="cars@example.com", email_port=587)
+        rate = mock.patch.object(notify, "TG_CHAT_RATE", (100, 1))
+        rate.start()
+        self.addCleanup(rate.stop)
+
+    def test_broadcast_is_queued_then_sent_in_one_batch(self):
+        from site_cars.email_utils import send_broadcast_email
+        from site_cars.models import SiteEmailLog
+        from tenants import notify
+
+        for name, email in (("a", "a@example.com"), ("b", "b@example.com"), ("c", ""),
+                            ("d", "A@example.com")):
+            User.objects.create_user(name, email=email, password="x")
+
+        notification = send_broadcast_email("Hello", "<p>Hi</p>")
+        self.assertEqual(notification.total, 2)          # no address / duplicate skipped
+        self.assertEqual(len(mail.outbox), 0)            # nothing sent in the request
+
+        self.assertEqual(notify.process(), {"sent": 2, "failed": 0, "retried": 0})
+        connection.set_tenant(self.tenant)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["a@example.com", "b@example.com"])
+        self.assertEqual(SiteEmailLog.objects.filter(email_type="broadcast", status="sent").count(), 2)
+        notification.refresh_from_db()
+        self.assertEqual(notify.progress(notification)["percent"], 100)
+        self.assertTrue(notify.progress(notification)["done"])
+
+    def test_telegram_fallback_retry_and_failure(self):
+        from django.utils import timezone
+
+        from tenants import notify
+        from tenants.models import NotificationMessage
+
+        text = {"method": "sendMessage", "text": "car"}
+        with override_settings(TELEGRAM_BOT_TOKEN="t", TELEGRAM_API_BASE=self.api_base):
+            ok = notify.queue_telegram("1", [text, {"method": "sendPhoto", "photo": "bad", "fallback": text}])
+            blocked = notify.queue_telegram("403", [text])
+            flaky = notify.queue_telegram("500", [text])
+
+            first = notify.process()
+            self.assertEqual((first["sent"], first["failed"]), (1, 1))
+            # The bad photo is re-sent as text on the next round.
+            NotificationMessage.objects.filter(recipient="1", status="queued").update(
+                next_attempt_at=timezone.now())
+            self.assertEqual(notify.process()["sent"], 1)
+
+        ok.refresh_from_db()
+        blocked.refresh_from_db()
+        self.assertEqual((ok.sent, ok.status), (2, ok.STATUS_DONE))
+        self.assertEqual((blocked.failed, blocked.status), (1, blocked.STATUS_DONE))
+        self.assertEqual(_StubTelegram.calls[-1][0], "sendMessage")
+
+        retry = NotificationMessage.objects.get(notification=flaky)
+        self.assertEqual((retry.status, retry.attempts), ("queued", 1))
+        self.assertGreater(retry.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+
+class CatalogDedupeTests(TenantTestCase):
+    """cars.dedupe: duplicate cars and makes are merged set-wise, with public
+    and tenant references re-pointed to the survivor."""
+
+    def setUp(self):
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        self.hyundai, self.dupe = Manufacturer.objects.bulk_create(
+            [Manufacturer(name="Hyundai"), Manufacturer(name="hyundai ", name_ar="هيونداي")])
+        self.sonata, self.sonata2 = CarModel.objects.bulk_create(
+            [CarModel(name="Sonata", manufacturer=self.hyundai),
+             CarModel(name="sonata", manufacturer=self.dupe)])
+        badge, badge2 = CarBadge.objects.bulk_create(
+            [CarBadge(name="2.0", model=self.sonata), CarBadge(name="2.0", model=self.sonata2)])
+        color = CarColor.objects.bulk_create([CarColor(name="white")])[0]
+        common = dict(title="Sonata", year=2020, color=color, price=1, mileage=1)
+        self.first, self.second = ApiCar.objects.bulk_create([
+            ApiCar(car_id="c1", lot_number="AB-1", manufacturer=self.hyundai,
+                   model=self.sonata, badge=badge, **common),
+            ApiCar(car_id="c2", lot_number=" ab-1", manufacturer=self.dupe,
+                   model=self.sonata2, badge=badge2, **common),
+        ])
+
+    def test_duplicate_cars_are_merged_with_their_references(self):
+        from cars import dedupe
+        from cars.models import ApiCar, Wishlist
+        from site_cars.models import SiteOrder
+
+        buyer = User.objects.create_user("buyer", password="x")
+        Wishlist.objects.bulk_create([Wishlist(session_key="s", car=self.first),
+                                      Wishlist(session_key="s", car=self.second)])
+        SiteOrder.objects.bulk_create([SiteOrder(user=buyer, car=self.second, offer_price=1)])
+
+        spec = dedupe.car_spec()
+        self.assertEqual(dedupe.build_map(spec), 1)
+        info = dedupe.report(spec)
+        self.assertEqual(info["refs"][f"{SiteOrder._meta.db_table}.car_id"], 1)
+        self.assertEqual(dedupe.apply(spec, batch=1)["deleted"], 1)
+
+        self.assertEqual(list(ApiCar.objects.values_list("pk", flat=True)), [self.first.pk])
+        self.assertEqual(SiteOrder.objects.get().car_id, self.first.pk)
+        self.assertEqual(Wishlist.objects.filter(car=self.first).count(), 1)
+
+    def test_merge_brand_dupes_folds_models_before_makes(self):
+        from cars.models import ApiCar, CarModel, Manufacturer
+
+        call_command("merge_brand_dupes", tenant=self.tenant.schema_name, apply=True,
+                     badges=True, stdout=StringIO())
+        connection.set_tenant(self.tenant)
+
+        make = Manufacturer.objects.get()
+        self.assertEqual((make.pk, make.name_ar), (self.hyundai.pk, "هيونداي"))
+        self.assertEqual(list(CarModel.objects.values_list("pk", flat=True)), [self.sonata.pk])
+        self.assertEqual(set(ApiCar.objects.values_list("manufacturer_id", "model_id")),
+                         {(self.hyundai.pk, self.sonata.pk)})
+        self.assertEqual(len(set(ApiCar.objects.values_list("badge_id", flat=True))), 1)
+
+
+class CarCardSyncTests(TenantTestCase):
+    """Cards follow ORM saves and deletes of ApiCar on commit, and a car
+    without a card is read straight from ApiCar without writing one."""
+
+    def setUp(self):
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        make = Manufacturer.objects.create(name="Kia")
+        model = CarModel.objects.create(name="K5", manufacturer=make)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car = ApiCar.objects.create(
+                car_id="cs1", lot_number="cs1", title="Kia K5", manufacturer=make,
+                model=model, badge=CarBadge.objects.create(name="2.0", model=model),
+                color=CarColor.objects.create(name="white"), year=2022, mileage=1, price=2500)
+
+    def test_save_and_delete_reach_the_card(self):
+        from cars.models import CarCard
+
+        self.assertEqual(CarCard.objects.get(pk=self.car.pk).price, 2500)
+        self.car.status = "sold"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.save()
+        self.assertEqual(CarCard.objects.get(pk=self.car.pk).status, "sold")
+        pk = self.car.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.delete()
+        self.assertFalse(CarCard.objects.filter(pk=pk).exists())
+
+    def test_fetch_projects_an_uncarded_car_without_writing(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from cars import cards
+        from cars.models import CarCard
+
+        cards.delete([self.car.pk])
+        with CaptureQueriesContext(connection) as queries:
+            card, = cards.fetch([self.car.pk])
+        self.assertFalse([q for q in queries
+                          if q["sql"].lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))])
+        self.assertEqual((card.price, card.manufacturer.name), (2500, "Kia"))
+        self.assertFalse(CarCard.objects.filter(pk=self.car.pk).exists())
+
+
+class CarRepriceTests(TenantTestCase):
+    """An availability check that finds a new Encar price reprices the car
+    through encar_check.update_prices, so its listing card and the tenants'
+    visible sets follow."""
+
+    def setUp(self):
+        from cars import cards
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        make = Manufacturer.objects.create(name="Hyundai")
+        model = CarModel.objects.create(name="Tucson", manufacturer=make)
+        self.car = ApiCar.objects.create(
+            car_id="rp1", lot_number="rp1", title="Hyundai Tucson", manufacturer=make,
+            model=model, badge=CarBadge.objects.create(name="2.0", model=model),
+            color=CarColor.objects.create(name="white"), year=2021, mileage=40000,
+            price=2000)
+        cards.refresh([self.car.pk])
+
+    def test_new_price_reaches_the_card(self):
+        from unittest import mock
+
+        from cars import encar_check
+        from cars.models import CarCard
+        from cars.views import car_availability_check
+
+        self.assertEqual(CarCard.objects.get(pk=self.car.pk).price, 2000)
+        found = encar_check.Result(self.car.lot_number, encar_check.OK, 1850)
+        with mock.patch.object(encar_check, "check_vehicle", return_value=found):
+            resp = car_availability_check(RequestFactory().get("/"), self.car.lot_number)
+        self.assertEqual(json.loads(resp.content), {
+            "available": True, "price": 1850, "old_price": 2000, "price_changed": True})
+        self.assertEqual(CarCard.objects.get(pk=self.car.pk).price, 1850)
+
+    def test_new_price_moves_the_car_across_a_price_whitelist(self):
+        from cars import encar_check, visibility
+
+        self.tenant.catalog_filter = {"price_max": 1000}   # SAR
+        self.tenant.save()
+        sig = visibility.materialize(self.tenant)
+        self.assertTrue(visibility.contains(sig, self.car.pk))
+        encar_check.update_prices({self.car.pk: 50_000_000})
+        self.assertFalse(visibility.contains(sig, self.car.pk))
+        encar_check.update_prices({self.car.pk: 2000})
+        self.assertTrue(visibility.contains(sig, self.car.pk))
+
+    def test_tenant_save_queues_its_catalog_build(self):
+        from unittest import mock
+
+        from cars import catalog_jobs
+
+        with mock.patch.object(catalog_jobs, "request_materialize") as queued, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.tenant.save()
+        queued.assert_called_once_with(self.tenant.schema_name)
+
+
+class LocalPdfRenderTests(TenantTestCase):
+    """cars.pdf_local: an export is claimed by one renderer, and a failure
+    part-way through a split-by-make render fails the rows not yet written and
+    leaves the finished ones alone."""
+
+    def setUp(self):
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+        color = CarColor.objects.create(name="white")
+        self.ids = []
+        for name in ("Genesis", "Hyundai", "Kia"):
+            make = Manufacturer.objects.create(name=name)
+            model = CarModel.objects.create(name="X", manufacturer=make)
+            self.ids.append(ApiCar.objects.create(
+                car_id=f"pdf-{name}", lot_number=f"pdf-{name}", title=name, manufacturer=make,
+                model=model, badge=CarBadge.objects.create(name="b", model=model), color=color,
+                year=2020, mileage=1, price=1).pk)
+
+    def test_a_failed_make_fails_the_rows_not_written(self):
+        from unittest import mock
+
+        from cars import pdf_local
+        from cars.models import PdfExport
+
+        def render_inline(cache, pages, workers):
+            for h, data in pages:
+                cache.put(h, pdf_local.render_page(data))
+            return len(pages), {}
+
+        real_add_page = pdf_local.PdfWriter.add_page
+        added = []
+
+        def add_page(writer, blob):
+            added.append(blob)
+            if len(added) == 2:    # the second make's first page
+                raise OSError("disk full")
+            return real_add_page(writer, blob)
+
+        self.tenant.ofleet_split_by_make = True
+        self.tenant.save()
+        export = pdf_local.queue_export("A1", self.ids, self.tenant.schema_name)
+        with mock.patch.object(pdf_local, "_render_missing", render_inline), \
+                mock.patch.object(pdf_local.PdfWriter, "add_page", add_page):
+            pdf_local.render_export(export, workers=1,
+                                    cache=pdf_local.PageCache(tempfile.mkdtemp(dir=self.media)))
+
+        export.refresh_from_db()
+        self.assertEqual(export.status, PdfExport.STATUS_COMPLETE)
+        siblings = PdfExport.objects.filter(auction_name="A1").exclude(pk=export.pk)
+        self.assertEqual(list(siblings.values_list("status", flat=True)), [PdfExport.STATUS_FAILED])
+
+    def test_an_export_is_claimed_once(self):
+        from cars import pdf_local
+        from cars.models import PdfExport
+
+        export = pdf_local.queue_export("A2", self.ids, self.tenant.schema_name)
+        claimed = pdf_local.claim_next()
+        self.assertEqual((claimed.pk, claimed.status), (export.pk, PdfExport.STATUS_RENDERING))
+        self.assertIsNone(pdf_local.claim_next())
+
+    def test_an_abandoned_claim_is_taken_over(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from cars import pdf_local
+        from cars.models import PdfExport
+
+        export = pdf_local.queue_export("A3", self.ids, self.tenant.schema_name)
+        child = PdfExport.objects.create(auction_name="A3", backend=PdfExport.BACKEND_LOCAL,
+                                         status=PdfExport.STATUS_RENDERING)
+        long_ago = timezone.now() - timedelta(seconds=pdf_local.LEASE + 60)
+        PdfExport.objects.filter(pk__in=[export.pk, child.pk]).update(
+            status=PdfExport.STATUS_RENDERING, started_at=long_ago)
+
+        self.assertEqual(pdf_local.claim_next().pk, export.pk)
+        child.refresh_from_db()
+        self.assertEqual(child.status, PdfExport.STATUS_FAILED)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ViewQueryBudgetTests(TenantTestCase):
+    """The real listing, detail and home pages against their @query_budget,
+    counted by RequestProfileMiddleware as in production (strict mode also
+    raises past the budget). A cold cache, so every query a visitor can
+    trigger is counted."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from cars import cards
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        cache.clear()
+        self.client = TenantClient(self.tenant)
+        color = CarColor.objects.create(name="white")
+        cars = []
+        for i, name in enumerate(("Hyundai", "Kia", "Genesis") * 4):
+            make = Manufacturer.objects.get_or_create(name=name)[0]
+            model = CarModel.objects.get_or_create(name=f"{name} X", manufacturer=make)[0]
+            badge = CarBadge.objects.get_or_create(name="2.0", model=model)[0]
+            cars.append(ApiCar.objects.create(
+                car_id=f"qb{i}", lot_number=f"qb{i}", title=f"{name} X", manufacturer=make,
+                model=model, badge=badge, color=color, year=2018 + i % 5,
+                mileage=10000 * i, price=1500 + 100 * i))
+        cards.refresh([c.pk for c in cars])
+        self.car = cars[0]
+
+    def _within_budget(self, url, view):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(response.wsgi_request.profile.queries, view.query_budget)
+
+    def test_car_list(self):
+        from cars import views
+        self._within_budget(reverse("car_list"), views.car_list)
+
+    def test_car_detail(self):
+        from cars import views
+        self._within_budget(reverse("car_detail", args=[self.car.slug]), views.car_detail)
+
+    def test_home(self):
+        from cars import views
+        self._within_budget(reverse("home"), views.home)
+
+
+class CatalogFilterCascadeTests(TenantTestCase):
+    """The make → model dropdown of a tenant with a catalog filter lists the
+    models its catalog shows (counted live) — not the empty rollup answer."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        cache.clear()
+        self.client = TenantClient(self.tenant)
+        self.make = Manufacturer.objects.create(name="Kia")
+        color = CarColor.objects.create(name="white")
+        self.models = {}
+        for i, (name, year) in enumerate((("Sorento", 2022), ("Sorento", 2021), ("Sportage", 2015))):
+            model = CarModel.objects.get_or_create(name=name, manufacturer=self.make)[0]
+            self.models[name] = model
+            ApiCar.objects.create(
+                car_id=f"cf{i}", lot_number=f"cf{i}", title=name, manufacturer=self.make,
+                model=model, badge=CarBadge.objects.get_or_create(name="2.0", model=model)[0],
+                color=color, year=year, mileage=1, price=2000)
+        self.tenant.catalog_filter = {"encar": {"year_min": 2020}}
+        self.tenant.save()
+
+    def test_models_of_a_filtered_tenant(self):
+        resp = self.client.get(reverse("api_models_by_manufacturer"),
+                               {"manufacturer_id": self.make.pk, "car_type": "cars"})
+        self.assertEqual([(m["id"], m["car_count"]) for m in resp.json()],
+                         [(self.models["Sorento"].pk, 2)])
+
+
+class PriceAnomalyTests(TenantTestCase):
+    """cars.anomaly over a synthetic Encar catalog: planted prices far from
+    their segment are flagged, the rest of the catalog (mostly) isn't, and
+    the storefront filter reads the flags."""
+
+    def setUp(self):
+        from collections import Counter
+
+        from cars import synthetic
+        from cars.models import ApiCar, CarBadge, CarColor, CarModel, Manufacturer
+
+        color = CarColor.objects.create(name="white")
+        makes, models, badges, cars = {}, {}, {}, []
+        for kind, row in synthetic.cars(7, 1500, datetime(2026, 3, 1).date()):
+            if kind != "encar":
+                continue
+            make = makes.get(row["mark"]) or makes.setdefault(
+                row["mark"], Manufacturer.objects.create(name=row["mark"]))
+            key = (row["mark"], row["model"])
+            model = models.get(key) or models.setdefault(
+                key, CarModel.objects.create(name=row["model"], manufacturer=make))
+            key += (row["configuration"],)
+            badge = badges.get(key) or badges.setdefault(
+                key, CarBadge.objects.create(name=row["configuration"], model=model))
+            cars.append(ApiCar(car_id=row["inner_id"], lot_number=row["inner_id"],
+                               title=f"{row['mark']} {row['model']}", manufacturer=make,
+                               model=model, badge=badge, color=color, year=row["year"],
+                               mileage=row["km_age"], price=row["price"]))
+        ApiCar.objects.bulk_create(cars, batch_size=500)
+
+        # Plant one very cheap and one very dear car in the largest segment.
+        segments = Counter((c.model_id, c.badge_id, c.year) for c in cars)
+        seg = segments.most_common(1)[0][0]
+        cheap, dear = [c for c in cars if (c.model_id, c.badge_id, c.year) == seg][:2]
+        ApiCar.objects.filter(pk=cheap.pk).update(price=max(cheap.price // 5, 1))
+        ApiCar.objects.filter(pk=dear.pk).update(price=dear.price * 5)
+        self.cheap, self.dear, self.total = cheap, dear, len(cars)
+
+    def test_planted_prices_are_flagged(self):
+        from cars import anomaly
+        from cars.models import ApiCar
+
+        res = anomaly.detect()
+        self.assertEqual(res["scored"], self.total)
+        cheap = ApiCar.objects.get(pk=self.cheap.pk)
+        dear = ApiCar.objects.get(pk=self.dear.pk)
+        self.assertEqual((cheap.price_flag, dear.price_flag), ("low", "high"))
+        self.assertLess(cheap.price_score, -anomaly.Z)
+        self.assertGreater(dear.price_expected, dear.price / 3)
+        self.assertLessEqual(res["low"] + res["high"], 2 + self.total // 50)
+
+        # A re-run over the same catalog writes nothing.
+        self.assertEqual(anomaly.detect()["updated"], 0)
+        self.assertIn(cheap.pk, [r.id for r in anomaly.flagged(flag="low")])
+
+    def test_list_filter_hides_or_shows_flagged_cars(self):
+        from cars import anomaly
+        from cars.models import ApiCar
+        from cars.views import _price_flag_filter
+
+        anomaly.detect()
+        qs = ApiCar.objects.all()
+        self.assertNotIn(self.cheap.pk, _price_flag_filter(qs, "ok").values_list("pk", flat=True))
+        self.assertIn(self.dear.pk, _price_flag_filter(qs, "high").values_list("pk", flat=True))
+        self.assertEqual(_price_flag_filter(qs, "any").count(), sum(anomaly.summary().values()))
+
+    def test_priceless_cars_are_not_flagged(self):
+        from cars import anomaly
+        from cars.models import ApiCar
+        from cars.views import _price_flag_filter
+
+        lot = ApiCar.objects.exclude(pk__in=[self.cheap.pk, self.dear.pk]).first()
+        ApiCar.objects.filter(pk=lot.pk).update(price=0)
+        anomaly.detect()
+        lot.refresh_from_db()
+        self.assertEqual((lot.price_flag, lot.price_score), ("", None))
+        self.assertIn(lot.pk, _price_flag_filter(ApiCar.objects.all(), "ok").values_list("pk", flat=True))
+        self.assertTrue(all(r.score is not None for r in anomaly.flagged()))
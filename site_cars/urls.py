@@ -56,11 +56,13 @@ urlpatterns = [
     path('inbox/<int:pk>/', views.message_detail, name='message_detail'),
     path('inbox/compose/', views.compose_message, name='compose_message'),
     path('send-email/', views.send_email_view, name='send_email'),
+    path('send-email/progress/<int:pk>/', views.notification_progress, name='notification_progress'),
     path('upload-auction/', views.upload_auction_json, name='upload_auction_json'),
     path('upload-auction/delete-expired/', views.delete_expired_auctions, name='delete_expired_auctions'),
     path('dashboard/import-happycar/', views.import_happycar_view, name='import_happycar'),
     path('dashboard/damaged-cars/delete-unsold/', views.delete_unsold_damaged, name='delete_unsold_damaged'),
     path('dashboard/delete-auctions/', views.delete_auctions, name='delete_auctions'),
+    path('dashboard/price-anomalies/', views.price_anomalies, name='price_anomalies'),
     path('staff/orders/', views.staff_orders, name='staff_orders'),
     path('staff/orders/<int:pk>/update/', views.staff_order_update, name='staff_order_update'),
     path('staff/ratings/', views.staff_ratings, name='staff_ratings'),
@@ -21,6 +21,7 @@ from cars.models import ApiCar, Manufacturer, CarModel
 from .models import SiteCar, SiteCarImage, SiteOrder, SiteBill, SiteBillItem, SiteReceipt, SiteShipment, SiteRating, SiteQuestion, SiteSoldCar, SiteMessage, SiteEmailLog, SiteFaq, UserProfile
 from .models import damaged_auction_ended, damaged_qs, exclude_expired_damaged, own_qs
 from .permissions import section_required, site_admin_required, staff_required
+from . import stats as site_car_stats
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from cars.models import Wishlist
@@ -122,6 +123,13 @@ def dashboard(request):
     return render(request, 'site_cars/dashboard.html', context)
 
 
+# GET params that narrow site_car_list below a whole source/status tab.
+_SITE_CAR_FILTER_PARAMS = (
+    'q', 'make', 'model', 'fuel', 'transmission', 'year_min', 'year_max',
+    'price_min', 'price_max', 'km_max',
+)
+
+
 def site_car_list(request):
     if _is_public_schema():
         return redirect('home')
@@ -192,24 +200,11 @@ def site_car_list(request):
     if sort in allowed_sorts:
         qs = qs.order_by(sort)
 
-    # ---- Counts (for the top tabs; unaffected by filters below) ----
-    sold_count = base_qs.filter(status='sold').count()
-    active_count = base_qs.exclude(status='sold').count()
-    auctions_total = external_qs.count()
-    mine_total = own_qs().count()
-
-    # ---- Dropdown options (scoped to the active source, not the filters
-    # so users can always see the full list of available values) ----
-    makes = (base_qs.exclude(manufacturer__exact='')
-                     .values_list('manufacturer', flat=True)
-                     .distinct().order_by('manufacturer'))
-    fuels = (base_qs.exclude(fuel__isnull=True).exclude(fuel__exact='')
-                     .values_list('fuel', flat=True)
-                     .distinct().order_by('fuel'))
-    transmissions = (base_qs.exclude(transmission__isnull=True)
-                            .exclude(transmission__exact='')
-                            .values_list('transmission', flat=True)
-                            .distinct().order_by('transmission'))
+    # ---- Counts + dropdown options (site_cars.stats, cached per schema) ----
+    # Counts feed the top tabs; dropdowns are scoped to the active source, not
+    # the filters, so users can always see the full list of available values.
+    all_stats = site_car_stats.get()
+    src_stats = all_stats[source]
 
     # ---- Pagination ----
     try:
@@ -217,6 +212,9 @@ def site_car_list(request):
     except ValueError:
         per_page = 24
     paginator = Paginator(qs, per_page)
+    # Unfiltered tabs already know their size — skip the COUNT(*).
+    if not any(request.GET.get(p) for p in _SITE_CAR_FILTER_PARAMS):
+        paginator.count = src_stats[status if status in ('sold', 'all') else 'active']
     page_obj = paginator.get_page(request.GET.get('page'))
 
     # Build a querystring base for pager links (preserves filters, drops `page`)
@@ -230,12 +228,12 @@ def site_car_list(request):
         'paginator': paginator,
         'qs_base': qs_base,
         'per_page': per_page,
-        'sold_count': sold_count,
-        'active_count': active_count,
+        'sold_count': src_stats['sold'],
+        'active_count': src_stats['active'],
         'current_status': status,
         'current_source': source,
-        'auctions_total': auctions_total,
-        'mine_total': mine_total,
+        'auctions_total': all_stats['auctions']['all'],
+        'mine_total': all_stats['mine']['all'],
         'is_auctions_tab': source == 'auctions',
         # filter UI state
         'filter_q': q,
@@ -248,9 +246,9 @@ def site_car_list(request):
         'filter_price_max': request.GET.get('price_max', ''),
         'filter_km_max': request.GET.get('km_max', ''),
         'current_sort': sort,
-        'makes': list(makes),
-        'fuels': list(fuels),
-        'transmissions': list(transmissions),
+        'makes': src_stats['makes'],
+        'fuels': src_stats['fuels'],
+        'transmissions': src_stats['transmissions'],
     }
     return render(request, 'site_cars/site_car_list.html', context)
 
@@ -822,9 +820,12 @@ def send_email_view(request):
         if not subject or not body:
             messages.error(request, 'يرجى ملء الموضوع والمحتوى.')
         elif send_type == 'broadcast':
-            count = send_broadcast_email(subject, body)
-            messages.success(request, f'تم إرسال البريد إلى {count} مستخدم.')
-            return redirect('site_dashboard')
+            notification = send_broadcast_email(subject, body)
+            messages.success(
+                request,
+                f'جاري إرسال البريد إلى {notification.total} مستخدم في الخلفية — تابع التقدم أدناه.'
+            )
+            return redirect('send_email')
         else:
             recipient_email = request.POST.get('recipient_email', '').strip()
             if not recipient_email:
@@ -838,8 +839,29 @@ def send_email_view(request):
                     messages.error(request, 'فشل إرسال البريد. تحقق من إعدادات SMTP.')
                 return redirect('send_email')
 
+    from tenants import notify
+    from tenants.models import Notification
+
     recent_logs = SiteEmailLog.objects.all()[:20]
-    return render(request, 'site_cars/send_email.html', {'recent_logs': recent_logs})
+    broadcasts = [
+        notify.progress(n) | {'subject': n.subject, 'created_at': n.created_at}
+        for n in Notification.objects.filter(
+            schema_name=connection.schema_name, channel=Notification.CHANNEL_EMAIL)[:5]
+    ]
+    return render(request, 'site_cars/send_email.html', {
+        'recent_logs': recent_logs,
+        'broadcasts': broadcasts,
+    })
+
+
+@site_admin_required
+def notification_progress(request, pk):
+    """Progress of one of this site's queued broadcasts (polled by send_email)."""
+    from tenants import notify
+    from tenants.models import Notification
+
+    n = get_object_or_404(Notification, pk=pk, schema_name=connection.schema_name)
+    return JsonResponse(notify.progress(n))
 
 
 # ── Admin: Delete Expired Auctions ──
@@ -1209,6 +1231,7 @@ def upload_auction_json(request):
                 cars_to_create.append(ApiCar(**car_data))
 
         # Bulk create new cars
+        cars_to_bulk_update = []
         with transaction.atomic():
             if cars_to_create:
                 ApiCar.objects.bulk_create(cars_to_create, batch_size=500, ignore_conflicts=True)
@@ -1217,7 +1240,6 @@ def upload_auction_json(request):
             # Bulk update existing cars
             if cars_to_update:
                 existing_cars = {car.car_id: car for car in ApiCar.objects.filter(car_id__in=[c['car_id'] for c in cars_to_update])}
-                cars_to_bulk_update = []
                 
                 for car_data in cars_to_update:
                     car_id = car_data.pop('car_id')
@@ -1258,6 +1280,17 @@ def upload_auction_json(request):
                     WHERE slug IS NULL OR slug = ''
                 """)
 
+            # Listing cards for every row written above (slugs included).
+            from cars import cards
+            cards.refresh(ApiCar.objects.filter(
+                car_id__in=[c.car_id for c in cars_to_create] + [c.car_id for c in cars_to_bulk_update]
+            ).values_list('id', flat=True))
+
+        # is_live, the model/badge dropdowns and the tenant catalogs are
+        # brought up to date by the catalog worker, not in this request.
+        from cars import catalog_jobs
+        catalog_jobs.request_rebuild()
+
         messages.success(request, f'تم الاستيراد بنجاح! {created} سيارة جديدة، {updated} سيارة محدّثة، {skipped} تم تخطيها')
         return redirect('upload_auction_json')
 
@@ -2307,6 +2340,24 @@ def staff_ratings(request):
     })
 
 
+@section_required("cars")
+def price_anomalies(request):
+    """Cars in this site's catalog whose price cars.anomaly flagged as
+    implausible for their model, trim, year and mileage."""
+    if _is_public_schema():
+        return redirect('home')
+    from cars import anomaly
+    from cars.views import _apply_tenant_catalog
+
+    flag = request.GET.get('flag') if request.GET.get('flag') in ('low', 'high') else ''
+    visible = _apply_tenant_catalog(ApiCar.objects.all(), getattr(connection, 'tenant', None))
+    return render(request, 'site_cars/price_anomalies.html', {
+        'rows': anomaly.flagged(visible, flag=flag or None, limit=200),
+        'counts': anomaly.summary(visible),
+        'flag': flag,
+    })
+
+
 @section_required("reviews")
 def staff_questions(request):
     """Tenant-side questions list."""
@@ -2445,18 +2496,18 @@ def share_search(request):
     """AJAX: search the full catalogue (ApiCar + SiteCar) for the share builder."""
     if _is_public_schema():
         return JsonResponse({"results": []})
+    from cars import cards
     from cars.models import ApiCar
     q = (request.GET.get("q") or "").strip()
     results = []
     if q:
-        api = (ApiCar.objects.filter(
+        api = cards.fetch(ApiCar.objects.filter(
                     Q(title__icontains=q) | Q(manufacturer__name__icontains=q)
                     | Q(model__name__icontains=q) | Q(lot_number__icontains=q))
-               .select_related("manufacturer", "model")[:15])
+               .values_list("id", flat=True)[:15])
         for c in api:
-            img = c.image or (c.images[0] if getattr(c, "images", None) else "")
             results.append({"ref": f"api:{c.id}", "title": c.title, "year": c.year,
-                            "price": c.price, "currency": "KRW", "kind": "api", "image": img})
+                            "price": c.price, "currency": "KRW", "kind": "api", "image": c.image or ""})
         site = SiteCar.objects.filter(
             Q(title__icontains=q) | Q(manufacturer__icontains=q) | Q(model__icontains=q))[:15]
         for c in site:
@@ -2850,34 +2901,8 @@ _SHARE_LABELS = {
 def _convert_krw(krw, code):
     """KRW -> the currency an admin picked for shared cards. Mirrors sar_price
     (global rate x tenant markup) but for any supported code."""
-    from tenants.models import GlobalExchangeRates
-    symbols = {"KRW": "₩", "SAR": "﷼", "USD": "$", "AED": "د.إ", "EUR": "€"}
-    try:
-        krw = float(krw or 0)
-    except (TypeError, ValueError):
-        return 0, symbols.get(code, code)
-    if krw <= 0:
-        return 0, symbols.get(code, code)
-    if code == "KRW":
-        return int(round(krw)), "₩"
-    rate = None
-    try:
-        rates = GlobalExchangeRates.get_solo()
-        rate = float(getattr(rates, f"rate_{code.lower()}", 0) or 0)
-    except Exception:
-        rate = None
-    if not rate:                       # tenant-defined currency
-        for cc in (getattr(getattr(connection, "tenant", None), "custom_currencies", None) or []):
-            if (cc or {}).get("code", "").upper() == code:
-                rate = float(cc.get("rate") or 0)
-                break
-    if not rate:
-        return 0, symbols.get(code, code)
-    try:
-        markup = float(getattr(getattr(connection, "tenant", None), "price_markup_factor", 1.01))
-    except Exception:
-        markup = 1.01
-    return int(round(krw * rate * markup)), symbols.get(code, code)
+    from tenants import pricing
+    return pricing.convert(krw, code), pricing.symbol(code)
 
 
 def _car_spec_lines(car, fields):
@@ -2930,7 +2955,7 @@ def telegram_send(request):
         body = {}
     cards = _share_cards(body.get("cars") or [], body.get("opts") or {})
 
-    sent = 0
+    calls = []
     for c in cards:
         lines = []
         if c["title"]:
@@ -2940,16 +2965,18 @@ def telegram_send(request):
         lines += [_html.escape(x) for x in c["spec_lines"]]
         lines.append(c["url"])
         caption = "\n".join(lines)
+        text = {"method": "sendMessage", "text": caption, "parse_mode": "HTML"}
         # An album when the admin asked for it and we have several photos;
         # otherwise a single photo, falling back to text so nothing is dropped.
         if len(c["photos"]) > 1:
-            res = tg.send_media_group(chat_id, c["photos"], caption)
+            calls.append({"method": "sendMediaGroup", "media": tg.album(c["photos"], caption),
+                          "fallback": text})
         elif c["image"]:
-            res = tg.send_photo(chat_id, c["image"], caption)
+            calls.append({"method": "sendPhoto", "photo": c["image"], "caption": caption,
+                          "parse_mode": "HTML", "fallback": text})
         else:
-            res = tg.send_message(chat_id, caption)
-        if res and res.get("ok"):
-            sent += 1
-        elif c["image"] and (tg.send_message(chat_id, caption) or {}).get("ok"):
-            sent += 1
-    return JsonResponse({"sent": sent, "total": len(cards)})
+            calls.append(text)
+    # Sent by `send_notifications` within Telegram's per-chat rate limit.
+    from tenants import notify
+    notification = notify.queue_telegram(chat_id, calls)
+    return JsonResponse({"queued": len(calls), "total": len(cards), "notification": notification.pk})
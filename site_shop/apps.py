@@ -5,3 +5,6 @@ class SiteShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "site_shop"
     verbose_name = "قطع الغيار والإكسسوارات"
+
+    def ready(self):
+        import site_shop.signals  # noqa: F401
@@ -0,0 +1,122 @@
+"""Cached per-schema facets for the shop catalogue (parts / accessories).
+
+The shop list used to pull every item's category and brand into Python to
+dedupe them, and ran an extra exists() for the "catalogue is empty" check.
+One grouped query now counts items per
+
+    (kind, category, brand, origin, condition, in_stock)
+
+and everything the list needs is rolled up from those groups: the category
+and brand dropdowns, per-facet counts, the catalogue totals, and the exact
+result count for any combination of those filters (so the paginator needs no
+COUNT unless there is a search term). Cached per schema under a generation
+number (tenants.generations):
+
+    site_shop_facets:<schema>:<generation>
+
+Bumped by site_shop.signals (ShopItem save / delete) and by the importer once
+per run (its bulk writes send no signals).
+"""
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+
+from tenants import generations
+
+FACETS_TTL = 60 * 60 * 6  # seconds; a backstop — bumps make entries stale first
+
+KINDS = ("part", "accessory")
+
+GENERATION = "site_shop_facets"
+
+
+def bump(schema=None):
+    """Invalidate the schema's facets. Best-effort: never raises."""
+    generations.bump(GENERATION, schema)
+
+
+# Whitespace a category / brand may carry stray runs of; written so Python's
+# re and Postgres' regexp_replace read it the same way.
+_WS = r"[ \t\n\r\f\v]+"
+
+
+def _tidy(s):
+    return re.sub(_WS, " ", s or "").strip(" ")
+
+
+def matching(qs, field, value):
+    """qs narrowed to rows whose `field` (category / brand) equals `value`
+    the way the facets compare them — whitespace runs collapsed, trimmed,
+    case-insensitive — so the list shows exactly the rows count() counts."""
+    return qs.extra(where=[f"lower(btrim(regexp_replace({field}, %s, ' ', 'g'), ' ')) = %s"],
+                    params=[_WS, _tidy(value).lower()])
+
+
+def _compute():
+    from .models import ShopItem
+
+    out = {k: {"total": 0, "groups": []} for k in KINDS}
+    rows = (ShopItem.objects
+            .values_list("kind", "category", "brand", "origin", "condition", "in_stock")
+            .annotate(n=Count("pk")).order_by())
+    for kind, category, brand, origin, condition, in_stock, n in rows:
+        f = out.setdefault(kind, {"total": 0, "groups": []})
+        f["total"] += n
+        f["groups"].append((_tidy(category), _tidy(brand), origin, condition, in_stock, n))
+
+    for f in out.values():
+        # Case-insensitive dedupe: the first spelling seen names the value.
+        categories, brands = {}, {}
+        cat_n, brand_n = Counter(), Counter()
+        origin_n, condition_n, in_stock = Counter(), Counter(), 0
+        for category, brand, origin, condition, stock, n in f["groups"]:
+            if category:
+                categories.setdefault(category.lower(), category)
+                cat_n[category.lower()] += n
+            if brand:
+                brands.setdefault(brand.lower(), brand)
+                brand_n[brand.lower()] += n
+            if origin:
+                origin_n[origin] += n
+            condition_n[condition] += n
+            in_stock += n if stock else 0
+        f["categories"] = sorted(categories.values(), key=str.lower)
+        f["brands"] = sorted(brands.values(), key=str.lower)
+        f["counts"] = {
+            "category": {categories[k]: v for k, v in cat_n.items()},
+            "brand": {brands[k]: v for k, v in brand_n.items()},
+            "origin": dict(origin_n),
+            "condition": dict(condition_n),
+            "in_stock": in_stock,
+        }
+    return out
+
+
+def get(schema=None):
+    """{kind: {...}} with total, categories, brands, counts (per category /
+    brand / origin / condition, and in stock) and the raw groups."""
+    schema = schema or connection.schema_name
+    key = f"site_shop_facets:{schema}:{generations.generation(GENERATION, schema)}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = _compute()
+        cache.set(key, facets, FACETS_TTL)
+    return facets
+
+
+def count(facets, kind, category="", brand="", condition="", origin="", in_stock=False):
+    """Items of `kind` matching the shop list's non-search filters, summed
+    from the cached groups (category / brand compare tidied and
+    case-insensitively, as matching() filters the list)."""
+    category, brand = _tidy(category).lower(), _tidy(brand).lower()
+    return sum(
+        n for c, b, o, cond, stock, n in facets.get(kind, {}).get("groups", ())
+        if (not category or c.lower() == category)
+        and (not brand or b.lower() == brand)
+        and (not condition or cond == condition)
+        and (not origin or o == origin)
+        and (not in_stock or stock)
+    )
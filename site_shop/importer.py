@@ -2,12 +2,32 @@
 
 Maps flexible CSV/dict rows (Korean wholesaler exports, distributor feeds, etc.)
 onto ShopItem, upserting so re-imports update instead of duplicating. Shared by
-the `import_shop_csv` management command and the staff upload page.
+the `import_shop_csv` / `import_autowini` commands and the staff upload page.
+
+    rows (streamed) ──CHUNK_SIZE──> diff vs one preload query ──> bulk_create / bulk_update
+                                                  └─> image jobs ──> bounded fetch pool
+                                                        ──> content-addressed store ──> bulk_update
+
+Only rows whose feed fields actually changed are written. Images are fetched
+after the rows, concurrently, and only when an item has none, the feed points
+at a new URL, or (refresh_images) a conditional GET says it changed.
+
+With defer_images (the staff upload page, which runs inside a web request)
+the fetches are not made: each item's URL is saved in image_pending_url and
+the shop_images worker (`fetch_shop_images --loop`) fetches them later.
+
+    request: rows ──> bulk writes ──> image_pending_url
+    worker:  image_pending_url ──> fetch_pending() ──> bounded fetch pool ──> clear
 """
 import csv
+import hashlib
 import io
 import os
 import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 import requests
 from django.core.files.base import ContentFile
@@ -89,105 +109,415 @@ _BROWSER_IMG_HEADERS = {
 _AUTOWINI_IMG_HEADERS = {**_BROWSER_IMG_HEADERS, "Referer": "https://www.autowini.com/", "Sec-Fetch-Site": "same-site"}
 
 
-def _download_image(item, url, name_hint, headers=None):
-    try:
-        r = requests.get(url, timeout=25, headers=headers or _BROWSER_IMG_HEADERS)
+Fetched = namedtuple("Fetched", "status content etag last_modified")
+
+
+class HttpImageSource:
+    """Fetches feed images over HTTP with the WAF-friendly browser headers,
+    one requests.Session per worker thread. A stored ETag / Last-Modified
+    turns the request into a conditional GET (304 = unchanged)."""
+
+    def __init__(self, headers=None, timeout=25):
+        self.headers = headers or _BROWSER_IMG_HEADERS
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def accepts(self, url):
+        return url.startswith(("http://", "https://"))
+
+    def fetch(self, url, etag="", last_modified=""):
+        sess = getattr(self._local, "session", None)
+        if sess is None:
+            sess = self._local.session = requests.Session()
+            sess.headers.update(self.headers)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        try:
+            r = sess.get(url, timeout=self.timeout, headers=headers)
+        except requests.RequestException:
+            return None
+        if r.status_code == 304:
+            return Fetched(304, b"", etag, last_modified)
         if not r.ok or not r.content:
-            return False
-        ext = os.path.splitext(url.split("?")[0])[1].lower() or ".jpg"
-        if ext not in (".jpg", ".jpeg", ".png", ".webp"):
-            ext = ".jpg"
-        item.image.save(f"{name_hint}{ext}", ContentFile(r.content), save=True)
-        return True
-    except Exception:
-        return False
+            return None
+        return Fetched(200, r.content, r.headers.get("ETag", ""), r.headers.get("Last-Modified", ""))
 
 
-def import_rows(rows, *, kind="part", source="csv", default_currency="SAR",
-                download_images=True, limit=2000, image_headers=None):
-    """Upsert an iterable of dict rows. Returns a result summary dict."""
+class FileImageSource:
+    """Serves feed image URLs from a local directory — for tests and offline
+    re-imports of a mirrored feed. `file://<path>` is read as is; any other
+    URL maps its path under `root`. The file's mtime stands in for
+    Last-Modified."""
+
+    def __init__(self, root=""):
+        self.root = root
+
+    def accepts(self, url):
+        return bool(url)
+
+    def _path(self, url):
+        if url.startswith("file://"):
+            return url[7:]
+        return os.path.join(self.root, urlsplit(url).path.lstrip("/"))
+
+    def fetch(self, url, etag="", last_modified=""):
+        path = self._path(url)
+        try:
+            mtime = str(os.stat(path).st_mtime_ns)
+            if last_modified and last_modified == mtime:
+                return Fetched(304, b"", etag, last_modified)
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        return Fetched(200, content, "", mtime) if content else None
+
+
+class _ImageStore:
+    """Content-addressed storage for feed images: the name comes from the
+    SHA-256 of the fetched bytes, so an image shared by many items (or
+    re-imported later) is optimised and uploaded once."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._digest_locks = {}
+        self._names = {}
+
+    def put(self, digest, content, url):
+        from django.core.files.storage import default_storage
+        from site_cars.image_utils import optimize_image
+
+        with self._lock:
+            lock = self._digest_locks.setdefault(digest, threading.Lock())
+        with lock:
+            if digest in self._names:
+                return self._names[digest]
+            name = next((n for n in (f"site_shop/feed/{digest}{e}" for e in (".jpg", ".png"))
+                         if default_storage.exists(n)), None)
+            if name is None:
+                ext = os.path.splitext(urlsplit(url).path)[1].lower()
+                src = ContentFile(content, name=f"{digest}{ext if ext in _IMG_EXTS else '.jpg'}")
+                optimized = optimize_image(src, max_width=1200, max_height=900, quality=85)
+                name = default_storage.save(f"site_shop/feed/{optimized.name}", optimized)
+            self._names[digest] = name
+            return name
+
+
+_IMG_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Feed-owned columns. Anything else (is_featured, gallery, a staff-uploaded
+# image) is never touched by an import.
+_FEED_FIELDS = (
+    "kind", "name", "category", "brand", "part_number", "part_number_norm", "origin",
+    "price", "currency", "condition", "in_stock", "fits_make", "fits_model",
+    "description", "source", "external_id",
+)
+_IMAGE_FIELDS = ("image", "image_source_url", "image_etag", "image_last_modified", "image_hash")
+
+CHUNK_SIZE = 1000    # rows diffed against one preload query and written in bulk
+IMAGE_WORKERS = 8    # concurrent image fetches
+PENDING_BATCH = 200  # queued images fetched per fetch_pending() call
+
+
+def _row_fields(raw, kind, source, default_currency):
+    """(ShopItem field values, image url) for one feed row, or None to skip it."""
+    row = _norm_headers(raw)
+    name = _pick(row, "name")
+    if not name:
+        return None
+
+    row_kind = (_pick(row, "kind") or "").lower()
+    if row_kind in ("accessory", "accessories", "اكسسوار", "إكسسوارات", "اكسسوارات"):
+        row_kind = "accessory"
+    elif row_kind in ("part", "parts", "قطعة", "قطع", "قطع غيار"):
+        row_kind = "part"
+    else:
+        row_kind = kind
+
+    price_raw = _pick(row, "price").replace(",", "")
+    try:
+        price = int(float(price_raw)) if price_raw else None
+    except ValueError:
+        price = None
+
+    fields = dict(
+        kind=row_kind, name=name[:200],
+        category=_pick(row, "category"), brand=_pick(row, "brand"),
+        part_number=_pick(row, "part_number"), origin=_norm_origin(_pick(row, "origin")),
+        price=price, currency=(_pick(row, "currency") or default_currency).upper()[:3] or default_currency,
+        condition=_norm_condition(_pick(row, "condition")),
+        in_stock=_truthy_stock(_pick(row, "in_stock")),
+        fits_make=_pick(row, "fits_make"), fits_model=_pick(row, "fits_model"),
+        description=_pick(row, "description"),
+        source=source, external_id=_pick(row, "external_id"),
+    )
+    return fields, _pick(row, "image")
+
+
+def _keys(kind, source, external_id, part_number, name):
+    """Upsert keys, strongest first: external_id (within the source) >
+    part_number (case-insensitive, within the kind) > name (within the kind)."""
+    if external_id:
+        return ("ext", source, external_id)
+    if part_number:
+        return ("pn", kind, part_number.upper())
+    return ("name", kind, name)
+
+
+def _preload(chunk, source):
+    """Existing items any row of the chunk could match — one query."""
+    from django.db.models import Q
+    from django.db.models.functions import Upper
+    from .models import ShopItem
+
+    ext, pns, names, kinds = set(), set(), set(), set()
+    for f, _ in chunk:
+        kinds.add(f["kind"])
+        if f["external_id"]:
+            ext.add(f["external_id"])
+        elif f["part_number"]:
+            pns.add(f["part_number"].upper())
+        else:
+            names.add(f["name"])
+    q = Q(pk__in=[])
+    if ext:
+        q |= Q(source=source, external_id__in=ext)
+    if pns:
+        q |= Q(kind__in=kinds, pn_upper__in=pns)
+    if names:
+        q |= Q(kind__in=kinds, name__in=names)
+    index = {}
+    for obj in ShopItem.objects.annotate(pn_upper=Upper("part_number")).filter(q):
+        # Default ordering (featured, newest) decides between duplicates,
+        # as the old per-row .first() lookups did.
+        if obj.external_id:
+            index.setdefault(("ext", obj.source, obj.external_id), obj)
+        if obj.part_number:
+            index.setdefault(("pn", obj.kind, obj.pn_upper), obj)
+        index.setdefault(("name", obj.kind, obj.name), obj)
+    return index
+
+
+def _write_chunk(chunk, source, download_images, refresh_images, accepts, jobs, counts):
+    """Diff one chunk against the database and write it with one bulk_create
+    and one bulk_update. Queues the image fetches it needs onto `jobs`."""
+    from django.utils import timezone
     from .models import ShopItem
 
-    created = updated = skipped = images = 0
+    index = _preload(chunk, source)
+    new, changed, wants_image = {}, {}, []
+    now = timezone.now()
+    for fields, img_url in chunk:
+        key = _keys(fields["kind"], source, fields["external_id"], fields["part_number"], fields["name"])
+        obj = new.get(key) or index.get(key)
+        if obj is None:
+            obj = new[key] = ShopItem(**fields)
+            obj.tidy()
+        else:
+            before = [getattr(obj, f) for f in _FEED_FIELDS]
+            for k, v in fields.items():
+                setattr(obj, k, v)
+            obj.tidy()
+            if obj.pk and [getattr(obj, f) for f in _FEED_FIELDS] != before:
+                obj.updated_at = now
+                changed[obj.pk] = obj
+            elif obj.pk and obj.pk not in changed:
+                counts["unchanged"] += 1
+        if download_images and img_url and accepts(img_url):
+            wants_image.append((obj, img_url))
+
+    if new:
+        ShopItem.objects.bulk_create(new.values(), batch_size=500)
+    if changed:
+        ShopItem.objects.bulk_update(changed.values(), [*_FEED_FIELDS, "updated_at"], batch_size=500)
+    counts["created"] += len(new)
+    counts["updated"] += len(changed)
+
+    for obj, url in wants_image:
+        if not obj.image:
+            jobs[obj.pk] = (url, "", "", "")
+        elif obj.image_source_url and obj.image_source_url != url:
+            jobs[obj.pk] = (url, "", "", obj.image_hash)          # the feed changed the picture
+        elif refresh_images and obj.image_source_url == url:
+            jobs[obj.pk] = (url, obj.image_etag, obj.image_last_modified, obj.image_hash)
+        # Otherwise: a staff upload or an image already taken from this URL.
+
+
+def _fetch_images(jobs, source, workers):
+    """Fetch queued images on a bounded pool, store new content, and write
+    the image columns with one bulk_update. Returns (stored, unchanged, failed)."""
+    from .models import ShopItem
+
+    store = _ImageStore()
+
+    def one(item):
+        pk, (url, etag, last_modified, old_hash) = item
+        got = source.fetch(url, etag=etag, last_modified=last_modified)
+        if got is None:
+            return None
+        update = ShopItem(pk=pk, image_source_url=url[:500],
+                          image_etag=(got.etag or "")[:200],
+                          image_last_modified=(got.last_modified or "")[:64])
+        if got.status == 304:
+            return update, False
+        digest = hashlib.sha256(got.content).hexdigest()
+        update.image_hash = digest
+        if digest == old_hash:
+            return update, False
+        update.image = store.put(digest, got.content, url)
+        return update, True
+
+    stored = unchanged = failed = 0
+    fresh, same = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for res in pool.map(one, jobs.items()):
+            if res is None:
+                failed += 1
+            elif res[1]:
+                fresh.append(res[0])
+            else:
+                same.append(res[0])
+    if fresh:
+        ShopItem.objects.bulk_update(fresh, list(_IMAGE_FIELDS), batch_size=500)
+        stored = len(fresh)
+    if same:
+        ShopItem.objects.bulk_update(same, ["image_source_url", "image_etag", "image_last_modified"],
+                                     batch_size=500)
+        unchanged = len(same)
+    return stored, unchanged, failed
+
+
+def _queue_images(jobs):
+    """Save the URL of each queued fetch for the shop_images worker."""
+    from .models import ShopItem
+
+    ShopItem.objects.bulk_update(
+        [ShopItem(pk=pk, image_pending_url=url[:500]) for pk, (url, *_) in jobs.items()],
+        ["image_pending_url"], batch_size=500)
+    return len(jobs)
+
+
+def fetch_pending(limit=PENDING_BATCH, image_source=None, workers=IMAGE_WORKERS):
+    """Fetch up to `limit` images queued by a deferred import in the current
+    schema. Returns (taken, stored, unchanged, failed); taken is 0 when none
+    are queued.
+
+    Every item taken is un-queued, failed or not — a failed fetch is retried
+    by the next import of the feed, not on every pass of the worker. An item
+    queued again for another URL while its fetch ran stays queued."""
+    from django.db import connection
+    from .models import ShopItem
+
+    items = list(ShopItem.objects.exclude(image_pending_url="").order_by("id")
+                 .only("id", "source", "image", "image_pending_url", *_IMAGE_FIELDS[1:])[:limit])
+    if not items:
+        return 0, 0, 0, 0
+
+    # Same rules as _write_chunk, re-checked now: a staff upload made since
+    # the import still wins.
+    groups = {}
+    for obj in items:
+        url = obj.image_pending_url
+        if not obj.image:
+            job = (url, "", "", "")
+        elif not obj.image_source_url:
+            continue
+        elif obj.image_source_url != url:
+            job = (url, "", "", obj.image_hash)
+        else:
+            job = (url, obj.image_etag, obj.image_last_modified, obj.image_hash)
+        groups.setdefault(obj.source == "autowini", {})[obj.pk] = job
+
+    stored = unchanged = failed = 0
+    for autowini, jobs in groups.items():
+        source = image_source or HttpImageSource(_AUTOWINI_IMG_HEADERS if autowini else None)
+        s, u, f = _fetch_images(jobs, source, workers)
+        stored, unchanged, failed = stored + s, unchanged + u, failed + f
+
+    with connection.cursor() as cur:
+        cur.execute(
+            f"UPDATE {ShopItem._meta.db_table} AS s SET image_pending_url = '' "
+            "FROM unnest(%s::bigint[], %s::text[]) AS j(id, url) "
+            "WHERE s.id = j.id AND s.image_pending_url = j.url",
+            [[o.pk for o in items], [o.image_pending_url for o in items]],
+        )
+    return len(items), stored, unchanged, failed
+
+
+def import_rows(rows, *, kind="part", source="csv", default_currency="SAR",
+                download_images=True, limit=None, image_headers=None,
+                image_source=None, refresh_images=False, image_workers=IMAGE_WORKERS,
+                defer_images=False):
+    """Upsert an iterable of dict rows (consumed as a stream, CHUNK_SIZE at a
+    time), then fetch the images that are missing or changed. Returns a
+    result summary dict.
+
+    image_source: anything with accepts(url) / fetch(url, etag, last_modified)
+    — HttpImageSource(image_headers) by default, FileImageSource for a local
+    mirror. refresh_images: also re-check images already taken from the same
+    URL (a conditional GET; 304 = nothing to do). defer_images: queue the
+    fetches for the shop_images worker instead of making them here."""
+    source_obj = image_source or HttpImageSource(image_headers)
+    counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
     errors = []
+    jobs = {}
 
+    chunk = []
     for i, raw in enumerate(rows):
-        if i >= limit:
+        if limit and i >= limit:
             errors.append(f"تم تجاوز الحد ({limit} صف) — تم تجاهل الباقي.")
             break
-        row = _norm_headers(raw)
-        name = _pick(row, "name")
-        if not name:
-            skipped += 1
+        parsed = _row_fields(raw, kind, source, default_currency)
+        if parsed is None:
+            counts["skipped"] += 1
             continue
+        chunk.append(parsed)
+        if len(chunk) >= CHUNK_SIZE:
+            _write_chunk(chunk, source, download_images, refresh_images, source_obj.accepts, jobs, counts)
+            chunk = []
+    if chunk:
+        _write_chunk(chunk, source, download_images, refresh_images, source_obj.accepts, jobs, counts)
 
-        row_kind = (_pick(row, "kind") or "").lower()
-        if row_kind in ("accessory", "accessories", "اكسسوار", "إكسسوارات", "اكسسوارات"):
-            row_kind = "accessory"
-        elif row_kind in ("part", "parts", "قطعة", "قطع", "قطع غيار"):
-            row_kind = "part"
-        else:
-            row_kind = kind
-
-        ext_id = _pick(row, "external_id")
-        part_number = _pick(row, "part_number")
+    if counts["created"] or counts["updated"]:
+        from .facets import bump
+        bump()    # bulk writes send no post_save
 
-        price_raw = _pick(row, "price").replace(",", "")
-        try:
-            price = int(float(price_raw)) if price_raw else None
-        except ValueError:
-            price = None
-
-        fields = dict(
-            kind=row_kind, name=name,
-            category=_pick(row, "category"), brand=_pick(row, "brand"),
-            part_number=part_number, origin=_norm_origin(_pick(row, "origin")),
-            price=price, currency=(_pick(row, "currency") or default_currency).upper()[:3] or default_currency,
-            condition=_norm_condition(_pick(row, "condition")),
-            in_stock=_truthy_stock(_pick(row, "in_stock")),
-            fits_make=_pick(row, "fits_make"), fits_model=_pick(row, "fits_model"),
-            description=_pick(row, "description"),
-            source=source, external_id=ext_id,
-        )
+    images = images_unchanged = images_failed = images_queued = 0
+    if jobs and defer_images:
+        images_queued = _queue_images(jobs)
+    elif jobs:
+        images, images_unchanged, images_failed = _fetch_images(jobs, source_obj, image_workers)
+    return {**counts, "images": images, "images_unchanged": images_unchanged,
+            "images_failed": images_failed, "images_queued": images_queued, "errors": errors,
+            "total": counts["created"] + counts["updated"] + counts["unchanged"]}
 
-        # Upsert key: external_id > part_number > name (scoped to this source/kind).
-        if ext_id:
-            obj = ShopItem.objects.filter(source=source, external_id=ext_id).first()
-        elif part_number:
-            obj = ShopItem.objects.filter(kind=row_kind, part_number__iexact=part_number).first()
-        else:
-            obj = ShopItem.objects.filter(kind=row_kind, name=name).first()
 
-        is_new = obj is None
-        if is_new:
-            obj = ShopItem(**fields)
-        else:
-            for k, v in fields.items():
-                setattr(obj, k, v)
-        obj.save()
-        created += 1 if is_new else 0
-        updated += 0 if is_new else 1
+def import_csv_file(f, **kwargs):
+    """Import from an open text-mode CSV file, row by row (no size cap)."""
+    return import_rows(csv.DictReader(f), **kwargs)
 
-        if download_images and not obj.image:
-            img_url = _pick(row, "image")
-            if img_url and img_url.startswith(("http://", "https://")):
-                if _download_image(obj, img_url, f"{row_kind}_{obj.pk}", headers=image_headers):
-                    images += 1
 
-    return {"created": created, "updated": updated, "skipped": skipped,
-            "images": images, "errors": errors, "total": created + updated}
+def import_csv_upload(upload, **kwargs):
+    """Import an uploaded CSV (Django UploadedFile) without reading it whole."""
+    with io.TextIOWrapper(upload.file, encoding="utf-8-sig", errors="replace", newline="") as f:
+        return import_csv_file(f, **kwargs)
 
 
 def import_csv_text(text, **kwargs):
     """Parse CSV text (handles UTF-8 / BOM) and import its rows."""
-    reader = csv.DictReader(io.StringIO(text))
-    return import_rows(reader, **kwargs)
+    return import_csv_file(io.StringIO(text), **kwargs)
 
 
 def import_csv_url(url, **kwargs):
-    r = requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0"})
-    r.raise_for_status()
-    return import_csv_text(r.content.decode("utf-8-sig", errors="replace"), **kwargs)
+    """Stream a CSV feed straight from the response into the importer."""
+    with requests.get(url, timeout=30, headers={"User-Agent": "Mozilla/5.0"}, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        with io.TextIOWrapper(r.raw, encoding="utf-8-sig", errors="replace", newline="") as f:
+            return import_csv_file(f, **kwargs)
 
 
 # ──────────────────── Autowini parts API (Korean wholesaler) ────────────────────
@@ -259,10 +589,12 @@ def fetch_autowini_rows(pages=3, page_size=32, fitting="CAR", sorting="recentDat
 
 
 def import_autowini(pages=3, fitting="CAR", currency="USD", source="autowini",
-                    download_images=True, limit=2000, start_page=1, dry_run=False):
+                    download_images=True, limit=None, start_page=1, dry_run=False,
+                    refresh_images=False, defer_images=False):
     rows = fetch_autowini_rows(pages=pages, fitting=fitting, start_page=start_page)
     if dry_run:
         return {"fetched": len(rows), "sample": rows[:8], "dry_run": True}
     return import_rows(rows, kind="part", source=source, default_currency=currency,
                        download_images=download_images, limit=limit,
-                       image_headers=_AUTOWINI_IMG_HEADERS)
+                       image_headers=_AUTOWINI_IMG_HEADERS, refresh_images=refresh_images,
+                       defer_images=defer_images)
@@ -0,0 +1,59 @@
+"""Worker for the shop feed images queued by the staff upload page.
+
+An import made inside a web request (site_shop.views.shop_import) writes the
+rows and saves each wanted image URL in ShopItem.image_pending_url; this
+fetches them (site_shop.importer.fetch_pending), one batch per tenant per
+pass so a big feed on one site does not hold up the others.
+
+Usage:
+    python manage.py fetch_shop_images                      # fetch what is queued, then exit
+    python manage.py fetch_shop_images --loop               # long-running worker (Procfile)
+    python manage.py fetch_shop_images --schema=<schema>    # one tenant
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from site_shop.importer import IMAGE_WORKERS, PENDING_BATCH, fetch_pending
+
+
+class Command(BaseCommand):
+    help = "Fetch the shop feed images queued by in-request imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", help="Limit to a single tenant schema.")
+        parser.add_argument("--batch", type=int, default=PENDING_BATCH,
+                            help="Images per tenant per pass.")
+        parser.add_argument("--workers", type=int, default=IMAGE_WORKERS,
+                            help="Concurrent image fetches.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running; sleep while nothing is queued.")
+        parser.add_argument("--interval", type=int, default=10,
+                            help="Seconds to sleep between polls with --loop.")
+
+    def handle(self, *args, **opts):
+        tenants = get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+        if opts.get("schema"):
+            tenants = tenants.filter(schema_name=opts["schema"])
+        stored = unchanged = failed = 0
+        while True:
+            took = 0
+            for schema in tenants.values_list("schema_name", flat=True):
+                try:
+                    with schema_context(schema):
+                        n, s, u, f = fetch_pending(opts["batch"], workers=opts["workers"])
+                except Exception as e:
+                    self.stderr.write(f"  {schema}: {e}")
+                    continue
+                if s or u or f:
+                    self.stdout.write(f"  {schema}: stored={s} unchanged={u} failed={f}")
+                took += n
+                stored, unchanged, failed = stored + s, unchanged + u, failed + f
+            if not took:
+                if not opts["loop"]:
+                    break
+                time.sleep(opts["interval"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. stored={stored} unchanged={unchanged} failed={failed}"))
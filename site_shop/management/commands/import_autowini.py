@@ -24,14 +24,17 @@ class Command(BaseCommand):
         parser.add_argument("--currency", default="USD")
         parser.add_argument("--source", default="autowini")
         parser.add_argument("--no-images", action="store_true")
-        parser.add_argument("--limit", type=int, default=5000)
+        parser.add_argument("--limit", type=int, default=0, help="Max rows (0 = no cap)")
+        parser.add_argument("--refresh-images", action="store_true",
+                            help="Re-check images already imported (conditional GET)")
         parser.add_argument("--dry-run", action="store_true")
 
     def handle(self, *args, **opts):
         res = import_autowini(
             pages=opts["pages"], start_page=opts["start_page"], fitting=opts["fitting"],
             currency=opts["currency"], source=opts["source"],
-            download_images=not opts["no_images"], limit=opts["limit"], dry_run=opts["dry_run"],
+            download_images=not opts["no_images"], limit=opts["limit"] or None, dry_run=opts["dry_run"],
+            refresh_images=opts["refresh_images"],
         )
         if res.get("dry_run"):
             self.stdout.write(self.style.SUCCESS(f"[dry-run] fetched {res['fetched']} rows"))
@@ -40,6 +43,6 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS(
                 f"created={res['created']} updated={res['updated']} "
-                f"skipped={res['skipped']} images={res['images']}"))
+                f"unchanged={res['unchanged']} skipped={res['skipped']} images={res['images']}"))
             for e in res["errors"][:5]:
                 self.stdout.write(self.style.WARNING(e))
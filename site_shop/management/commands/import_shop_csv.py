@@ -7,10 +7,14 @@ Run per-tenant via django-tenants:
 Or from a URL:
     python manage.py tenant_command import_shop_csv --schema=<schema> \
         --url=https://supplier.example/feed.csv --kind=part --source=supplier
+
+The file is streamed, so there is no size cap. Images are fetched after the
+rows on a bounded pool; --image-root reads them from a local mirror instead
+(a URL's path is looked up under that directory).
 """
 from django.core.management.base import BaseCommand, CommandError
 
-from site_shop.importer import import_csv_text, import_csv_url
+from site_shop.importer import FileImageSource, import_csv_file, import_csv_url
 
 
 class Command(BaseCommand):
@@ -24,22 +28,28 @@ class Command(BaseCommand):
         parser.add_argument("--source", default="csv", help="Source label (used for upsert de-dup)")
         parser.add_argument("--currency", default="SAR", help="Default currency")
         parser.add_argument("--no-images", action="store_true", help="Skip downloading images")
-        parser.add_argument("--limit", type=int, default=2000)
+        parser.add_argument("--limit", type=int, default=0, help="Max rows (0 = no cap)")
+        parser.add_argument("--refresh-images", action="store_true",
+                            help="Re-check images already imported (conditional GET / mtime)")
+        parser.add_argument("--image-root", help="Read images from this local directory")
 
     def handle(self, *args, **opts):
         kwargs = dict(kind=opts["kind"], source=opts["source"],
                       default_currency=opts["currency"],
-                      download_images=not opts["no_images"], limit=opts["limit"])
+                      download_images=not opts["no_images"], limit=opts["limit"] or None,
+                      refresh_images=opts["refresh_images"])
+        if opts.get("image_root"):
+            kwargs["image_source"] = FileImageSource(opts["image_root"])
         if opts.get("url"):
             res = import_csv_url(opts["url"], **kwargs)
         elif opts.get("path"):
-            with open(opts["path"], encoding="utf-8-sig", errors="replace") as f:
-                res = import_csv_text(f.read(), **kwargs)
+            with open(opts["path"], encoding="utf-8-sig", errors="replace", newline="") as f:
+                res = import_csv_file(f, **kwargs)
         else:
             raise CommandError("Provide a CSV file path or --url")
 
         self.stdout.write(self.style.SUCCESS(
             f"created={res['created']} updated={res['updated']} "
-            f"skipped={res['skipped']} images={res['images']}"))
+            f"unchanged={res['unchanged']} skipped={res['skipped']} images={res['images']}"))
         for e in res["errors"]:
             self.stdout.write(self.style.WARNING(e))
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_shop', '0005_shoprequest_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_source_url',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_etag',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_last_modified',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
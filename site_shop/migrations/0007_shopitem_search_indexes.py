@@ -0,0 +1,54 @@
+# Shop search was an icontains OR across seven columns — a sequential scan of
+# the tenant's items on every search, growing with each imported feed.
+#
+#   part_number_norm   trigram GIN (substring: LIKE '%X%') and a
+#                      varchar_pattern_ops btree (prefix: LIKE 'X%', and terms
+#                      shorter than a trigram)
+#   search_vector      STORED generated tsvector, weighted
+#                        A  name, part_number
+#                        B  brand, fits_make, fits_model
+#                        C  description
+#                      with a GIN index. The 'simple' config: names are a mix
+#                      of Arabic, English and part codes, so no stemming.
+#
+# Postgres maintains the column on every write, so the importer's bulk writes
+# and ORM saves need no changes. pg_trgm is installed once, in public (on the
+# tenants' search_path).
+from django.db import migrations
+
+
+VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(name, '') || ' ' || coalesce(part_number, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(brand, '') || ' ' || coalesce(fits_make, '') || ' ' "
+    "|| coalesce(fits_model, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'C')"
+)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("site_shop", "0006_shopitem_image_bookkeeping")]
+    operations = [
+        migrations.RunSQL(
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public;",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE INDEX IF NOT EXISTS site_shop_shopitem_pn_norm_trgm "
+                "ON site_shop_shopitem USING gin (part_number_norm public.gin_trgm_ops);",
+                "CREATE INDEX IF NOT EXISTS site_shop_shopitem_pn_norm_prefix "
+                "ON site_shop_shopitem (part_number_norm varchar_pattern_ops);",
+                "ALTER TABLE site_shop_shopitem ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({VECTOR}) STORED;",
+                "CREATE INDEX IF NOT EXISTS site_shop_shopitem_search_gin "
+                "ON site_shop_shopitem USING gin (search_vector);",
+                "ANALYZE site_shop_shopitem;",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS site_shop_shopitem_search_gin;",
+                "ALTER TABLE site_shop_shopitem DROP COLUMN IF EXISTS search_vector;",
+                "DROP INDEX IF EXISTS site_shop_shopitem_pn_norm_prefix;",
+                "DROP INDEX IF EXISTS site_shop_shopitem_pn_norm_trgm;",
+            ],
+        ),
+    ]
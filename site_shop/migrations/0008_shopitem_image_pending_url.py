@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_shop', '0007_shopitem_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shopitem',
+            name='image_pending_url',
+            field=models.CharField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='shopitem',
+            index=models.Index(condition=models.Q(('image_pending_url', ''), _negated=True),
+                               fields=['id'], name='site_shop_item_image_pending'),
+        ),
+    ]
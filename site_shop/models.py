@@ -9,14 +9,10 @@ from site_cars.image_utils import optimize_image
 def categories_for(kind):
     """Distinct categories actually in use for this kind (dynamic, from the
     tenant's own items — populated by imports/staff, not hardcoded). Deduped
-    case-insensitively so whitespace/casing variants collapse to one."""
-    seen = {}
-    for c in (ShopItem.objects.filter(kind=kind)
-              .exclude(category="").values_list("category", flat=True)):
-        c = re.sub(r"\s+", " ", c or "").strip()
-        if c and c.lower() not in seen:
-            seen[c.lower()] = c
-    return sorted(seen.values(), key=lambda s: s.lower())
+    case-insensitively so whitespace/casing variants collapse to one. Served
+    from the cached facets (site_shop.facets)."""
+    from .facets import get
+    return list(get().get(kind, {}).get("categories", []))
 
 
 class ShopItem(models.Model):
@@ -73,6 +69,15 @@ class ShopItem(models.Model):
     # Import bookkeeping — lets an importer upsert instead of duplicating.
     source = models.CharField(max_length=40, blank=True, default="", db_index=True, verbose_name="المصدر (استيراد)")
     external_id = models.CharField(max_length=120, blank=True, default="", db_index=True, verbose_name="المعرّف الخارجي")
+    # Feed image bookkeeping (site_shop.importer): where the image came from,
+    # the validators for a conditional re-fetch, and the content hash.
+    image_source_url = models.CharField(max_length=500, blank=True, default="", editable=False)
+    image_etag = models.CharField(max_length=200, blank=True, default="", editable=False)
+    image_last_modified = models.CharField(max_length=64, blank=True, default="", editable=False)
+    image_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    # Set by an import that queued the fetch for the shop_images worker
+    # instead of making it (the staff upload page); cleared once fetched.
+    image_pending_url = models.CharField(max_length=500, blank=True, default="", editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -81,7 +86,11 @@ class ShopItem(models.Model):
         ordering = ["-is_featured", "-created_at"]
         verbose_name = "قطعة / إكسسوار"
         verbose_name_plural = "قطع الغيار والإكسسوارات"
-        indexes = [models.Index(fields=["kind", "-created_at"])]
+        indexes = [
+            models.Index(fields=["kind", "-created_at"]),
+            models.Index(fields=["id"], condition=~models.Q(image_pending_url=""),
+                         name="site_shop_item_image_pending"),
+        ]
 
     def __str__(self):
         return f"{self.get_kind_display()}: {self.name}"
@@ -90,13 +99,18 @@ class ShopItem(models.Model):
         name = "accessories_detail" if self.kind == "accessory" else "parts_detail"
         return reverse(name, args=[self.pk])
 
-    def save(self, *args, **kwargs):
+    def tidy(self):
+        """Normalise the derived/cleaned fields. save() calls it; bulk writers
+        (site_shop.importer) call it themselves."""
         # Tidy whitespace so filter values / category lists stay consistent.
         self.category = re.sub(r"\s+", " ", self.category or "").strip()
         self.brand = re.sub(r"\s+", " ", self.brand or "").strip()
         # Loose part-number matching: keep only alphanumerics, uppercased, so
         # "GR3Z-10346-Q" / "GR3Z 10346 Q" / "gr3z10346q" all match.
         self.part_number_norm = re.sub(r"[^A-Za-z0-9]", "", self.part_number or "").upper()
+
+    def save(self, *args, **kwargs):
+        self.tidy()
         if self.image and hasattr(self.image, "file"):
             try:
                 self.image = optimize_image(self.image, max_width=1200, max_height=900, quality=85)
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender='site_shop.ShopItem')
+@receiver(post_delete, sender='site_shop.ShopItem')
+def shop_item_changed(sender, instance, **kwargs):
+    """Invalidate the catalogue facets (site_shop.facets)."""
+    from tenants import generations
+
+    from .facets import GENERATION
+    generations.bump_on_write(GENERATION)
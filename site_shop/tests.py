@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import override_settings
+from django.urls import reverse
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.test.client import TenantClient
+
+from . import facets
+from .importer import FileImageSource, fetch_pending, import_rows
+from .models import ShopItem
+from .views import _search
+
+
+class FeedImportTests(TenantTestCase):
+    """site_shop.importer against a local image mirror: rows are bulk-upserted
+    and diffed, identical images are stored once, and a re-run with
+    refresh_images only re-reads files whose mtime moved."""
+
+    def setUp(self):
+        from PIL import Image
+
+        self.media = tempfile.mkdtemp()
+        self.mirror = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        self.settings_override.enable()
+        for name, color in (("a.jpg", "red"), ("b.jpg", "red"), ("c.jpg", "blue")):
+            buf = BytesIO()
+            Image.new("RGB", (40, 30), color).save(buf, format="JPEG")
+            with open(os.path.join(self.mirror, name), "wb") as f:
+                f.write(buf.getvalue())
+        self.source = FileImageSource(self.mirror)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+        shutil.rmtree(self.mirror, ignore_errors=True)
+
+    def _rows(self, price="100"):
+        return [
+            {"name": "Oil filter", "part_number": "26300-35505", "price": price,
+             "image": "https://cdn.example/a.jpg"},
+            {"name": "Air filter", "part_number": "28113-2S000", "price": "80",
+             "image": "https://cdn.example/b.jpg"},
+            {"name": "Brake pads", "external_id": "bp-1", "price": "250",
+             "image": "https://cdn.example/c.jpg"},
+            {"name": "", "price": "1"},
+        ]
+
+    def _import(self, rows, **kwargs):
+        return import_rows(rows, source="feed", image_source=self.source, **kwargs)
+
+    def test_bulk_upsert_counts_and_diff(self):
+        first = self._import(self._rows())
+        self.assertEqual((first["created"], first["updated"], first["skipped"]), (3, 0, 1))
+        self.assertEqual(first["images"], 3)
+
+        # Same feed with one changed price: one update, nothing else written.
+        second = self._import(self._rows(price="120"))
+        self.assertEqual((second["created"], second["updated"], second["unchanged"]), (0, 1, 2))
+        self.assertEqual(second["images"], 0)
+        self.assertEqual(ShopItem.objects.count(), 3)
+        item = ShopItem.objects.get(part_number="26300-35505")
+        self.assertEqual(item.price, 120)
+        self.assertEqual(item.part_number_norm, "2630035505")
+
+    def test_identical_images_are_stored_once(self):
+        self._import(self._rows())
+        oil = ShopItem.objects.get(part_number="26300-35505")
+        air = ShopItem.objects.get(part_number="28113-2S000")
+        pads = ShopItem.objects.get(external_id="bp-1")
+        self.assertEqual(oil.image_hash, air.image_hash)
+        self.assertEqual(oil.image.name, air.image.name)
+        self.assertNotEqual(oil.image.name, pads.image.name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media, "site_shop", "feed"))), 2)
+
+    def test_refresh_only_refetches_changed_files(self):
+        self._import(self._rows())
+        again = self._import(self._rows(), refresh_images=True)
+        self.assertEqual((again["images"], again["images_unchanged"]), (0, 3))
+
+        # c.jpg is replaced by a copy of a.jpg: re-read, and it now shares a.jpg's file.
+        shutil.copyfile(os.path.join(self.mirror, "a.jpg"), os.path.join(self.mirror, "c.jpg"))
+        os.utime(os.path.join(self.mirror, "c.jpg"), ns=(1, 1))
+        changed = self._import(self._rows(), refresh_images=True)
+        self.assertEqual(changed["images"], 1)
+        pads = ShopItem.objects.get(external_id="bp-1")
+        oil = ShopItem.objects.get(part_number="26300-35505")
+        self.assertEqual(pads.image.name, oil.image.name)
+
+    def test_deferred_import_queues_urls_for_the_worker(self):
+        res = self._import(self._rows(), defer_images=True)
+        self.assertEqual((res["images"], res["images_queued"]), (0, 3))
+        self.assertFalse(ShopItem.objects.exclude(image="").exclude(image=None).exists())
+        self.assertEqual(
+            ShopItem.objects.get(external_id="bp-1").image_pending_url, "https://cdn.example/c.jpg")
+
+        self.assertEqual(fetch_pending(image_source=self.source), (3, 3, 0, 0))
+        self.assertFalse(ShopItem.objects.exclude(image_pending_url="").exists())
+        self.assertEqual(ShopItem.objects.get(external_id="bp-1").image_source_url,
+                         "https://cdn.example/c.jpg")
+        self.assertEqual(fetch_pending(image_source=self.source), (0, 0, 0, 0))
+
+    def test_no_row_cap_by_default(self):
+        rows = [{"name": f"Clip {i}", "part_number": f"CLIP-{i}"} for i in range(2500)]
+        res = self._import(rows, download_images=False)
+        self.assertEqual(res["created"], 2500)
+        self.assertFalse(res["errors"])
+
+    def test_limit_caps_the_rows_written(self):
+        rows = [{"name": f"Clip {i}", "part_number": f"CLIP-{i}"} for i in range(30)]
+        res = self._import(rows, download_images=False, limit=20)
+        self.assertEqual(res["created"], 20)
+        self.assertEqual(ShopItem.objects.count(), 20)
+        self.assertTrue(res["errors"])
+
+
+class ShopSearchAndFacetTests(TenantTestCase):
+    """Indexed search (search_vector / part_number_norm) and the cached
+    facets behind the shop list."""
+
+    def setUp(self):
+        self.client = TenantClient(self.tenant)
+        ShopItem.objects.create(kind="part", name="Oil filter", part_number="26300-35505",
+                                brand="Hyundai", category="Filters", origin="genuine")
+        ShopItem.objects.create(kind="part", name="Brake pads", part_number="58101-D7A00",
+                                brand="Kia", category=" Filters ", in_stock=False,
+                                description="Front ceramic pads")
+        ShopItem.objects.create(kind="accessory", name="Floor mats", brand="Hyundai")
+
+    def _names(self, q):
+        return sorted(_search(ShopItem.objects.filter(kind="part"), q).values_list("name", flat=True))
+
+    def test_search_matches_words_prefixes_and_part_numbers(self):
+        self.assertEqual(self._names("oil"), ["Oil filter"])
+        self.assertEqual(self._names("cera"), ["Brake pads"])        # description, prefix
+        self.assertEqual(self._names("hyundai filt"), ["Oil filter"])
+        self.assertEqual(self._names("2630035505"), ["Oil filter"])  # normalised part number
+        self.assertEqual(self._names("d7a"), ["Brake pads"])         # substring of the part number
+
+    def test_facets_are_grouped_and_invalidated_on_save(self):
+        part = facets.get()["part"]
+        self.assertEqual(part["total"], 2)
+        self.assertEqual(part["categories"], ["Filters"])
+        self.assertEqual(part["brands"], ["Hyundai", "Kia"])
+        self.assertEqual(part["counts"]["in_stock"], 1)
+        self.assertEqual(facets.count(facets.get(), "part", category="FILTERS", in_stock=True), 1)
+
+        ShopItem.objects.create(kind="part", name="Spark plug", brand="NGK")
+        self.assertEqual(facets.get()["part"]["brands"], ["Hyundai", "Kia", "NGK"])
+
+    def test_list_count_comes_from_facets(self):
+        resp = self.client.get(reverse("parts_list"), {"brand": "kia"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["items"].paginator.count, 1)
+        self.assertFalse(resp.context["catalogue_empty"])
+
+    def test_list_rows_match_the_facet_count(self):
+        ShopItem.objects.create(kind="part", name="Air filter", brand="Kia",
+                                category="Air   Filters\t")
+        ShopItem.objects.create(kind="part", name="Cabin filter", brand="Kia",
+                                category="air filters")
+        for category in ("Air Filters", " air  filters"):
+            resp = self.client.get(reverse("parts_list"), {"category": category})
+            page = resp.context["items"]
+            self.assertEqual(page.paginator.count, 2)
+            self.assertEqual(sorted(i.name for i in page), ["Air filter", "Cabin filter"])
+        by_category = {k.lower(): v for k, v in facets.get()["part"]["counts"]["category"].items()}
+        self.assertEqual(by_category["air filters"], 2)
@@ -28,13 +28,41 @@ def _is_public_schema():
 
 # ──────────────────────────── Public ────────────────────────────
 
+def _search(qs, q):
+    """Indexed catalogue search (migration 0007): every word of `q` as a
+    prefix against the weighted search_vector, OR the alphanumeric part of
+    `q` against part_number_norm — a substring via the trigram index, or a
+    prefix for terms too short for trigrams. Best matches first."""
+    words = re.findall(r"[^\W_]+", q)
+    tsquery = " & ".join(f"{w}:*" for w in words)
+    qnorm = re.sub(r"[^A-Za-z0-9]", "", q).upper()
+    where, params = [], []
+    if tsquery:
+        where.append("search_vector @@ to_tsquery('simple', %s)")
+        params.append(tsquery)
+    if qnorm:
+        where.append("part_number_norm LIKE %s")
+        params.append(f"%{qnorm}%" if len(qnorm) >= 3 else f"{qnorm}%")
+    if not where:
+        return qs
+    qs = qs.extra(where=["(" + " OR ".join(where) + ")"], params=params)
+    if tsquery:
+        qs = qs.extra(select={"search_rank": "ts_rank(search_vector, to_tsquery('simple', %s))"},
+                      select_params=[tsquery],
+                      order_by=["-search_rank", "-is_featured", "-created_at"])
+    return qs
+
+
 def _shop_list(request, kind):
     """Public catalogue for one kind (part / accessory)."""
     labels = KIND_LABELS[kind]
+    facets = None
     if _is_public_schema():
         items = ShopItem.objects.none()
         categories, brands = [], []
     else:
+        from . import facets as shop_facets
+
         qs = ShopItem.objects.filter(kind=kind)
 
         q = (request.GET.get("q") or "").strip()
@@ -43,29 +71,38 @@ def _shop_list(request, kind):
         condition = (request.GET.get("condition") or "").strip()
         origin = (request.GET.get("origin") or "").strip()
         in_stock = request.GET.get("in_stock")
+        if condition not in ("new", "used"):
+            condition = ""
+        if origin not in ("genuine", "aftermarket"):
+            origin = ""
 
         if q:
-            cond = Q(name__icontains=q) | Q(description__icontains=q) | Q(brand__icontains=q) | Q(fits_make__icontains=q) | Q(fits_model__icontains=q) | Q(part_number__icontains=q)
-            qnorm = re.sub(r"[^A-Za-z0-9]", "", q).upper()
-            if qnorm:
-                cond |= Q(part_number_norm__icontains=qnorm)
-            qs = qs.filter(cond)
+            qs = _search(qs, q)
         if category:
-            qs = qs.filter(category__iexact=category)
+            qs = shop_facets.matching(qs, "category", category)
         if brand:
-            qs = qs.filter(brand__iexact=brand)
-        if condition in ("new", "used"):
+            qs = shop_facets.matching(qs, "brand", brand)
+        if condition:
             qs = qs.filter(condition=condition)
-        if origin in ("genuine", "aftermarket"):
+        if origin:
             qs = qs.filter(origin=origin)
         if in_stock == "1":
             qs = qs.filter(in_stock=True)
 
-        # Categories + brands are dynamic — taken from the items actually present.
-        categories = categories_for(kind)
-        brands = sorted({b for b in ShopItem.objects.filter(kind=kind).exclude(brand="").values_list("brand", flat=True)})
+        # Categories, brands and counts are dynamic — taken from the items
+        # actually present, via the cached grouped query (site_shop.facets).
+        all_facets = shop_facets.get()
+        facets = all_facets.get(kind, {})
+        categories = facets.get("categories", [])
+        brands = facets.get("brands", [])
 
         paginator = Paginator(qs, 24)
+        if not q:
+            # Every non-search filter is a facet dimension: the count is
+            # exact from the cached groups, so skip the COUNT(*).
+            paginator.count = shop_facets.count(
+                all_facets, kind, category=category, brand=brand, condition=condition,
+                origin=origin, in_stock=in_stock == "1")
         items = paginator.get_page(request.GET.get("page"))
 
     tenant = getattr(connection, "tenant", None)
@@ -73,8 +110,7 @@ def _shop_list(request, kind):
         tenant, "show_parts" if kind == "part" else "show_accessories", True))
     # True only when the catalogue has NO items of this kind at all (ignoring
     # filters) — that's when we offer the "request it" form instead.
-    catalogue_empty = (not _is_public_schema()
-                       and not ShopItem.objects.filter(kind=kind).exists())
+    catalogue_empty = facets is not None and not facets.get("total")
 
     context = {
         "items": items,
@@ -86,6 +122,7 @@ def _shop_list(request, kind):
         "kind_labels": labels,
         "categories": categories,
         "brands": brands,
+        "facet_counts": (facets or {}).get("counts", {}),
         "active_filters": {
             "q": request.GET.get("q", ""),
             "category": request.GET.get("category", ""),
@@ -387,25 +424,27 @@ def shop_import(request):
             res = import_autowini(
                 pages=pages, fitting=(request.POST.get("fitting") or "CAR"),
                 currency=(request.POST.get("currency") or "USD"), source="autowini",
-                download_images="no_images" not in request.POST, limit=400)
+                download_images="no_images" not in request.POST, limit=400, defer_images=True)
         except Exception as e:
             messages.error(request, f"تعذّر الجلب من Autowini: {e}")
             return redirect(f"{reverse('shop_import')}?kind={kind}")
-        messages.success(request, f"Autowini — أُضيف {res['created']}، حُدّث {res['updated']}، صور {res['images']}")
+        messages.success(request, f"Autowini — أُضيف {res['created']}، حُدّث {res['updated']}، صور بالانتظار {res['images_queued']}")
         return redirect(f"{reverse('shop_manage')}?kind={kind}")
 
     if request.method == "POST":
-        from .importer import import_csv_text, import_csv_url
+        from .importer import import_csv_upload, import_csv_url
         source = (request.POST.get("source") or "csv").strip()[:40] or "csv"
         currency = (request.POST.get("currency") or "SAR").strip() or "SAR"
         download_images = "no_images" not in request.POST
+        # Capped: this runs inside the request (gunicorn --timeout 60). Bigger
+        # feeds go through `manage.py import_shop_csv` (no cap by default).
+        # Images are only queued here; the shop_images worker fetches them.
         common = dict(kind=kind, source=source, default_currency=currency,
-                      download_images=download_images, limit=1000)
+                      download_images=download_images, limit=1000, defer_images=True)
         try:
             url = (request.POST.get("url") or "").strip()
             if request.FILES.get("file"):
-                text = request.FILES["file"].read().decode("utf-8-sig", errors="replace")
-                res = import_csv_text(text, **common)
+                res = import_csv_upload(request.FILES["file"], **common)
             elif url:
                 res = import_csv_url(url, **common)
             else:
@@ -414,7 +453,7 @@ def shop_import(request):
         except Exception as e:
             messages.error(request, f"تعذّر الاستيراد: {e}")
             return redirect(f"{reverse('shop_import')}?kind={kind}")
-        messages.success(request, f"تم الاستيراد — أُضيف {res['created']}، حُدّث {res['updated']}، صور {res['images']}، تم تخطّي {res['skipped']}")
+        messages.success(request, f"تم الاستيراد — أُضيف {res['created']}، حُدّث {res['updated']}، صور بالانتظار {res['images_queued']}، تم تخطّي {res['skipped']}")
         for e in res["errors"][:5]:
             messages.warning(request, e)
         return redirect(f"{reverse('shop_manage')}?kind={kind}")
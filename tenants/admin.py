@@ -9,7 +9,7 @@ from django.utils.html import format_html
 from django_tenants.admin import TenantAdminMixin
 from django_tenants.utils import schema_context
 
-from .models import Tenant, Domain, TenantPhoneNumber, TenantHeroImage, TenantWorkStep, TenantSalesPerson, GlobalExchangeRates
+from .models import Tenant, Domain, TenantPhoneNumber, TenantHeroImage, TenantWorkStep, TenantSalesPerson, GlobalExchangeRates, Notification
 
 from cars.models import CarImage, Manufacturer, BodyType
 
@@ -246,3 +246,14 @@ class GlobalExchangeRatesAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ("schema_name", "channel", "kind", "subject", "total", "sent", "failed", "status", "created_at")
+    list_filter = ("channel", "status", "schema_name")
+    readonly_fields = ("schema_name", "channel", "kind", "subject", "body", "total", "sent", "failed",
+                       "status", "created_at", "finished_at")
+
+    def has_add_permission(self, request):
+        return False
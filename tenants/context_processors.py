@@ -1,6 +1,7 @@
 from django.db import connection
 from django.core.cache import cache
-from .models import TenantHeroImage, GlobalExchangeRates
+from . import pricing
+from .models import TenantHeroImage
 from .fonts import font_ctx
 
 
@@ -17,33 +18,18 @@ def _work_steps(tenant):
 
 def _custom_currencies(tenant):
     """Validated per-tenant extra currencies for the switcher/converters."""
-    out = []
-    for c in (getattr(tenant, 'custom_currencies', None) or []):
-        try:
-            code = str(c.get('code', '')).strip().upper()[:6]
-            rate = float(c.get('rate') or 0)
-            if code and rate > 0 and code not in ('KRW', 'USD', 'SAR', 'AED', 'EUR'):
-                out.append({'code': code, 'symbol': str(c.get('symbol', '') or code).strip()[:8], 'rate': rate})
-        except Exception:
-            continue
-    return out
+    return pricing.custom_currencies(tenant)
 
 
 def _global_rates():
-    try:
-        rates = GlobalExchangeRates.get_solo()
-    except Exception:
-        return {
-            "rate_usd": 0.00067,
-            "rate_sar": 0.00250,
-            "rate_aed": 0.00272,
-            "rate_eur": 0.00069,
-        }
+    # Held in-process by tenants.pricing, so a request doesn't go to the cache
+    # (and unpickle the singleton) just to read four numbers.
+    rates = pricing.rates()
     return {
-        "rate_usd": float(rates.rate_usd),
-        "rate_sar": float(rates.rate_sar),
-        "rate_aed": float(rates.rate_aed),
-        "rate_eur": float(rates.rate_eur),
+        "rate_usd": rates.usd,
+        "rate_sar": rates.sar,
+        "rate_aed": rates.aed,
+        "rate_eur": rates.eur,
     }
 
 
@@ -0,0 +1,52 @@
+"""Per-schema generation counters for derived caches.
+
+A cache that is costly to build and only changes when certain rows do is
+stored under the schema's current generation number, and anything that
+changes those rows bumps it — which orphans the old entry (it simply expires):
+
+    <name>:<schema>:<generation(name, schema)>
+
+    site_car_stats     site_cars.stats     (SiteCar rows)
+    site_shop_facets   site_shop.facets    (ShopItem rows)
+
+A counter starts from the clock, so one lost with the cache never hands an
+old number — and with it a stale entry — back out.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+def _key(name, schema):
+    return f"{name}_gen:{schema}"
+
+
+def generation(name, schema=None):
+    schema = schema or connection.schema_name
+    gen = cache.get(_key(name, schema))
+    if gen is None:
+        cache.add(_key(name, schema), int(time.time()), None)
+        gen = cache.get(_key(name, schema)) or 0
+    return gen
+
+
+def bump(name, schema=None):
+    """Move `name` to a new generation for the schema. Best-effort: never
+    raises."""
+    schema = schema or connection.schema_name
+    try:
+        cache.incr(_key(name, schema))
+    except ValueError:
+        cache.add(_key(name, schema), int(time.time()), None)
+    except Exception:
+        pass
+
+
+def bump_on_write(name, schema=None):
+    """bump() for a model signal: now, for reads later in the same
+    transaction, and again on commit, so a request that cached the pre-commit
+    state in between doesn't keep it."""
+    schema = schema or connection.schema_name
+    bump(name, schema)
+    transaction.on_commit(lambda: bump(name, schema))
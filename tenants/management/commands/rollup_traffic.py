@@ -0,0 +1,67 @@
+"""
+Copy the per-tenant traffic counters out of Redis into TrafficRollup.
+
+TrafficCounterMiddleware keeps `traf:hour:<YYYYmmddHH>` (2-day TTL) and
+`traf:day:<YYYYmmdd>` (32-day TTL) hashes on the "state" Redis alias. Run
+this at least daily so the history survives the TTLs. A bucket's counter only
+ever grows, so the upsert keeps the larger of the stored and the Redis count:
+re-running or overlapping runs is harmless, and a counter that was lost and
+restarted (Redis restart, REDIS_STATE_URL moved) can't shrink a stored total.
+
+    python manage.py rollup_traffic            # last 2 days of hours + days
+    python manage.py rollup_traffic --days 31  # backfill everything Redis still has
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = "Upsert Redis traffic counters (hourly + daily, per tenant) into TrafficRollup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=2,
+                            help="How many days back to copy (hours are only kept 2 days in Redis).")
+
+    def handle(self, *args, **opts):
+        try:
+            from django_redis import get_redis_connection
+            r = get_redis_connection("state")
+        except Exception as e:
+            raise CommandError(f"Redis unavailable: {e}")
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        days = max(1, opts["days"])
+        day_buckets = [now.replace(hour=0) - datetime.timedelta(days=i) for i in range(days)]
+        hour_buckets = [now - datetime.timedelta(hours=i) for i in range(min(days, 2) * 24)]
+
+        # One round-trip for every hash we need.
+        pipe = r.pipeline(transaction=False)
+        for b in day_buckets:
+            pipe.hgetall(f"traf:day:{b:%Y%m%d}")
+        for b in hour_buckets:
+            pipe.hgetall(f"traf:hour:{b:%Y%m%d%H}")
+        results = pipe.execute()
+
+        rows = []
+        for period, buckets, res in (("day", day_buckets, results[:len(day_buckets)]),
+                                     ("hour", hour_buckets, results[len(day_buckets):])):
+            for b, h in zip(buckets, res):
+                rows.extend((k.decode(), period, b, int(v)) for k, v in (h or {}).items())
+
+        if not rows:
+            self.stdout.write("Nothing to roll up.")
+            return
+
+        with connection.cursor() as cur:
+            for i in range(0, len(rows), 1000):
+                batch = rows[i:i + 1000]
+                args = ",".join(cur.mogrify("(%s,%s,%s,%s)", row).decode() for row in batch)
+                cur.execute(
+                    "INSERT INTO tenants_trafficrollup (schema_name, period, bucket, count) "
+                    f"VALUES {args} "
+                    "ON CONFLICT (schema_name, period, bucket) "
+                    "DO UPDATE SET count = GREATEST(tenants_trafficrollup.count, EXCLUDED.count)"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {len(rows)} hour/day counters."))
@@ -0,0 +1,50 @@
+"""Worker for queued notifications (tenants.notify): email broadcasts and
+Telegram posts.
+
+Usage:
+    python manage.py send_notifications                    # send what is due, then exit
+    python manage.py send_notifications --loop             # long-running worker
+    python manage.py send_notifications --max-seconds 600  # bounded run for cron
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from tenants import notify
+
+
+class Command(BaseCommand):
+    help = "Send queued emails and Telegram messages (batched, rate-limited, retried with backoff)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=notify.BATCH, help="Messages claimed per round.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running; sleep while nothing is due.")
+        parser.add_argument("--max-seconds", type=int, default=0,
+                            help="Stop after this long (0 = no limit).")
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        sent = failed = rounds = 0
+        while True:
+            if opts["max_seconds"] and time.monotonic() - started >= opts["max_seconds"]:
+                break
+            res = notify.process(opts["batch"])
+            sent += res["sent"]
+            failed += res["failed"]
+            if not (res["sent"] or res["failed"] or res["retried"]):
+                if not opts["loop"]:
+                    break
+                time.sleep(1)
+                continue
+            if not (res["sent"] or res["failed"]):
+                time.sleep(0.5)   # only deferred (rate-limited) messages this round
+            rounds += 1
+            if rounds % 10 == 0:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  {sent} sent, {failed} failed "
+                                  f"({sent / elapsed:.1f}/s, pending={notify.pending()})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. sent={sent} failed={failed} pending={notify.pending()}"
+        ))
@@ -2,7 +2,9 @@
 Dashboard metrics helpers.
 
 - tenant_traffic(schema): a tenant's own request volume from the Redis counters
-  written by TrafficCounterMiddleware (today / week / month + a daily sparkline).
+  written by TrafficCounterMiddleware (today / week / month + a daily sparkline),
+  backed by the TrafficRollup table beyond the Redis TTL.
+- fleet_traffic(): the same for every tenant, still one Redis round-trip.
 - fleet_gsc(): aggregate the cached per-tenant GSC for the owner overview.
 - fleet_sales(): total orders/sold/revenue across all tenant schemas (cached,
   since it iterates schemas and the owner page auto-refreshes).
@@ -10,24 +12,89 @@ Dashboard metrics helpers.
 import datetime
 
 
-def tenant_traffic(schema, days=30):
+# traf:day:* hashes live 32 days; anything older comes from TrafficRollup.
+REDIS_DAY_HISTORY = 31
+
+
+def _utc_days(days):
+    """The last `days` UTC dates, oldest → today (the counters are UTC-keyed)."""
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    return [today - datetime.timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+
+def daily_counts(day_list, schemas=None):
+    """{schema: [count per day in day_list]}.
+
+    Recent days come from Redis in ONE pipelined round-trip (HMGET of the
+    requested schemas, or HGETALL when schemas is None = every tenant); days
+    past the Redis TTL — or all of them if Redis is unreachable — come from
+    the TrafficRollup table in one query."""
+    cutoff = day_list[-1] - datetime.timedelta(days=REDIS_DAY_HISTORY - 1)
+    recent = [d for d in day_list if d >= cutoff]
+    by_day = {}  # date -> {schema: count}
     try:
         from django_redis import get_redis_connection
-        r = get_redis_connection("default")
-        today = datetime.date.today()
-        counts = []
-        for i in range(days - 1, -1, -1):  # oldest → today
-            d = today - datetime.timedelta(days=i)
-            v = r.hget(f"traf:day:{d.strftime('%Y%m%d')}", schema)
-            counts.append(int(v) if v else 0)
-        mx = max(counts) if counts else 0
-        return {
-            "today": counts[-1] if counts else 0,
-            "week": sum(counts[-7:]),
-            "month": sum(counts),
-            "spark": [round(100 * c / mx) if mx else 0 for c in counts],
-            "days": days,
-        }
+        pipe = get_redis_connection("state").pipeline(transaction=False)
+        for d in recent:
+            key = f"traf:day:{d.strftime('%Y%m%d')}"
+            if schemas:
+                pipe.hmget(key, schemas)
+            else:
+                pipe.hgetall(key)
+        for d, res in zip(recent, pipe.execute()):
+            if schemas:
+                by_day[d] = {s: int(v) for s, v in zip(schemas, res) if v}
+            else:
+                by_day[d] = {k.decode(): int(v) for k, v in res.items()}
+    except Exception:
+        by_day = {}
+
+    missing = [d for d in day_list if d not in by_day]
+    if missing:
+        try:
+            from tenants.models import TrafficRollup
+            qs = TrafficRollup.objects.filter(
+                period=TrafficRollup.PERIOD_DAY,
+                bucket__date__gte=missing[0], bucket__date__lte=missing[-1],
+            )
+            if schemas:
+                qs = qs.filter(schema_name__in=schemas)
+            for schema, bucket, n in qs.values_list("schema_name", "bucket", "count"):
+                by_day.setdefault(bucket.date(), {})[schema] = n
+        except Exception:
+            pass
+
+    names = schemas or sorted({s for per in by_day.values() for s in per})
+    return {s: [by_day.get(d, {}).get(s, 0) for d in day_list] for s in names}
+
+
+def _summarise(counts, days):
+    mx = max(counts) if counts else 0
+    return {
+        "today": counts[-1] if counts else 0,
+        "week": sum(counts[-7:]),
+        "month": sum(counts),
+        "spark": [round(100 * c / mx) if mx else 0 for c in counts],
+        "days": days,
+    }
+
+
+def tenant_traffic(schema, days=30):
+    try:
+        return _summarise(daily_counts(_utc_days(days), [schema])[schema], days)
+    except Exception:
+        return None
+
+
+def fleet_traffic(days=30):
+    """tenant_traffic() for every tenant at once — same Redis round-trip count
+    as a single tenant. {schema: summary}, busiest first."""
+    try:
+        per = daily_counts(_utc_days(days))
+        return dict(sorted(
+            ((s, _summarise(c, days)) for s, c in per.items()),
+            key=lambda x: -x[1]["month"],
+        ))
     except Exception:
         return None
 
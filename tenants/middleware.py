@@ -2,9 +2,8 @@ from django.db import connection
 from django.http import HttpResponseBadRequest
 
 
+import logging
 import re
-import time
-from collections import defaultdict
 
 from django.db import connection
 from django.http import HttpResponseBadRequest, HttpResponseNotFound, HttpResponse
@@ -35,6 +34,8 @@ _VALID_CAR_TYPE_RE = re.compile(r'^[a-z0-9_]{1,32}$', re.IGNORECASE)
 
 MAX_PAGE_NUMBER = 200  # Hard cap – no listing needs 200+ pages
 
+_slow_log = logging.getLogger("slow_requests")
+
 
 class OnDemandTLSCheckMiddleware:
     """Answers Caddy's on-demand-TLS ``ask`` probe: 200 if the requested domain
@@ -63,14 +64,27 @@ class OnDemandTLSCheckMiddleware:
 
 class TrafficCounterMiddleware:
     """Best-effort per-tenant request counters in Redis for the health dashboard.
-    One pipelined round-trip per request; wrapped so counting never affects the
-    response. Skips static/internal/self paths. Must sit AFTER TenantMainMiddleware
-    so connection.schema_name is set."""
+    Counts are buffered in-process and flushed every FLUSH_INTERVAL seconds as
+    one pipeline of aggregated INCRBY/HINCRBY — no Redis round-trip on the
+    request path. Wrapped so counting never affects the response. Skips
+    static/internal/self paths. Must sit AFTER TenantMainMiddleware so
+    connection.schema_name is set.
+
+    A flush happens on the first request after the interval, so an idle worker
+    holds at most a few seconds of counts; they are also flushed at exit."""
 
-    _SKIP = ("/static/", "/media/", "/internal/", "/vps-health/", "/favicon", "/robots")
+    _SKIP = ("/static/", "/media/", "/internal/", "/vps-health/", "/metrics", "/favicon", "/robots")
+    FLUSH_INTERVAL = 5  # seconds
 
     def __init__(self, get_response):
+        import atexit
+        import threading
+        import time
         self.get_response = get_response
+        self._lock = threading.Lock()
+        self._buf = {}                  # (minute, schema) -> count
+        self._last_flush = time.monotonic()
+        atexit.register(self._flush)
 
     def __call__(self, request):
         try:
@@ -83,17 +97,136 @@ class TrafficCounterMiddleware:
 
     def _count(self, schema):
         import time
-        from django_redis import get_redis_connection
-        t = time.gmtime()
-        minute = time.strftime("%Y%m%d%H%M", t)
-        hour = time.strftime("%Y%m%d%H", t)
-        day = time.strftime("%Y%m%d", t)
-        r = get_redis_connection("default")
-        pipe = r.pipeline()
-        pipe.incr(f"traf:min:{minute}"); pipe.expire(f"traf:min:{minute}", 7200)          # 2h
-        pipe.hincrby(f"traf:hour:{hour}", schema, 1); pipe.expire(f"traf:hour:{hour}", 172800)   # 2d
-        pipe.hincrby(f"traf:day:{day}", schema, 1); pipe.expire(f"traf:day:{day}", 2764800)      # 32d
-        pipe.execute()
+        key = (time.strftime("%Y%m%d%H%M", time.gmtime()), schema)
+        now = time.monotonic()
+        with self._lock:
+            self._buf[key] = self._buf.get(key, 0) + 1
+            due = now - self._last_flush >= self.FLUSH_INTERVAL
+            if due:
+                self._last_flush = now
+        if due:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            buf, self._buf = self._buf, {}
+        if not buf:
+            return
+        minutes, hours, days = {}, {}, {}
+        for (minute, schema), n in buf.items():
+            minutes[minute] = minutes.get(minute, 0) + n
+            hours[(minute[:10], schema)] = hours.get((minute[:10], schema), 0) + n
+            days[(minute[:8], schema)] = days.get((minute[:8], schema), 0) + n
+        try:
+            from django_redis import get_redis_connection
+            r = get_redis_connection("state")
+            pipe = r.pipeline(transaction=False)
+            for minute, n in minutes.items():
+                pipe.incrby(f"traf:min:{minute}", n); pipe.expire(f"traf:min:{minute}", 7200)  # 2h
+            for (hour, schema), n in hours.items():
+                pipe.hincrby(f"traf:hour:{hour}", schema, n); pipe.expire(f"traf:hour:{hour}", 172800)  # 2d
+            for (day, schema), n in days.items():
+                pipe.hincrby(f"traf:day:{day}", schema, n); pipe.expire(f"traf:day:{day}", 2764800)  # 32d
+            pipe.execute()
+        except Exception:
+            pass
+
+
+class RequestProfileMiddleware:
+    """Samples requests into a tenants.profiling.RequestProfile (SQL count and
+    time, slowest statements, outbound HTTP, cache hits/misses, template time)
+    tagged with view name and tenant schema.
+
+    Every request is timed (one perf_counter pair); any that run past
+    SLOW_REQUEST_MS go to the "slow_requests" log, with the full breakdown when
+    the request was sampled. Views declared with @query_budget(n) are checked
+    against their budget — logged in production, raised when
+    QUERY_BUDGET_STRICT is on (tests). Sits after TenantMainMiddleware so
+    connection.schema_name is set."""
+
+    def __init__(self, get_response):
+        from django.conf import settings
+        from tenants import profiling
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "REQUEST_PROFILE_SAMPLE_RATE", 0.0)
+        self.slow_ms = getattr(settings, "SLOW_REQUEST_MS", 2000)
+        self.strict = getattr(settings, "QUERY_BUDGET_STRICT", False)
+        profiling.install()
+
+    def __call__(self, request):
+        import random
+        import time
+        from tenants import profiling
+
+        request._query_budget = None
+        started = time.perf_counter()
+        # Strict mode profiles everything so a budgeted view can't slip past
+        # its budget just because the request wasn't sampled.
+        if not (self.strict or (self.sample_rate and random.random() < self.sample_rate)):
+            response = self.get_response(request)
+            total_ms = (time.perf_counter() - started) * 1000
+            view, schema = _view_name(request), getattr(connection, "schema_name", "public")
+            if total_ms >= self.slow_ms:
+                _slow_log.warning(
+                    "slow request %s %s view=%s schema=%s total=%.0fms (unsampled)",
+                    request.method, request.path, view, schema, total_ms,
+                )
+            _record_metrics(view, schema, total_ms)
+            return response
+
+        prof = profiling.RequestProfile(getattr(connection, "schema_name", "public"))
+        token = profiling.activate(prof)
+        try:
+            with connection.execute_wrapper(profiling.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            profiling.deactivate(token)
+        prof.total_ms = (time.perf_counter() - started) * 1000
+        prof.view = _view_name(request)
+        request.profile = prof
+
+        if prof.total_ms >= self.slow_ms:
+            _slow_log.warning(
+                "slow request %s %s %s slowest=%s", request.method, request.path,
+                prof.summary(), [f"{ms:.0f}ms {sql[:200]}" for ms, sql in prof.slowest],
+            )
+
+        _record_metrics(prof.view, prof.schema, prof.total_ms, prof)
+
+        budget = request._query_budget
+        if budget is not None and prof.queries > budget:
+            msg = f"{prof.view} ran {prof.queries} queries (budget {budget})"
+            if self.strict:
+                raise profiling.QueryBudgetExceeded(
+                    msg + ":\n" + "\n".join(f"  {ms:.1f}ms {sql}" for ms, sql in prof.slowest)
+                )
+            _slow_log.warning("query budget exceeded: %s", msg)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, "query_budget", None)
+        return None
+
+
+def _record_metrics(view, schema, total_ms, prof=None):
+    """Feed tenants.telemetry (/metrics). Buffered in-process; flushed to
+    Redis at most every few seconds, never on the hot path."""
+    try:
+        from tenants import telemetry
+        telemetry.observe("http_request_duration_seconds", total_ms / 1000,
+                          {"view": view, "schema": schema})
+        if prof is not None:
+            telemetry.inc("profiled_requests_total", {"view": view})
+            telemetry.inc("db_queries_total", {"view": view}, prof.queries)
+            telemetry.inc("db_query_seconds_total", {"view": view}, prof.sql_ms / 1000)
+        telemetry.flush()
+    except Exception:
+        pass
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return (match.view_name or match._func_path) if match else "-"
 
 
 class QueryStringGuardMiddleware:
@@ -107,10 +240,10 @@ class QueryStringGuardMiddleware:
     """
     MAX_QS_LENGTH = 2048  # 2 KB
 
-    # Simple per-IP rate limiting for bots (requests per window)
+    # Per-IP rate limiting for bots (requests per window), shared across
+    # workers via tenants.ratelimit.
     BOT_RATE_LIMIT = 10          # max requests
     BOT_RATE_WINDOW = 60         # per 60 seconds
-    _bot_hits = defaultdict(list)  # ip -> [timestamps]
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -162,20 +295,17 @@ class QueryStringGuardMiddleware:
                     )
 
         # ── 5. Rate-limit throttled bots ──
-        if _THROTTLED_UA_PATTERNS.search(ua):
-            ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip()
-            if not ip:
-                ip = request.META.get('REMOTE_ADDR', '')
-            now = time.monotonic()
-            hits = self._bot_hits[ip]
-            # Prune old entries
-            hits[:] = [t for t in hits if now - t < self.BOT_RATE_WINDOW]
-            if len(hits) >= self.BOT_RATE_LIMIT:
+        # Keyed by IP + crawler + path family, so one crawler hammering the
+        # catalog doesn't also lock itself out of the sitemap.
+        bot = _THROTTLED_UA_PATTERNS.search(ua)
+        if bot:
+            from tenants.ratelimit import client_ip, hit, path_family
+            key = f"bot:{bot.group(0).lower()}:{client_ip(request)}:{path_family(path)}"
+            if not hit(key, self.BOT_RATE_LIMIT, self.BOT_RATE_WINDOW):
                 return HttpResponse(
                     'Rate limited. Please slow down.',
                     status=429, content_type='text/plain',
                 )
-            hits.append(now)
 
         return self.get_response(request)
 
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0083_alter_tenant_template_theme'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageCompressionRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(db_index=True, max_length=63)),
+                ('model_label', models.CharField(max_length=40)),
+                ('field_name', models.CharField(max_length=40)),
+                ('object_id', models.BigIntegerField()),
+                ('source_key', models.CharField(max_length=500)),
+                ('result_key', models.CharField(max_length=500)),
+                ('old_bytes', models.BigIntegerField(default=0)),
+                ('new_bytes', models.BigIntegerField(default=0)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('compressed', 'تم الضغط'), ('optimal', 'مضغوطة مسبقاً')], max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'سجل ضغط صورة',
+                'verbose_name_plural': 'سجلات ضغط الصور',
+                'constraints': [models.UniqueConstraint(fields=('schema_name', 'result_key'), name='imgcompress_schema_result_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0084_imagecompressionrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrafficRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63)),
+                ('period', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day (UTC).')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'إحصاء زيارات',
+                'verbose_name_plural': 'إحصاءات الزيارات',
+                'constraints': [models.UniqueConstraint(fields=('schema_name', 'period', 'bucket'), name='traffic_rollup_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0085_trafficrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(db_index=True, max_length=63)),
+                ('channel', models.CharField(choices=[('email', 'بريد'), ('telegram', 'تيليجرام')], max_length=10)),
+                ('kind', models.CharField(blank=True, max_length=20)),
+                ('subject', models.CharField(blank=True, max_length=255, verbose_name='الموضوع')),
+                ('body', models.TextField(blank=True, verbose_name='المحتوى')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='الإجمالي')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='تم الإرسال')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='فشل')),
+                ('status', models.CharField(choices=[('queued', 'قيد الإرسال'), ('done', 'اكتمل')], db_index=True, default='queued', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'إرسال جماعي',
+                'verbose_name_plural': 'الإرسال الجماعي',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.CharField(max_length=254)),
+                ('user_id', models.IntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'قيد الإرسال'), ('sent', 'تم الإرسال'), ('failed', 'فشل')], default='queued', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField()),
+                ('error', models.TextField(blank=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='tenants.notification')),
+            ],
+            options={
+                'verbose_name': 'رسالة مجدولة',
+                'verbose_name_plural': 'رسائل مجدولة',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='notifymsg_due_idx')],
+            },
+        ),
+    ]
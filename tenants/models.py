@@ -469,6 +469,8 @@ class GlobalExchangeRates(models.Model):
         super().save(*args, **kwargs)
         from django.core.cache import cache
         cache.delete("global_exchange_rates")
+        from . import pricing
+        pricing.refresh()
 
     def delete(self, *args, **kwargs):
         pass
@@ -605,3 +607,140 @@ class TenantSalesPerson(models.Model):
         if not update_fields and self.photo and getattr(self.photo, '_file', None) is not None:
             self.photo = optimize_image(self.photo, max_width=400, max_height=400, quality=85)
         super().save(*args, **kwargs)
+
+
+class ImageCompressionRecord(models.Model):
+    """Checkpoint row written by `compress_existing_images` for every stored
+    file it has dealt with, so an interrupted or repeated run skips work that
+    is already done.
+
+    Lives in the public schema (tenants is a shared app) so one table covers
+    every tenant; `schema_name` says whose media the key belongs to.
+    `result_key` is the file name the DB points at after the run — the same
+    as `source_key` for files that were left alone.
+    """
+    STATUS_COMPRESSED = 'compressed'
+    STATUS_OPTIMAL = 'optimal'
+    STATUS_CHOICES = [
+        (STATUS_COMPRESSED, 'تم الضغط'),
+        (STATUS_OPTIMAL, 'مضغوطة مسبقاً'),
+    ]
+
+    schema_name = models.CharField(max_length=63, db_index=True)
+    model_label = models.CharField(max_length=40)
+    field_name = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    source_key = models.CharField(max_length=500)
+    result_key = models.CharField(max_length=500)
+    old_bytes = models.BigIntegerField(default=0)
+    new_bytes = models.BigIntegerField(default=0)
+    # sha256 of the bytes stored under result_key.
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "سجل ضغط صورة"
+        verbose_name_plural = "سجلات ضغط الصور"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schema_name', 'result_key'], name='imgcompress_schema_result_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.schema_name}:{self.result_key} ({self.status})"
+
+
+class TrafficRollup(models.Model):
+    """Hourly / daily request counts per tenant, copied out of the Redis
+    `traf:hour:*` / `traf:day:*` hashes by the `rollup_traffic` command so
+    history outlives their 2-day / 32-day TTLs."""
+    PERIOD_HOUR = 'hour'
+    PERIOD_DAY = 'day'
+    PERIOD_CHOICES = [(PERIOD_HOUR, 'ساعة'), (PERIOD_DAY, 'يوم')]
+
+    schema_name = models.CharField(max_length=63)
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField(help_text="Start of the hour/day (UTC).")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "إحصاء زيارات"
+        verbose_name_plural = "إحصاءات الزيارات"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schema_name', 'period', 'bucket'], name='traffic_rollup_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.schema_name} {self.period} {self.bucket:%Y-%m-%d %H}h = {self.count}"
+
+
+class Notification(models.Model):
+    """One queued fan-out — an email broadcast or a batch of Telegram posts —
+    sent in the background by `send_notifications` (tenants.notify). Lives in
+    the public schema so one worker serves every tenant; the counters are the
+    progress shown to the tenant's staff."""
+    CHANNEL_EMAIL = 'email'
+    CHANNEL_TELEGRAM = 'telegram'
+    CHANNEL_CHOICES = [(CHANNEL_EMAIL, 'بريد'), (CHANNEL_TELEGRAM, 'تيليجرام')]
+    STATUS_QUEUED = 'queued'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [(STATUS_QUEUED, 'قيد الإرسال'), (STATUS_DONE, 'اكتمل')]
+
+    schema_name = models.CharField(max_length=63, db_index=True)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    # SiteEmailLog.email_type for email ('broadcast', 'custom', ...).
+    kind = models.CharField(max_length=20, blank=True)
+    subject = models.CharField(max_length=255, blank=True, verbose_name="الموضوع")
+    body = models.TextField(blank=True, verbose_name="المحتوى")
+    total = models.PositiveIntegerField(default=0, verbose_name="الإجمالي")
+    sent = models.PositiveIntegerField(default=0, verbose_name="تم الإرسال")
+    failed = models.PositiveIntegerField(default=0, verbose_name="فشل")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "إرسال جماعي"
+        verbose_name_plural = "الإرسال الجماعي"
+
+    def __str__(self):
+        return f"{self.schema_name} {self.channel} #{self.pk}: {self.sent + self.failed}/{self.total}"
+
+
+class NotificationMessage(models.Model):
+    """One recipient of a Notification. `recipient` is an email address or a
+    Telegram chat id; `payload` holds a Telegram call ({"method", ...params}).
+    Rows waiting for a retry keep status queued with a later next_attempt_at."""
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'قيد الإرسال'),
+        (STATUS_SENT, 'تم الإرسال'),
+        (STATUS_FAILED, 'فشل'),
+    ]
+
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='messages')
+    recipient = models.CharField(max_length=254)
+    # auth.User pk in the tenant's schema (no FK across schemas).
+    user_id = models.IntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "رسالة مجدولة"
+        verbose_name_plural = "رسائل مجدولة"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notifymsg_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} ({self.status})"
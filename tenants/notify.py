@@ -0,0 +1,320 @@
+"""Background notification dispatcher: queued email broadcasts and Telegram
+posts, sent by `manage.py send_notifications` instead of inside the request.
+
+    send_broadcast_email / telegram_send
+        └─> queue_email / queue_telegram ──> Notification + NotificationMessage
+                                              (bulk_create, status queued)
+
+    send_notifications (--loop) ──> process()
+        claim a batch of due messages (SKIP LOCKED, leased for LEASE seconds)
+        per Notification:
+          email     one SMTP connection for the whole batch, one send per
+                    recipient on it (no reconnect / login per mail)
+          telegram  Bot API calls under the shared rate limiter: TG_GLOBAL_RATE
+                    per second bot-wide, TG_CHAT_RATE / TG_GROUP_RATE per chat
+        outcomes ──> one bulk_update of the messages, F() counters on the
+                     Notification, SiteEmailLog rows bulk-created in the tenant
+
+Transient failures (connection errors, 4xx-temporary SMTP replies, Telegram
+429 / 5xx) are retried with exponential backoff up to MAX_ATTEMPTS; refused
+recipients and Telegram 400 / 403 fail at once. A Telegram 429 or a chat over
+its rate is deferred without using up an attempt. Messages to one chat are
+sent in order.
+
+Email goes through Django's mail API with the tenant's SMTP settings, so
+tests (and local dev) can set NOTIFY_EMAIL_BACKEND to the locmem backend.
+"""
+import logging
+import random
+import smtplib
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH = 200
+LEASE = 600               # seconds a claimed message is hidden from other workers
+MAX_ATTEMPTS = 5
+BACKOFF = 30              # seconds before the first retry; doubled per attempt
+TG_GLOBAL_RATE = 25       # Bot API calls per second, bot-wide (Telegram allows ~30)
+TG_CHAT_RATE = (1, 1)     # per private chat: 1 per second
+TG_GROUP_RATE = (20, 60)  # per group / channel: 20 per minute
+
+
+# ── queueing ─────────────────────────────────────────────────────────────────
+
+def _queue(channel, schema, rows, **fields):
+    from .models import Notification, NotificationMessage
+
+    now = timezone.now()
+    with transaction.atomic():
+        n = Notification.objects.create(
+            schema_name=schema or connection.schema_name, channel=channel, total=len(rows), **fields)
+        NotificationMessage.objects.bulk_create(
+            [NotificationMessage(notification=n, next_attempt_at=now, **r) for r in rows],
+            batch_size=1000,
+        )
+        if not rows:
+            n.status = Notification.STATUS_DONE
+            n.finished_at = now
+            n.save(update_fields=["status", "finished_at"])
+    return n
+
+
+def queue_email(recipients, subject, body_html, kind="custom", schema=None):
+    """Queue one HTML email to each (address, user pk or None) in
+    `recipients`, sent with the tenant's SMTP settings. Returns the
+    Notification."""
+    rows, seen = [], set()
+    for address, user_id in recipients:
+        address = (address or "").strip()
+        if address and address.lower() not in seen:
+            seen.add(address.lower())
+            rows.append({"recipient": address, "user_id": user_id})
+    return _queue("email", schema, rows, kind=kind, subject=subject[:255], body=body_html)
+
+
+def queue_telegram(chat_id, calls, schema=None):
+    """Queue Bot API calls to one chat, sent in order. Each call is a dict
+    {"method": ..., **params} without chat_id; an optional "fallback" call
+    is sent instead when Telegram rejects the first (e.g. a bad photo URL)."""
+    rows = [{"recipient": str(chat_id), "payload": call} for call in calls]
+    return _queue("telegram", schema, rows)
+
+
+def progress(notification):
+    """Counters for a progress bar: total, sent, failed, pending, percent, done."""
+    n = notification
+    finished = n.sent + n.failed
+    return {
+        "id": n.pk,
+        "total": n.total,
+        "sent": n.sent,
+        "failed": n.failed,
+        "pending": max(n.total - finished, 0),
+        "percent": int(finished * 100 / n.total) if n.total else 100,
+        "done": n.status == n.STATUS_DONE,
+    }
+
+
+# ── outcomes ─────────────────────────────────────────────────────────────────
+
+def _sent(m):
+    m.status, m.error = m.STATUS_SENT, ""
+    m.attempts += 1
+
+
+def _failed(m, error):
+    m.status, m.error = m.STATUS_FAILED, str(error)[:2000]
+    m.attempts += 1
+
+
+def _retry(m, error, delay=None, count=True):
+    """Back off and try again later; gives up after MAX_ATTEMPTS counted tries."""
+    if count:
+        if m.attempts + 1 >= MAX_ATTEMPTS:
+            return _failed(m, error)    # counts the attempt itself
+        m.attempts += 1
+        delay = delay if delay is not None else BACKOFF * 2 ** (m.attempts - 1) * random.uniform(1, 1.25)
+    m.error = str(error)[:2000]
+    m.next_attempt_at = timezone.now() + timedelta(seconds=delay or 1)
+
+
+# ── channels ─────────────────────────────────────────────────────────────────
+
+def _permanent_smtp(exc):
+    return (isinstance(exc, smtplib.SMTPRecipientsRefused)
+            or (isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500))
+
+
+def _send_email(notification, msgs):
+    from django.core.mail import EmailMessage, get_connection
+
+    from site_cars.email_utils import email_config
+
+    from .models import Tenant
+
+    tenant = Tenant.objects.filter(schema_name=notification.schema_name).first()
+    cfg = email_config(tenant) if tenant else None
+    if not cfg:
+        for m in msgs:
+            _failed(m, "SMTP settings not configured for this site.")
+        return
+
+    conn = get_connection(
+        getattr(settings, "NOTIFY_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"),
+        host=cfg["host"], port=cfg["port"], username=cfg["username"], password=cfg["password"],
+        use_tls=cfg["use_tls"], use_ssl=not cfg["use_tls"], timeout=30, fail_silently=False,
+    )
+    sender = f"{cfg['from_name']} <{cfg['from_email']}>"
+    try:
+        conn.open()
+    except Exception as exc:
+        for m in msgs:
+            _retry(m, exc)
+        return
+    try:
+        for m in msgs:
+            mail = EmailMessage(notification.subject, notification.body, sender, [m.recipient],
+                                connection=conn)
+            mail.content_subtype = "html"
+            try:
+                conn.send_messages([mail])
+                _sent(m)
+            except Exception as exc:
+                if _permanent_smtp(exc):
+                    _failed(m, exc)
+                    continue
+                _retry(m, exc)
+                if isinstance(exc, (smtplib.SMTPServerDisconnected, OSError)):
+                    conn.close()
+                    try:
+                        conn.open()
+                    except Exception:
+                        break   # the rest stay leased and are retried after LEASE
+    finally:
+        conn.close()
+
+
+def _send_telegram(msgs):
+    import requests
+
+    from . import telegram_bot as tg
+    from .ratelimit import hit
+
+    if not tg.is_configured():
+        for m in msgs:
+            _failed(m, "Telegram bot is not configured.")
+        return
+
+    session = requests.Session()
+    deferred = {}   # chat -> seconds; later messages to that chat wait too, to keep order
+    for m in msgs:
+        chat = m.recipient
+        limit, window = TG_GROUP_RATE if chat.startswith("-") else TG_CHAT_RATE
+        if chat in deferred or not hit(f"tg:chat:{chat}", limit, window):
+            deferred.setdefault(chat, window / limit)
+            _retry(m, m.error, delay=deferred[chat], count=False)
+            continue
+        while not hit("tg:global", TG_GLOBAL_RATE, 1):
+            time.sleep(0.05)
+
+        call = dict(m.payload)
+        method = call.pop("method", "sendMessage")
+        fallback = call.pop("fallback", None)
+        try:
+            status, body = tg.request(method, session=session, chat_id=chat, **call)
+        except Exception as exc:
+            _retry(m, exc)
+            deferred.setdefault(chat, 1)
+            continue
+        if body.get("ok"):
+            _sent(m)
+        elif status == 429:
+            wait = (body.get("parameters") or {}).get("retry_after") or 1
+            _retry(m, body.get("description", "429"), delay=wait, count=False)
+            deferred[chat] = wait
+        elif status >= 500:
+            _retry(m, body.get("description", status))
+            deferred.setdefault(chat, 1)
+        elif fallback and status == 400:
+            # e.g. Telegram could not fetch the photo: send the text instead.
+            m.payload = fallback
+            _retry(m, body.get("description", status), delay=0, count=False)
+            deferred.setdefault(chat, 0)
+        else:
+            _failed(m, body.get("description", status))
+
+
+# ── worker ───────────────────────────────────────────────────────────────────
+
+def _claim(batch):
+    from .models import NotificationMessage
+
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            NotificationMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=NotificationMessage.STATUS_QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "pk").values_list("pk", flat=True)[:batch]
+        )
+        if ids:
+            NotificationMessage.objects.filter(pk__in=ids).update(
+                next_attempt_at=now + timedelta(seconds=LEASE))
+    return list(NotificationMessage.objects.filter(pk__in=ids)
+                .select_related("notification").order_by("pk"))
+
+
+def _log_emails(notification, msgs):
+    """SiteEmailLog rows (in the tenant's schema) for finished email messages."""
+    from django_tenants.utils import schema_context
+
+    from site_cars.models import SiteEmailLog
+
+    rows = [
+        SiteEmailLog(recipient_email=m.recipient, recipient_user_id=m.user_id,
+                     subject=notification.subject, body=notification.body,
+                     email_type=notification.kind or "custom", status=m.status,
+                     error_message=m.error if m.status == m.STATUS_FAILED else "")
+        for m in msgs if m.status != m.STATUS_QUEUED
+    ]
+    if rows:
+        with schema_context(notification.schema_name):
+            SiteEmailLog.objects.bulk_create(rows, batch_size=500)
+
+
+def process(batch=BATCH):
+    """Send one batch of due messages. Returns {"sent", "failed", "retried"}."""
+    from .models import Notification, NotificationMessage
+
+    msgs = _claim(batch)
+    by_notification = defaultdict(list)
+    for m in msgs:
+        by_notification[m.notification_id].append(m)
+
+    totals = {"sent": 0, "failed": 0, "retried": 0}
+    for group in by_notification.values():
+        notification = group[0].notification
+        try:
+            if notification.channel == Notification.CHANNEL_EMAIL:
+                _send_email(notification, group)
+            else:
+                _send_telegram(group)
+        except Exception:
+            # Unsent messages keep their lease and come back after LEASE.
+            logger.exception("Notification %d: batch failed", notification.pk)
+
+        NotificationMessage.objects.bulk_update(
+            group, ["status", "attempts", "next_attempt_at", "error", "payload"], batch_size=500)
+        sent = sum(m.status == m.STATUS_SENT for m in group)
+        failed = sum(m.status == m.STATUS_FAILED for m in group)
+        Notification.objects.filter(pk=notification.pk).update(
+            sent=F("sent") + sent, failed=F("failed") + failed)
+        if notification.channel == Notification.CHANNEL_EMAIL:
+            try:
+                _log_emails(notification, group)
+            except Exception:
+                logger.exception("Notification %d: email log failed", notification.pk)
+        totals["sent"] += sent
+        totals["failed"] += failed
+        totals["retried"] += len(group) - sent - failed
+
+    if by_notification:
+        (Notification.objects
+         .filter(pk__in=list(by_notification), status=Notification.STATUS_QUEUED)
+         .exclude(messages__status=NotificationMessage.STATUS_QUEUED)
+         .update(status=Notification.STATUS_DONE, finished_at=timezone.now()))
+    return totals
+
+
+def pending():
+    """Messages still queued (due now or waiting for a retry)."""
+    from .models import NotificationMessage
+
+    return NotificationMessage.objects.filter(status=NotificationMessage.STATUS_QUEUED).count()
@@ -0,0 +1,134 @@
+"""Display prices: KRW -> the visitor's currency, with the tenant's markup.
+
+Car prices are stored once, in KRW. Every other currency is a constant factor
+of it — the global rate per KRW × the tenant's price_markup_factor — so prices
+are never converted per car in the database:
+
+    rates()           GlobalExchangeRates as a plain Rates tuple of floats,
+                      held in-process for PROCESS_TTL seconds (no cache round
+                      trip, model unpickle or Decimal maths per price)
+    factors(tenant)   {code: KRW -> code factor}, one dict per (rates, markup,
+                      custom currencies) — the per-rate-version factor table
+    convert(krw, code)
+                      whole units of `code`; KRW is shown as-is
+    krw_range(lo, hi, code)
+                      a price range typed in `code` as the KRW range that
+                      displays inside it, so the list filter stays an index
+                      range scan on cars_apicar.price (and sorting by price is
+                      the same order in every currency)
+
+update_exchange_rates (and any GlobalExchangeRates.save) calls refresh();
+other processes pick the new rates up within PROCESS_TTL.
+"""
+import math
+import time
+from collections import namedtuple
+
+from django.db import connection
+
+PROCESS_TTL = 60          # seconds a process keeps the rates it read
+DEFAULT_MARKUP = 1.01
+
+CODES = ("USD", "SAR", "AED", "EUR")
+SYMBOLS = {"KRW": "₩", "SAR": "﷼", "USD": "$", "AED": "د.إ", "EUR": "€"}
+
+Rates = namedtuple("Rates", "usd sar aed eur")
+DEFAULT_RATES = Rates(0.00067, 0.00250, 0.00272, 0.00069)
+
+_rates = None
+_rates_at = 0.0
+_factors = {}
+
+
+def rates():
+    """Current global rates per 1 KRW. Never raises (defaults on error)."""
+    global _rates, _rates_at
+    now = time.monotonic()
+    if _rates is None or now - _rates_at >= PROCESS_TTL:
+        try:
+            from .models import GlobalExchangeRates
+            g = GlobalExchangeRates.get_solo()
+            _rates = Rates(*(float(getattr(g, f"rate_{c.lower()}") or 0) or d
+                             for c, d in zip(CODES, DEFAULT_RATES)))
+        except Exception:
+            _rates = _rates or DEFAULT_RATES
+        _rates_at = now
+    return _rates
+
+
+def refresh():
+    """Forget this process's rates and factors (after the rates changed)."""
+    global _rates
+    _rates = None
+    _factors.clear()
+
+
+def custom_currencies(tenant):
+    """Validated per-tenant extra currencies for the switcher/converters."""
+    out = []
+    for c in (getattr(tenant, 'custom_currencies', None) or []):
+        try:
+            code = str(c.get('code', '')).strip().upper()[:6]
+            rate = float(c.get('rate') or 0)
+            if code and rate > 0 and code not in ('KRW', *CODES):
+                out.append({'code': code, 'symbol': str(c.get('symbol', '') or code).strip()[:8], 'rate': rate})
+        except Exception:
+            continue
+    return out
+
+
+def markup(tenant=None):
+    if tenant is None:
+        tenant = getattr(connection, "tenant", None)
+    try:
+        return float(getattr(tenant, "price_markup_factor", DEFAULT_MARKUP))
+    except Exception:
+        return DEFAULT_MARKUP
+
+
+def factors(tenant=None):
+    """{code: factor} with price_in_code = krw × factor, for `tenant`
+    (default: the current one). KRW is 1 — the feed price, no markup."""
+    if tenant is None:
+        tenant = getattr(connection, "tenant", None)
+    r, m = rates(), markup(tenant)
+    custom = tuple((c["code"], c["rate"]) for c in custom_currencies(tenant))
+    key = (r, m, custom)
+    table = _factors.get(key)
+    if table is None:
+        table = {"KRW": 1.0}
+        table.update((code, rate * m) for code, rate in zip(CODES, r))
+        table.update((code, rate * m) for code, rate in custom)
+        if len(_factors) >= 256:
+            _factors.clear()
+        _factors[key] = table
+    return table
+
+
+def convert(krw, code="SAR", tenant=None):
+    """KRW amount in whole units of `code` (0 for no price / unknown code)."""
+    try:
+        krw = float(krw or 0)
+    except (TypeError, ValueError):
+        return 0
+    if krw <= 0:
+        return 0
+    f = factors(tenant).get(str(code).upper())
+    return int(round(krw * f)) if f else 0
+
+
+def symbol(code):
+    return SYMBOLS.get(code, code)
+
+
+def krw_range(lo, hi, code="SAR", tenant=None):
+    """(min KRW, max KRW) of the prices that display between `lo` and `hi`
+    in `code` (either bound may be None; inf / nan count as None). Unknown
+    codes are taken as KRW."""
+    lo = lo if lo is not None and math.isfinite(lo) else None
+    hi = hi if hi is not None and math.isfinite(hi) else None
+    f = factors(tenant).get(str(code or "KRW").upper()) or 1.0
+    if f == 1.0:
+        return (int(lo) if lo is not None else None, int(hi) if hi is not None else None)
+    return (max(math.ceil((lo - 0.5) / f), 0) if lo is not None else None,
+            math.floor((hi + 0.5) / f) if hi is not None else None)
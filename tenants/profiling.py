@@ -0,0 +1,213 @@
+"""Per-request profiling: SQL, outbound HTTP, cache and template time.
+
+RequestProfileMiddleware opens a RequestProfile for a sampled fraction of
+requests (settings.REQUEST_PROFILE_SAMPLE_RATE) and everything below feeds it:
+
+- SQL        — connection.execute_wrapper (count, total ms, slowest statements)
+- HTTP       — requests.Session.send and urllib's OpenerDirector.open
+- cache      — the default cache backend's get() (hit/miss per key family;
+               also counted for every request into tenants.telemetry)
+- templates  — django.template.base.Template.render (outermost render only,
+               so {% include %} isn't double counted)
+
+The hooks are installed once per process and cost one ContextVar lookup when
+no profile is active, so unsampled requests pay next to nothing.
+
+Views can declare a query budget with @query_budget(n). Sampled requests that
+exceed it are logged; with settings.QUERY_BUDGET_STRICT (set it in tests) every
+budgeted request is profiled and going over raises QueryBudgetExceeded.
+"""
+import contextvars
+import functools
+import re
+import threading
+import time
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+# How many of the slowest statements each profile keeps.
+SLOWEST_KEPT = 5
+
+_VERSION_SUFFIX_RE = re.compile(r"_v\d+$")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestProfile:
+    __slots__ = (
+        "view", "schema", "started", "total_ms", "queries", "sql_ms", "slowest",
+        "http_calls", "http_ms", "cache_hits", "cache_misses", "cache_families",
+        "template_ms", "_tpl_depth",
+    )
+
+    def __init__(self, schema="public"):
+        self.view = "-"
+        self.schema = schema
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest = []           # [(ms, sql)], longest first
+        self.http_calls = 0
+        self.http_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_families = {}    # family -> [hits, misses]
+        self.template_ms = 0.0
+        self._tpl_depth = 0
+
+    def add_query(self, sql, ms):
+        self.queries += 1
+        self.sql_ms += ms
+        if len(self.slowest) < SLOWEST_KEPT or ms > self.slowest[-1][0]:
+            self.slowest.append((ms, sql[:500]))
+            self.slowest.sort(key=lambda x: -x[0])
+            del self.slowest[SLOWEST_KEPT:]
+
+    def add_cache(self, key, hit):
+        fam = self.cache_families.setdefault(key_family(key), [0, 0])
+        if hit:
+            self.cache_hits += 1
+            fam[0] += 1
+        else:
+            self.cache_misses += 1
+            fam[1] += 1
+
+    def summary(self):
+        """One-line, grep-friendly rendering for the slow-request log."""
+        return (
+            f"view={self.view} schema={self.schema} total={self.total_ms:.0f}ms "
+            f"sql={self.queries}q/{self.sql_ms:.0f}ms http={self.http_calls}/{self.http_ms:.0f}ms "
+            f"cache={self.cache_hits}h/{self.cache_misses}m tpl={self.template_ms:.0f}ms"
+        )
+
+
+def current():
+    """The active RequestProfile, or None when this request isn't sampled."""
+    return _current.get()
+
+
+def activate(profile):
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def key_family(key):
+    """'car_list_v7:tenant:...' -> 'car_list'. Cache keys here are
+    '<family>[_vN]:<rest>', so the family is the versionless first segment."""
+    return _VERSION_SUFFIX_RE.sub("", str(key).split(":", 1)[0])
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook."""
+    prof = _current.get()
+    if prof is None:
+        return execute(sql, params, many, context)
+    t = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        prof.add_query(sql, (time.perf_counter() - t) * 1000)
+
+
+def query_budget(n):
+    """Declare the most queries a view should run per request.
+
+        @query_budget(12)
+        def car_detail(request, slug): ...
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapped.query_budget = n
+        return wrapped
+    return decorator
+
+
+# ── process-wide hooks ───────────────────────────────────────────────────────
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _timed_http(orig):
+    @functools.wraps(orig)
+    def wrapped(*args, **kwargs):
+        prof = _current.get()
+        if prof is None:
+            return orig(*args, **kwargs)
+        t = time.perf_counter()
+        try:
+            return orig(*args, **kwargs)
+        finally:
+            prof.http_calls += 1
+            prof.http_ms += (time.perf_counter() - t) * 1000
+    return wrapped
+
+
+def _counted_cache_get(orig):
+    from tenants import telemetry
+
+    @functools.wraps(orig)
+    def get(self, key, *args, **kwargs):
+        val = orig(self, key, *args, **kwargs)
+        default = args[0] if args else kwargs.get("default")
+        hit = val is not None and val is not default
+        # Hit ratio per key family is cheap enough to count on every get().
+        telemetry.inc("cache_requests_total",
+                      {"family": key_family(key), "result": "hit" if hit else "miss"})
+        prof = _current.get()
+        if prof is not None:
+            prof.add_cache(key, hit)
+        return val
+    return get
+
+
+def _timed_render(orig):
+    @functools.wraps(orig)
+    def render(self, context):
+        prof = _current.get()
+        if prof is None:
+            return orig(self, context)
+        prof._tpl_depth += 1
+        t = time.perf_counter()
+        try:
+            return orig(self, context)
+        finally:
+            prof._tpl_depth -= 1
+            if prof._tpl_depth == 0:
+                prof.template_ms += (time.perf_counter() - t) * 1000
+    return render
+
+
+def install():
+    """Wrap the HTTP / cache / template entry points. Idempotent."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+        import urllib.request
+        urllib.request.OpenerDirector.open = _timed_http(urllib.request.OpenerDirector.open)
+        try:
+            import requests
+            requests.Session.send = _timed_http(requests.Session.send)
+        except ImportError:
+            pass
+
+        from django.template.base import Template
+        Template.render = _timed_render(Template.render)
+
+        try:
+            from django.core.cache import caches
+            cls = type(caches["default"])
+            cls.get = _counted_cache_get(cls.get)
+        except Exception:
+            pass
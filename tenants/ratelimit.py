@@ -0,0 +1,131 @@
+"""Shared sliding-window rate limiter.
+
+One primitive, `hit(key, limit, window)`, used by QueryStringGuardMiddleware
+(crawler throttling), the assistant burst cap and the public /api/car/ endpoints.
+
+Redis is the source of truth: a sorted set per key holds the request timestamps
+of the current window, and a Lua script prunes, counts and records in one atomic
+round-trip — so the limit holds across every gunicorn worker and survives worker
+restarts. When Redis is unreachable (or not configured, e.g. local dev on
+LocMemCache) we fall back to a per-process window table that is bounded in size,
+so a crawler storm can't grow it without limit. After a Redis error we stay on
+the fallback for a short cool-down rather than paying the socket timeout on
+every request.
+"""
+import functools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from django.http import HttpResponse
+
+# Sliding window over a sorted set. KEYS[1]=key; ARGV: now_ms, window_ms, limit, member.
+# Returns 1 when the hit was recorded (allowed), 0 when the caller is over the limit.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) >= limit then
+    return 0
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return 1
+"""
+
+KEY_PREFIX = "rl:"
+
+# In-process fallback: at most this many keys are tracked per worker; the
+# least-recently-used key is evicted first.
+FALLBACK_MAX_KEYS = 10_000
+# Seconds to skip Redis after it failed, before trying it again.
+REDIS_RETRY_AFTER = 30
+
+_script = None
+_redis_down_until = 0.0
+_local = OrderedDict()          # key -> deque[timestamps]
+_local_lock = threading.Lock()
+
+
+def _redis_hit(key, limit, window):
+    global _script
+    from django_redis import get_redis_connection
+    r = get_redis_connection("default")
+    if _script is None:
+        _script = r.register_script(_SLIDING_WINDOW_LUA)
+    now_ms = int(time.time() * 1000)
+    # Unique member so two hits in the same millisecond both count.
+    member = f"{now_ms}:{uuid.uuid4().hex[:8]}"
+    return bool(_script(keys=[KEY_PREFIX + key], args=[now_ms, int(window * 1000), limit, member], client=r))
+
+
+def _local_hit(key, limit, window):
+    now = time.monotonic()
+    with _local_lock:
+        hits = _local.get(key)
+        if hits is None:
+            hits = _local[key] = deque()
+            if len(_local) > FALLBACK_MAX_KEYS:
+                _local.popitem(last=False)
+        else:
+            _local.move_to_end(key)
+        while hits and now - hits[0] >= window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return False
+        hits.append(now)
+        return True
+
+
+def hit(key, limit, window):
+    """Record one request against `key` and return True if it is within
+    `limit` requests per `window` seconds, False if it should be rejected.
+
+    Rejected requests are not recorded, so a client that backs off recovers as
+    soon as its oldest hit leaves the window. Never raises.
+    """
+    global _redis_down_until
+    if time.monotonic() >= _redis_down_until:
+        try:
+            return _redis_hit(key, limit, window)
+        except Exception:
+            # No django_redis backend, or Redis unreachable — degrade locally.
+            _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+    return _local_hit(key, limit, window)
+
+
+def client_ip(request):
+    """First X-Forwarded-For hop (we sit behind a proxy), else REMOTE_ADDR."""
+    ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip()
+    return ip or request.META.get('REMOTE_ADDR', '')
+
+
+def path_family(path):
+    """Coarse bucket for a URL path — its first segment ("/cars/x/?..." -> "cars").
+    Keeps one crawler's budget on the catalog separate from, say, the sitemap."""
+    return path.strip('/').split('/', 1)[0] or 'root'
+
+
+def _default_limited(request):
+    return HttpResponse('Rate limited. Please slow down.', status=429, content_type='text/plain')
+
+
+def rate_limit(scope, limit, window=60, key=client_ip, on_limited=None):
+    """View decorator: reject with 429 once `key(request)` has made `limit`
+    requests to `scope` within `window` seconds. `limit` may be a callable so
+    it can read a setting at request time. `on_limited(request)` builds the
+    rejection response (default: plain-text 429)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            n = limit() if callable(limit) else limit
+            if not hit(f"{scope}:{key(request)}", n, window):
+                resp = (on_limited or _default_limited)(request)
+                resp['Retry-After'] = str(int(window))
+                return resp
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -1,4 +1,5 @@
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -11,6 +12,16 @@ LANDING_DESIGNS = (
 )
 
 
+@receiver(post_save, sender=Tenant)
+def materialize_visible_catalog(sender, instance, **kwargs):
+    """Queue the catalog set for the tenant's rule set once the save commits;
+    the catalog worker builds it (a no-op when another tenant already uses the
+    same signature). Until then its listings answer from the live rules."""
+    from cars import catalog_jobs
+    schema = instance.schema_name
+    transaction.on_commit(lambda: catalog_jobs.request_materialize(schema))
+
+
 @receiver(post_save, sender=Tenant)
 def invalidate_tenant_caches(sender, instance, **kwargs):
     schema = instance.schema_name
@@ -13,7 +13,7 @@ import time
 import requests
 from django.conf import settings
 
-_API = "https://api.telegram.org/bot{token}/{method}"
+_API = "{base}/bot{token}/{method}"
 
 
 def _token():
@@ -47,18 +47,33 @@ def verify_connect_token(token):
     return None
 
 
+def _api_base():
+    return (getattr(settings, "TELEGRAM_API_BASE", "") or "https://api.telegram.org").rstrip("/")
+
+
+def request(method, session=None, **data):
+    """One Bot API call, no retries: (HTTP status, JSON body). Raises on
+    network errors. The notification dispatcher uses this directly so it can
+    schedule its own retries."""
+    url = _API.format(base=_api_base(), token=_token(), method=method)
+    r = (session or requests).post(url, json=data, timeout=15)
+    try:
+        body = r.json()
+    except ValueError:
+        body = {"ok": False, "description": r.text[:200]}
+    return r.status_code, body
+
+
 def _call(method, **data):
     if not _token():
         return None
-    url = _API.format(token=_token(), method=method)
     # Retry on 429 (bulk sends to one chat get throttled) honouring retry_after.
     for attempt in range(3):
         try:
-            r = requests.post(url, json=data, timeout=15)
-            body = r.json()
+            status, body = request(method, **data)
         except Exception:
             return None
-        if r.status_code == 429 and attempt < 2:
+        if status == 429 and attempt < 2:
             wait = ((body.get("parameters") or {}).get("retry_after") or 1)
             time.sleep(min(wait, 5))
             continue
@@ -80,9 +95,10 @@ def send_photo(chat_id, photo, caption):
     return _call("sendPhoto", chat_id=chat_id, photo=photo, caption=caption, parse_mode="HTML")
 
 
-def send_media_group(chat_id, photos, caption):
-    """Send up to 10 photos as one album. Only the first item carries the
-    caption — that's how Telegram shows a single caption under an album."""
+def album(photos, caption):
+    """sendMediaGroup `media` for up to 10 photos (JSON, or "" if none). Only
+    the first item carries the caption — that's how Telegram shows a single
+    caption under an album."""
     import json as _json
     media = []
     for i, url in enumerate((photos or [])[:10]):
@@ -91,9 +107,15 @@ def send_media_group(chat_id, photos, caption):
             item["caption"] = caption
             item["parse_mode"] = "HTML"
         media.append(item)
+    return _json.dumps(media) if media else ""
+
+
+def send_media_group(chat_id, photos, caption):
+    """Send up to 10 photos as one album."""
+    media = album(photos, caption)
     if not media:
         return None
-    return _call("sendMediaGroup", chat_id=chat_id, media=_json.dumps(media))
+    return _call("sendMediaGroup", chat_id=chat_id, media=media)
 
 
 def set_webhook(base_url):
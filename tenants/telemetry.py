@@ -0,0 +1,259 @@
+"""Prometheus-style metrics, aggregated across gunicorn workers (and cron
+commands) through Redis, served in text exposition format at /metrics.
+
+Each process buffers increments in memory and flushes them at most every
+FLUSH_INTERVAL seconds in one pipelined round-trip (HINCRBYFLOAT into a single
+shared hash), so recording a metric never costs a network call on the request
+path. Counters and histogram series are cumulative in Redis, which is what
+makes the numbers correct no matter how many workers or restarts there are.
+
+Gauges come in two kinds:
+- per-process ("redis pool connections in use") — written to a hash per pid
+  that expires, so a recycled worker (--max-requests) drops out on its own;
+- global ("rows/sec of the last import") — last writer wins, no expiry.
+
+Scrape-time values (job queue depths) are produced by functions registered
+with @collector and evaluated when /metrics is rendered.
+
+Without Redis (local dev on LocMemCache) everything still works for the single
+process: the in-process totals are rendered instead.
+"""
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+COUNTERS_KEY = "metrics:c"
+GLOBAL_GAUGES_KEY = "metrics:g:global"
+PROCESS_GAUGES_PREFIX = "metrics:g:pid:"
+
+FLUSH_INTERVAL = 10     # seconds between flushes per process
+PROCESS_GAUGE_TTL = 120  # a process that stops flushing disappears after this
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASE_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200)
+
+# name -> (type, help). Histograms are listed by their family name.
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "Request latency by view and tenant schema."),
+    "db_queries_total": ("counter", "SQL statements run by profiled (sampled) requests."),
+    "db_query_seconds_total": ("counter", "SQL time spent by profiled (sampled) requests."),
+    "profiled_requests_total": ("counter", "Requests that were profiled (denominator for db_*)."),
+    "cache_requests_total": ("counter", "Cache get() calls by key family and hit/miss."),
+    "import_rows_total": ("counter", "Rows processed by catalog imports."),
+    "import_rows_per_second": ("gauge", "Throughput of the last import run."),
+    "import_phase_duration_seconds": ("histogram", "Wall time of import phases."),
+    "import_last_success_timestamp_seconds": ("gauge", "Unix time the last import phase finished."),
+    "job_queue_depth": ("gauge", "Jobs waiting, by queue."),
+    "encar_checks_total": ("counter", "Encar availability/lease checks by kind and result or error."),
+    "redis_pool_in_use_connections": ("gauge", "Redis connections checked out of this worker's pool."),
+    "redis_pool_created_connections": ("gauge", "Redis connections this worker's pool has opened."),
+    "redis_pool_max_connections": ("gauge", "Redis pool cap (max_connections)."),
+}
+
+_lock = threading.Lock()
+_pending = defaultdict(float)   # series -> increment since last flush
+_totals = defaultdict(float)    # series -> cumulative, this process (no-Redis fallback)
+_process_gauges = {}
+_global_gauges = {}
+_dirty_globals = set()          # global gauges set since the last flush
+_last_flush = time.monotonic()
+_collectors = []
+
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def inc(name, labels=None, value=1):
+    s = _series(name, labels)
+    with _lock:
+        _pending[s] += value
+        _totals[s] += value
+
+
+def observe(name, value, labels=None, buckets=LATENCY_BUCKETS):
+    """Record one histogram observation (cumulative le buckets + _sum/_count).
+    Every bucket of the label set is written — 0 where the value is above it —
+    so the series never has gaps."""
+    labels = labels or {}
+    with _lock:
+        for le in buckets:
+            s = _series(f"{name}_bucket", {**labels, "le": le})
+            hit = 1 if value <= le else 0
+            _pending[s] += hit
+            _totals[s] += hit
+        for s, v in ((_series(f"{name}_bucket", {**labels, "le": "+Inf"}), 1),
+                     (_series(f"{name}_sum", labels), value),
+                     (_series(f"{name}_count", labels), 1)):
+            _pending[s] += v
+            _totals[s] += v
+
+
+def set_gauge(name, value, labels=None, per_process=False):
+    s = _series(name, labels)
+    with _lock:
+        if per_process:
+            _process_gauges[s] = value
+        else:
+            _global_gauges[s] = value
+            _dirty_globals.add(s)
+
+
+def collector(fn):
+    """Register fn() -> iterable of (name, labels, value), run at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def _sample_redis_pool():
+    try:
+        from django_redis import get_redis_connection
+        pool = get_redis_connection("default").connection_pool
+        set_gauge("redis_pool_in_use_connections", len(pool._in_use_connections), per_process=True)
+        set_gauge("redis_pool_created_connections", pool._created_connections, per_process=True)
+        set_gauge("redis_pool_max_connections", pool.max_connections, per_process=True)
+    except Exception:
+        pass
+
+
+def flush(force=False):
+    """Push buffered metrics to Redis if FLUSH_INTERVAL has passed (or force).
+    Best-effort: on a Redis error the batch is dropped, never retried forever."""
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _sample_redis_pool()
+    with _lock:
+        _last_flush = now
+        pending = dict(_pending)
+        _pending.clear()
+        proc = dict(_process_gauges)
+        glob = {s: _global_gauges[s] for s in _dirty_globals}
+        _dirty_globals.clear()
+    try:
+        from django_redis import get_redis_connection
+        r = get_redis_connection("default")
+        pipe = r.pipeline(transaction=False)
+        for s, v in pending.items():
+            pipe.hincrbyfloat(COUNTERS_KEY, s, v)
+        if proc:
+            key = f"{PROCESS_GAUGES_PREFIX}{os.getpid()}"
+            pipe.hset(key, mapping=proc)
+            pipe.expire(key, PROCESS_GAUGE_TTL)
+        if glob:
+            pipe.hset(GLOBAL_GAUGES_KEY, mapping=glob)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+# ── import helpers ───────────────────────────────────────────────────────────
+
+@contextmanager
+def phase(source, name):
+    """Time one import phase:  with telemetry.phase("encar", "active"): ..."""
+    t = time.monotonic()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        observe("import_phase_duration_seconds", time.monotonic() - t,
+                {"source": source, "phase": name}, buckets=PHASE_BUCKETS)
+        if ok:
+            set_gauge("import_last_success_timestamp_seconds", time.time(),
+                      {"source": source, "phase": name})
+        flush(force=True)
+
+
+def import_rows(source, rows, seconds):
+    inc("import_rows_total", {"source": source}, rows)
+    if seconds > 0:
+        set_gauge("import_rows_per_second", round(rows / seconds, 1), {"source": source})
+    flush(force=True)
+
+
+@collector
+def _pdf_export_queue():
+    from cars.models import PdfExport
+    yield ("job_queue_depth", {"queue": "pdf_export"},
+           PdfExport.objects.filter(status=PdfExport.STATUS_PENDING).count())
+
+
+# ── rendering ────────────────────────────────────────────────────────────────
+
+def _family(series):
+    name = series.split("{", 1)[0]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+            return name[: -len(suffix)]
+    return name
+
+
+_LE = re.compile(r',?le="([^"]*)"')
+
+
+def _order(item):
+    """Sort key: series by name and labels, a histogram's buckets by le."""
+    s = item[0]
+    m = _LE.search(s)
+    return (s[:m.start()] + s[m.end():], float(m.group(1))) if m else (s, 0.0)
+
+
+def _num(v):
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def render():
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    flush(force=True)
+    counters, gauges = None, {}
+    try:
+        from django_redis import get_redis_connection
+        r = get_redis_connection("default")
+        counters = {k.decode(): float(v) for k, v in r.hgetall(COUNTERS_KEY).items()}
+        gauges.update({k.decode(): float(v) for k, v in r.hgetall(GLOBAL_GAUGES_KEY).items()})
+        for key in r.scan_iter(match=f"{PROCESS_GAUGES_PREFIX}*", count=100):
+            pid = key.decode().rsplit(":", 1)[-1]
+            for s, v in r.hgetall(key).items():
+                s = s.decode()
+                s = s[:-1] + f',pid="{pid}"}}' if s.endswith("}") else s + f'{{pid="{pid}"}}'
+                gauges[s] = float(v)
+    except Exception:
+        with _lock:
+            counters = dict(_totals)
+            gauges = {**_global_gauges}
+            gauges.update({
+                (s[:-1] + f',pid="{os.getpid()}"}}' if s.endswith("}") else s + f'{{pid="{os.getpid()}"}}'): v
+                for s, v in _process_gauges.items()
+            })
+
+    for fn in _collectors:
+        try:
+            for name, labels, value in fn():
+                gauges[_series(name, labels)] = value
+        except Exception:
+            pass
+
+    by_family = defaultdict(list)
+    for s, v in list(counters.items()) + list(gauges.items()):
+        by_family[_family(s)].append((s, v))
+
+    lines = []
+    for fam in sorted(by_family):
+        kind, help_text = METRICS.get(fam, ("untyped", ""))
+        if help_text:
+            lines.append(f"# HELP {fam} {help_text}")
+        lines.append(f"# TYPE {fam} {kind}")
+        lines.extend(f"{s} {_num(v)}" for s, v in sorted(by_family[fam], key=_order))
+    return "\n".join(lines) + "\n"
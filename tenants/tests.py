@@ -1,3 +1,186 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from tenants import generations, notify, pricing, profiling, ratelimit, telemetry
+from tenants.middleware import QueryStringGuardMiddleware, RequestProfileMiddleware
+
+
+class RateLimitFallbackTests(SimpleTestCase):
+    """The in-process side of tenants.ratelimit — what runs when Redis is not
+    configured (the test settings use LocMemCache)."""
+
+    def setUp(self):
+        ratelimit._local.clear()
+        ratelimit._redis_down_until = 0.0
+
+    def test_allows_up_to_the_limit_then_rejects(self):
+        results = [ratelimit.hit("t:a", 3, 60) for _ in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+
+    def test_keys_are_independent(self):
+        for _ in range(3):
+            ratelimit.hit("t:a", 3, 60)
+        self.assertTrue(ratelimit.hit("t:b", 3, 60))
+
+    def test_window_slides(self):
+        with mock.patch("tenants.ratelimit.time.monotonic", return_value=1000.0):
+            for _ in range(3):
+                ratelimit.hit("t:a", 3, 60)
+            self.assertFalse(ratelimit.hit("t:a", 3, 60))
+        with mock.patch("tenants.ratelimit.time.monotonic", return_value=1061.0):
+            self.assertTrue(ratelimit.hit("t:a", 3, 60))
+
+    def test_fallback_table_is_bounded(self):
+        with mock.patch.object(ratelimit, "FALLBACK_MAX_KEYS", 50):
+            for i in range(200):
+                ratelimit.hit(f"t:{i}", 3, 60)
+            self.assertLessEqual(len(ratelimit._local), 50)
+
+
+class PricingTests(SimpleTestCase):
+    """tenants.pricing with the rates pinned (no database)."""
+
+    def setUp(self):
+        pricing.refresh()
+        patcher = mock.patch.object(pricing, "rates", return_value=pricing.Rates(0.0007, 0.0025, 0.0027, 0.0007))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(pricing.refresh)
+        self.tenant = mock.Mock(price_markup_factor=1.01,
+                                custom_currencies=[{"code": "qar", "rate": 0.0026, "symbol": "ر.ق"}])
+
+    def test_convert_applies_rate_and_markup(self):
+        self.assertEqual(pricing.convert(10_000_000, "SAR", self.tenant), 25250)
+        self.assertEqual(pricing.convert(10_000_000, "KRW", self.tenant), 10_000_000)
+        self.assertEqual(pricing.convert(10_000_000, "QAR", self.tenant), 26260)
+        self.assertEqual(pricing.convert(None, "SAR", self.tenant), 0)
+        self.assertEqual(pricing.convert(1, "XYZ", self.tenant), 0)
+
+    def test_factor_table_is_memoised_per_rates_and_markup(self):
+        first = pricing.factors(self.tenant)
+        self.assertIs(pricing.factors(self.tenant), first)
+        self.tenant.price_markup_factor = 1.2
+        self.assertAlmostEqual(pricing.factors(self.tenant)["SAR"], 0.0025 * 1.2)
+
+    def test_krw_range_covers_exactly_the_displayed_prices(self):
+        lo, hi = pricing.krw_range(50_000, 60_000, "SAR", self.tenant)
+        for krw in (lo, hi):
+            self.assertTrue(50_000 <= pricing.convert(krw, "SAR", self.tenant) <= 60_000)
+        self.assertLess(pricing.convert(lo - 1, "SAR", self.tenant), 50_000)
+        self.assertGreater(pricing.convert(hi + 1, "SAR", self.tenant), 60_000)
+        self.assertEqual(pricing.krw_range(None, 900, "KRW", self.tenant), (None, 900))
+
+    def test_non_finite_bounds_are_ignored(self):
+        from cars.views import _price_bounds
+        for code in ("KRW", "SAR"):
+            self.assertEqual(pricing.krw_range(float("inf"), float("nan"), code, self.tenant),
+                             (None, None))
+        with mock.patch.object(pricing, "factors", return_value={"KRW": 1.0}):
+            self.assertEqual(_price_bounds({"price_min": "inf", "price_max": "nan"}), (None, None))
+            self.assertEqual(_price_bounds({"price_min": "1e400", "price_max": "900"}), (None, 900))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class GenerationTests(SimpleTestCase):
+    def test_bump_moves_only_its_own_counter(self):
+        stats, facets = generations.generation("stats", "t1"), generations.generation("facets", "t1")
+        generations.bump("stats", "t1")
+        self.assertGreater(generations.generation("stats", "t1"), stats)
+        self.assertEqual(generations.generation("facets", "t1"), facets)
+        self.assertEqual(generations.generation("stats", "t2"), generations.generation("stats", "t2"))
+
+
+class NotifyRetryTests(SimpleTestCase):
+    def _message(self, attempts):
+        return SimpleNamespace(attempts=attempts, status="pending", error="",
+                               next_attempt_at=None, STATUS_FAILED="failed")
+
+    def test_each_try_counts_once(self):
+        m = self._message(0)
+        notify._retry(m, "timeout")
+        self.assertEqual((m.status, m.attempts), ("pending", 1))
+        m = self._message(notify.MAX_ATTEMPTS - 1)
+        notify._retry(m, "timeout")
+        self.assertEqual((m.status, m.attempts), ("failed", notify.MAX_ATTEMPTS))
+
+
+class BotThrottleTests(SimpleTestCase):
+    def setUp(self):
+        ratelimit._local.clear()
+        ratelimit._redis_down_until = 0.0
+        self.mw = QueryStringGuardMiddleware(lambda request: "ok")
+        self.rf = RequestFactory()
+
+    def _get(self, path, ua="Mozilla/5.0 (compatible; Googlebot/2.1)"):
+        return self.mw(self.rf.get(path, HTTP_USER_AGENT=ua, REMOTE_ADDR="1.2.3.4"))
+
+    def test_throttled_bot_gets_429_past_the_limit(self):
+        for _ in range(QueryStringGuardMiddleware.BOT_RATE_LIMIT):
+            self.assertEqual(self._get("/cars/"), "ok")
+        self.assertEqual(self._get("/cars/").status_code, 429)
+
+    def test_path_families_have_separate_budgets(self):
+        for _ in range(QueryStringGuardMiddleware.BOT_RATE_LIMIT + 1):
+            self._get("/cars/")
+        self.assertEqual(self._get("/sitemap.xml"), "ok")
+
+    def test_browsers_are_not_throttled(self):
+        for _ in range(QueryStringGuardMiddleware.BOT_RATE_LIMIT + 5):
+            self.assertEqual(self._get("/cars/", ua="Mozilla/5.0 (X11; Linux)"), "ok")
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """RequestProfileMiddleware + @query_budget in strict (test) mode."""
+
+    @staticmethod
+    def _view(n):
+        @profiling.query_budget(2)
+        def view(request):
+            with connection.cursor() as cur:
+                for _ in range(n):
+                    cur.execute("SELECT 1")
+            return HttpResponse("ok")
+        return view
+
+    def _call(self, view):
+        def get_response(request):
+            mw.process_view(request, view, (), {})
+            return view(request)
+        mw = RequestProfileMiddleware(get_response)
+        request = RequestFactory().get("/")
+        return request, mw(request)
+
+    def test_within_budget_passes_and_is_profiled(self):
+        request, response = self._call(self._view(2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.profile.queries, 2)
+
+    def test_over_budget_raises(self):
+        with self.assertRaises(profiling.QueryBudgetExceeded):
+            self._call(self._view(3))
+
+
+class TelemetryRenderTests(SimpleTestCase):
+    """Exposition format of tenants.telemetry, rendered from the in-process
+    totals (no Redis in tests)."""
+
+    def test_histogram_series_are_cumulative(self):
+        labels = {"view": "t_hist", "schema": "s"}
+        telemetry.observe("http_request_duration_seconds", 0.3, labels)
+        out = telemetry.render()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", out)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.5",schema="s",view="t_hist"} 1', out)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.25",schema="s",view="t_hist"} 0', out)
+        buckets = [line.split('le="', 1)[1].split('"', 1)[0] for line in out.splitlines()
+                   if line.startswith("http_request_duration_seconds_bucket") and 't_hist"' in line]
+        self.assertEqual(buckets, [str(le) for le in telemetry.LATENCY_BUCKETS] + ["+Inf"])
+        self.assertIn('http_request_duration_seconds_count{schema="s",view="t_hist"} 1', out)
+
+    def test_label_values_are_escaped(self):
+        telemetry.inc("cache_requests_total", {"family": 'we"ird', "result": "hit"})
+        self.assertIn('family="we\\"ird"', telemetry.render())